@@ -2,12 +2,9 @@
 wtf.__main__
 
 The main entrypoint for the bundled app. This module is executed when you run
-    the wtf module as a script, i.e. `python -m wtf`.
+    the wtf module as a script, i.e. `python -m wtf`. See wtf.cli for the
+    available commands.
 '''
-import os
-from wtf.app import create_app
+from wtf.cli import main
 
-HOST = os.getenv('WTF_HOST')
-PORT = int(os.getenv('WTF_PORT')) if os.getenv('WTF_PORT') else None
-
-create_app().run(host=HOST, port=PORT)
+main()
@@ -2,13 +2,23 @@
 wtf.api.__main__
 
 The main entrypoint for the API. This module is executed when you run the
-    wtf.api module as a script, i.e. `python -m wtf.api`.
+    wtf.api module as a script, i.e. `python -m wtf.api`. The recipe catalog
+    (WTF_CATALOG), if any, is loaded when the app is created.
+
+With --profile-startup, the startup time of the API is reported instead (see
+    wtf.startup).
 '''
 import os
+import sys
+from wtf import startup
 from wtf.api.app import create_app
 
 
+CATALOG = os.getenv('WTF_CATALOG')
 HOST = os.getenv('WTF_API_HOST')
 PORT = int(os.getenv('WTF_API_PORT')) if os.getenv('WTF_API_PORT') else None
 
-create_app().run(host=HOST, port=PORT)
+if '--profile-startup' in sys.argv[1:]:
+    startup.main('wtf.api.app')
+else:
+    create_app(catalog=CATALOG).run(host=HOST, port=PORT)
@@ -0,0 +1,50 @@
+'''
+wtf.api.admin
+
+Admin features of the API (e.g. profiling, see wtf.api.profiling) are only
+    available to requests that send the WTF_ADMIN_SECRET in the
+    `X-Admin-Secret` header, and are disabled when no secret is configured.
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/admin/profiles \
+        --header "X-Admin-Secret: ..."
+'''
+import hmac
+from functools import wraps
+from flask import current_app, request
+
+
+HEADER = 'X-Admin-Secret'
+
+
+class AdminError(Exception):
+    '''Represents a failed request for an admin feature.'''
+
+    def __init__(self, message, status=403):
+        super(AdminError, self).__init__(message)
+        self.status = status
+
+
+def is_admin():
+    '''Check whether the current request has the admin secret.'''
+    secret = current_app.config.get('WTF_ADMIN_SECRET')
+    if not secret:
+        return False
+    return hmac.compare_digest(
+        request.headers.get(HEADER, '').encode('utf-8'), secret.encode('utf-8'))
+
+
+def admin_required(func):
+    '''Decorate a route handler to require the admin secret.
+
+    The handler raises an AdminError if the secret is missing or wrong.
+    '''
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            raise AdminError('Forbidden')
+        return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,17 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from wtf.api import admin
+from wtf.api.app import create_app
+
+
+def test_admin_required():
+    client = create_app(prefix='', config={'WTF_ADMIN_SECRET': 'foo'}).test_client()
+    assert client.get('/admin/profiles').status_code == 403
+    response = client.get('/admin/profiles', headers={admin.HEADER: 'bar'})
+    assert response.status_code == 403
+    assert response.get_json() == {'errors': ['Forbidden']}
+    assert client.get('/admin/profiles', headers={admin.HEADER: 'foo'}).status_code == 200
+
+
+def test_disabled_without_secret():
+    client = create_app(prefix='', config={'WTF_ADMIN_SECRET': ''}).test_client()
+    assert client.get('/admin/profiles', headers={admin.HEADER: ''}).status_code == 403
@@ -0,0 +1,202 @@
+'''
+wtf.api.admission
+
+Admission control: limits on the number of requests handled at once, so that
+    a burst of requests is turned away quickly instead of slowing down every
+    request.
+
+Each process admits at most WTF_ADMISSION_LIMIT requests at once (0 for no
+    limit), and each route in WTF_ADMISSION_ROUTE_LIMITS at most its own
+    limit, e.g. `create_account=4,get_export=2` to keep expensive requests
+    (password hashing, bulk exports) from taking over the workers. A request
+    over a limit waits in a queue of at most WTF_ADMISSION_QUEUE_SIZE requests
+    for up to WTF_ADMISSION_TIMEOUT seconds; when the queue is full or the
+    wait times out, it is rejected with a 503 and a `Retry-After` header.
+    Routes in WTF_ADMISSION_EXEMPT (e.g. `get_health`) are always admitted.
+    Streamed responses (exports) hold their slots until they are sent.
+
+The number of requests waiting and of rejected requests are exported in the
+    request metrics (see wtf.api.metrics).
+'''
+from threading import Condition
+from time import monotonic
+from flask import request
+
+
+class AdmissionError(Exception):
+    '''Represents a request rejected because the server is at capacity.'''
+
+    def __init__(self, message, retry_after):
+        super(AdmissionError, self).__init__(message)
+        self.retry_after = retry_after
+
+
+class Limiter(object):
+    '''A limit on requests handled at once, with a bounded queue of waiting requests.'''
+
+    def __init__(self, limit, queue_size=0, timeout=1.0):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.condition = Condition()
+
+    def try_acquire(self):
+        '''Take a slot if one is free and no request is waiting for one.'''
+        with self.condition:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return True
+            return False
+
+    def acquire(self):
+        '''Take a slot, waiting for one in the queue if needed.
+
+        Returns False if the queue is full or no slot was freed in time.
+        '''
+        with self.condition:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return True
+            if self.waiting >= self.queue_size:
+                return False
+            self.waiting += 1
+            try:
+                deadline = monotonic() + self.timeout
+                while self.active >= self.limit:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        if self.active < self.limit:
+                            self.condition.notify()  # pass on a slot freed meanwhile
+                        return False
+                    self.condition.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        '''Free a slot.'''
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+
+class AdmissionController(object):
+    '''The limiters of an app: a global one (if any) and one per limited route.'''
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, limit=0, route_limits=None, queue_size=16, timeout=1.0,
+                 exempt=(), retry_after=1):
+        self.limiter = Limiter(limit, queue_size, timeout) if limit > 0 else None
+        self.route_limiters = {
+            route: Limiter(route_limit, queue_size, timeout)
+            for route, route_limit in (route_limits or {}).items()
+        }
+        self.exempt = frozenset(exempt)
+        self.retry_after = retry_after
+
+    def limiters(self, route):
+        '''Get the limiters that a request to a route must go through, in order.'''
+        if route in self.exempt:
+            return []
+        limiters = [self.route_limiters[route]] if route in self.route_limiters else []
+        return limiters + [self.limiter] if self.limiter is not None else limiters
+
+    def admit(self, limiters, metrics=None):
+        '''Acquire a slot of each limiter, returning whether the request was admitted.
+
+        The number of waiting requests is recorded in `metrics`, if given.
+        '''
+        acquired = []
+        for limiter in limiters:
+            if limiter.try_acquire():
+                acquired.append(limiter)
+                continue
+            shard = metrics.shard() if metrics is not None else None
+            if shard is not None:
+                shard.queued += 1
+            try:
+                admitted = limiter.acquire()
+            finally:
+                if shard is not None:
+                    shard.queued -= 1
+            if not admitted:
+                for other in acquired:
+                    other.release()
+                return False
+            acquired.append(limiter)
+        return True
+
+
+def parse_limits(value):
+    '''Parse route limits, e.g. "create_account=4,get_export=2".
+
+    Raises a ValueError if a limit is invalid.
+    '''
+    limits = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        route, _, limit = item.partition('=')
+        if not route.strip() or not limit.strip().isdigit() or int(limit) < 1:
+            raise ValueError('Invalid route limit: %s (expected <route>=<limit>)' % item)
+        limits[route.strip()] = int(limit)
+    return limits
+
+
+def init_app(app):
+    '''Set up admission control for an app.
+
+    Call it before wtf.api.metrics.init_app(), so that rejected requests and
+        the time spent waiting are included in the request metrics.
+    '''
+    controller = app.extensions['wtf.admission'] = AdmissionController(
+        limit=app.config.get('WTF_ADMISSION_LIMIT', 0),
+        route_limits=parse_limits(app.config.get('WTF_ADMISSION_ROUTE_LIMITS', '')),
+        queue_size=app.config.get('WTF_ADMISSION_QUEUE_SIZE', 16),
+        timeout=app.config.get('WTF_ADMISSION_TIMEOUT', 1.0),
+        exempt=[
+            route.strip() for route in app.config.get('WTF_ADMISSION_EXEMPT', '').split(',')
+            if route.strip()
+        ],
+        retry_after=app.config.get('WTF_ADMISSION_RETRY_AFTER', 1)
+    )
+    if controller.limiter is None and not controller.route_limiters:
+        return
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        endpoint = request.endpoint
+        route = endpoint.rpartition('.')[2] if endpoint else None
+        limiters = controller.limiters(route) if route else []
+        if not limiters:
+            return dispatch()
+        metrics = app.extensions.get('wtf.metrics')
+        if not controller.admit(limiters, metrics):
+            if metrics is not None:
+                metrics.count('rejected', route, request.method)
+            try:
+                # raised, since Flask handles the exception being handled
+                raise AdmissionError('Server is at capacity, retry later', controller.retry_after)
+            except AdmissionError as error:
+                return app.finalize_request(app.handle_user_exception(error))
+
+        def release():
+            for limiter in limiters:
+                limiter.release()
+
+        try:
+            response = dispatch()
+        except BaseException:
+            release()
+            raise
+        if response.is_streamed:
+            # e.g. an export, generated after dispatch returns
+            response.call_on_close(release)
+        else:
+            release()
+        return response
+
+    app.full_dispatch_request = full_dispatch_request
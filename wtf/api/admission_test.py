@@ -0,0 +1,122 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import threading
+import pytest
+from mock import patch
+from wtf.api import admission
+from wtf.api.app import create_app
+
+
+def test_limiter():
+    limiter = admission.Limiter(1, queue_size=1, timeout=0.01)
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+    assert limiter.active == 1
+    assert limiter.waiting == 0
+
+
+def test_limiter_queue():
+    limiter = admission.Limiter(1, queue_size=1, timeout=5.0)
+    limiter.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+    waiter.start()
+    while not limiter.waiting:
+        pass
+    assert not limiter.acquire()  # the queue is full
+    limiter.release()
+    waiter.join()
+    assert results == [True]
+    assert limiter.active == 1
+
+
+def test_controller_limiters():
+    controller = admission.AdmissionController(
+        limit=8, route_limits={'create_foo': 2}, exempt=['get_health'])
+    assert controller.limiters('get_health') == []
+    assert controller.limiters('get_foo') == [controller.limiter]
+    assert controller.limiters('create_foo') == [
+        controller.route_limiters['create_foo'], controller.limiter]
+    assert admission.AdmissionController().limiters('get_foo') == []
+
+
+def test_controller_admit_releases_on_rejection():
+    controller = admission.AdmissionController(
+        limit=1, route_limits={'create_foo': 2}, queue_size=0)
+    controller.limiter.acquire()
+    limiters = controller.limiters('create_foo')
+    assert not controller.admit(limiters)
+    assert limiters[0].active == 0
+
+
+def test_parse_limits():
+    assert admission.parse_limits('create_foo=4, get_bar = 2,') == {'create_foo': 4, 'get_bar': 2}
+    assert admission.parse_limits('') == {}
+    for value in ['create_foo', 'create_foo=0', '=2', 'create_foo=x']:
+        with pytest.raises(ValueError):
+            admission.parse_limits(value)
+
+
+@patch('wtf.core.characters.find_by_id')
+def test_app(mock_find_by_id):
+    started, release = threading.Event(), threading.Event()
+
+    def find_by_id(character_id):
+        started.set()
+        release.wait()
+        return {'id': character_id}
+
+    mock_find_by_id.side_effect = find_by_id
+    app = create_app(prefix='', config={
+        'WTF_ADMISSION_ROUTE_LIMITS': 'get_character_by_id=1',
+        'WTF_ADMISSION_QUEUE_SIZE': 0,
+        'WTF_ADMISSION_RETRY_AFTER': 2
+    })
+    responses = []
+    thread = threading.Thread(
+        target=lambda: responses.append(app.test_client().get('/characters/foo')))
+    thread.start()
+    started.wait()
+    try:
+        client = app.test_client()
+        response = client.get('/characters/bar')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '2'
+        assert response.get_json() == {'errors': ['Server is at capacity, retry later']}
+        assert client.get('/health').status_code == 200
+        text = client.get('/metrics').get_data(as_text=True)
+        assert ('wtf_http_rejected_requests_total'
+                '{route="get_character_by_id",method="GET"} 1') in text
+        assert ('wtf_http_requests_total'
+                '{route="get_character_by_id",method="GET",status="503"} 1') in text
+    finally:
+        release.set()
+        thread.join()
+    assert responses[0].status_code == 200
+    assert app.test_client().get('/characters/bar').status_code == 200
+
+
+@patch('wtf.core.characters.REPO', {'by_id': {'foo': {'id': 'foo'}}})
+def test_app_streamed():
+    app = create_app(prefix='', config={
+        'WTF_ADMISSION_ROUTE_LIMITS': 'get_export=1',
+        'WTF_ADMISSION_QUEUE_SIZE': 0
+    })
+    [limiter] = app.extensions['wtf.admission'].limiters('get_export')
+    client = app.test_client()
+    # the export holds its slot while its body is being sent
+    response = client.get('/export/characters', buffered=False)
+    assert response.status_code == 200
+    assert limiter.active == 1
+    assert client.get('/export/characters', buffered=True).status_code == 503
+    response.close()
+    assert limiter.active == 0
+    assert client.get('/export/characters', buffered=True).status_code == 200
+    assert limiter.active == 0
+
+
+def test_app_invalid_limits():
+    with pytest.raises(ValueError):
+        create_app(prefix='', config={'WTF_ADMISSION_ROUTE_LIMITS': 'create_account'})
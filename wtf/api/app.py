@@ -4,11 +4,42 @@ wtf.api.app
 The War Torn Faith API app.
 '''
 from flask import Flask
-from wtf.api import routes, API_PREFIX
+from wtf import config as wtf_config
+from wtf.api import admission, idempotency, metrics, profiling, routes, serialization, server_timing
+from wtf.api import catalog_watcher, coalescing, rate_limiting, realms, request_loader
+from wtf.api import slow_requests
+from wtf.api import API_PREFIX
+from wtf.core import catalog as wtf_catalog, equipment, realms as wtf_realms
 
 
-def create_app(prefix=API_PREFIX):
-    '''Create the API Flask application'''
+def create_app(prefix=API_PREFIX, config=None, catalog=None):
+    '''Create the API Flask application
+
+    The recipes of a catalog file or snapshot (see wtf.core.catalog) are
+        loaded if a `catalog` path is given, which is then the catalog that
+        is reloaded (WTF_CATALOG). They are read once, and shared by the
+        realms that the app serves (WTF_REALMS, see wtf.api.realms).
+    '''
     app = Flask(__name__)
+    app.config.update(wtf_config.load(config))
+    equipment.set_sampler(app.config['WTF_GRADE_SAMPLER'])
+    served = realms.init_app(app, prefix)
+    if catalog:
+        recipes = wtf_catalog.read(catalog)
+        for realm in served:
+            with wtf_realms.using(realm):
+                wtf_catalog.store(recipes)
+        app.config['WTF_CATALOG'] = catalog
+    serialization.init_app(app)
+    idempotency.init_app(app)
+    coalescing.init_app(app)
+    request_loader.init_app(app)
+    admission.init_app(app)
+    rate_limiting.init_app(app)
+    metrics.init_app(app)
+    server_timing.init_app(app)
+    profiling.init_app(app)
+    slow_requests.init_app(app)
+    catalog_watcher.init_app(app)
     app.register_blueprint(routes.BLUEPRINT, url_prefix='%s' % prefix)
     return app
@@ -1,8 +1,22 @@
 # pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import json
 from flask import Flask
+from mock import patch
 from wtf.api.app import create_app
 
 
 def test_create_app():
     app = create_app()
     assert isinstance(app, Flask)
+
+
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_create_app_catalog(tmpdir):
+    path = tmpdir.join('catalog.json')
+    path.write(json.dumps({'weapon-recipes': [{
+        'id': 'foo-sword', 'name': 'Foo Sword', 'description': 'Foo',
+        'weight': {'center': 12, 'radius': 3}, 'type': 'sword',
+        'damage': {'min': {'center': 50, 'radius': 10}, 'max': {'center': 100, 'radius': 10}}
+    }]}))
+    client = create_app(prefix='', catalog=str(path)).test_client()
+    assert client.get('/weapon-recipes/foo-sword').status_code == 200
@@ -0,0 +1,91 @@
+'''
+wtf.api.catalog_watcher
+
+Reloads the recipe catalog (WTF_CATALOG) when its file changes, checking its
+    modification time and size every WTF_CATALOG_WATCH_INTERVAL seconds (see
+    wtf.core.catalog.reload()). Replace the file atomically (write a temporary
+    file, then rename it over the catalog), so that a half-written catalog is
+    never read.
+
+Each process watches the file from its first request on, so that every worker
+    of the production server (see wtf.server) reloads the catalog. A catalog
+    that fails to load is logged to the `wtf.catalog` logger, and the recipes
+    already loaded are kept until the file changes again.
+
+The catalog is read once and reloaded in every realm that the app serves
+    (see wtf.api.realms), each of which has its own catalog version.
+'''
+import logging
+import os
+import threading
+from time import sleep
+from wtf.core import catalog, realms
+
+
+LOGGER = logging.getLogger('wtf.catalog')
+
+
+class CatalogWatcher(object):
+    '''Watches a catalog file, reloading it when it changes.'''
+
+    def __init__(self, path, interval=1.0, served=None):
+        self.path = path
+        self.interval = interval
+        self.realms = served or [realms.DEFAULT]
+        self.stamp = self.read_stamp()
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def read_stamp(self):
+        '''Get the modification time and size of the file (None if it is missing).'''
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self):
+        '''Start watching, once per (forked) process.'''
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        while True:
+            sleep(self.interval)
+            self.check()
+
+    def check(self):
+        '''Reload the catalog if the file changed, returning the reload's result (or None).
+
+        The result is that of the first realm.
+        '''
+        stamp = self.read_stamp()
+        if stamp is None or stamp == self.stamp:
+            return None
+        self.stamp = stamp
+        try:
+            result = catalog.reload(self.path, self.realms)
+        except Exception as error:  # pylint: disable=broad-except
+            # e.g. invalid recipes, or a file that isn't a catalog
+            LOGGER.error('Unable to reload catalog %s: %s', self.path, error)
+            return None
+        LOGGER.info('Reloaded catalog %s (version %d, %d realms)', self.path,
+                    result['version'], len(self.realms))
+        return result
+
+
+def init_app(app):
+    '''Watch the app's catalog file, if configured.'''
+    path = app.config.get('WTF_CATALOG')
+    interval = app.config.get('WTF_CATALOG_WATCH_INTERVAL', 0.0)
+    if not path or interval <= 0:
+        app.extensions['wtf.catalog_watcher'] = None
+        return
+    router = app.extensions.get('wtf.realms')
+    watcher = app.extensions['wtf.catalog_watcher'] = CatalogWatcher(
+        path, interval, list(router.realms.values()) if router is not None else None)
+    app.before_request(watcher.start)
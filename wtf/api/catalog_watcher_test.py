@@ -0,0 +1,91 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import json
+import os
+from mock import patch
+from wtf.api import admin, catalog_watcher
+from wtf.api.app import create_app
+from wtf.bench.responses import RECIPE
+from wtf.core import catalog, realms, weapons
+
+
+def write(path, recipes, mtime):
+    path.write(json.dumps({'weapon-recipes': recipes}))
+    os.utime(str(path), (mtime, mtime))
+
+
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_check(tmpdir):
+    path = tmpdir.join('catalog.json')
+    write(path, [dict(RECIPE, id='foo')], 1000)
+    watcher = catalog_watcher.CatalogWatcher(str(path))
+    assert watcher.check() is None
+    write(path, [dict(RECIPE, id='foo'), dict(RECIPE, id='bar')], 2000)
+    assert watcher.check()['recipes']['weapon-recipes'] == 2
+    assert set(weapons.REPO_RECIPES['by_id']) == {'foo', 'bar'}
+    assert watcher.check() is None
+    write(path, [dict(RECIPE, id='baz', type='spoon')], 3000)
+    with patch.object(catalog_watcher.LOGGER, 'error') as mock_error:
+        assert watcher.check() is None
+    assert mock_error.called
+    assert 'baz' not in weapons.REPO_RECIPES['by_id']
+    path.remove()
+    assert watcher.check() is None
+
+
+def test_check_realms(tmpdir):
+    path = tmpdir.join('catalog.json')
+    write(path, [], 1000)
+    eu, us = realms.Realm('eu'), realms.Realm('us')
+    watcher = catalog_watcher.CatalogWatcher(str(path), served=[eu, us])
+    write(path, [dict(RECIPE, id='foo')], 2000)
+    with patch('wtf.core.catalog.read', wraps=catalog.read) as mock_read:
+        assert watcher.check()['version'] == 1
+    assert mock_read.call_count == 1
+    recipes = [realm.repositories['weapon_recipes']['by_id']['foo'] for realm in [eu, us]]
+    assert recipes[0] is recipes[1]
+    assert (eu.catalog_version, us.catalog_version) == (1, 1)
+    # a realm that fails to update leaves every realm at its version
+    us.repositories['weapon_recipes']['by_id'] = None
+    write(path, [dict(RECIPE, id='bar')], 3000)
+    with patch.object(catalog_watcher.LOGGER, 'error'):
+        assert watcher.check() is None
+    assert 'bar' not in eu.repositories['weapon_recipes']['by_id']
+    assert (eu.catalog_version, us.catalog_version) == (1, 1)
+
+
+@patch('wtf.api.catalog_watcher.CatalogWatcher.start')
+def test_init_app(mock_start, tmpdir):
+    app = create_app(prefix='')
+    assert app.extensions['wtf.catalog_watcher'] is None
+    path = tmpdir.join('catalog.json')
+    write(path, [], 1000)
+    app = create_app(prefix='', config={
+        'WTF_CATALOG': str(path), 'WTF_CATALOG_WATCH_INTERVAL': 0.5})
+    watcher = app.extensions['wtf.catalog_watcher']
+    assert (watcher.path, watcher.interval) == (str(path), 0.5)
+    app.test_client().get('/health')
+    assert mock_start.called
+
+
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_reload_route(tmpdir):
+    headers = {admin.HEADER: 'foo'}
+    client = create_app(prefix='', config={'WTF_ADMIN_SECRET': 'foo'}).test_client()
+    assert client.post('/admin/catalog/reload', headers=headers).status_code == 400
+    path = tmpdir.join('catalog.json')
+    write(path, [dict(RECIPE, id='foo')], 1000)
+    client = create_app(prefix='', config={'WTF_ADMIN_SECRET': 'foo'},
+                        catalog=str(path)).test_client()
+    assert client.post('/admin/catalog/reload').status_code == 403
+    version = catalog.version()
+    etag = client.get('/weapon-recipes/foo').headers['ETag']
+    write(path, [dict(RECIPE, id='foo', name='Bar Sword')], 2000)
+    response = client.post('/admin/catalog/reload', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'version': version + 1, 'recipes': {'weapon-recipes': 1, 'armor-recipes': 0}}
+    response = client.get('/weapon-recipes/foo')
+    assert response.get_json()['recipe']['name'] == 'Bar Sword'
+    assert response.headers['ETag'] != etag
+    assert client.get('/admin/catalog', headers=headers).get_json() == {
+        'path': str(path), 'version': version + 1}
@@ -0,0 +1,110 @@
+'''
+wtf.api.coalescing
+
+Coalesced lookups (single flight).
+
+Identical GET requests (same realm, path, query string and response format) that
+    arrive while one of them is being handled wait for it instead of repeating
+    the lookup: the first request is handled normally, and every request that
+    joined it in flight is answered with a copy of its response (marked
+    `X-Coalesced: true`). Responses are not stored, so a request that arrives
+    after the first one completed is handled again.
+
+Coalesced requests are counted by route in the
+    `wtf_http_coalesced_requests_total` metric (see wtf.api.metrics).
+    Conditional requests are never coalesced, since their response depends on
+    their headers. Coalescing is enabled by WTF_COALESCING, and a request waits
+    at most WTF_COALESCING_TIMEOUT seconds for the one it joined.
+'''
+from functools import wraps
+from threading import Event, Lock
+from flask import current_app, request
+from wtf.api.idempotency import StoredResponse
+from wtf.api.serialization import CONDITIONAL_HEADERS, response_mimetype
+from wtf.core import realms
+
+
+HEADER = 'X-Coalesced'
+
+
+# pylint: disable=too-few-public-methods
+class Flight(object):
+    '''A request that is being handled, which identical requests can join.'''
+
+    __slots__ = ['done', 'result']
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+
+
+class Coalescer(object):
+    '''Requests in flight, by key.'''
+
+    def __init__(self, timeout=30.0):
+        self.in_flight = {}
+        self.timeout = timeout
+        self.lock = Lock()
+
+    def execute(self, key, handle):
+        '''Get the response to a request, joining an identical request in flight if any.
+
+        `handle` is a function that creates the response. Returns a tuple of
+            the StoredResponse and whether it was coalesced. If the request
+            in flight fails or is still in flight after `timeout`, `handle` is
+            called to handle this request on its own.
+        '''
+        with self.lock:
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = Flight()
+        if leader:
+            return self._lead(key, flight, handle), False
+        if flight.done.wait(self.timeout) and flight.result is not None:
+            return flight.result, True
+        return StoredResponse(None, handle()), False
+
+    def _lead(self, key, flight, handle):
+        try:
+            flight.result = StoredResponse(None, handle())
+            return flight.result
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            flight.done.set()
+
+
+def init_app(app):
+    '''Set up coalesced lookups for an app.'''
+    app.extensions['wtf.coalescing'] = Coalescer(
+        timeout=app.config.get('WTF_COALESCING_TIMEOUT', 30.0)
+    ) if app.config.get('WTF_COALESCING', True) else None
+
+
+def coalesced(view):
+    '''Decorate a (GET) view to coalesce identical concurrent requests.'''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        coalescer = current_app.extensions.get('wtf.coalescing')
+        if coalescer is None or CONDITIONAL_HEADERS.intersection(request.environ):
+            return view(*args, **kwargs)
+
+        def handle():
+            try:
+                result = view(*args, **kwargs)
+            except Exception as error:  # pylint: disable=broad-except
+                result = current_app.handle_user_exception(error)
+            return current_app.make_response(result)
+
+        key = (realms.current().name, request.path, request.query_string,
+               response_mimetype())
+        stored, joined = coalescer.execute(key, handle)
+        response = stored.to_response()
+        if joined:
+            response.headers[HEADER] = 'true'
+            metrics = current_app.extensions.get('wtf.metrics')
+            if metrics is not None:
+                metrics.count('coalesced', view.__name__, request.method)
+        return response
+    return wrapper
@@ -0,0 +1,135 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name,unused-argument
+import threading
+from time import sleep
+import pytest
+from flask import Flask
+from mock import Mock, patch
+from wtf.api import coalescing
+from wtf.api.app import create_app
+
+
+@pytest.fixture
+def app():
+    return create_app(prefix='')
+
+
+@pytest.fixture
+def repo():
+    with patch('wtf.core.characters.REPO', {'by_id': {}, 'by_account': {}}) as repo:
+        yield repo
+
+
+def execute_concurrently(coalescer, handle, count):
+    '''Execute `count` requests, all but the first joining it while it is in flight.'''
+    app = Flask(__name__)
+    results = []
+
+    def execute():
+        with app.app_context():
+            try:
+                results.append(coalescer.execute('key', handle))
+            except Exception as error:  # pylint: disable=broad-except
+                results.append((error, False))
+
+    threads = [threading.Thread(target=execute) for _ in range(count)]
+    threads[0].start()
+    handle.started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    sleep(0.1)
+    handle.release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class BlockingHandle(object):
+    '''Creates responses (or raises errors) in order, once released.'''
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.started, self.release = threading.Event(), threading.Event()
+        self.call_count = 0
+        self.app = Flask(__name__)
+
+    def __call__(self):
+        self.call_count += 1
+        self.started.set()
+        self.release.wait()
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return self.app.response_class(result)
+
+
+def test_execute_concurrent_duplicates_share_one_flight():
+    coalescer = coalescing.Coalescer()
+    handle = BlockingHandle(b'foo')
+    results = execute_concurrently(coalescer, handle, 5)
+    assert handle.call_count == 1
+    assert sorted(joined for _, joined in results) == [False] + [True] * 4
+    assert len(set(id(stored) for stored, _ in results)) == 1
+    assert not coalescer.in_flight
+
+
+def test_execute_leader_failure():
+    coalescer = coalescing.Coalescer()
+    handle = BlockingHandle(Exception('foo'), b'bar', b'bar')
+    results = execute_concurrently(coalescer, handle, 3)
+    assert handle.call_count == 3
+    bodies = sorted(str(result) if isinstance(result, Exception) else result.body.decode()
+                    for result, _ in results)
+    assert bodies == ['bar', 'bar', 'foo']
+    assert not coalescer.in_flight
+
+
+def test_execute_wait_timeout():
+    app = Flask(__name__)
+    coalescer = coalescing.Coalescer(timeout=0.01)
+    coalescer.in_flight['key'] = coalescing.Flight()
+    with app.app_context():
+        stored, joined = coalescer.execute('key', lambda: app.response_class(b'foo'))
+    assert stored.body == b'foo'
+    assert not joined
+
+
+def test_execute_not_stored():
+    app = Flask(__name__)
+    coalescer = coalescing.Coalescer()
+    handle = Mock(side_effect=lambda: app.response_class(b'foo'))
+    with app.app_context():
+        assert not coalescer.execute('key', handle)[1]
+        assert not coalescer.execute('key', handle)[1]
+    assert handle.call_count == 2
+
+
+def test_coalesced(app, repo):
+    repo['by_id']['foo'] = {'id': 'foo', 'name': 'Foo'}
+    flight = coalescing.Flight()
+    app.extensions['wtf.coalescing'].in_flight[
+        'default', '/characters/foo', b'', 'application/json'] = flight
+    flight.result = coalescing.StoredResponse(None, app.response_class(b'{"character": {}}'))
+    flight.done.set()
+    response = app.test_client().get('/characters/foo')
+    assert response.status_code == 200
+    assert response.get_data() == b'{"character": {}}'
+    assert response.headers[coalescing.HEADER] == 'true'
+    requests = app.test_client().get('/metrics').get_data(as_text=True)
+    assert ('wtf_http_coalesced_requests_total'
+            '{route="get_character_by_id",method="GET"} 1') in requests
+
+
+def test_coalesced_not_conditional(app, repo):
+    repo['by_id']['foo'] = {'id': 'foo', 'name': 'Foo'}
+    app.extensions['wtf.coalescing'].in_flight['/characters/foo', b'', 'application/json'] = \
+        coalescing.Flight()
+    response = app.test_client().get('/characters/foo', headers={'If-None-Match': '"bar"'})
+    assert response.status_code == 200
+    assert coalescing.HEADER not in response.headers
+
+
+def test_disabled(repo):
+    app = create_app(prefix='', config={'WTF_COALESCING': False})
+    assert app.extensions['wtf.coalescing'] is None
+    repo['by_id']['foo'] = {'id': 'foo', 'name': 'Foo'}
+    assert app.test_client().get('/characters/foo').status_code == 200
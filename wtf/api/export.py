@@ -0,0 +1,84 @@
+'''
+wtf.api.export
+
+Full exports of the game's repositories as newline-delimited JSON (NDJSON),
+    one record per line.
+
+Exports are generated in batches, so only one batch of transformed records is
+    held in memory at a time (on top of a list of references to the records
+    taken when the export starts, so that concurrent saves don't disturb it).
+    Repositories stored in a database (see wtf.storage) are snapshotted as a
+    list of ids instead, and each batch of records is read when it is exported.
+
+Repositories are append-only and keep insertion order, so an export can be
+    resumed: the cursor is the number of records already received, i.e. an
+    interrupted export with cursor `c` that delivered `n` complete lines is
+    resumed with cursor `c + n`.
+'''
+from wtf.core import accounts, armor, characters, weapons
+from wtf.core.errors import NotFoundError, ValidationError
+
+
+BATCH_SIZE = 500
+KINDS = {
+    'accounts': (lambda: accounts.REPO, accounts.transform_many),
+    'characters': (lambda: characters.REPO, list),
+    'weapon-recipes': (lambda: weapons.REPO_RECIPES, list),
+    'weapons': (lambda: weapons.REPO, weapons.transform_many),
+    'armor-recipes': (lambda: armor.REPO_RECIPES, list),
+    'armor': (lambda: armor.REPO, armor.transform_many)
+}
+
+
+class StoredRecords(object):  # pylint: disable=too-few-public-methods
+    '''A snapshot of the ids of a stored mapping's records, read in slices.'''
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+        self.keys = list(mapping)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, index):
+        keys = self.keys[index]
+        found = self.mapping.get_many(keys)
+        return [found[key] for key in keys if key in found]
+
+
+def parse_cursor(cursor):
+    '''Parse an export cursor.
+
+    Raises a ValidationError if the cursor is not a non-negative integer.
+    '''
+    try:
+        cursor = int(cursor or 0)
+    except ValueError:
+        cursor = -1
+    if cursor < 0:
+        raise ValidationError('Invalid cursor: must be an integer >= 0')
+    return cursor
+
+
+def snapshot(kind):
+    '''Take a snapshot of the records of a kind.
+
+    Raises a NotFoundError if the kind is not exportable.
+    '''
+    if kind not in KINDS:
+        raise NotFoundError('Export not found')
+    get_repo, transform_many = KINDS[kind]
+    by_id = get_repo().get('by_id')
+    if not isinstance(by_id, dict):
+        return StoredRecords(by_id), transform_many
+    return list(by_id.values()), transform_many
+
+
+def export(records, transform_many, encode, cursor=0, batch_size=BATCH_SIZE):
+    '''Generate NDJSON chunks (one per batch) for a snapshot of records.
+
+    `encode` is a function that encodes a record as JSON bytes.
+    '''
+    for start in range(cursor, len(records), batch_size):
+        batch = transform_many(records[start:start + batch_size])
+        yield b''.join([encode(record) + b'\n' for record in batch])
@@ -0,0 +1,57 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import json
+import pytest
+from mock import patch
+from wtf import storage
+from wtf.api import export
+from wtf.core.errors import NotFoundError, ValidationError
+
+
+def test_parse_cursor():
+    assert export.parse_cursor(None) == 0
+    assert export.parse_cursor('42') == 42
+    for cursor in ['-1', 'foo']:
+        with pytest.raises(ValidationError) as e:
+            export.parse_cursor(cursor)
+        assert e.value.errors == ['Invalid cursor: must be an integer >= 0']
+
+
+@patch('wtf.core.characters.REPO', {'by_id': {'a': {'id': 'a'}, 'b': {'id': 'b'}}})
+def test_snapshot():
+    records, transform_many = export.snapshot('characters')
+    assert records == [{'id': 'a'}, {'id': 'b'}]
+    assert transform_many is list
+
+
+def test_snapshot_stored(tmpdir):
+    by_id = storage.SQLiteDatabase(str(tmpdir.join('wtf.db'))).mapping('characters')
+    for key in 'abc':
+        by_id[key] = {'id': key}
+    with patch('wtf.core.characters.REPO', {'by_id': by_id}):
+        records, _ = export.snapshot('characters')
+    assert isinstance(records, export.StoredRecords)
+    by_id['d'] = {'id': 'd'}
+    del by_id['b']
+    assert len(records) == 3
+    with patch.object(by_id, 'get_many', wraps=by_id.get_many) as get_many:
+        chunks = list(export.export(records, list, lambda record: record['id'].encode(),
+                                    batch_size=2))
+    assert chunks == [b'a\n', b'c\n']
+    assert get_many.call_count == 2
+
+
+def test_snapshot_not_found():
+    with pytest.raises(NotFoundError) as e:
+        export.snapshot('foobar')
+    assert str(e.value) == 'Export not found'
+
+
+def test_export():
+    records = [{'id': i} for i in range(5)]
+    encode = lambda record: json.dumps(record).encode()
+    chunks = list(export.export(records, list, encode, cursor=1, batch_size=2))
+    assert chunks == [
+        b'{"id": 1}\n{"id": 2}\n',
+        b'{"id": 3}\n{"id": 4}\n'
+    ]
+    assert list(export.export(records, list, encode, cursor=5)) == []
@@ -0,0 +1,281 @@
+'''
+wtf.api.idempotency
+
+Idempotent create requests.
+
+A client that retries a POST (e.g. after a timeout) sends the same
+    `Idempotency-Key` header with each attempt. The first request with a key is
+    handled normally and its response stored; retries with the same key are
+    answered with the stored response (marked `Idempotent-Replayed: true`)
+    without running the handler again. A retry that arrives while the first
+    request is still being handled waits for it to finish.
+
+Stored responses are bounded in number (WTF_IDEMPOTENCY_CACHE_SIZE) and
+    expire after WTF_IDEMPOTENCY_TTL seconds. Server errors (5xx) are not
+    stored, so that they can be retried. Reusing a key for a different request
+    (method, path, Content-Type or body) is an error. Keys are scoped to the
+    realm (see wtf.core.realms) and path of the request.
+
+Responses are stored in process memory by default, so each worker process of
+    the production server (see wtf.server) only replays the requests that it
+    handled itself: a retry that reaches another worker is handled again. Set
+    WTF_IDEMPOTENCY_STORAGE to `sqlite:///<path>` to share them between
+    workers, where a retry of a request in flight in another worker polls
+    the database until the request is handled.
+'''
+import json
+from functools import wraps
+from hashlib import md5
+from threading import Event, Lock
+from time import sleep, time
+from flask import current_app, request
+from wtf import storage
+from wtf.cache import LRUCache
+from wtf.core import realms
+from wtf.core.errors import ValidationError
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+PRUNE_INTERVAL = 1000
+
+
+class IdempotencyError(Exception):
+    '''Represents a misuse of an idempotency key.'''
+
+    def __init__(self, message, status):
+        super(IdempotencyError, self).__init__(message)
+        self.status = status
+
+
+# pylint: disable=too-few-public-methods
+class StoredResponse(object):
+    '''A stored response to a request with an idempotency key.'''
+
+    __slots__ = ['fingerprint', 'status', 'headers', 'body']
+
+    def __init__(self, fingerprint, response):
+        self.fingerprint = fingerprint
+        self.status = response.status_code
+        self.headers = list(response.headers.items())
+        self.body = response.get_data()
+
+    @classmethod
+    def restore(cls, fingerprint, status, headers, body):
+        '''Restore a stored response (e.g. from a database).'''
+        stored = cls.__new__(cls)
+        stored.fingerprint, stored.status, stored.headers, stored.body = \
+            fingerprint, status, headers, body
+        return stored
+
+    def to_response(self, replayed=False):
+        '''Create a response from this one, marked as a replay if `replayed`.'''
+        response = current_app.response_class(self.body, status=self.status, headers=self.headers)
+        if replayed:
+            response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+
+class InFlight(object):
+    '''A request with an idempotency key that is being handled.'''
+
+    __slots__ = ['fingerprint', 'done', 'result']
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = Event()
+        self.result = None
+
+
+class IdempotencyStore(object):
+    '''Stored responses, and requests in flight, by idempotency key.'''
+
+    def __init__(self, max_entries=10000, ttl=86400, timeout=30.0):
+        self.responses = LRUCache(max_entries=max_entries, ttl=ttl, name='idempotency')
+        self.in_flight = {}
+        self.timeout = timeout
+        self.lock = Lock()
+
+    def execute(self, key, fingerprint, handle):
+        '''Get the response to a request, calling `handle` only if needed.
+
+        `handle` is a function that creates the response. Returns a tuple of
+            the StoredResponse and whether it is a replay.
+
+        Raises an IdempotencyError if the key was used for a different request
+            or if the original request is still in flight after `timeout`.
+        '''
+        while True:
+            with self.lock:
+                stored = self.responses.get(key)
+                in_flight = self.in_flight.get(key) if stored is None else None
+                leader = stored is None and in_flight is None
+                if leader:
+                    in_flight = self.in_flight[key] = InFlight(fingerprint)
+            if stored is not None:
+                _check_fingerprint(stored, fingerprint)
+                return stored, True
+            if leader:
+                return self._lead(key, in_flight, handle), False
+            _check_fingerprint(in_flight, fingerprint)
+            if not in_flight.done.wait(self.timeout):
+                raise IdempotencyError(
+                    'A request with this Idempotency-Key is still in progress', 409)
+            if in_flight.result is not None:
+                return in_flight.result, True
+
+    def _lead(self, key, in_flight, handle):
+        try:
+            result = StoredResponse(in_flight.fingerprint, handle())
+            in_flight.result = result
+            if result.status < 500:
+                self.responses.set(key, result)
+            return result
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            in_flight.done.set()
+
+
+class SQLiteIdempotencyStore(object):
+    '''Stored responses, and requests in flight, in a SQLite database shared by processes.
+
+    A request in flight is a row without a response. Rows older than `ttl`
+        (or `timeout`, for requests in flight, e.g. in a worker that was
+        killed) are ignored, and deleted every PRUNE_INTERVAL requests (per
+        process).
+    '''
+
+    def __init__(self, path, ttl=86400, timeout=30.0):
+        self.database = storage.SQLiteDatabase(path)
+        self.database.connection.execute(
+            'CREATE TABLE IF NOT EXISTS idempotency ('
+            'key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status INTEGER, '
+            'headers TEXT, body BLOB, created REAL NOT NULL)')
+        self.ttl = ttl
+        self.timeout = timeout
+        self.requests = 0
+
+    def execute(self, key, fingerprint, handle):
+        '''Get the response to a request, see IdempotencyStore.execute().'''
+        key = json.dumps(key)
+        waited = 0.0
+        while True:
+            stored = self._claim(key, fingerprint)
+            if stored is None:
+                return self._lead(key, fingerprint, handle), False
+            _check_fingerprint(stored, fingerprint)
+            if stored.status is not None:
+                return stored, True
+            if waited >= self.timeout:
+                raise IdempotencyError(
+                    'A request with this Idempotency-Key is still in progress', 409)
+            sleep(POLL_INTERVAL)
+            waited += POLL_INTERVAL
+
+    def _claim(self, key, fingerprint):
+        '''Get the row of a key, or insert one (in flight) and return None if there is none.'''
+        now = time()
+        connection = self.database.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT fingerprint, status, headers, body, created FROM idempotency '
+                'WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[4] + (self.timeout if row[1] is None else self.ttl) > now:
+                connection.execute('COMMIT')
+                return StoredResponse.restore(
+                    row[0], row[1], row[2] and json.loads(row[2]), row[3])
+            connection.execute(
+                'INSERT OR REPLACE INTO idempotency (key, fingerprint, created) VALUES (?, ?, ?)',
+                (key, fingerprint, now))
+            self.requests += 1
+            if self.requests % PRUNE_INTERVAL == 0:
+                connection.execute(
+                    'DELETE FROM idempotency WHERE created < ? AND '
+                    '(status IS NOT NULL OR created < ?)',
+                    (now - self.ttl, now - self.timeout))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return None
+
+    def _lead(self, key, fingerprint, handle):
+        connection = self.database.connection
+        try:
+            result = StoredResponse(fingerprint, handle())
+        except Exception:
+            connection.execute('DELETE FROM idempotency WHERE key = ?', (key,))
+            raise
+        if result.status < 500:
+            connection.execute(
+                'UPDATE idempotency SET status = ?, headers = ?, body = ?, created = ? '
+                'WHERE key = ?',
+                (result.status, json.dumps(result.headers), result.body, time(), key))
+        else:
+            connection.execute('DELETE FROM idempotency WHERE key = ?', (key,))
+        return result
+
+
+def create_store(url, max_entries=10000, ttl=86400, timeout=30.0):
+    '''Create an idempotency store for a storage URL (see wtf.storage).
+
+    Raises a ValueError if the URL is not supported.
+    '''
+    if url == 'memory':
+        return IdempotencyStore(max_entries, ttl, timeout)
+    if url.startswith(storage.SQLITE_PREFIX):
+        return SQLiteIdempotencyStore(url[len(storage.SQLITE_PREFIX):], ttl, timeout)
+    raise ValueError('Unsupported idempotency storage: %s' % url)
+
+
+def _check_fingerprint(entry, fingerprint):
+    if entry.fingerprint != fingerprint:
+        raise IdempotencyError(
+            'Idempotency-Key has already been used for a different request', 422)
+
+
+def init_app(app):
+    '''Set up idempotent requests for an app.'''
+    size = app.config.get('WTF_IDEMPOTENCY_CACHE_SIZE', 0)
+    app.extensions['wtf.idempotency'] = create_store(
+        app.config.get('WTF_IDEMPOTENCY_STORAGE', 'memory'),
+        max_entries=size,
+        ttl=app.config.get('WTF_IDEMPOTENCY_TTL', 86400),
+        timeout=app.config.get('WTF_IDEMPOTENCY_TIMEOUT', 30.0)
+    ) if size > 0 else None
+
+
+def request_fingerprint():
+    '''Fingerprint the current request.'''
+    digest = md5(('%s %s %s\n' % (
+        request.method, request.path, request.content_type)).encode('utf-8'))
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def idempotent(view):
+    '''Decorate a view to honor the Idempotency-Key header.'''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        store = current_app.extensions.get('wtf.idempotency')
+        if key is None or store is None:
+            return view(*args, **kwargs)
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            raise ValidationError(
+                '%s header must be 1 to %d characters' % (HEADER, MAX_KEY_LENGTH))
+
+        def handle():
+            try:
+                result = view(*args, **kwargs)
+            except Exception as error:  # pylint: disable=broad-except
+                result = current_app.handle_user_exception(error)
+            return current_app.make_response(result)
+
+        stored, replayed = store.execute(
+            (realms.current().name, request.path, key), request_fingerprint(), handle)
+        return stored.to_response(replayed)
+    return wrapper
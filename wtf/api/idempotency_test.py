@@ -0,0 +1,236 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name,unused-argument
+import threading
+import pytest
+from flask import Flask
+from mock import Mock, patch
+from wtf.api import idempotency
+from wtf.api.app import create_app
+
+
+@pytest.fixture
+def client():
+    return create_app(prefix='').test_client()
+
+
+@pytest.fixture
+def repo():
+    with patch('wtf.core.characters.REPO', {'by_id': {}, 'by_account': {}}) as repo:
+        yield repo
+
+
+def post_character(client, key, name='Foo'):
+    headers = {idempotency.HEADER: key} if key is not None else {}
+    return client.post('/characters', json={'account': 'foo', 'name': name}, headers=headers)
+
+
+def test_replay(client, repo):
+    first = post_character(client, 'key-1')
+    second = post_character(client, 'key-1')
+    assert first.status_code == second.status_code == 201
+    assert first.get_data() == second.get_data()
+    assert 'Idempotent-Replayed' not in first.headers
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert len(repo['by_id']) == 1
+    assert post_character(client, 'key-2', name='Bar').status_code == 201
+    assert len(repo['by_id']) == 2
+
+
+def test_without_key(client, repo):
+    assert post_character(client, None).status_code == 201
+    assert post_character(client, None).status_code == 400
+    assert len(repo['by_id']) == 1
+
+
+def test_key_reused_for_different_request(client, repo):
+    post_character(client, 'key')
+    response = post_character(client, 'key', name='Bar')
+    assert response.status_code == 422
+    assert response.get_json() == {
+        'errors': ['Idempotency-Key has already been used for a different request']
+    }
+
+
+def test_invalid_key(client, repo):
+    response = post_character(client, 'x' * 256)
+    assert response.status_code == 400
+    assert response.get_json() == {
+        'errors': ['Idempotency-Key header must be 1 to 255 characters']
+    }
+
+
+def test_client_errors_stored(client, repo):
+    repo['by_account']['foo'] = [{'name': 'Foo'}]
+    assert post_character(client, 'key').status_code == 400
+    repo['by_account']['foo'] = []
+    response = post_character(client, 'key')
+    assert response.status_code == 400
+    assert response.headers['Idempotent-Replayed'] == 'true'
+
+
+@patch('wtf.core.characters.save')
+def test_server_errors_not_stored(mock_save, client):
+    mock_save.side_effect = [Exception('foo'), {'id': 'bar'}]
+    assert post_character(client, 'key').status_code == 500
+    response = post_character(client, 'key')
+    assert response.status_code == 201
+    assert response.get_json() == {'character': {'id': 'bar'}}
+
+
+def test_disabled(repo):
+    client = create_app(prefix='', config={'WTF_IDEMPOTENCY_CACHE_SIZE': 0}).test_client()
+    assert post_character(client, 'key').status_code == 201
+    assert post_character(client, 'key').status_code == 400
+
+
+def test_store_concurrent_duplicates_wait():
+    app = Flask(__name__)
+    store = idempotency.IdempotencyStore()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def handle():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return app.response_class(b'created', status=201)
+
+    results = []
+
+    def execute():
+        with app.app_context():
+            results.append(store.execute('key', 'fingerprint', handle))
+
+    threads = [threading.Thread(target=execute) for _ in range(5)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 4
+    assert len(set(id(stored) for stored, _ in results)) == 1
+    assert not store.in_flight
+
+
+def test_store_wait_timeout():
+    store = idempotency.IdempotencyStore(timeout=0.01)
+    store.in_flight['key'] = idempotency.InFlight('fingerprint')
+    with pytest.raises(idempotency.IdempotencyError) as e:
+        store.execute('key', 'fingerprint', Mock())
+    assert e.value.status == 409
+
+
+@patch('wtf.cache.monotonic')
+def test_store_ttl(mock_monotonic):
+    app = Flask(__name__)
+    mock_monotonic.return_value = 0
+    store = idempotency.IdempotencyStore(ttl=60)
+    handle = Mock(side_effect=lambda: app.response_class(b'created', status=201))
+    with app.app_context():
+        store.execute('key', 'fingerprint', handle)
+        mock_monotonic.return_value = 30
+        assert store.execute('key', 'fingerprint', handle)[1]
+        mock_monotonic.return_value = 100
+        assert not store.execute('key', 'fingerprint', handle)[1]
+    assert handle.call_count == 2
+
+
+def test_sqlite_store_shared(tmpdir):
+    app = Flask(__name__)
+    path = str(tmpdir.join('wtf.db'))
+    stores = [idempotency.SQLiteIdempotencyStore(path) for _ in range(2)]
+    handle = Mock(side_effect=lambda: app.response_class(b'created', status=201))
+    with app.app_context():
+        stored, replayed = stores[0].execute(('default', '/characters', 'key'), 'foo', handle)
+        assert (stored.status, replayed) == (201, False)
+        # a retry that reaches another worker
+        stored, replayed = stores[1].execute(('default', '/characters', 'key'), 'foo', handle)
+        assert (stored.status, stored.body, replayed) == (201, b'created', True)
+        assert stored.to_response(True).headers['Idempotent-Replayed'] == 'true'
+        with pytest.raises(idempotency.IdempotencyError) as e:
+            stores[1].execute(('default', '/characters', 'key'), 'bar', handle)
+        assert e.value.status == 422
+    assert handle.call_count == 1
+
+
+@patch('wtf.api.idempotency.POLL_INTERVAL', 0.01)
+def test_sqlite_store_in_flight(tmpdir):
+    app = Flask(__name__)
+    path = str(tmpdir.join('wtf.db'))
+    leader = idempotency.SQLiteIdempotencyStore(path)
+    started, release = threading.Event(), threading.Event()
+
+    def handle():
+        started.set()
+        release.wait()
+        return app.response_class(b'created', status=201)
+
+    def execute():
+        with app.app_context():
+            leader.execute('key', 'fingerprint', handle)
+
+    thread = threading.Thread(target=execute)
+    thread.start()
+    started.wait()
+    with pytest.raises(idempotency.IdempotencyError) as e:
+        idempotency.SQLiteIdempotencyStore(path, timeout=0.02).execute('key', 'fingerprint', Mock())
+    assert e.value.status == 409
+    follower = idempotency.SQLiteIdempotencyStore(path)
+    threading.Timer(0.05, release.set).start()
+    stored, replayed = follower.execute('key', 'fingerprint', Mock())
+    assert (stored.status, replayed) == (201, True)
+    thread.join()
+
+
+@patch('wtf.api.idempotency.time')
+def test_sqlite_store_expiry(mock_time, tmpdir):
+    app = Flask(__name__)
+    mock_time.return_value = 1000.0
+    store = idempotency.SQLiteIdempotencyStore(str(tmpdir.join('wtf.db')), ttl=60, timeout=10)
+    responses = iter([Exception('foo'), app.response_class(b'error', status=503),
+                      app.response_class(b'created', status=201)])
+
+    def handle():
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    with app.app_context():
+        # failed requests are not stored
+        with pytest.raises(Exception):
+            store.execute('key', 'fingerprint', handle)
+        assert store.execute('key', 'fingerprint', handle)[0].status == 503
+        assert not store.execute('key', 'fingerprint', handle)[1]
+        assert store.execute('key', 'fingerprint', handle)[1]
+        mock_time.return_value = 1100.0
+        handle = Mock(side_effect=lambda: app.response_class(b'created', status=201))
+        assert not store.execute('key', 'fingerprint', handle)[1]
+        # requests in flight in a worker that died are abandoned after the timeout
+        store.database.connection.execute('UPDATE idempotency SET status = NULL')
+        mock_time.return_value = 1111.0
+        assert not store.execute('key', 'fingerprint', handle)[1]
+    assert handle.call_count == 2
+
+
+def test_create_store(tmpdir):
+    assert isinstance(idempotency.create_store('memory'), idempotency.IdempotencyStore)
+    store = idempotency.create_store('sqlite:///%s' % tmpdir.join('wtf.db'), ttl=60)
+    assert isinstance(store, idempotency.SQLiteIdempotencyStore)
+    assert store.ttl == 60
+    with pytest.raises(ValueError):
+        idempotency.create_store('redis://localhost')
+
+
+def test_app_sqlite(tmpdir, repo):
+    client = create_app(prefix='', config={
+        'WTF_IDEMPOTENCY_STORAGE': 'sqlite:///%s' % tmpdir.join('wtf.db')
+    }).test_client()
+    first = post_character(client, 'key')
+    second = post_character(client, 'key')
+    assert first.status_code == second.status_code == 201
+    assert first.get_data() == second.get_data()
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert len(repo['by_id']) == 1
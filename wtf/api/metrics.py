@@ -0,0 +1,348 @@
+'''
+wtf.api.metrics
+
+Request metrics, exposed in the Prometheus text format at `GET /metrics`:
+  * wtf_http_requests_total: requests by route, method and status
+  * wtf_http_request_errors_total: server errors (5xx) by route and method
+  * wtf_http_request_duration_seconds: a latency histogram by route, method
+    and status
+  * wtf_http_requests_in_flight: requests being handled
+  * wtf_http_slow_requests_total: requests that took at least
+    WTF_SLOW_REQUEST_THRESHOLD seconds (if set), by route and method (see
+    wtf.api.slow_requests)
+  * wtf_http_coalesced_requests_total: requests answered with the response to
+    an identical concurrent request, by route and method (see
+    wtf.api.coalescing)
+  * wtf_http_rejected_requests_total: requests turned away (503) because the
+    server was at capacity, by route and method (see wtf.api.admission)
+  * wtf_http_requests_queued: requests waiting to be admitted
+  * wtf_http_rate_limited_requests_total: requests turned away (429) because
+    their client was over its rate limit, by route and method (see
+    wtf.api.rate_limiting)
+
+Each thread records its requests in its own shard, without locking; shards are
+    only summed when the metrics are collected. The shard of a thread that
+    ended (e.g. with the development server, which starts a thread per
+    request) is added to the counts of retired threads, so that shards don't
+    pile up.
+
+Worker processes of the production server (see wtf.server) each keep their
+    own metrics. When WTF_METRICS_DIR is set, every process writes a snapshot
+    of its metrics to a file in that directory every
+    WTF_METRICS_FLUSH_INTERVAL seconds and when it exits, and `GET /metrics`
+    adds up the snapshots of every process (including those of recycled
+    workers, so that counters never decrease). `python -m wtf serve` sets up a
+    directory if none is configured.
+'''
+import atexit
+import json
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from time import perf_counter, sleep
+from flask import current_app, request
+
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+COUNTERS = {
+    'slow': 'Requests that took at least %r seconds.',
+    'coalesced': 'Requests answered with the response to an identical concurrent request.',
+    'rejected': 'Requests rejected because the server was at capacity.',
+    'rate_limited': 'Requests rejected because their client was over its rate limit.'
+}
+
+
+# pylint: disable=too-few-public-methods
+class Shard(object):
+    '''The metrics recorded by one thread.
+
+    `requests` maps (route, method, status) to the sum of the durations
+        followed by the count of each bucket (the last one being +Inf), and
+        `counts` maps (counter, route, method) to the count of requests of
+        each of the COUNTERS (e.g. slow requests).
+    '''
+
+    __slots__ = ['requests', 'counts', 'in_flight', 'queued']
+
+    def __init__(self):
+        self.requests = {}
+        self.counts = {}
+        self.in_flight = 0
+        self.queued = 0
+
+
+class _Holder(object):  # pylint: disable=too-few-public-methods
+    '''Holds the shard of a thread, in a thread-local: it is freed when the thread ends.'''
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+# pylint: disable=too-many-instance-attributes
+class Metrics(object):
+    '''Request metrics of a process, optionally shared with other processes.'''
+
+    def __init__(self, directory=None, flush_interval=1.0, slow_threshold=0.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.slow_threshold = slow_threshold
+        self.local = threading.local()
+        self.shards = []
+        self.retired = Shard()
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def shard(self):
+        '''Get the shard of the current thread.'''
+        try:
+            return self.local.holder.shard
+        except AttributeError:
+            pass
+        shard = Shard()
+        holder = self.local.holder = _Holder(shard)
+        weakref.finalize(holder, self._retire, shard).atexit = False
+        with self.lock:
+            self.shards.append(shard)
+            if self.directory and self.pid != os.getpid():
+                # first request of a (forked) process
+                self.pid = os.getpid()
+                threading.Thread(target=self._flush_periodically, daemon=True).start()
+                atexit.register(self._flush_at_exit)
+        return shard
+
+    def _retire(self, shard):
+        with self.lock:
+            self.shards.remove(shard)
+            _merge(self.retired.requests, list(shard.requests.items()))
+            _add(self.retired.counts, list(shard.counts.items()))
+
+    def start(self):
+        '''Record the start of a request.'''
+        self.shard().in_flight += 1
+
+    def finish(self, route, method, status, seconds):
+        '''Record the response to a request.'''
+        shard = self.shard()
+        key = (route, method, status)
+        entry = shard.requests.get(key)
+        if entry is None:
+            entry = shard.requests[key] = [0.0] * (len(BUCKETS) + 2)
+        entry[0] += seconds
+        entry[bisect_left(BUCKETS, seconds) + 1] += 1
+        if self.slow_threshold and seconds >= self.slow_threshold:
+            shard.counts['slow', route, method] = shard.counts.get(('slow', route, method), 0) + 1
+
+    def end(self):
+        '''Record the end of a request (whether or not there is a response).'''
+        self.shard().in_flight -= 1
+
+    def count(self, counter, route, method):
+        '''Count a request in one of the COUNTERS (e.g. a coalesced request).'''
+        counts = self.shard().counts
+        counts[counter, route, method] = counts.get((counter, route, method), 0) + 1
+
+    def snapshot(self):
+        '''Add up the shards of this process.'''
+        requests = {}
+        counts = {}
+        in_flight = 0
+        queued = 0
+        with self.lock:
+            shards = list(self.shards)
+            _merge(requests, self.retired.requests.items())
+            _add(counts, self.retired.counts.items())
+        for shard in shards:
+            in_flight += shard.in_flight
+            queued += shard.queued
+            _merge(requests, list(shard.requests.items()))
+            _add(counts, list(shard.counts.items()))
+        return requests, counts, in_flight, queued
+
+    def flush(self):
+        '''Write a snapshot of this process's metrics to the directory.'''
+        requests, counts, in_flight, queued = self.snapshot()
+        path = os.path.join(self.directory, '%d.json' % os.getpid())
+        with open(path + '.tmp', 'w') as file:
+            json.dump({
+                'requests': [list(key) + values for key, values in requests.items()],
+                'counts': [list(key) + [count] for key, count in counts.items()],
+                'in_flight': in_flight,
+                'queued': queued
+            }, file)
+        os.replace(path + '.tmp', path)
+
+    def _flush_at_exit(self):
+        if self.pid == os.getpid():
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _flush_periodically(self):
+        while True:
+            sleep(self.flush_interval)
+            self.flush()
+
+    def collect(self):
+        '''Add up the metrics of this process and, if shared, every other process.'''
+        requests, counts, in_flight, queued = self.snapshot()
+        if not self.directory:
+            return requests, counts, in_flight, queued
+        own = '%d.json' % os.getpid()
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            _merge(requests, [(tuple(row[:3]), row[3:]) for row in data['requests']])
+            _add(counts, [(tuple(row[:3]), row[3]) for row in data.get('counts', [])])
+            if _is_alive(int(name[:-len('.json')])):
+                in_flight += data['in_flight']
+                queued += data.get('queued', 0)
+        return requests, counts, in_flight, queued
+
+    def render(self):
+        '''Render the metrics in the Prometheus text format.'''
+        requests, counts, in_flight, queued = self.collect()
+        items = sorted(requests.items())
+        lines = _render_requests(items) + _render_durations(items)
+        lines.append('# HELP wtf_http_requests_in_flight Requests being handled.')
+        lines.append('# TYPE wtf_http_requests_in_flight gauge')
+        lines.append('wtf_http_requests_in_flight %d' % in_flight)
+        lines.append('# HELP wtf_http_requests_queued Requests waiting to be admitted.')
+        lines.append('# TYPE wtf_http_requests_queued gauge')
+        lines.append('wtf_http_requests_queued %d' % queued)
+        lines.extend(self._render_counters(counts))
+        return '\n'.join(lines) + '\n'
+
+    def _render_counters(self, counts):
+        lines = []
+        for counter, description in sorted(COUNTERS.items()):
+            if counter == 'slow':
+                if not self.slow_threshold:
+                    continue
+                description %= self.slow_threshold
+            name = 'wtf_http_%s_requests_total' % counter
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s counter' % name)
+            for (_, route, method), count in sorted(
+                    item for item in counts.items() if item[0][0] == counter):
+                lines.append('%s{%s} %d' % (name, _labels(route, method), count))
+        return lines
+
+
+def _render_requests(items):
+    lines = [
+        '# HELP wtf_http_requests_total Requests handled by the API.',
+        '# TYPE wtf_http_requests_total counter'
+    ]
+    for (route, method, status), values in items:
+        lines.append('wtf_http_requests_total{%s} %d' % (
+            _labels(route, method, status), sum(values[1:])))
+    errors = {}
+    for (route, method, status), values in items:
+        if status >= 500:
+            errors[route, method] = errors.get((route, method), 0) + sum(values[1:])
+    lines.append('# HELP wtf_http_request_errors_total Requests that failed with a '
+                 'server error (5xx).')
+    lines.append('# TYPE wtf_http_request_errors_total counter')
+    for (route, method), count in sorted(errors.items()):
+        lines.append('wtf_http_request_errors_total{%s} %d' % (_labels(route, method), count))
+    return lines
+
+
+def _render_durations(items):
+    lines = [
+        '# HELP wtf_http_request_duration_seconds Time spent handling requests.',
+        '# TYPE wtf_http_request_duration_seconds histogram'
+    ]
+    for (route, method, status), values in items:
+        labels = _labels(route, method, status)
+        count = 0
+        for bound, bucket in zip(BUCKETS + ('+Inf',), values[1:]):
+            count += bucket
+            lines.append('wtf_http_request_duration_seconds_bucket{%s,le="%s"} %d' % (
+                labels, bound, count))
+        lines.append('wtf_http_request_duration_seconds_sum{%s} %r' % (labels, values[0]))
+        lines.append('wtf_http_request_duration_seconds_count{%s} %d' % (labels, count))
+    return lines
+
+
+def _merge(requests, items):
+    for key, values in items:
+        total = requests.get(key)
+        if total is None:
+            requests[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                total[i] += value
+
+
+def _add(counts, items):
+    for key, count in items:
+        counts[key] = counts.get(key, 0) + count
+
+
+def _labels(route, method, status=None):
+    labels = 'route="%s",method="%s"' % (route, method)
+    return labels if status is None else '%s,status="%d"' % (labels, status)
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def clear_directory(directory):
+    '''Remove the snapshots of a previous run from a metrics directory.'''
+    for name in os.listdir(directory):
+        if name.endswith('.json') or name.endswith('.json.tmp'):
+            os.remove(os.path.join(directory, name))
+
+
+def init_app(app):
+    '''Set up request metrics for an app.'''
+    if not app.config.get('WTF_METRICS', True):
+        app.extensions['wtf.metrics'] = None
+        return
+    metrics = app.extensions['wtf.metrics'] = Metrics(
+        directory=app.config.get('WTF_METRICS_DIR') or None,
+        flush_interval=app.config.get('WTF_METRICS_FLUSH_INTERVAL', 1.0),
+        slow_threshold=app.config.get('WTF_SLOW_REQUEST_THRESHOLD', 0.0)
+    )
+
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        # a single wrapper costs less than before/after/teardown hooks
+        shard = metrics.shard()
+        shard.in_flight += 1
+        start = perf_counter()
+        status = 500
+        try:
+            response = dispatch()
+            status = response.status_code
+            return response
+        finally:
+            shard.in_flight -= 1
+            endpoint = request.endpoint
+            metrics.finish(endpoint.rpartition('.')[2] if endpoint else 'unmatched',
+                           request.method, status, perf_counter() - start)
+
+    app.full_dispatch_request = full_dispatch_request
+
+
+def render():
+    '''Render the metrics of the current app in the Prometheus text format.'''
+    metrics = current_app.extensions.get('wtf.metrics')
+    return metrics.render() if metrics is not None else ''
@@ -0,0 +1,161 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import json
+import os
+import threading
+from time import sleep
+from mock import patch
+from wtf.api import metrics
+from wtf.api.app import create_app
+
+
+def sample(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.rpartition(' ')[2])
+    return None
+
+
+def test_render():
+    m = metrics.Metrics()
+    m.start()
+    m.finish('get_foo', 'GET', 200, 0.003)
+    m.finish('get_foo', 'GET', 200, 0.2)
+    m.finish('get_foo', 'GET', 500, 20)
+    m.end()
+    text = m.render()
+    labels = 'route="get_foo",method="GET",status="200"'
+    assert sample(text, 'wtf_http_requests_total{%s}' % labels) == 2
+    assert sample(text, 'wtf_http_request_duration_seconds_bucket{%s,le="0.001"}' % labels) == 0
+    assert sample(text, 'wtf_http_request_duration_seconds_bucket{%s,le="0.005"}' % labels) == 1
+    assert sample(text, 'wtf_http_request_duration_seconds_bucket{%s,le="+Inf"}' % labels) == 2
+    assert sample(text, 'wtf_http_request_duration_seconds_count{%s}' % labels) == 2
+    assert sample(text, 'wtf_http_request_duration_seconds_sum{%s}' % labels) == 0.203
+    assert sample(text, 'wtf_http_request_errors_total{route="get_foo",method="GET"}') == 1
+    assert sample(
+        text, 'wtf_http_request_duration_seconds_bucket{route="get_foo",method="GET",'
+              'status="500",le="10.0"}') == 0
+    assert sample(text, 'wtf_http_requests_in_flight') == 0
+    assert '# TYPE wtf_http_request_duration_seconds histogram' in text
+
+
+def test_threads():
+    m = metrics.Metrics()
+
+    def record():
+        for _ in range(1000):
+            m.start()
+            m.finish('get_foo', 'GET', 200, 0.001)
+            m.end()
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    requests, _, in_flight, _ = m.snapshot()
+    assert sum(requests['get_foo', 'GET', 200][1:]) == 4000
+    assert in_flight == 0
+
+
+def test_threads_retired():
+    m = metrics.Metrics()
+
+    def record():
+        m.start()
+        m.finish('get_foo', 'GET', 200, 0.001)
+        m.count('coalesced', 'get_foo', 'GET')
+        m.end()
+
+    for _ in range(5):
+        threads = [threading.Thread(target=record) for _ in range(100)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    record()
+    # the shards of the threads that ended were folded into the retired counts
+    assert m.shards == [m.local.holder.shard]
+    requests, counts, in_flight, _ = m.snapshot()
+    assert sum(requests['get_foo', 'GET', 200][1:]) == 501
+    assert counts['coalesced', 'get_foo', 'GET'] == 501
+    assert in_flight == 0
+
+
+def test_processes(tmpdir):
+    directory = str(tmpdir)
+    m = metrics.Metrics(directory)
+    m.start()
+    m.finish('get_foo', 'GET', 200, 0.001)
+    m.flush()
+    # a live worker, and a recycled one
+    for pid, in_flight in [(os.getppid(), 2), (2 ** 22 + 1, 5)]:
+        data = {'requests': [['get_foo', 'GET', 200] + [0.5] + [1] * 15], 'in_flight': in_flight}
+        tmpdir.join('%d.json' % pid).write(json.dumps(data))
+    tmpdir.join('junk.json').write('{')
+    requests, _, in_flight, _ = m.collect()
+    assert sum(requests['get_foo', 'GET', 200][1:]) == 31
+    assert in_flight == 3
+    metrics.clear_directory(directory)
+    assert tmpdir.listdir() == []
+
+
+def test_flush_periodically(tmpdir):
+    m = metrics.Metrics(str(tmpdir), flush_interval=0.01)
+    m.start()
+    for _ in range(100):
+        sleep(0.01)
+        if tmpdir.join('%d.json' % os.getpid()).exists():
+            break
+    data = json.loads(tmpdir.join('%d.json' % os.getpid()).read())
+    assert data == {'requests': [], 'counts': [], 'in_flight': 1, 'queued': 0}
+
+
+def test_app():
+    client = create_app(prefix='').test_client()
+    client.get('/weapons/foo')
+    client.get('/foo')
+    with patch('wtf.core.armor.find_by_id', side_effect=Exception):
+        client.get('/armor/foo')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert sample(
+        text, 'wtf_http_requests_total{route="get_weapon_by_id",method="GET",status="404"}') == 1
+    assert sample(
+        text, 'wtf_http_requests_total{route="unmatched",method="GET",status="404"}') == 1
+    assert sample(text, 'wtf_http_request_errors_total{route="get_armor_by_id",method="GET"}') == 1
+    assert sample(text, 'wtf_http_requests_in_flight') == 1
+
+
+def test_app_disabled():
+    client = create_app(prefix='', config={'WTF_METRICS': False}).test_client()
+    client.get('/health')
+    assert client.get('/metrics').get_data() == b''
+
+
+def test_slow(tmpdir):
+    m = metrics.Metrics(str(tmpdir), slow_threshold=0.5)
+    m.finish('get_foo', 'GET', 200, 0.1)
+    m.finish('get_foo', 'GET', 200, 0.5)
+    m.finish('get_foo', 'GET', 500, 2.0)
+    data = {'requests': [], 'counts': [['slow', 'get_foo', 'GET', 3]], 'in_flight': 0}
+    tmpdir.join('%d.json' % (2 ** 22 + 1)).write(json.dumps(data))
+    text = m.render()
+    assert sample(text, 'wtf_http_slow_requests_total{route="get_foo",method="GET"}') == 5
+    assert 'wtf_http_slow_requests_total' not in metrics.Metrics().render()
+
+
+def test_count(tmpdir):
+    m = metrics.Metrics(str(tmpdir))
+    m.count('coalesced', 'get_foo', 'GET')
+    m.count('coalesced', 'get_foo', 'GET')
+    m.count('rejected', 'create_foo', 'POST')
+    m.shard().queued += 2
+    data = {'requests': [], 'counts': [['coalesced', 'get_foo', 'GET', 3]], 'in_flight': 0,
+            'queued': 1}
+    tmpdir.join('%d.json' % os.getppid()).write(json.dumps(data))
+    text = m.render()
+    assert sample(text, 'wtf_http_coalesced_requests_total{route="get_foo",method="GET"}') == 5
+    assert sample(text, 'wtf_http_rejected_requests_total{route="create_foo",method="POST"}') == 1
+    assert sample(text, 'wtf_http_requests_queued') == 3
@@ -0,0 +1,230 @@
+'''
+wtf.api.packing
+
+MessagePack (https://msgpack.org) encoding and decoding.
+
+If the optional `msgpack` package is installed, it is used; otherwise a pure
+    Python implementation of the subset of the format needed by the API is
+    used: nil, booleans, integers, floats, strings, binary, arrays and maps.
+'''
+from struct import Struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class PackingError(ValueError):
+    '''Represents a failure to encode or decode MessagePack data.'''
+
+    pass
+
+
+UINT8, UINT16, UINT32, UINT64 = Struct('>B'), Struct('>H'), Struct('>I'), Struct('>Q')
+INT8, INT16, INT32, INT64 = Struct('>b'), Struct('>h'), Struct('>i'), Struct('>q')
+FLOAT32, FLOAT64 = Struct('>f'), Struct('>d')
+
+
+def py_packb(obj):
+    '''Encode an object as MessagePack bytes (pure Python).'''
+    parts = []
+    _pack(obj, parts.append)
+    return b''.join(parts)
+
+
+def _pack(obj, write):
+    packer = PACKERS.get(type(obj))
+    if packer is None:
+        packer = _find_packer(obj)
+    packer(obj, write)
+
+
+def _find_packer(obj):
+    for kind, packer in PACKERS.items():
+        if isinstance(obj, kind) and kind is not bool:
+            return packer
+    raise PackingError('Unable to pack object of type: %s' % type(obj).__name__)
+
+
+def _pack_none(_, write):
+    write(b'\xc0')
+
+
+def _pack_bool(obj, write):
+    write(b'\xc3' if obj else b'\xc2')
+
+
+def _pack_float(obj, write):
+    write(b'\xcb' + FLOAT64.pack(obj))
+
+
+def _pack_str(obj, write):
+    data = obj.encode('utf-8')
+    size = len(data)
+    if size < 32:
+        write(FIXSTR[size] + data)
+    else:
+        write(_header(size, b'\xd9', b'\xda', b'\xdb') + data)
+
+
+def _pack_bytes(obj, write):
+    write(_header(len(obj), b'\xc4', b'\xc5', b'\xc6') + bytes(obj))
+
+
+def _pack_dict(obj, write):
+    size = len(obj)
+    write(FIXMAP[size] if size < 16 else _header(size, None, b'\xde', b'\xdf'))
+    for key, value in obj.items():
+        _pack(key, write)
+        _pack(value, write)
+
+
+def _pack_list(obj, write):
+    size = len(obj)
+    write(FIXARRAY[size] if size < 16 else _header(size, None, b'\xdc', b'\xdd'))
+    for value in obj:
+        _pack(value, write)
+
+
+def _pack_int(obj, write):
+    if -32 <= obj < 128:
+        write(FIXINT[obj])
+    elif obj >= 0:
+        for prefix, struct in [(b'\xcc', UINT8), (b'\xcd', UINT16),
+                               (b'\xce', UINT32), (b'\xcf', UINT64)]:
+            if obj < 1 << (struct.size * 8):
+                write(prefix + struct.pack(obj))
+                return
+        raise PackingError('Integer out of range: %d' % obj)
+    else:
+        for prefix, struct in [(b'\xd0', INT8), (b'\xd1', INT16),
+                               (b'\xd2', INT32), (b'\xd3', INT64)]:
+            if obj >= -(1 << (struct.size * 8 - 1)):
+                write(prefix + struct.pack(obj))
+                return
+        raise PackingError('Integer out of range: %d' % obj)
+
+
+def _header(size, prefix_8, prefix_16, prefix_32):
+    if prefix_8 is not None and size < 256:
+        return prefix_8 + UINT8.pack(size)
+    if size < 65536:
+        return prefix_16 + UINT16.pack(size)
+    return prefix_32 + UINT32.pack(size)
+
+
+FIXINT = {i: INT8.pack(i) if i < 0 else UINT8.pack(i) for i in range(-32, 128)}
+FIXSTR = [UINT8.pack(0xa0 | i) for i in range(32)]
+FIXMAP = [UINT8.pack(0x80 | i) for i in range(16)]
+FIXARRAY = [UINT8.pack(0x90 | i) for i in range(16)]
+PACKERS = {
+    type(None): _pack_none, bool: _pack_bool, int: _pack_int, float: _pack_float,
+    str: _pack_str, dict: _pack_dict, list: _pack_list, tuple: _pack_list,
+    bytes: _pack_bytes, bytearray: _pack_bytes
+}
+
+
+def py_unpackb(data):
+    '''Decode MessagePack bytes (pure Python).
+
+    Raises a PackingError if the data is not valid MessagePack.
+    '''
+    try:
+        obj, offset = _unpack(memoryview(data), 0)
+    except (IndexError, UnicodeDecodeError) as error:
+        raise PackingError('Invalid MessagePack data: %s' % error)
+    if offset != len(data):
+        raise PackingError('Invalid MessagePack data: trailing bytes')
+    return obj
+
+
+FIXED = {0xc0: None, 0xc2: False, 0xc3: True}
+SCALARS = {
+    0xca: FLOAT32, 0xcb: FLOAT64,
+    0xcc: UINT8, 0xcd: UINT16, 0xce: UINT32, 0xcf: UINT64,
+    0xd0: INT8, 0xd1: INT16, 0xd2: INT32, 0xd3: INT64
+}
+SIZES = {
+    0xc4: UINT8, 0xc5: UINT16, 0xc6: UINT32,
+    0xd9: UINT8, 0xda: UINT16, 0xdb: UINT32,
+    0xdc: UINT16, 0xdd: UINT32, 0xde: UINT16, 0xdf: UINT32
+}
+
+
+# pylint: disable=too-many-return-statements
+def _unpack(data, offset):
+    code = data[offset]
+    offset += 1
+    if code < 0x80:
+        return code, offset
+    if code >= 0xe0:
+        return code - 0x100, offset
+    if code < 0x90:
+        return _unpack_map(data, offset, code & 0x0f)
+    if code < 0xa0:
+        return _unpack_array(data, offset, code & 0x0f)
+    if code < 0xc0:
+        end = offset + (code & 0x1f)
+        return _read(data, offset, end).decode('utf-8'), end
+    if code in FIXED:
+        return FIXED[code], offset
+    if code in SCALARS:
+        struct = SCALARS[code]
+        end = offset + struct.size
+        return struct.unpack(_read(data, offset, end))[0], end
+    if code in SIZES:
+        struct = SIZES[code]
+        size = struct.unpack(_read(data, offset, offset + struct.size))[0]
+        offset += struct.size
+        if code >= 0xde:
+            return _unpack_map(data, offset, size)
+        if code >= 0xdc:
+            return _unpack_array(data, offset, size)
+        end = offset + size
+        value = _read(data, offset, end)
+        return (value.decode('utf-8') if code >= 0xd9 else value), end
+    raise PackingError('Unsupported MessagePack type: 0x%02x' % code)
+
+
+def _read(data, start, end):
+    if end > len(data):
+        raise PackingError('Invalid MessagePack data: truncated')
+    return bytes(data[start:end])
+
+
+def _unpack_array(data, offset, size):
+    values = []
+    for _ in range(size):
+        value, offset = _unpack(data, offset)
+        values.append(value)
+    return values, offset
+
+
+def _unpack_map(data, offset, size):
+    values = {}
+    for _ in range(size):
+        key, offset = _unpack(data, offset)
+        value, offset = _unpack(data, offset)
+        values[key] = value
+    return values, offset
+
+
+def packb(obj):
+    '''Encode an object as MessagePack bytes.'''
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    return py_packb(obj)
+
+
+def unpackb(data):
+    '''Decode MessagePack bytes.
+
+    Raises a PackingError if the data is not valid MessagePack.
+    '''
+    if msgpack is not None:
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except Exception as error:  # pylint: disable=broad-except
+            raise PackingError('Invalid MessagePack data: %s' % error)
+    return py_unpackb(data)
@@ -0,0 +1,52 @@
+# pylint: disable=missing-docstring,invalid-name
+import numpy as np
+import pytest
+from wtf.api import packing
+
+
+VALUES = [
+    None, True, False, 0, 1, 127, 128, 255, 256, 65535, 65536, 2 ** 32, 2 ** 64 - 1,
+    -1, -32, -33, -128, -129, -32768, -32769, -2 ** 31 - 1, -2 ** 63,
+    0.5, -12.93, '', 'foo', 'x' * 31, 'x' * 32, 'x' * 256, 'x' * 65536, 'Pinzón',
+    b'', b'\x00\x01', b'x' * 300, [], [1, 'a'], list(range(16)), list(range(70000)),
+    {}, {'a': 1}, {str(i): i for i in range(16)},
+    {'weapon': {'damage': {'min': 41.5, 'max': 90.25}, 'tags': ['a', None]}}
+]
+
+
+def test_roundtrip():
+    for value in VALUES:
+        assert packing.py_unpackb(packing.py_packb(value)) == value, value
+        assert packing.unpackb(packing.packb(value)) == value, value
+
+
+def test_pack_known_encodings():
+    assert packing.py_packb(None) == b'\xc0'
+    assert packing.py_packb(-1) == b'\xff'
+    assert packing.py_packb(200) == b'\xcc\xc8'
+    assert packing.py_packb('a') == b'\xa1a'
+    assert packing.py_packb({'a': [1]}) == b'\x81\xa1a\x91\x01'
+    assert packing.py_packb(1.5) == b'\xcb\x3f\xf8\x00\x00\x00\x00\x00\x00'
+
+
+def test_pack_tuple_and_numpy_float():
+    assert packing.py_unpackb(packing.py_packb((1, 2))) == [1, 2]
+    assert packing.py_unpackb(packing.py_packb(np.float64(12.5))) == 12.5
+
+
+def test_unpack_float32():
+    assert packing.py_unpackb(b'\xca\x3f\xc0\x00\x00') == 1.5
+
+
+def test_pack_unsupported():
+    for value in [object(), 2 ** 64, -2 ** 63 - 1]:
+        with pytest.raises(packing.PackingError):
+            packing.py_packb(value)
+
+
+def test_unpack_invalid():
+    for data in [b'', b'\xc1', b'\xa3ab', b'\xcd\x01', b'\x91', b'\x01\x02', b'\xa1\xff']:
+        with pytest.raises(packing.PackingError):
+            packing.py_unpackb(data)
+        with pytest.raises(ValueError):
+            packing.unpackb(data)
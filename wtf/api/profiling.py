@@ -0,0 +1,167 @@
+'''
+wtf.api.profiling
+
+Profiles requests with cProfile, either:
+  * on demand: requests with an `X-Profile: 1` header and the admin secret
+    (see wtf.api.admin) are profiled, and their response has the id of the
+    profile (`X-Profile-Id`) and the functions that took the most time
+    (`X-Profile-Summary`)
+  * by sampling: one in WTF_PROFILE_SAMPLE_RATE requests is profiled (without
+    any change to its response), to get profiles of real traffic
+
+Profiles are saved in the pstats format to WTF_PROFILE_DIR (by default, a
+    `wtf-profiles` directory in the temporary directory), as
+    `<id>.pstats`, and can be listed and read with the admin endpoints
+    `GET /admin/profiles` and `GET /admin/profiles/<id>`, or loaded with the
+    pstats module:
+
+    $ python -m pstats /tmp/wtf-profiles/20200101T120000-create_weapon-1a2b3c4d.pstats
+
+At most WTF_PROFILE_MAX_FILES profiles are kept: the oldest are deleted when
+    a new one is saved.
+
+Requests are profiled one at a time: a request that arrives while another is
+    profiled is handled normally.
+'''
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import tempfile
+import threading
+from time import strftime
+from uuid import uuid4
+from flask import request
+from wtf.api import admin
+from wtf.core.errors import NotFoundError
+
+
+REQUEST_HEADER = 'X-Profile'
+ID_HEADER = 'X-Profile-Id'
+SUMMARY_HEADER = 'X-Profile-Summary'
+SUMMARY_SIZE = 5
+SORT_KEYS = ['calls', 'cumulative', 'tottime']
+PROFILE_ID = re.compile(r'^[0-9]{8}T[0-9]{6}-[A-Za-z0-9_]+-[0-9a-f]{8}$')
+
+
+class Profiler(object):
+    '''Profiles requests and stores their profiles in a directory.'''
+
+    def __init__(self, directory, sample_rate=0, max_files=0):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.requests = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        '''Check whether the next request is one to profile by sampling.'''
+        return bool(self.sample_rate) and next(self.requests) % self.sample_rate == 0
+
+    def profile(self, func, name):
+        '''Call a function under cProfile, saving its profile as `name`.
+
+        Returns the function's result, the profile's id and its Stats (both
+            None if another call is being profiled).
+        '''
+        if not self.lock.acquire(blocking=False):
+            return func(), None, None
+        try:
+            profile = cProfile.Profile()
+            result = profile.runcall(func)
+        finally:
+            self.lock.release()
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        profile_id = '%s-%s-%s' % (strftime('%Y%m%dT%H%M%S'), name, uuid4().hex[:8])
+        os.makedirs(self.directory, exist_ok=True)
+        stats.dump_stats(self.path(profile_id))
+        self.prune(profile_id)
+        return result, profile_id, stats
+
+    def prune(self, keep):
+        '''Delete the oldest profiles beyond `max_files` (0 for no limit), except `keep`.'''
+        if not self.max_files:
+            return
+        ages = []
+        for profile_id in self.profile_ids():
+            path = os.path.join(self.directory, profile_id + '.pstats')
+            try:
+                if profile_id != keep:
+                    ages.append((os.path.getmtime(path), profile_id, path))
+            except FileNotFoundError:  # deleted by another request
+                continue
+        for _, _, path in sorted(ages, reverse=True)[max(self.max_files - 1, 0):]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+
+    def path(self, profile_id):
+        '''Get the path of a profile.
+
+        Raises a NotFoundError if the profile id is invalid.
+        '''
+        if not PROFILE_ID.match(profile_id):
+            raise NotFoundError('Profile not found')
+        return os.path.join(self.directory, profile_id + '.pstats')
+
+    def profile_ids(self):
+        '''List the ids of the stored profiles, most recent first.'''
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted((name[:-len('.pstats')] for name in names if name.endswith('.pstats')),
+                      reverse=True)
+
+    def report(self, profile_id, sort='cumulative', limit=50):
+        '''Print a stored profile's top `limit` functions.
+
+        Raises a NotFoundError if the profile doesn't exist.
+        '''
+        path = self.path(profile_id)
+        if not os.path.exists(path):
+            raise NotFoundError('Profile not found')
+        stream = io.StringIO()
+        pstats.Stats(path, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+
+def summary(stats, size=SUMMARY_SIZE):
+    '''Summarize the functions that took the most time (excluding the functions they called).'''
+    stats.sort_stats('tottime')
+    functions = []
+    for function in stats.fcn_list[:size]:
+        _, calls, tottime, _, _ = stats.stats[function]
+        filename, line, name = function
+        functions.append('%s:%d(%s);calls=%d;dur=%.3f' % (
+            os.path.basename(filename), line, name, calls, tottime * 1e3))
+    return ', '.join(functions)
+
+
+def init_app(app):
+    '''Set up request profiling for an app.'''
+    profiler = app.extensions['wtf.profiler'] = Profiler(
+        app.config.get('WTF_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'wtf-profiles'),
+        app.config.get('WTF_PROFILE_SAMPLE_RATE', 0),
+        app.config.get('WTF_PROFILE_MAX_FILES', 0)
+    )
+    if not app.config.get('WTF_ADMIN_SECRET') and not profiler.sample_rate:
+        return
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        requested = request.headers.get(REQUEST_HEADER) == '1' and admin.is_admin()
+        if not requested and not profiler.sample():
+            return dispatch()
+        endpoint = request.endpoint
+        response, profile_id, stats = profiler.profile(
+            dispatch, endpoint.rpartition('.')[2] if endpoint else 'unmatched')
+        if requested and stats is not None:
+            response.headers[ID_HEADER] = profile_id
+            response.headers[SUMMARY_HEADER] = summary(stats)
+        return response
+
+    app.full_dispatch_request = full_dispatch_request
@@ -0,0 +1,89 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import os
+import pstats
+import pytest
+from wtf.api import admin, profiling
+from wtf.api.app import create_app
+from wtf.core.errors import NotFoundError
+
+
+ADMIN = {admin.HEADER: 'foo'}
+
+
+@pytest.fixture
+def client(tmpdir):
+    return create_app(prefix='', config={
+        'WTF_ADMIN_SECRET': 'foo', 'WTF_PROFILE_DIR': str(tmpdir.join('profiles'))
+    }).test_client()
+
+
+def test_on_demand(client, tmpdir):
+    assert profiling.ID_HEADER not in client.get('/health').headers
+    response = client.get('/health', headers={profiling.REQUEST_HEADER: '1'})
+    assert profiling.ID_HEADER not in response.headers
+    response = client.get('/health', headers=dict(ADMIN, **{profiling.REQUEST_HEADER: '1'}))
+    assert response.get_data() == b'Healthy'
+    profile_id = response.headers[profiling.ID_HEADER]
+    assert '-get_health-' in profile_id
+    assert len(response.headers[profiling.SUMMARY_HEADER].split(', ')) == profiling.SUMMARY_SIZE
+    stats = pstats.Stats(str(tmpdir.join('profiles', profile_id + '.pstats')))
+    assert any(name == 'get_health' for _, _, name in stats.stats)
+    assert client.get('/admin/profiles', headers=ADMIN).get_json() == {'profiles': [profile_id]}
+    response = client.get('/admin/profiles/%s?sort=tottime&limit=3' % profile_id, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'Ordered by: internal time' in response.get_data(as_text=True)
+    assert client.get('/admin/profiles/%s?sort=foo' % profile_id,
+                      headers=ADMIN).status_code == 400
+    assert client.get('/admin/profiles/%s?limit=foo' % profile_id,
+                      headers=ADMIN).status_code == 400
+    assert client.get('/admin/profiles/..', headers=ADMIN).status_code == 404
+    assert client.get('/admin/profiles/20200101T000000-get_health-00000000',
+                      headers=ADMIN).status_code == 404
+
+
+def test_sampling(tmpdir):
+    client = create_app(prefix='', config={
+        'WTF_PROFILE_DIR': str(tmpdir), 'WTF_PROFILE_SAMPLE_RATE': 3
+    }).test_client()
+    for _ in range(7):
+        response = client.get('/weapons/foo')
+        assert response.status_code == 404
+        assert profiling.ID_HEADER not in response.headers
+    assert len(tmpdir.listdir()) == 2
+    assert all('-get_weapon_by_id-' in path.basename for path in tmpdir.listdir())
+
+
+def test_one_at_a_time(tmpdir):
+    profiler = profiling.Profiler(str(tmpdir))
+    results = []
+
+    def nested():
+        results.append(profiler.profile(lambda: 'bar', 'bar'))
+        return 'foo'
+
+    results.append(profiler.profile(nested, 'foo'))
+    assert results[0] == ('bar', None, None)
+    assert results[1][0] == 'foo'
+    assert profiler.profile_ids() == [results[1][1]]
+    with pytest.raises(NotFoundError):
+        profiler.path('../foo')
+
+
+def test_max_files(tmpdir):
+    profiler = profiling.Profiler(str(tmpdir), max_files=3)
+    profile_ids = []
+    for i in range(5):
+        profile_ids.append(profiler.profile(lambda: 'foo', 'foo')[1])
+        os.utime(profiler.path(profile_ids[-1]), (i, i))
+    assert sorted(profiler.profile_ids()) == sorted(profile_ids[2:])
+    profiler.max_files = 0
+    profiler.profile(lambda: 'foo', 'foo')
+    assert len(profiler.profile_ids()) == 4
+
+
+def test_disabled(tmpdir):
+    client = create_app(prefix='', config={'WTF_PROFILE_DIR': str(tmpdir)}).test_client()
+    response = client.get('/health', headers=dict(ADMIN, **{profiling.REQUEST_HEADER: '1'}))
+    assert profiling.ID_HEADER not in response.headers
+    assert profiling.Profiler(str(tmpdir.join('foo'))).profile_ids() == []
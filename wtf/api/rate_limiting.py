@@ -0,0 +1,215 @@
+'''
+wtf.api.rate_limiting
+
+Per-client rate limits, so that a single client can't starve the others.
+
+Each route in WTF_RATE_LIMITS allows each client a number of requests per
+    period, e.g. `create_account=10/60,create_weapon=120/60` (10 sign-ups
+    per minute, and 2 weapons per second), with bursts of up to that number
+    of requests (a token bucket per client and route). A request over the
+    limit is rejected with a 429 and a `Retry-After` header.
+
+Clients are identified by their `Authorization` header (token) if they send
+    one, and by their IP address otherwise.
+
+Buckets are stored in process memory by default, bounded to
+    WTF_RATE_LIMIT_MAX_KEYS buckets (the buckets that have been idle the
+    longest are evicted first). Each worker process of the production server
+    (see wtf.server) then enforces the limits on its own: set
+    WTF_RATE_LIMIT_STORAGE to `sqlite:///<path>` to share the buckets between
+    workers, at the cost of a database transaction per limited request.
+
+Rate-limited requests are counted per route in the request metrics (see
+    wtf.api.metrics).
+'''
+import math
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic, time
+from flask import request
+from wtf import storage
+
+
+PRUNE_INTERVAL = 1000
+
+
+class RateLimitError(Exception):
+    '''Represents a request over a client's rate limit.'''
+
+    def __init__(self, message, retry_after):
+        super(RateLimitError, self).__init__(message)
+        self.retry_after = retry_after
+
+
+class MemoryStore(object):
+    '''Token buckets in process memory, evicted least recently used first.
+
+    Each bucket is a [tokens, updated] list.
+    '''
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def take(self, key, rate, capacity):
+        '''Take a token from a bucket (full if new).
+
+        Returns 0.0 if a token was taken, and otherwise the number of seconds
+            until one is available.
+        '''
+        now = monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [capacity, now]
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                tokens = bucket[0] + (now - bucket[1]) * rate
+                bucket[0] = capacity if tokens > capacity else tokens
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+
+class SQLiteStore(object):
+    '''Token buckets in a SQLite database, shared by processes.
+
+    Buckets that have filled up again are the same as missing ones, and are
+        deleted every PRUNE_INTERVAL takes (per process).
+    '''
+
+    def __init__(self, path):
+        self.database = storage.SQLiteDatabase(path)
+        self.database.connection.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, '
+            'full REAL NOT NULL)')
+        self.takes = 0
+
+    def __len__(self):
+        return self.database.connection.execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+
+    def take(self, key, rate, capacity):
+        '''Take a token from a bucket (full if new), see MemoryStore.take().'''
+        now = time()
+        connection = self.database.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT tokens, updated FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            connection.execute(
+                'INSERT OR REPLACE INTO rate_limits (key, tokens, updated, full) '
+                'VALUES (?, ?, ?, ?)', (key, tokens, now, now + (capacity - tokens) / rate))
+            self.takes += 1
+            if self.takes % PRUNE_INTERVAL == 0:
+                connection.execute('DELETE FROM rate_limits WHERE full < ?', (now,))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+
+class RateLimiter(object):  # pylint: disable=too-few-public-methods
+    '''The rate limits of an app's routes, and their buckets.'''
+
+    def __init__(self, limits, store):
+        self.limits = {
+            route: (requests / seconds, requests)
+            for route, (requests, seconds) in limits.items()
+        }
+        self.store = store
+
+    def check(self, route, client):
+        '''Take a token for a request of a client, see MemoryStore.take().'''
+        rate, capacity = self.limits[route]
+        return self.store.take('%s %s' % (route, client), rate, capacity)
+
+
+def parse_limits(value):
+    '''Parse rate limits, e.g. "create_account=10/60,create_weapon=120/60".
+
+    Returns the number of requests and the period (in seconds) by route.
+        Raises a ValueError if a limit is invalid.
+    '''
+    limits = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        route, _, limit = item.partition('=')
+        requests, _, seconds = limit.partition('/')
+        try:
+            limit = (int(requests), float(seconds))
+        except ValueError:
+            limit = None
+        if not route.strip() or limit is None or limit[0] < 1 or limit[1] <= 0:
+            raise ValueError(
+                'Invalid rate limit: %s (expected <route>=<requests>/<seconds>)' % item)
+        limits[route.strip()] = limit
+    return limits
+
+
+def create_store(url, max_keys=100000):
+    '''Create a bucket store for a storage URL (see wtf.storage).
+
+    Raises a ValueError if the URL is not supported.
+    '''
+    if url == 'memory':
+        return MemoryStore(max_keys)
+    if url.startswith(storage.SQLITE_PREFIX):
+        return SQLiteStore(url[len(storage.SQLITE_PREFIX):])
+    raise ValueError('Unsupported rate limit storage: %s' % url)
+
+
+def client_id():
+    '''Identify the client of the current request.'''
+    token = request.headers.get('Authorization')
+    return 'token:%s' % token if token else 'ip:%s' % request.remote_addr
+
+
+def init_app(app):
+    '''Set up rate limits for an app.
+
+    Call it before wtf.api.metrics.init_app(), so that rate-limited requests
+        are included in the request metrics.
+    '''
+    limits = parse_limits(app.config.get('WTF_RATE_LIMITS', ''))
+    if not limits:
+        app.extensions['wtf.rate_limiting'] = None
+        return
+    limiter = app.extensions['wtf.rate_limiting'] = RateLimiter(limits, create_store(
+        app.config.get('WTF_RATE_LIMIT_STORAGE', 'memory'),
+        app.config.get('WTF_RATE_LIMIT_MAX_KEYS', 100000)
+    ))
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        endpoint = request.endpoint
+        route = endpoint.rpartition('.')[2] if endpoint else None
+        if route not in limiter.limits:
+            return dispatch()
+        wait = limiter.check(route, client_id())
+        if not wait:
+            return dispatch()
+        metrics = app.extensions.get('wtf.metrics')
+        if metrics is not None:
+            metrics.count('rate_limited', route, request.method)
+        try:
+            # raised, since Flask handles the exception being handled
+            raise RateLimitError('Too many requests, retry later', int(math.ceil(wait)))
+        except RateLimitError as error:
+            return app.finalize_request(app.handle_user_exception(error))
+
+    app.full_dispatch_request = full_dispatch_request
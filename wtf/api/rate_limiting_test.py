@@ -0,0 +1,96 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import pytest
+from mock import patch
+from wtf.api import rate_limiting
+from wtf.api.app import create_app
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmpdir):
+    if request.param == 'memory':
+        return rate_limiting.MemoryStore()
+    return rate_limiting.SQLiteStore(str(tmpdir.join('wtf.db')))
+
+
+@pytest.fixture
+def clock():
+    with patch('wtf.api.rate_limiting.monotonic') as monotonic, \
+            patch('wtf.api.rate_limiting.time') as time:
+        monotonic.return_value = time.return_value = 1000.0
+        yield monotonic, time
+
+
+def tick(clock, seconds):
+    for mock in clock:
+        mock.return_value += seconds
+
+
+def test_take(store, clock):
+    assert [store.take('foo', 1.0, 2) for _ in range(3)] == [0.0, 0.0, 1.0]
+    assert store.take('bar', 1.0, 2) == 0.0
+    tick(clock, 0.5)
+    assert store.take('foo', 1.0, 2) == 0.5
+    tick(clock, 0.5)
+    assert store.take('foo', 1.0, 2) == 0.0
+    tick(clock, 60)
+    assert [store.take('foo', 1.0, 2) for _ in range(3)] == [0.0, 0.0, 1.0]
+    assert len(store) == 2
+
+
+def test_memory_store_evicts_idle_buckets(clock):
+    store = rate_limiting.MemoryStore(max_keys=2)
+    store.take('foo', 1.0, 1)
+    store.take('bar', 1.0, 1)
+    tick(clock, 0.5)
+    assert store.take('foo', 1.0, 1) == 0.5
+    store.take('baz', 1.0, 1)
+    # the least recently used bucket is evicted, and starts over full
+    assert list(store.buckets) == ['foo', 'baz']
+    assert store.take('bar', 1.0, 1) == 0.0
+
+
+@patch('wtf.api.rate_limiting.PRUNE_INTERVAL', 2)
+def test_sqlite_store_prunes_full_buckets(tmpdir, clock):
+    store = rate_limiting.SQLiteStore(str(tmpdir.join('wtf.db')))
+    store.take('foo', 1.0, 2)
+    tick(clock, 10)
+    store.take('bar', 1.0, 2)
+    assert len(store) == 1
+
+
+def test_parse_limits():
+    assert rate_limiting.parse_limits('create_foo=10/60, get_bar=2/0.5,') == {
+        'create_foo': (10, 60.0), 'get_bar': (2, 0.5)}
+    assert rate_limiting.parse_limits('') == {}
+    for value in ['create_foo', 'create_foo=10', 'create_foo=0/1', 'create_foo=1/0', '=1/1']:
+        with pytest.raises(ValueError):
+            rate_limiting.parse_limits(value)
+
+
+def test_create_store(tmpdir):
+    assert isinstance(rate_limiting.create_store('memory'), rate_limiting.MemoryStore)
+    store = rate_limiting.create_store('sqlite:///%s' % tmpdir.join('wtf.db'))
+    assert isinstance(store, rate_limiting.SQLiteStore)
+    with pytest.raises(ValueError):
+        rate_limiting.create_store('redis://localhost')
+
+
+def test_app():
+    app = create_app(prefix='', config={'WTF_RATE_LIMITS': 'get_weapon_by_id=2/60'})
+    client = app.test_client()
+    assert [client.get('/weapons/foo').status_code for _ in range(3)] == [404, 404, 429]
+    response = client.get('/weapons/foo')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '30'
+    assert response.get_json() == {'errors': ['Too many requests, retry later']}
+    # other clients and routes are not limited
+    assert client.get('/weapons/foo', headers={'Authorization': 'foo'}).status_code == 404
+    assert client.get('/armor/foo').status_code == 404
+    text = client.get('/metrics').get_data(as_text=True)
+    assert ('wtf_http_rate_limited_requests_total'
+            '{route="get_weapon_by_id",method="GET"} 2') in text
+
+
+def test_app_disabled():
+    app = create_app(prefix='', config={'WTF_RATE_LIMITS': ''})
+    assert app.extensions['wtf.rate_limiting'] is None
@@ -0,0 +1,120 @@
+'''
+wtf.api.realms
+
+Serves several realms (independent game worlds, see wtf.core.realms) from one
+    app: each request names its realm, which handles it. The realms are
+    listed in WTF_REALMS, and WTF_REALM_ROUTING selects how requests name them:
+  * host: the first label of the Host header, e.g. `eu.wtf.example.com`
+  * path: the first path segment after the API prefix, e.g. `/api/eu/characters`,
+    which is removed from the path before the request is routed
+
+Requests that don't name a listed realm are answered with a 404. Without
+    WTF_REALMS, every request is handled by the realm of the thread that
+    handles it: the default realm, unless another one is in use (e.g. by a
+    benchmark, see wtf.core.realms.using()).
+
+Each realm's repositories are stored as configured by WTF_STORAGE (see
+    wtf.storage), and the realms share the recipes of the app's catalog.
+'''
+import json
+from werkzeug.wrappers import Response
+from wtf import storage
+from wtf.core import realms
+
+
+ROUTING = ['host', 'path']
+NOT_FOUND = json.dumps({'errors': ['Realm not found']})
+
+
+def host_realm(environ, prefix):  # pylint: disable=unused-argument
+    '''Get the name of the realm in a request's host.'''
+    host = environ.get('HTTP_HOST') or environ.get('SERVER_NAME', '')
+    return host.split(':', 1)[0].split('.', 1)[0].lower()
+
+
+def path_realm(environ, prefix):
+    '''Get the name of the realm in a request's path, removing it from the path.'''
+    path = environ.get('PATH_INFO', '')
+    if not path.startswith(prefix + '/'):
+        return ''
+    name, _, path = path[len(prefix) + 1:].partition('/')
+    environ['PATH_INFO'] = '%s/%s' % (prefix, path)
+    return name
+
+
+SELECTORS = {'host': host_realm, 'path': path_realm}
+
+
+class RealmResponse(object):
+    '''Iterates over a response body (e.g. a streamed export) in a realm.'''
+
+    def __init__(self, realm, body):
+        self.realm = realm
+        self.body = body
+
+    def __iter__(self):
+        chunks = iter(self.body)
+        while True:
+            previous = realms.activate(self.realm)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                realms.activate(previous)
+            yield chunk
+
+    def close(self):
+        '''Close the body, if it can be closed.'''
+        if hasattr(self.body, 'close'):
+            self.body.close()
+
+
+class RealmRouter(object):  # pylint: disable=too-few-public-methods
+    '''A WSGI middleware handling each request in the realm it names.'''
+
+    def __init__(self, app, served, routing='host', prefix=''):
+        if routing not in SELECTORS:
+            raise ValueError('Invalid realm routing: %s (expected one of: %s)' % (
+                routing, ', '.join(ROUTING)))
+        self.app = app
+        self.realms = {realm.name: realm for realm in served}
+        self.select = SELECTORS[routing]
+        self.prefix = prefix
+
+    def __call__(self, environ, start_response):
+        realm = self.realms.get(self.select(environ, self.prefix))
+        if realm is None:
+            return Response(NOT_FOUND, status=404, mimetype='application/json')(
+                environ, start_response)
+        previous = realms.activate(realm)
+        try:
+            body = self.app(environ, start_response)
+        finally:
+            realms.activate(previous)
+        return RealmResponse(realm, body)
+
+
+def parse_realms(value):
+    '''Parse comma-separated realm names into realms (created as needed).
+
+    Raises a ValueError if a name is invalid.
+    '''
+    return [realms.realm(name.strip()) for name in value.split(',') if name.strip()]
+
+
+def init_app(app, prefix=''):
+    '''Route an app's requests to its realms, if configured, returning the realms it serves.
+
+    Without WTF_REALMS, the app serves the current realm.
+    '''
+    served = parse_realms(app.config.get('WTF_REALMS', ''))
+    if not served:
+        app.extensions['wtf.realms'] = None
+        return [realms.current()]
+    for realm in served:
+        if realm is not realms.DEFAULT:
+            storage.init(app.config.get('WTF_STORAGE', 'memory'), realm)
+    app.extensions['wtf.realms'] = app.wsgi_app = RealmRouter(
+        app.wsgi_app, served, app.config.get('WTF_REALM_ROUTING', 'host'), prefix)
+    return served
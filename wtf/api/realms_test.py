@@ -0,0 +1,96 @@
+# pylint: disable=missing-docstring,invalid-name
+import json
+import pytest
+from flask import Flask
+from wtf.api import realms
+from wtf.api.app import create_app
+from wtf.core import realms as wtf_realms
+
+
+RECIPE = {
+    'id': 'foo-sword',
+    'name': 'Foo Sword',
+    'description': 'The mightiest sword in all the land.',
+    'weight': {'center': 12, 'radius': 3},
+    'type': 'sword',
+    'damage': {'min': {'center': 50, 'radius': 10}, 'max': {'center': 100, 'radius': 10}}
+}
+
+
+def test_host_realm():
+    assert realms.host_realm({'HTTP_HOST': 'EU.wtf.example.com:5000'}, '') == 'eu'
+    assert realms.host_realm({'SERVER_NAME': 'us.wtf.example.com'}, '') == 'us'
+
+
+def test_path_realm():
+    environ = {'PATH_INFO': '/api/eu/characters/foo'}
+    assert realms.path_realm(environ, '/api') == 'eu'
+    assert environ['PATH_INFO'] == '/api/characters/foo'
+    environ = {'PATH_INFO': '/eu'}
+    assert realms.path_realm(environ, '') == 'eu'
+    assert environ['PATH_INFO'] == '/'
+    assert realms.path_realm({'PATH_INFO': '/characters/foo'}, '/api') == ''
+
+
+def test_init_app():
+    app = Flask(__name__)
+    app.config['WTF_REALMS'] = ''
+    assert realms.init_app(app) == [wtf_realms.DEFAULT]
+    assert app.extensions['wtf.realms'] is None
+    realm = wtf_realms.Realm('api-init')
+    with wtf_realms.using(realm):
+        assert realms.init_app(app) == [realm]
+    app.config.update(WTF_REALMS='api-init-a, api-init-b', WTF_REALM_ROUTING='path')
+    served = realms.init_app(app)
+    assert [realm.name for realm in served] == ['api-init-a', 'api-init-b']
+    assert app.wsgi_app is app.extensions['wtf.realms']
+    app.config['WTF_REALM_ROUTING'] = 'cookie'
+    with pytest.raises(ValueError):
+        realms.init_app(app)
+    app.config['WTF_REALMS'] = 'Foo'
+    with pytest.raises(ValueError):
+        realms.init_app(app)
+
+
+def test_host_routing(tmpdir):
+    path = tmpdir.join('catalog.json')
+    path.write(json.dumps({'weapon-recipes': [RECIPE]}))
+    app = create_app(prefix='', catalog=str(path), config={'WTF_REALMS': 'api-host-a,api-host-b'})
+    client = app.test_client()
+    a = 'http://api-host-a.example.com/'
+    b = 'http://api-host-b.example.com/'
+    response = client.post('accounts', base_url=a,
+                           json={'email': 'foo@example.com', 'password': 'foo'})
+    assert response.status_code == 201
+    account_id = response.get_json()['account']['id']
+    assert client.get('accounts/%s' % account_id, base_url=a).status_code == 200
+    assert client.get('accounts/%s' % account_id, base_url=b).status_code == 404
+    # the realms share the catalog's recipes
+    recipes = [wtf_realms.realm(name).repositories['weapon_recipes']['by_id']['foo-sword']
+               for name in ['api-host-a', 'api-host-b']]
+    assert recipes[0] is recipes[1]
+    response = client.get('health', base_url='http://example.com/')
+    assert response.status_code == 404
+    assert response.get_json() == {'errors': ['Realm not found']}
+
+
+def test_path_routing(tmpdir):
+    path = tmpdir.join('catalog.json')
+    path.write(json.dumps({'weapon-recipes': [RECIPE]}))
+    client = create_app(prefix='', catalog=str(path), config={
+        'WTF_REALMS': 'api-path-a,api-path-b',
+        'WTF_REALM_ROUTING': 'path'
+    }).test_client()
+    assert client.get('/health').status_code == 404
+    assert client.get('/api-path-c/health').status_code == 404
+    assert client.get('/api-path-a/health').status_code == 200
+    response = client.post('/api-path-a/weapons', json={'recipe': 'foo-sword'})
+    assert response.status_code == 201
+    weapon_id = response.get_json()['weapon']['id']
+    assert client.get('/api-path-a/weapons/%s' % weapon_id).status_code == 200
+    assert client.get('/api-path-b/weapons/%s' % weapon_id).status_code == 404
+    # streamed responses are generated in the realm
+    response = client.get('/api-path-a/export/weapons')
+    [record] = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert record['id'] == weapon_id
+    assert record['name'] == 'Foo Sword'
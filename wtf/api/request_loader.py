@@ -0,0 +1,25 @@
+'''
+wtf.api.request_loader
+
+Gives each request its own Loader (see wtf.core.loader), so that the records
+    a request looks up several times (e.g. a weapon's recipe, to validate and
+    then to transform the weapon) are looked up once. Enabled by
+    WTF_REQUEST_LOADER.
+'''
+from wtf.core import loader
+
+
+def init_app(app):
+    '''Set up request-scoped lookups for an app.'''
+    if not app.config.get('WTF_REQUEST_LOADER', True):
+        return
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        loader.start()
+        try:
+            return dispatch()
+        finally:
+            loader.stop()
+
+    app.full_dispatch_request = full_dispatch_request
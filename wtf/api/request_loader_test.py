@@ -0,0 +1,34 @@
+# pylint: disable=missing-docstring,invalid-name
+from mock import Mock, patch
+from wtf.api.app import create_app
+from wtf.core import loader
+
+
+RECIPE = {
+    'id': 'foo-sword',
+    'name': 'Foo Sword',
+    'description': 'Foo',
+    'weight': {'center': 12, 'radius': 3},
+    'type': 'sword',
+    'handedness': 1,
+    'damage': {'min': {'center': 50, 'radius': 10}, 'max': {'center': 100, 'radius': 10}}
+}
+
+
+def create_weapon(config):
+    by_id = Mock(get=Mock(return_value=RECIPE))
+    with patch('wtf.core.weapons.REPO_RECIPES', {'by_id': by_id}), \
+            patch('wtf.core.weapons.REPO', {'by_id': {}}):
+        client = create_app(prefix='', config=config).test_client()
+        assert client.post('/weapons', json={'recipe': 'foo-sword'}).status_code == 201
+    return by_id.get.call_count
+
+
+def test_request_loader():
+    # the recipe is looked up to validate the weapon, then to transform it
+    assert create_weapon({}) == 1
+    assert loader.current() is None
+
+
+def test_request_loader_disabled():
+    assert create_weapon({'WTF_REQUEST_LOADER': False}) == 2
@@ -2,46 +2,98 @@
 wtf.api.routes
 
 API route handlers.
+
+Request and response bodies may be JSON or MessagePack (see
+    wtf.api.serialization), e.g.
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/characters/<id> \
+        --header "Accept: application/msgpack" \
+        --output character.msgpack
+
+Request metrics are exposed in the Prometheus text format at `GET /metrics`
+    (see wtf.api.metrics), and the time spent in each stage of a request
+    (parsing, validation, saving...) can be reported in the Server-Timing
+    header (see wtf.api.server_timing).
+
+Requests can be profiled with cProfile, and their profiles read at
+    `GET /admin/profiles/<id>` (see wtf.api.profiling), or sampled for flame
+    graphs at `GET /admin/sample` (see wtf.api.sampling). The memory used by
+    repositories and caches is reported at `GET /admin/memory` (see
+    wtf.memory). The recipe catalog is reloaded with
+    `POST /admin/catalog/reload` (see wtf.core.catalog). Admin routes require
+    the admin secret (see wtf.api.admin).
+
+Requests beyond the concurrency limits of the API and of its expensive routes
+    are rejected with a 503 and a Retry-After header (see wtf.api.admission),
+    and requests of a client over its rate limit with a 429 (see
+    wtf.api.rate_limiting).
+
+Requests slower than a threshold are logged with their parameters, stages and
+    stack (see wtf.api.slow_requests).
+
+Create (POST) requests honor the Idempotency-Key header, so that they can be
+    safely retried (see wtf.api.idempotency), and identical concurrent lookups
+    (GET by ID) share a single response (see wtf.api.coalescing).
 '''
-from flask import Blueprint, jsonify, request
-from werkzeug.exceptions import BadRequest
-from wtf.core import accounts, armor, characters, weapons
+from flask import Blueprint, current_app, request
+from wtf import memory
+from wtf.api import export, metrics, profiling, sampling
+from wtf.api.admin import AdminError, admin_required
+from wtf.api.admission import AdmissionError
+from wtf.api.coalescing import coalesced
+from wtf.api.idempotency import IdempotencyError, idempotent
+from wtf.api.rate_limiting import RateLimitError
+from wtf.api.serialization import cached_serialize, get_body, json_encoder, serialize
+from wtf.core import accounts, armor, catalog, characters, weapons
 from wtf.core.errors import NotFoundError, ValidationError
 
 
 BLUEPRINT = Blueprint('api', __name__)
 
 
-def get_json_body():
-    '''Get the JSON request body.'''
-    body = None
-    if request.content_type != 'application/json':
-        raise ValidationError('Content-Type header must be: application/json')
-    else:
-        try:
-            body = request.get_json()
-        except BadRequest:
-            raise ValidationError('Unable to parse JSON request body')
-    return body
-
-
 @BLUEPRINT.errorhandler(ValidationError)
 def handle_invalid_request(error):
     '''Handle ValidationError errors.'''
-    return jsonify({'errors': error.errors}), 400
+    return serialize({'errors': error.errors}), 400
 
 
 @BLUEPRINT.errorhandler(NotFoundError)
 def handle_not_found(error):
     '''Handle NotFoundError errors.'''
-    return jsonify({'errors': [str(error)]}), 404
+    return serialize({'errors': [str(error)]}), 404
+
+
+@BLUEPRINT.errorhandler(IdempotencyError)
+def handle_idempotency_error(error):
+    '''Handle IdempotencyError errors.'''
+    return serialize({'errors': [str(error)]}), error.status
+
+
+@BLUEPRINT.errorhandler(AdminError)
+def handle_forbidden(error):
+    '''Handle AdminError errors.'''
+    return serialize({'errors': [str(error)]}), error.status
+
+
+@BLUEPRINT.errorhandler(AdmissionError)
+def handle_at_capacity(error):
+    '''Handle AdmissionError errors.'''
+    return serialize({'errors': [str(error)]}), 503, {'Retry-After': str(error.retry_after)}
+
+
+@BLUEPRINT.errorhandler(RateLimitError)
+def handle_rate_limited(error):
+    '''Handle RateLimitError errors.'''
+    return serialize({'errors': [str(error)]}), 429, {'Retry-After': str(error.retry_after)}
 
 
 # pylint: disable=unused-argument
 @BLUEPRINT.errorhandler(Exception)
 def handle_error(error):
     '''Handle errors not caught by another error handler.'''
-    return jsonify({'errors': ['Internal Server Error']}), 500
+    return serialize({'errors': ['Internal Server Error']}), 500
 
 
 @BLUEPRINT.route('/health', methods=['GET'])
@@ -56,7 +108,19 @@ def get_health():
     return 'Healthy'
 
 
+@BLUEPRINT.route('/metrics', methods=['GET'])
+def get_metrics():
+    '''Get request metrics in the Prometheus text format.
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/metrics
+    '''
+    return current_app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @BLUEPRINT.route('/accounts', methods=['POST'])
+@idempotent
 def create_account():
     '''Create an account.
 
@@ -70,15 +134,16 @@ def create_account():
             "password": "..."
         }'
     '''
-    body = get_json_body()
+    body = get_body()
     account = accounts.save(accounts.create(
         email=body.get('email'),
         password=body.get('password')
     ))
-    return jsonify({'account': accounts.transform(account)}), 201
+    return serialize({'account': accounts.transform(account)}), 201
 
 
 @BLUEPRINT.route('/accounts/<account_id>', methods=['GET'])
+@coalesced
 def get_account_by_id(account_id):
     '''Get an account by its ID.
 
@@ -88,10 +153,11 @@ def get_account_by_id(account_id):
         --write-out "\n"
     '''
     account = accounts.find_by_id(account_id)
-    return jsonify({'account': accounts.transform(account)}), 200
+    return serialize({'account': accounts.transform(account)}), 200
 
 
 @BLUEPRINT.route('/characters', methods=['POST'])
+@idempotent
 def create_character():
     '''Create a character.
 
@@ -105,15 +171,16 @@ def create_character():
             "name": "..."
         }'
     '''
-    body = get_json_body()
+    body = get_body()
     character = characters.save(characters.create(
         account=body.get('account'),
         name=body.get('name')
     ))
-    return jsonify({'character': character}), 201
+    return serialize({'character': character}), 201
 
 
 @BLUEPRINT.route('/characters/<character_id>', methods=['GET'])
+@coalesced
 def get_character_by_id(character_id):
     '''Find a character by its ID.
 
@@ -123,10 +190,11 @@ def get_character_by_id(character_id):
         --write-out "\n"
     '''
     character = characters.find_by_id(character_id)
-    return jsonify({'character': character}), 200
+    return serialize({'character': character}), 200
 
 
 @BLUEPRINT.route('/weapon-recipes', methods=['POST'])
+@idempotent
 def create_weapon_recipe():
     '''Create a weapon recipe.
 
@@ -156,32 +224,13 @@ def create_weapon_recipe():
             }
         }'
     '''
-    body = get_json_body()
-    weight = body.get('weight', {})
-    damage = body.get('damage', {})
-    damage_min = damage.get('min', {})
-    damage_max = damage.get('max', {})
-    recipe = weapons.save_recipe(weapons.create_recipe(
-        name=body.get('name'),
-        description=body.get('description'),
-        weight=dict(center=weight.get('center'), radius=weight.get('radius')),
-        type=body.get('type'),
-        handedness=body.get('handedness'),
-        damage=dict(
-            min=dict(
-                center=damage_min.get('center'),
-                radius=damage_min.get('radius')
-            ),
-            max=dict(
-                center=damage_max.get('center'),
-                radius=damage_max.get('radius')
-            )
-        )
-    ))
-    return jsonify({'recipe': recipe}), 201
+    body = get_body()
+    recipe = weapons.save_recipe(weapons.parse_recipe(body))
+    return serialize({'recipe': recipe}), 201
 
 
 @BLUEPRINT.route('/weapon-recipes/<recipe_id>', methods=['GET'])
+@coalesced
 def get_weapon_recipe_by_id(recipe_id):
     '''Get a weapon recipe by its ID.
 
@@ -191,10 +240,15 @@ def get_weapon_recipe_by_id(recipe_id):
         --write-out "\n"
     '''
     recipe = weapons.find_recipe_by_id(recipe_id)
-    return jsonify({'recipe': recipe}), 200
+    return cached_serialize(
+        ('weapon-recipe', recipe_id),
+        (recipe,),
+        lambda: {'recipe': recipe}
+    )
 
 
 @BLUEPRINT.route('/weapons', methods=['POST'])
+@idempotent
 def create_weapon():
     '''Create a weapon.
 
@@ -207,14 +261,15 @@ def create_weapon():
             "recipe": "..."
         }'
     '''
-    body = get_json_body()
+    body = get_body()
     weapon = weapons.save(weapons.create(
         recipe=body.get('recipe')
     ))
-    return jsonify({'weapon': weapons.transform(weapon)}), 201
+    return serialize({'weapon': weapons.transform(weapon)}), 201
 
 
 @BLUEPRINT.route('/weapons/<weapon_id>', methods=['GET'])
+@coalesced
 def get_weapon_by_id(weapon_id):
     '''Get a weapon by its ID.
 
@@ -224,10 +279,16 @@ def get_weapon_by_id(weapon_id):
         --write-out "\n"
     '''
     weapon = weapons.find_by_id(weapon_id)
-    return jsonify({'weapon': weapons.transform(weapon)}), 200
+    recipe = weapons.find_recipe_by_id(weapon.get('recipe'))
+    return cached_serialize(
+        ('weapon', weapon_id),
+        (weapon, recipe),
+        lambda: {'weapon': weapons.transform(weapon)}
+    )
 
 
 @BLUEPRINT.route('/armor-recipes', methods=['POST'])
+@idempotent
 def create_armor_recipe():
     '''Create an armor recipe.
 
@@ -256,31 +317,13 @@ def create_armor_recipe():
             }
         }'
     '''
-    body = get_json_body()
-    weight = body.get('weight', {})
-    defense = body.get('defense', {})
-    defense_min = defense.get('min', {})
-    defense_max = defense.get('max', {})
-    recipe = armor.save_recipe(armor.create_recipe(
-        name=body.get('name'),
-        description=body.get('description'),
-        weight=dict(center=weight.get('center'), radius=weight.get('radius')),
-        location=body.get('location'),
-        defense=dict(
-            min=dict(
-                center=defense_min.get('center'),
-                radius=defense_min.get('radius')
-            ),
-            max=dict(
-                center=defense_max.get('center'),
-                radius=defense_max.get('radius')
-            )
-        )
-    ))
-    return jsonify({'recipe': recipe}), 201
+    body = get_body()
+    recipe = armor.save_recipe(armor.create_recipe(**body))
+    return serialize({'recipe': recipe}), 201
 
 
 @BLUEPRINT.route('/armor-recipes/<recipe_id>', methods=['GET'])
+@coalesced
 def get_armor_recipe_by_id(recipe_id):
     '''Get an armor recipe by its ID.
 
@@ -290,10 +333,15 @@ def get_armor_recipe_by_id(recipe_id):
         --write-out "\n"
     '''
     recipe = armor.find_recipe_by_id(recipe_id)
-    return jsonify({'recipe': recipe}), 200
+    return cached_serialize(
+        ('armor-recipe', recipe_id),
+        (recipe,),
+        lambda: {'recipe': recipe}
+    )
 
 
 @BLUEPRINT.route('/armor', methods=['POST'])
+@idempotent
 def create_armor():
     '''Create an armor.
 
@@ -306,14 +354,15 @@ def create_armor():
             "recipe": "..."
         }'
     '''
-    body = get_json_body()
+    body = get_body()
     new_armor = armor.save(armor.create(
         recipe=body.get('recipe')
     ))
-    return jsonify({'armor': armor.transform(new_armor)}), 201
+    return serialize({'armor': armor.transform(new_armor)}), 201
 
 
 @BLUEPRINT.route('/armor/<armor_id>', methods=['GET'])
+@coalesced
 def get_armor_by_id(armor_id):
     '''Get an armor by its ID.
 
@@ -323,4 +372,193 @@ def get_armor_by_id(armor_id):
         --write-out "\n"
     '''
     existing_armor = armor.find_by_id(armor_id)
-    return jsonify({'armor': armor.transform(existing_armor)}), 200
+    recipe = armor.find_recipe_by_id(existing_armor.get('recipe'))
+    return cached_serialize(
+        ('armor', armor_id),
+        (existing_armor, recipe),
+        lambda: {'armor': armor.transform(existing_armor)}
+    )
+
+
+@BLUEPRINT.route('/export/<kind>', methods=['GET'])
+def get_export(kind):
+    '''Export every record of a kind as newline-delimited JSON.
+
+    The kind is one of: accounts, characters, weapon-recipes, weapons,
+        armor-recipes or armor. An interrupted export can be resumed by
+        passing the number of records already received as the cursor.
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/export/<kind>?cursor=<cursor>
+    '''
+    cursor = export.parse_cursor(request.args.get('cursor'))
+    records, transform_many = export.snapshot(kind)
+    response = current_app.response_class(
+        export.export(records, transform_many, json_encoder(), cursor),
+        mimetype='application/x-ndjson'
+    )
+    response.headers['X-Export-Cursor'] = str(cursor)
+    response.headers['X-Export-Total'] = str(len(records))
+    return response
+
+
+@BLUEPRINT.route('/admin/profiles', methods=['GET'])
+@admin_required
+def get_profiles():
+    '''List the ids of the stored request profiles, most recent first.
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/admin/profiles \
+        --header "X-Admin-Secret: ..." \
+        --write-out "\n"
+    '''
+    return serialize({'profiles': current_app.extensions['wtf.profiler'].profile_ids()}), 200
+
+
+@BLUEPRINT.route('/admin/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def get_profile(profile_id):
+    '''Get a request profile's top functions as text.
+
+    The functions are sorted by `sort` (calls, cumulative or tottime) and
+        limited to `limit` (default: 50).
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/admin/profiles/<id>?sort=tottime \
+        --header "X-Admin-Secret: ..."
+    '''
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in profiling.SORT_KEYS:
+        raise ValidationError('Invalid sort: %s' % sort)
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        raise ValidationError('Invalid limit')
+    report = current_app.extensions['wtf.profiler'].report(profile_id, sort, limit)
+    return current_app.response_class(report, mimetype='text/plain')
+
+
+@BLUEPRINT.route('/admin/sample', methods=['GET'])
+@admin_required
+def get_sample():
+    '''Sample the stacks of the threads handling requests for `seconds` seconds.
+
+    Returns the stacks in the collapsed format of flame graph tools. Samples
+        are taken every `interval` seconds (default: 0.01), of the threads
+        handling requests or, with `threads=all`, of every thread.
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/admin/sample?seconds=10 \
+        --header "X-Admin-Secret: ..." \
+        --output stacks.txt
+    '''
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval', 0.01))
+    except ValueError:
+        raise ValidationError('Invalid seconds or interval')
+    if not 0 < seconds <= sampling.MAX_SECONDS:
+        raise ValidationError('Invalid seconds: must be at most %d' % sampling.MAX_SECONDS)
+    if interval < sampling.MIN_INTERVAL:
+        raise ValidationError('Invalid interval: must be at least %s' % sampling.MIN_INTERVAL)
+    threads = request.args.get('threads', 'requests')
+    if threads not in sampling.THREADS:
+        raise ValidationError('Invalid threads: %s' % threads)
+    sampler = sampling.sample(seconds, interval, requests_only=threads == 'requests')
+    if sampler is None:
+        raise AdminError('Another sampling is running', 409)
+    response = current_app.response_class(sampler.render(), mimetype='text/plain')
+    response.headers['X-Samples'] = str(sampler.samples)
+    return response
+
+
+@BLUEPRINT.route('/admin/memory', methods=['GET'])
+@admin_required
+def get_memory():
+    '''Report the entries and estimated memory use of the repositories and caches.
+
+    Memory use is estimated from a sample of `sample` entries (default: 1000)
+        per repository index and cache.
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/admin/memory?sample=1000 \
+        --header "X-Admin-Secret: ..." \
+        --write-out "\n"
+    '''
+    try:
+        sample_size = int(request.args.get('sample', memory.SAMPLE_SIZE))
+    except ValueError:
+        raise ValidationError('Invalid sample')
+    if sample_size < 1:
+        raise ValidationError('Invalid sample: must be at least 1')
+    return serialize(memory.usage(sample_size)), 200
+
+
+@BLUEPRINT.route('/admin/memory/allocations', methods=['GET'])
+@admin_required
+def get_memory_allocations():
+    '''Report the `limit` (default: 10) source lines that allocated the most memory.
+
+    Unless tracemalloc is already tracing, allocations are traced for
+        `seconds` seconds (default: 10).
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/admin/memory/allocations?seconds=10 \
+        --header "X-Admin-Secret: ..." \
+        --write-out "\n"
+    '''
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        raise ValidationError('Invalid seconds or limit')
+    if not 0 <= seconds <= sampling.MAX_SECONDS:
+        raise ValidationError('Invalid seconds: must be at most %d' % sampling.MAX_SECONDS)
+    allocations = memory.top_allocations(seconds, limit)
+    if allocations is None:
+        raise AdminError('Another tracing is running', 409)
+    return serialize({'allocations': allocations}), 200
+
+
+@BLUEPRINT.route('/admin/catalog', methods=['GET'])
+@admin_required
+def get_catalog():
+    '''Get the path and version of the recipe catalog.
+
+    $ curl \
+        --request GET \
+        --url http://localhost:5000/api/admin/catalog \
+        --header "X-Admin-Secret: ..." \
+        --write-out "\n"
+    '''
+    return serialize({
+        'path': current_app.config.get('WTF_CATALOG') or None,
+        'version': catalog.version()
+    }), 200
+
+
+@BLUEPRINT.route('/admin/catalog/reload', methods=['POST'])
+@admin_required
+def reload_catalog():
+    '''Reload the recipe catalog (WTF_CATALOG) without blocking requests.
+
+    With several worker processes, only the worker that handles the request
+        reloads the catalog: set WTF_CATALOG_WATCH_INTERVAL to have every
+        worker reload it when the file changes instead.
+
+    $ curl \
+        --request POST \
+        --url http://localhost:5000/api/admin/catalog/reload \
+        --header "X-Admin-Secret: ..." \
+        --write-out "\n"
+    '''
+    path = current_app.config.get('WTF_CATALOG')
+    if not path:
+        raise ValidationError('No catalog configured (WTF_CATALOG)')
+    return serialize(catalog.reload(path)), 200
@@ -1,7 +1,6 @@
 # pylint: disable=missing-docstring,invalid-name,redefined-outer-name
 import pytest
-from mock import patch, Mock
-from werkzeug.exceptions import BadRequest
+from mock import patch
 from wtf.api import routes
 from wtf.api.app import create_app
 from wtf.core.errors import NotFoundError, ValidationError
@@ -26,57 +25,27 @@ def test_client():
     return client
 
 
-@patch('wtf.api.routes.request')
-def test_get_json_body(mock_request):
-    expected = {'foo': 'bar'}
-    mock_request.content_type = 'application/json'
-    mock_request.get_json = Mock(return_value=expected)
-    actual = routes.get_json_body()
-    assert expected == actual
-
-
-@patch('wtf.api.routes.request')
-def test_get_json_body_content_type_not_json(mock_request):
-    expected = 'Content-Type header must be: application/json'
-    mock_request.content_type = 'application/html'
-    with pytest.raises(ValidationError) as e:
-        routes.get_json_body()
-    actual = e.value.errors
-    assert expected in actual
-
-
-@patch('wtf.api.routes.request')
-def test_get_json_body_invalid(mock_request):
-    expected = 'Unable to parse JSON request body'
-    mock_request.content_type = 'application/json'
-    mock_request.get_json = Mock(side_effect=BadRequest())
-    with pytest.raises(ValidationError) as e:
-        routes.get_json_body()
-    actual = e.value.errors
-    assert expected in actual
-
-
-@patch('wtf.api.routes.jsonify')
-def test_handle_invalid_request_error(mock_jsonify):
-    mock_jsonify.side_effect = lambda b: b
+@patch('wtf.api.routes.serialize')
+def test_handle_invalid_request_error(mock_serialize):
+    mock_serialize.side_effect = lambda b: b
     error = ValidationError(errors=['foo', 'bar', 'baz'])
     response, status_code = routes.handle_invalid_request(error)
     assert response == {'errors': ['foo', 'bar', 'baz']}
     assert status_code == 400
 
 
-@patch('wtf.api.routes.jsonify')
-def test_handle_not_found_error(mock_jsonify):
-    mock_jsonify.side_effect = lambda b: b
+@patch('wtf.api.routes.serialize')
+def test_handle_not_found_error(mock_serialize):
+    mock_serialize.side_effect = lambda b: b
     error = NotFoundError('Foobar not found')
     response, status_code = routes.handle_not_found(error)
     assert response == {'errors': ['Foobar not found']}
     assert status_code == 404
 
 
-@patch('wtf.api.routes.jsonify')
-def test_handle_misc_error(mock_jsonify):
-    mock_jsonify.side_effect = lambda b: b
+@patch('wtf.api.routes.serialize')
+def test_handle_misc_error(mock_serialize):
+    mock_serialize.side_effect = lambda b: b
     error = Exception('foo bar baz')
     response, status_code = routes.handle_error(error)
     assert response == {'errors': ['Internal Server Error']}
@@ -130,6 +99,34 @@ def test_create_character(mock_save, test_client):
     response.assert_body({'character': 'foobar'})
 
 
+@patch('wtf.core.characters.save')
+def test_create_character_msgpack(mock_save, test_client):
+    mock_save.side_effect = lambda character: character
+    headers = {'Content-Type': 'application/msgpack', 'Accept': 'application/msgpack'}
+    response = test_client.post('/characters', headers=headers, body={
+        'account': 'foo', 'name': 'Bar'
+    })
+    response.assert_status_code(201)
+    assert response.response.content_type == 'application/msgpack'
+    assert mock_save.call_args[0][0]['name'] == 'Bar'
+    response.assert_body({'character': mock_save.call_args[0][0]})
+
+
+def test_create_character_unsupported_content_type(test_client):
+    response = test_client.post('/characters', headers={'Content-Type': 'text/plain'}, body={})
+    response.assert_status_code(400)
+    response.assert_body({
+        'errors': ['Content-Type header must be one of: application/json, application/msgpack']
+    })
+
+
+def test_not_found_msgpack(test_client):
+    response = test_client.get('/characters/foo', headers={'Accept': 'application/msgpack'})
+    response.assert_status_code(404)
+    assert response.response.content_type == 'application/msgpack'
+    response.assert_body({'errors': ['Character not found']})
+
+
 @patch('wtf.core.characters.save')
 def test_create_character_invalid(mock_save, test_client):
     mock_save.side_effect = ValidationError(errors=['foo', 'bar', 'baz'])
@@ -168,6 +165,46 @@ def test_create_weapon_recipe_invalid(mock_save_recipe, test_client):
     response.assert_body({'errors': ['foo', 'bar', 'baz']})
 
 
+def test_create_weapon_recipe_malformed(test_client):
+    response = test_client.post('/weapon-recipes', body={
+        'name': 'Foo Sword',
+        'description': 42,
+        'weight': 12,
+        'type': 'sword',
+        'damage': {'min': {'center': 'foo', 'radius': 10}, 'max': None}
+    })
+    response.assert_status_code(400)
+    response.assert_body({'errors': [
+        'Invalid field: description must be a string',
+        'Missing required field: weight.center',
+        'Missing required field: weight.radius',
+        'Missing required field: handedness',
+        'Invalid field: damage.min.center must be a number',
+        'Missing required field: damage.max.center',
+        'Missing required field: damage.max.radius'
+    ]})
+
+
+@pytest.mark.parametrize('handedness', [{}, {'handedness': None}])
+def test_create_weapon_recipe_missing_handedness(handedness, test_client):
+    response = test_client.post('/weapon-recipes', body=dict({
+        'name': 'Foo Sword',
+        'description': 'The mightiest sword in all the land.',
+        'weight': {'center': 12, 'radius': 3},
+        'type': 'sword',
+        'damage': {'min': {'center': 50, 'radius': 10}, 'max': {'center': 100, 'radius': 10}}
+    }, **handedness))
+    response.assert_status_code(400)
+    response.assert_body({'errors': ['Missing required field: handedness']})
+
+
+@pytest.mark.parametrize('path', ['/weapon-recipes', '/armor-recipes'])
+def test_create_recipe_not_an_object(path, test_client):
+    response = test_client.post(path, body=[1])
+    response.assert_status_code(400)
+    response.assert_body({'errors': ['Request body must be an object']})
+
+
 @patch('wtf.core.weapons.find_recipe_by_id')
 def test_get_weapon_recipe_by_id(mock_find_recipe_by_id, test_client):
     mock_find_recipe_by_id.return_value = 'foobar'
@@ -175,6 +212,12 @@ def test_get_weapon_recipe_by_id(mock_find_recipe_by_id, test_client):
     response = test_client.get('/weapon-recipes/%s' % recipe_id)
     response.assert_status_code(200)
     response.assert_body({'recipe': 'foobar'})
+    etag = response.response.headers['ETag']
+    response = test_client.get(
+        '/weapon-recipes/%s' % recipe_id,
+        headers={'If-None-Match': etag}
+    )
+    response.assert_status_code(304)
 
 
 def test_get_weapon_recipe_by_id_not_found(test_client):
@@ -203,13 +246,21 @@ def test_create_weapon_invalid(mock_save, test_client):
 
 
 @patch('wtf.core.weapons.transform')
+@patch('wtf.core.weapons.find_recipe_by_id')
 @patch('wtf.core.weapons.find_by_id')
-def test_get_weapon_by_id(mock_find_by_id, mock_transform, test_client):
-    mock_find_by_id.return_value = 'foobar'
+def test_get_weapon_by_id(mock_find_by_id, mock_find_recipe_by_id, mock_transform,
+                          test_client):
+    mock_find_by_id.return_value = {'recipe': TEST_DATA['weapon_recipe']['id']}
+    mock_find_recipe_by_id.return_value = {}
     mock_transform.return_value = 'foobar-transformed'
+    for _ in range(2):
+        response = test_client.get('/weapons/%s' % TEST_DATA['weapon']['id'])
+        response.assert_status_code(200)
+        response.assert_body({'weapon': 'foobar-transformed'})
+    assert mock_transform.call_count == 1
+    mock_find_recipe_by_id.return_value = {}
     response = test_client.get('/weapons/%s' % TEST_DATA['weapon']['id'])
-    response.assert_status_code(200)
-    response.assert_body({'weapon': 'foobar-transformed'})
+    assert mock_transform.call_count == 2
 
 
 def test_get_weapon_by_id_not_found(test_client):
@@ -269,16 +320,47 @@ def test_create_armor_invalid(mock_save, test_client):
 
 
 @patch('wtf.core.armor.transform')
+@patch('wtf.core.armor.find_recipe_by_id')
 @patch('wtf.core.armor.find_by_id')
-def test_get_armor_by_id(mock_find_by_id, mock_transform, test_client):
-    mock_find_by_id.return_value = 'foobar'
+def test_get_armor_by_id(mock_find_by_id, mock_find_recipe_by_id, mock_transform,
+                         test_client):
+    mock_find_by_id.return_value = {'recipe': TEST_DATA['armor_recipe']['id']}
+    mock_find_recipe_by_id.return_value = {}
     mock_transform.return_value = 'foobar-transformed'
-    response = test_client.get('/armor/%s' % TEST_DATA['armor']['id'])
-    response.assert_status_code(200)
-    response.assert_body({'armor': 'foobar-transformed'})
+    for _ in range(2):
+        response = test_client.get('/armor/%s' % TEST_DATA['armor']['id'])
+        response.assert_status_code(200)
+        response.assert_body({'armor': 'foobar-transformed'})
+    assert mock_transform.call_count == 1
 
 
 def test_get_armor_by_id_not_found(test_client):
     response = test_client.get('/armor/%s' % TEST_DATA['armor']['id'])
     response.assert_status_code(404)
     response.assert_body({'errors': ['Armor not found']})
+
+
+@patch('wtf.core.accounts.REPO', {'by_id': {
+    str(i): {'id': str(i), 'password': 'foobar'} for i in range(3)
+}})
+def test_get_export(test_client):
+    response = test_client.get('/export/accounts')
+    response.assert_status_code(200)
+    assert response.response.mimetype == 'application/x-ndjson'
+    assert response.response.headers['X-Export-Total'] == '3'
+    assert response.response.get_data() == b'{"id":"0"}\n{"id":"1"}\n{"id":"2"}\n'
+    response = test_client.get('/export/accounts?cursor=2')
+    assert response.response.headers['X-Export-Cursor'] == '2'
+    assert response.response.get_data() == b'{"id":"2"}\n'
+
+
+def test_get_export_not_found(test_client):
+    response = test_client.get('/export/foobar')
+    response.assert_status_code(404)
+    response.assert_body({'errors': ['Export not found']})
+
+
+def test_get_export_invalid_cursor(test_client):
+    response = test_client.get('/export/accounts?cursor=foobar')
+    response.assert_status_code(400)
+    response.assert_body({'errors': ['Invalid cursor: must be an integer >= 0']})
@@ -0,0 +1,114 @@
+'''
+wtf.api.sampling
+
+A sampling profiler: every `interval` seconds, it records the stack of each
+    thread that is handling a request (or of every thread), and counts
+    identical stacks. Unlike cProfile (see wtf.api.profiling), it doesn't
+    slow down the code being profiled, nor does it distort the time spent in
+    native code (e.g. NumPy).
+
+Stacks are reported in the collapsed format read by flame graph tools, one
+    stack per line with its count, e.g.
+
+    $ curl \
+        --url "http://localhost:5000/api/admin/sample?seconds=10" \
+        --header "X-Admin-Secret: ..." \
+        --output stacks.txt
+    $ flamegraph.pl stacks.txt > flamegraph.svg
+
+Samples are taken by the thread handling the sampling request, so that the
+    threads being sampled are not interrupted (no signals are used). Only one
+    sampling request runs at a time per process; with several worker
+    processes, the worker that handles the sampling request is sampled.
+'''
+import sys
+import threading
+from time import monotonic, sleep
+from flask import Flask
+
+
+MAX_SECONDS = 60.0
+MIN_INTERVAL = 0.001
+SWITCH_INTERVAL = 0.0001
+THREADS = ['requests', 'all']
+# frames of this function are those of a thread handling a request
+REQUEST_CODE = Flask.wsgi_app.__code__
+LOCK = threading.Lock()
+
+
+def collapse(frame, requests_only=True):
+    '''Collapse a stack into `module.function` frames, from the outermost.
+
+    Returns None if `requests_only` and the stack isn't handling a request.
+    '''
+    frames = []
+    handling_request = False
+    while frame is not None:
+        code = frame.f_code
+        if code is REQUEST_CODE:
+            handling_request = True
+        frames.append('%s.%s' % (frame.f_globals.get('__name__', '?'), code.co_name))
+        frame = frame.f_back
+    if requests_only and not handling_request:
+        return None
+    frames.reverse()
+    return ';'.join(frames)
+
+
+class Sampler(object):
+    '''Counts the stacks of the threads of the process.'''
+
+    def __init__(self, requests_only=True):
+        self.requests_only = requests_only
+        self.stacks = {}
+        self.samples = 0
+
+    def sample(self):
+        '''Record the stacks of every thread (but the current one).'''
+        own = threading.get_ident()
+        # pylint: disable=protected-access
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = collapse(frame, self.requests_only)
+            if stack is not None:
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+    def run(self, seconds, interval=0.01):
+        '''Take samples every `interval` seconds for `seconds` seconds.'''
+        deadline = monotonic() + seconds
+        # threads running Python code only give up the GIL every switch
+        #   interval (or when blocking on I/O), so a longer switch interval
+        #   would bias samples towards I/O
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, SWITCH_INTERVAL))
+        try:
+            while True:
+                self.sample()
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                sleep(min(interval, remaining))
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+    def render(self):
+        '''Render the stacks in the collapsed format, most frequent first.'''
+        stacks = sorted(self.stacks.items(), key=lambda item: (-item[1], item[0]))
+        return ''.join('%s %d\n' % (stack, count) for stack, count in stacks)
+
+
+def sample(seconds, interval=0.01, requests_only=True):
+    '''Sample the stacks of this process, unless another sampling is running.
+
+    Returns the Sampler, or None if another sampling didn't finish in time.
+    '''
+    if not LOCK.acquire(timeout=seconds):
+        return None
+    try:
+        sampler = Sampler(requests_only)
+        sampler.run(seconds, interval)
+        return sampler
+    finally:
+        LOCK.release()
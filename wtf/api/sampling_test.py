@@ -0,0 +1,70 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import sys
+import threading
+from time import sleep
+from mock import patch
+from wtf.api import admin, sampling
+from wtf.api.app import create_app
+
+
+ADMIN = {admin.HEADER: 'foo'}
+
+
+def slow_find(_):
+    sleep(0.5)
+    raise ValueError()
+
+
+def test_collapse():
+    frame = sys._getframe()  # pylint: disable=protected-access
+    assert sampling.collapse(frame) is None
+    stack = sampling.collapse(frame, requests_only=False)
+    assert stack.endswith(';wtf.api.sampling_test.test_collapse')
+
+
+def test_sampler():
+    sampler = sampling.Sampler(requests_only=False)
+    event = threading.Event()
+    thread = threading.Thread(target=event.wait)
+    thread.start()
+    sampler.run(0.05, 0.01)
+    event.set()
+    thread.join()
+    assert sampler.samples >= 2
+    lines = sampler.render().splitlines()
+    assert any(line.startswith('threading.') and ';threading.wait;' in line for line in lines)
+    assert not any('test_sampler' in line for line in lines)
+    counts = [int(line.rpartition(' ')[2]) for line in lines]
+    assert counts == sorted(counts, reverse=True)
+
+
+@patch('wtf.core.weapons.find_by_id', side_effect=slow_find)
+def test_app(_):
+    client = create_app(prefix='', config={'WTF_ADMIN_SECRET': 'foo'}).test_client()
+    thread = threading.Thread(target=lambda: client.get('/weapons/foo'))
+    thread.start()
+    sleep(0.1)
+    response = client.get('/admin/sample?seconds=0.2&interval=0.005', headers=ADMIN)
+    thread.join()
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert int(response.headers['X-Samples']) >= 10
+    stacks = response.get_data(as_text=True).splitlines()
+    assert stacks
+    assert all('wtf.api.routes.get_weapon_by_id;' in stack for stack in stacks)
+    assert all('get_sample' not in stack for stack in stacks)
+
+
+def test_app_invalid():
+    client = create_app(prefix='', config={'WTF_ADMIN_SECRET': 'foo'}).test_client()
+    assert client.get('/admin/sample?seconds=1').status_code == 403
+    for query in ['seconds=0', 'seconds=61', 'seconds=foo', 'interval=0', 'threads=foo']:
+        assert client.get('/admin/sample?' + query, headers=ADMIN).status_code == 400
+
+
+def test_one_at_a_time():
+    client = create_app(prefix='', config={'WTF_ADMIN_SECRET': 'foo'}).test_client()
+    with sampling.LOCK:
+        response = client.get('/admin/sample?seconds=0.01', headers=ADMIN)
+    assert response.status_code == 409
+    assert response.get_json() == {'errors': ['Another sampling is running']}
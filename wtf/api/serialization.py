@@ -0,0 +1,194 @@
+'''
+wtf.api.serialization
+
+Request parsing and response serialization.
+
+Request and response bodies are either JSON (the default) or MessagePack
+    (https://msgpack.org), which is more compact and, with the optional msgpack
+    package installed, faster to encode and decode. Requests are parsed
+    according to their Content-Type; responses are encoded in the media type
+    preferred by the request's Accept header, JSON unless MessagePack is
+    explicitly preferred.
+
+JSON encoding is pluggable: set WTF_JSON_ENCODER to the name of one of the
+    encoders in JSON_ENCODERS. The default, "auto", uses orjson if it is
+    installed and falls back to the standard library otherwise.
+
+Resources that don't change until they are saved again (recipes and
+    transformed items) are served from a cache of pre-serialized response
+    bodies. Each cache entry is tagged with the stored objects it was built
+    from; since every save stores a new object, an entry is only reused while
+    the repository still holds the very same objects. Entries are also keyed by
+    the catalog version, so that reloading the recipe catalog (see
+    wtf.core.catalog) invalidates every response derived from recipes, and by
+    realm (see wtf.core.realms), which each have their own entries.
+'''
+import json
+from hashlib import md5
+from flask import current_app, request
+from wtf.api import packing
+from wtf.cache import LRUCache
+from wtf.core import catalog, realms, timing
+from wtf.core.errors import ValidationError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_dumps(obj):
+    '''Encode an object as JSON bytes with the standard library.'''
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def orjson_dumps(obj):
+    '''Encode an object as JSON bytes with orjson.'''
+    # pylint: disable=no-member
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+JSON_ENCODERS = {'json': json_dumps}
+if orjson is not None:
+    JSON_ENCODERS['orjson'] = orjson_dumps
+JSON_ENCODERS['auto'] = JSON_ENCODERS.get('orjson', json_dumps)
+CONDITIONAL_HEADERS = frozenset(['HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE'])
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MEDIA_TYPES = [JSON, MSGPACK]
+MEDIA_TYPE_ALIASES = {'application/x-msgpack': MSGPACK}
+MEDIA_TYPE_NAMES = {JSON: 'JSON', MSGPACK: 'MessagePack'}
+
+
+# pylint: disable=too-few-public-methods
+class CacheEntry(object):
+    '''A pre-serialized response body.'''
+
+    __slots__ = ['sources', 'body', 'etag']
+
+    def __init__(self, sources, body):
+        self.sources = sources
+        self.body = body
+        self.etag = '"%s"' % md5(body).hexdigest()
+
+    def is_current(self, sources):
+        '''Check whether this entry was built from the provided objects.'''
+        return len(sources) == len(self.sources) and all(
+            source is cached for source, cached in zip(sources, self.sources)
+        )
+
+
+def init_app(app):
+    '''Set up response serialization for an app.'''
+    name = app.config.get('WTF_JSON_ENCODER', 'auto')
+    if name not in JSON_ENCODERS:
+        raise ValueError('Unknown JSON encoder: %s' % name)
+    size = app.config.get('WTF_RESPONSE_CACHE_SIZE', 0)
+    app.extensions['wtf.json_encoder'] = JSON_ENCODERS[name]
+    app.extensions['wtf.encoders'] = {JSON: JSON_ENCODERS[name], MSGPACK: packing.packb}
+    app.extensions['wtf.response_cache'] = \
+        LRUCache(max_entries=size, name='responses') if size > 0 else None
+
+
+def json_encoder():
+    '''Get the current app's JSON encoder.'''
+    return current_app.extensions.get('wtf.json_encoder', json_dumps)
+
+
+@timing.stage('serialize')
+def dumps(obj, mimetype=JSON):
+    '''Encode an object as `mimetype` bytes with the current app's encoder.'''
+    if mimetype == JSON:
+        return json_encoder()(obj)
+    return current_app.extensions.get('wtf.encoders', {}).get(mimetype, packing.packb)(obj)
+
+
+@timing.stage('parse')
+def loads(data, mimetype=JSON):
+    '''Decode `mimetype` bytes.
+
+    Raises a ValueError if the data is invalid.
+    '''
+    if mimetype == JSON:
+        return json.loads(data.decode('utf-8') if isinstance(data, bytes) else data)
+    return packing.unpackb(data)
+
+
+def request_mimetype():
+    '''Get the media type of the request body.
+
+    Raises a ValidationError if it is not supported.
+    '''
+    mimetype = request.mimetype
+    mimetype = MEDIA_TYPE_ALIASES.get(mimetype, mimetype)
+    if mimetype not in MEDIA_TYPES:
+        raise ValidationError('Content-Type header must be one of: %s' % ', '.join(MEDIA_TYPES))
+    return mimetype
+
+
+def response_mimetype():
+    '''Get the media type of the response body.
+
+    Full Accept header negotiation is only done when the header mentions
+        MessagePack, so that JSON requests (by far the most common) don't pay
+        for it.
+    '''
+    accept = request.environ.get('HTTP_ACCEPT', '')
+    if 'msgpack' not in accept:
+        return JSON
+    mimetype = request.accept_mimetypes.best_match(
+        MEDIA_TYPES + list(MEDIA_TYPE_ALIASES), default=JSON)
+    return MEDIA_TYPE_ALIASES.get(mimetype, mimetype)
+
+
+def get_body():
+    '''Parse the request body according to its Content-Type.
+
+    Raises a ValidationError if the Content-Type is not supported or the body
+        can't be parsed into an object.
+    '''
+    mimetype = request_mimetype()
+    try:
+        body = loads(request.get_data(cache=True), mimetype)
+    except ValueError:
+        raise ValidationError('Unable to parse %s request body' % MEDIA_TYPE_NAMES[mimetype])
+    if not isinstance(body, dict):
+        raise ValidationError('Request body must be an object')
+    return body
+
+
+def serialize(obj):
+    '''Create a response in the negotiated media type.'''
+    mimetype = response_mimetype()
+    response = current_app.response_class(dumps(obj, mimetype), mimetype=mimetype)
+    response.headers['Vary'] = 'Accept'
+    return response
+
+
+def cached_serialize(key, sources, build, status=200):
+    '''Create a response in the negotiated media type for an immutable resource.
+
+    `key` identifies the resource, `sources` are the stored objects it is
+        derived from and `build` is called to create the response body if
+        there is no current cache entry. The response is tagged with a strong
+        ETag and honors conditional requests (which are only evaluated when the
+        request is conditional, since doing so is relatively expensive).
+    '''
+    mimetype = response_mimetype()
+    key = (realms.current().name, key, mimetype, catalog.version())
+    cache = current_app.extensions.get('wtf.response_cache')
+    entry = cache.get(key) if cache is not None else None
+    if entry is None or not entry.is_current(sources):
+        entry = CacheEntry(sources, dumps(build(), mimetype))
+        if cache is not None:
+            cache.set(key, entry)
+    response = current_app.response_class(
+        entry.body,
+        status=status,
+        mimetype=mimetype
+    )
+    response.headers['ETag'] = entry.etag
+    response.headers['Vary'] = 'Accept'
+    if CONDITIONAL_HEADERS.intersection(request.environ):
+        response.make_conditional(request)
+    return response
@@ -0,0 +1,156 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import json
+import numpy as np
+import pytest
+from flask import Flask
+from mock import Mock
+from wtf.api import packing, serialization
+from wtf.core.errors import ValidationError
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(WTF_JSON_ENCODER='json', WTF_RESPONSE_CACHE_SIZE=10)
+    serialization.init_app(app)
+    return app
+
+
+def test_json_encoders():
+    obj = {'weight': np.float64(12.5), 'name': 'Foo Sword'}
+    for name, encoder in serialization.JSON_ENCODERS.items():
+        assert json.loads(encoder(obj).decode()) == obj, name
+    assert serialization.JSON_ENCODERS['auto'] is serialization.JSON_ENCODERS.get(
+        'orjson', serialization.json_dumps)
+
+
+def test_init_app_unknown_encoder():
+    app = Flask(__name__)
+    app.config['WTF_JSON_ENCODER'] = 'foobar'
+    with pytest.raises(ValueError):
+        serialization.init_app(app)
+
+
+def test_init_app_cache_disabled():
+    app = Flask(__name__)
+    app.config['WTF_RESPONSE_CACHE_SIZE'] = 0
+    serialization.init_app(app)
+    assert app.extensions['wtf.response_cache'] is None
+    assert app.extensions['wtf.json_encoder'] is serialization.JSON_ENCODERS['auto']
+
+
+def test_serialize(app):
+    with app.test_request_context():
+        response = serialization.serialize({'foo': 'bar'})
+    assert response.mimetype == 'application/json'
+    assert response.get_data() == b'{"foo":"bar"}'
+    assert response.headers['Vary'] == 'Accept'
+
+
+def test_serialize_msgpack(app):
+    with app.test_request_context(headers={'Accept': 'application/msgpack'}):
+        response = serialization.serialize({'foo': 'bar'})
+    assert response.mimetype == 'application/msgpack'
+    assert packing.unpackb(response.get_data()) == {'foo': 'bar'}
+
+
+def test_response_mimetype(app):
+    for accept, expected in [
+            (None, 'application/json'),
+            ('*/*', 'application/json'),
+            ('text/html', 'application/json'),
+            ('application/json', 'application/json'),
+            ('application/msgpack', 'application/msgpack'),
+            ('application/x-msgpack', 'application/msgpack'),
+            ('application/json;q=0.5, application/msgpack', 'application/msgpack'),
+            ('application/json, application/x-msgpack;q=0.5', 'application/json'),
+            ('application/msgpack;q=0.5, */*', 'application/json')]:
+        headers = {'Accept': accept} if accept else {}
+        with app.test_request_context(headers=headers):
+            assert serialization.response_mimetype() == expected, accept
+
+
+def test_get_body(app):
+    expected = {'foo': 'bar', 'baz': [1, 2.5, None]}
+    for content_type, data in [
+            ('application/json', json.dumps(expected)),
+            ('application/json; charset=utf-8', json.dumps(expected)),
+            ('application/msgpack', packing.packb(expected)),
+            ('application/x-msgpack', packing.packb(expected))]:
+        with app.test_request_context(method='POST', data=data, content_type=content_type):
+            assert serialization.get_body() == expected, content_type
+
+
+def test_get_body_unsupported_content_type(app):
+    expected = 'Content-Type header must be one of: application/json, application/msgpack'
+    with app.test_request_context(method='POST', data='{}', content_type='application/html'):
+        with pytest.raises(ValidationError) as e:
+            serialization.get_body()
+    assert expected in e.value.errors
+
+
+def test_get_body_invalid(app):
+    for content_type, expected in [
+            ('application/json', 'Unable to parse JSON request body'),
+            ('application/msgpack', 'Unable to parse MessagePack request body')]:
+        with app.test_request_context(method='POST', data=b'{\xc1', content_type=content_type):
+            with pytest.raises(ValidationError) as e:
+                serialization.get_body()
+        assert expected in e.value.errors
+
+
+def test_cached_serialize(app):
+    recipe = {'id': 'foo'}
+    build = Mock(return_value={'recipe': recipe})
+    for _ in range(2):
+        with app.test_request_context():
+            response = serialization.cached_serialize(('recipe', 'foo'), (recipe,), build)
+        assert response.status_code == 200
+        assert response.get_data() == b'{"recipe":{"id":"foo"}}'
+    assert build.call_count == 1
+    etag = response.headers['ETag']
+    with app.test_request_context(headers={'If-None-Match': etag}):
+        response = serialization.cached_serialize(('recipe', 'foo'), (recipe,), build)
+    assert response.status_code == 304
+    updated = {'id': 'foo', 'name': 'bar'}
+    build.return_value = {'recipe': updated}
+    with app.test_request_context():
+        response = serialization.cached_serialize(
+            ('recipe', 'foo'), (updated,), build, status=201)
+    assert response.status_code == 201
+    assert json.loads(response.get_data().decode()) == {'recipe': updated}
+    assert response.headers['ETag'] != etag
+    assert build.call_count == 2
+
+
+def test_cached_serialize_per_mimetype(app):
+    recipe = {'id': 'foo'}
+    build = Mock(return_value={'recipe': recipe})
+    with app.test_request_context():
+        response = serialization.cached_serialize('key', (recipe,), build)
+    assert response.mimetype == 'application/json'
+    with app.test_request_context(headers={'Accept': 'application/msgpack'}):
+        response = serialization.cached_serialize('key', (recipe,), build)
+    assert response.mimetype == 'application/msgpack'
+    assert response.headers['Vary'] == 'Accept'
+    assert packing.unpackb(response.get_data()) == {'recipe': recipe}
+    assert build.call_count == 2
+
+
+def test_cached_serialize_without_cache():
+    app = Flask(__name__)
+    app.config['WTF_RESPONSE_CACHE_SIZE'] = 0
+    serialization.init_app(app)
+    build = Mock(return_value={})
+    for _ in range(2):
+        with app.test_request_context():
+            serialization.cached_serialize('key', (), build)
+    assert build.call_count == 2
+
+
+def test_cache_entry_is_current():
+    source = {}
+    entry = serialization.CacheEntry((source,), b'{}')
+    assert entry.is_current((source,))
+    assert not entry.is_current(({},))
+    assert not entry.is_current((source, source))
@@ -0,0 +1,81 @@
+'''
+wtf.api.server_timing
+
+Reports how long each stage of a request took (see wtf.core.timing), e.g.
+
+    Server-Timing: parse;dur=0.021, generate_grade;dur=0.094, find;dur=0.002,
+        validate;dur=0.031, save;dur=0.040, transform;dur=0.027,
+        serialize;dur=0.012, total;dur=0.412
+
+Durations are in milliseconds. With WTF_SERVER_TIMING set to:
+  * off (default): stages are not timed, at no cost
+  * header: stages are timed for requests with an `X-Server-Timing: 1` header
+  * on: stages are timed for every request
+
+Timed requests are also logged, as a JSON object, at the INFO level of the
+    `wtf.timing` logger.
+'''
+import json
+import logging
+from flask import request
+from wtf.core import timing
+
+
+MODES = ['off', 'header', 'on']
+REQUEST_HEADER = 'X-Server-Timing'
+LOGGER = logging.getLogger('wtf.timing')
+
+
+def header_value(stages, total):
+    '''Format the durations (in seconds) of a request's stages as a Server-Timing header.'''
+    metrics = ['%s;dur=%.3f' % (name, seconds * 1e3) for name, seconds in stages.items()]
+    metrics.append('total;dur=%.3f' % (total * 1e3))
+    return ', '.join(metrics)
+
+
+def log(response, stages, total):
+    '''Log the durations of a request's stages.'''
+    endpoint = request.endpoint
+    LOGGER.info('%s', json.dumps({
+        'method': request.method,
+        'path': request.path,
+        'route': endpoint.rpartition('.')[2] if endpoint else 'unmatched',
+        'status': response.status_code,
+        'total_ms': round(total * 1e3, 3),
+        'stages_ms': {name: round(seconds * 1e3, 3) for name, seconds in stages.items()}
+    }, sort_keys=True))
+
+
+def init_app(app):
+    '''Set up Server-Timing for an app.
+
+    Raises a ValueError if WTF_SERVER_TIMING is not one of MODES.
+    '''
+    mode = app.config.get('WTF_SERVER_TIMING', 'off')
+    if mode not in MODES:
+        raise ValueError('Invalid WTF_SERVER_TIMING: %s' % mode)
+    if mode == 'off':
+        return
+    timing.instrument()
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        if mode == 'header' and request.headers.get(REQUEST_HEADER) != '1':
+            return dispatch()
+        # the request may already be timed (see wtf.api.slow_requests)
+        timer = timing.current()
+        owned = timer is None
+        if owned:
+            timer = timing.start()
+        try:
+            response = dispatch()
+        finally:
+            if owned:
+                timing.stop()
+        total = timer.elapsed()
+        response.headers['Server-Timing'] = header_value(timer.stages, total)
+        if LOGGER.isEnabledFor(logging.INFO):
+            log(response, timer.stages, total)
+        return response
+
+    app.full_dispatch_request = full_dispatch_request
@@ -0,0 +1,71 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import json
+import logging
+import pytest
+from mock import patch
+from wtf.api import server_timing
+from wtf.api.app import create_app
+from wtf.core import timing
+
+
+@pytest.fixture(autouse=True)
+def uninstrument():
+    yield
+    timing.uninstrument()
+
+
+def client(mode):
+    return create_app(prefix='', config={'WTF_SERVER_TIMING': mode}).test_client()
+
+
+def stages(response):
+    return [metric.split(';')[0] for metric in response.headers['Server-Timing'].split(', ')]
+
+
+def test_header_value():
+    assert server_timing.header_value({'parse': 0.0001234, 'save': 0.002}, 0.01) == (
+        'parse;dur=0.123, save;dur=2.000, total;dur=10.000')
+
+
+@patch('wtf.core.weapons.REPO', {'by_id': {}})
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_on(caplog):
+    c = client('on')
+    recipe = c.post('/weapon-recipes', json={
+        'name': 'Foo', 'description': 'Bar', 'type': 'sword', 'handedness': 1,
+        'weight': {'center': 10, 'radius': 1},
+        'damage': {
+            'min': {'center': 10, 'radius': 1},
+            'max': {'center': 20, 'radius': 1}
+        }
+    }).get_json()['recipe']
+    with caplog.at_level(logging.INFO, logger='wtf.timing'):
+        response = c.post('/weapons', json={'recipe': recipe['id']})
+    assert response.status_code == 201
+    assert stages(response) == [
+        'parse', 'generate_grade', 'find', 'validate', 'save', 'transform', 'serialize', 'total']
+    entry = json.loads(caplog.records[-1].getMessage())
+    assert entry['route'] == 'create_weapon'
+    assert entry['status'] == 201
+    assert set(entry['stages_ms']) == set(stages(response)[:-1])
+    assert stages(c.get('/weapons/foo')) == ['find', 'serialize', 'total']
+    assert stages(c.get('/health')) == ['total']
+
+
+def test_header():
+    c = client('header')
+    assert 'Server-Timing' not in c.get('/health').headers
+    response = c.get('/health', headers={server_timing.REQUEST_HEADER: '1'})
+    assert stages(response) == ['total']
+
+
+def test_off():
+    c = client('off')
+    assert not timing.is_instrumented()
+    response = c.get('/health', headers={server_timing.REQUEST_HEADER: '1'})
+    assert 'Server-Timing' not in response.headers
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        client('sometimes')
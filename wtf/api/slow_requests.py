@@ -0,0 +1,200 @@
+'''
+wtf.api.slow_requests
+
+Logs requests that take at least WTF_SLOW_REQUEST_THRESHOLD seconds, one JSON
+    object per line, with:
+  * the route, method, path, status and duration
+  * the parameters: path and query parameters, and the body's fields, with
+    secrets (e.g. passwords) redacted
+  * the time spent in each stage of the request (see wtf.core.timing)
+  * the request's stack when it crossed the threshold, captured by a
+    watchdog thread while the request was still running (null if the request
+    finished before the watchdog looked at it)
+
+The log is a file (WTF_SLOW_REQUEST_LOG) rotated once it reaches
+    WTF_SLOW_REQUEST_LOG_SIZE bytes, keeping WTF_SLOW_REQUEST_LOG_BACKUPS old
+    files. Worker processes of the production server don't coordinate
+    rotation: with several workers, put `{pid}` in the path to give each
+    worker its own log.
+
+Slow requests are also counted per route in the request metrics (see
+    wtf.api.metrics).
+'''
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import traceback
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from time import perf_counter, sleep
+from flask import request
+from wtf.api import serialization
+from wtf.core import timing
+from wtf.core.errors import ValidationError
+
+
+REDACTED = '[redacted]'
+SECRET_NAMES = ['password', 'secret', 'token']
+
+
+# pylint: disable=too-few-public-methods
+class InFlight(object):
+    '''A request being handled, and its stack once it has become slow.'''
+
+    __slots__ = ['started', 'stack', 'stack_ms']
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.stack = None
+        self.stack_ms = None
+
+
+# pylint: disable=too-many-instance-attributes
+class SlowRequestLog(object):
+    '''Watches the requests of a process and logs the slow ones.'''
+
+    def __init__(self, threshold, path, max_bytes=10485760, backups=5):
+        self.threshold = threshold
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.pid = None
+        self.logger = None
+
+    def start(self):
+        '''Record the start of a request by the current thread.'''
+        if self.pid != os.getpid():
+            self._start_process()
+        in_flight = self.requests[threading.get_ident()] = InFlight()
+        return in_flight
+
+    def finish(self):
+        '''Record the end of the current thread's request, returning its InFlight.'''
+        return self.requests.pop(threading.get_ident())
+
+    def _start_process(self):
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # first request of a (forked) process
+            self.pid = os.getpid()
+            self.logger = logging.Logger('wtf.slow_requests')
+            self.logger.propagate = False
+            handler = RotatingFileHandler(
+                self.path.replace('{pid}', str(self.pid)),
+                maxBytes=self.max_bytes, backupCount=self.backups, delay=True)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        interval = min(max(self.threshold / 2, 0.01), 1.0)
+        while True:
+            sleep(interval)
+            self.capture()
+
+    def capture(self):
+        '''Capture the stacks of the requests that have just become slow.'''
+        now = perf_counter()
+        frames = None
+        for ident, in_flight in list(self.requests.items()):
+            if in_flight.stack is not None or now - in_flight.started < self.threshold:
+                continue
+            if frames is None:
+                frames = sys._current_frames()  # pylint: disable=protected-access
+            frame = frames.get(ident)
+            if frame is not None:
+                in_flight.stack = [line.rstrip() for line in traceback.format_stack(frame)]
+                in_flight.stack_ms = round((now - in_flight.started) * 1e3, 3)
+
+    def log(self, values):
+        '''Write an entry to the log.'''
+        self.logger.info('%s', json.dumps(values, sort_keys=True, default=str))
+
+
+def redact(value):
+    '''Redact the values of secret fields (e.g. passwords), recursively.'''
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if _is_secret(key) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def _is_secret(name):
+    name = str(name).lower()
+    return any(secret in name for secret in SECRET_NAMES)
+
+
+def parameters():
+    '''Get the current request's path and query parameters, and body fields.'''
+    params = dict(request.view_args or {})
+    params.update(request.args.to_dict())
+    if request.content_length:
+        try:
+            body = serialization.get_body()
+        except ValidationError:
+            body = None
+        if isinstance(body, dict):
+            params.update(body)
+    return redact(params)
+
+
+def entry(in_flight, stages, status, seconds):
+    '''Describe the current request as a slow request log entry.'''
+    endpoint = request.endpoint
+    return {
+        'time': datetime.utcnow().isoformat() + 'Z',
+        'pid': os.getpid(),
+        'route': endpoint.rpartition('.')[2] if endpoint else 'unmatched',
+        'method': request.method,
+        'path': request.path,
+        'status': status,
+        'duration_ms': round(seconds * 1e3, 3),
+        'params': parameters(),
+        'stages_ms': {name: round(value * 1e3, 3) for name, value in stages.items()},
+        'stack': in_flight.stack,
+        'stack_ms': in_flight.stack_ms
+    }
+
+
+def init_app(app):
+    '''Set up the slow request log for an app.'''
+    threshold = app.config.get('WTF_SLOW_REQUEST_THRESHOLD', 0.0)
+    if not threshold:
+        app.extensions['wtf.slow_requests'] = None
+        return
+    log = app.extensions['wtf.slow_requests'] = SlowRequestLog(
+        threshold,
+        app.config.get('WTF_SLOW_REQUEST_LOG') or os.path.join(
+            tempfile.gettempdir(), 'wtf-slow-requests.log'),
+        app.config.get('WTF_SLOW_REQUEST_LOG_SIZE', 10485760),
+        app.config.get('WTF_SLOW_REQUEST_LOG_BACKUPS', 5)
+    )
+    timing.instrument()
+    dispatch = app.full_dispatch_request
+
+    def full_dispatch_request():
+        in_flight = log.start()
+        timer = timing.start()
+        status = 500
+        try:
+            response = dispatch()
+            status = response.status_code
+            return response
+        finally:
+            timing.stop()
+            log.finish()
+            seconds = perf_counter() - in_flight.started
+            if seconds >= threshold:
+                log.log(entry(in_flight, timer.stages, status, seconds))
+
+    app.full_dispatch_request = full_dispatch_request
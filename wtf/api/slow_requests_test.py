@@ -0,0 +1,76 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name,unused-argument
+import json
+from time import sleep
+import pytest
+from mock import patch
+from wtf.api import slow_requests
+from wtf.api.app import create_app
+from wtf.core import timing
+
+
+@pytest.fixture(autouse=True)
+def uninstrument():
+    yield
+    timing.uninstrument()
+
+
+def slow_save(account):
+    sleep(0.3)
+    return dict(account, id='foo')
+
+
+def read_log(path):
+    return [json.loads(line) for line in path.read().splitlines()]
+
+
+@patch('wtf.core.accounts.REPO', {'by_id': {}, 'by_email': {}})
+def test_app(tmpdir):
+    path = tmpdir.join('slow.log')
+    app = create_app(prefix='', config={
+        'WTF_SLOW_REQUEST_THRESHOLD': 0.1, 'WTF_SLOW_REQUEST_LOG': str(path),
+        'WTF_SERVER_TIMING': 'on'
+    })
+    client = app.test_client()
+    assert client.get('/health').status_code == 200
+    with patch('wtf.core.accounts.save', side_effect=slow_save):
+        response = client.post('/accounts?source=foo', json={
+            'email': 'foo@bar.com', 'password': 'bar'})
+    assert response.status_code == 201
+    [entry] = read_log(path)
+    assert entry['route'] == 'create_account'
+    assert entry['method'] == 'POST'
+    assert entry['path'] == '/accounts'
+    assert entry['status'] == 201
+    assert entry['duration_ms'] >= 300
+    assert entry['params'] == {'email': 'foo@bar.com', 'password': '[redacted]', 'source': 'foo'}
+    assert set(entry['stages_ms']) >= {'parse', 'hash', 'transform', 'serialize'}
+    assert 'hash' in response.headers['Server-Timing']
+    assert any('in slow_save' in line for line in entry['stack'])
+    assert 100 <= entry['stack_ms'] < 300
+    assert not app.extensions['wtf.slow_requests'].requests
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'wtf_http_slow_requests_total{route="create_account",method="POST"} 1' in metrics
+
+
+def test_rotation(tmpdir):
+    log = slow_requests.SlowRequestLog(
+        1.0, str(tmpdir.join('slow-{pid}.log')), max_bytes=100, backups=2)
+    log.start()
+    for i in range(10):
+        log.log({'foo': 'x' * 50, 'i': i})
+    log.finish()
+    assert len(tmpdir.listdir()) == 3
+    [latest] = [path for path in tmpdir.listdir() if path.ext == '.log']
+    assert read_log(latest) == [{'foo': 'x' * 50, 'i': 9}]
+
+
+def test_redact():
+    assert slow_requests.redact({
+        'name': 'foo', 'Password': 'bar', 'items': [{'api_token': 'baz'}], 'n': 1
+    }) == {'name': 'foo', 'Password': '[redacted]', 'items': [{'api_token': '[redacted]'}], 'n': 1}
+
+
+def test_disabled():
+    app = create_app(prefix='')
+    assert app.extensions['wtf.slow_requests'] is None
+    assert not timing.is_instrumented()
@@ -5,16 +5,25 @@ The War Torn Faith bundled app.
 '''
 from flask import Flask
 from werkzeug.wsgi import DispatcherMiddleware
+from wtf import compression, config as wtf_config
 from wtf.api import API_PREFIX
 from wtf.api.app import create_app as create_api_app
 from wtf.web.app import create_app as create_web_app
 
 
-def create_app():
-    '''Create the bundled Werkzeug application'''
+def create_app(config=None, catalog=None):
+    '''Create the bundled Werkzeug application
+
+    The recipes of a catalog file or snapshot (see wtf.core.catalog) are
+        loaded if a `catalog` path is given.
+    '''
     app = Flask(__name__)
-    app.wsgi_app = DispatcherMiddleware(
-        create_web_app(),
-        {API_PREFIX: create_api_app(prefix='')}
+    app.config.update(wtf_config.load(config))
+    app.wsgi_app = compression.create_middleware(
+        DispatcherMiddleware(
+            create_web_app(),
+            {API_PREFIX: create_api_app(prefix='', config=config, catalog=catalog)}
+        ),
+        app.config
     )
     return app
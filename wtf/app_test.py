@@ -1,4 +1,6 @@
 # pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import gzip
+import json
 from flask import Flask
 from wtf.app import create_app
 
@@ -6,3 +8,33 @@ from wtf.app import create_app
 def test_create_app():
     app = create_app()
     assert isinstance(app, Flask)
+
+
+def test_create_app_compression():
+    app = create_app({'WTF_COMPRESSION_MIN_SIZE': 0})
+    client = app.test_client()
+    response = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == b'Healthy'
+
+
+def test_create_app_compression_disabled():
+    app = create_app({'WTF_COMPRESSION': False, 'WTF_COMPRESSION_MIN_SIZE': 0})
+    client = app.test_client()
+    response = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_create_app_realms_catalog(tmpdir):
+    path = tmpdir.join('catalog.json')
+    path.write(json.dumps({'weapon-recipes': [{
+        'id': 'app-sword', 'name': 'Sword', 'description': 'A sword.',
+        'weight': {'center': 12, 'radius': 3}, 'type': 'sword',
+        'damage': {'min': {'center': 50, 'radius': 10}, 'max': {'center': 100, 'radius': 10}}
+    }]}))
+    app = create_app({'WTF_REALMS': 'app-eu,app-us'}, catalog=str(path))
+    client = app.test_client()
+    for host in ['app-eu', 'app-us']:
+        response = client.get('/api/weapon-recipes/app-sword',
+                              base_url='http://%s.example.com/' % host)
+        assert response.status_code == 200
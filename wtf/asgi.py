@@ -0,0 +1,432 @@
+'''
+wtf.asgi
+
+Serves the (WSGI) apps from an asyncio event loop, so that a process can hold
+    thousands of concurrent connections instead of one per thread:
+  * to_asgi(app): an ASGI (https://asgi.readthedocs.io) application that calls
+    a WSGI app, e.g. the bundled app with the same routes and error handlers
+  * AsyncWorker: an HTTP/1.1 server running an ASGI application on an event
+    loop, i.e. `python -m wtf serve --worker-class asyncio`
+
+Connections, including idle keep-alive connections and slow clients sending
+    request bodies or reading responses, are handled by the event loop. Only
+    complete requests are handed to a pool of threads (--threads), which runs
+    the handlers (and their CPU-heavy work, e.g. password hashing and item
+    generation) off the event loop.
+
+Errors raised by the app are logged and answered with a 500, unless the
+    response has started, in which case its connection is closed.
+
+The ASGI application can also be run with any ASGI server:
+
+    $ uvicorn --factory wtf.asgi:create_app
+'''
+import asyncio
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from io import BytesIO
+from urllib.parse import unquote
+from werkzeug._internal import _log
+from wtf.app import create_app as create_wsgi_app
+
+
+MAX_HEADER_SIZE = 65536
+INTERNAL_ERROR = b'Internal server error'
+
+
+# pylint: disable=too-few-public-methods
+class ASGIAdapter(object):
+    '''An ASGI application that calls a WSGI app in a pool of threads.'''
+
+    def __init__(self, app, executor=None):
+        self.app = app
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await _lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported scope type: %s' % scope['type'])
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body', False):
+                break
+        loop = asyncio.get_event_loop()
+        environ = to_environ(scope, bytes(body))
+        try:
+            status, headers, iterable, first = await loop.run_in_executor(
+                self.executor, self._start, environ)
+        except Exception:  # pylint: disable=broad-except
+            _log('error', 'Error on request:\n%s', traceback.format_exc())
+            status, headers, iterable, first = 500, [
+                (b'content-type', b'text/plain'),
+                (b'content-length', str(len(INTERNAL_ERROR)).encode('latin-1'))
+            ], None, INTERNAL_ERROR
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers
+        })
+        if iterable is None:
+            await send({'type': 'http.response.body', 'body': first})
+            return
+        try:
+            chunk = first
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.executor, next, iterable, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                await loop.run_in_executor(self.executor, iterable.close)
+
+    def _start(self, environ):
+        '''Call the app, up to the first chunk of the response body.'''
+        response = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response[:] = [int(status.split(' ', 1)[0]), [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]]
+            return _write_unsupported
+
+        iterable = self.app(environ, start_response)
+        iterator = iter(iterable)
+        first = next(iterator, None)
+        status, headers = response[0], response[1]
+        length = _content_length(headers)
+        if first is None or (length is not None and len(first) >= length):
+            # the whole body is known: close the response right away, saving
+            #   the event loop two trips to the pool of threads
+            if hasattr(iterable, 'close'):
+                iterable.close()
+            return status, headers, None, first or b''
+        if iterator is not iterable:
+            iterable = _Chain(iterable, iterator)
+        return status, headers, iterable, first
+
+
+class _Chain(object):
+    '''The iterator of a WSGI response, which closes the response.'''
+
+    def __init__(self, iterable, iterator):
+        self.iterable = iterable
+        self.iterator = iterator
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.iterator)
+
+    def close(self):
+        '''Close the response.'''
+        if hasattr(self.iterable, 'close'):
+            self.iterable.close()
+
+
+def _write_unsupported(_):
+    raise NotImplementedError('The write() callable of WSGI is not supported')
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def _content_length(headers):
+    for name, value in headers:
+        if name == b'content-length':
+            return int(value)
+    return None
+
+
+def to_environ(scope, body):
+    '''Create the WSGI environ of an ASGI HTTP request.'''
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = 'HTTP_%s' % name
+        environ[key] = '%s,%s' % (environ[key], value) if key in environ else value
+    if body and 'CONTENT_LENGTH' not in environ:
+        environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+def to_asgi(app, threads=None):
+    '''Create an ASGI application that calls a WSGI app in a pool of threads.'''
+    return ASGIAdapter(app, ThreadPoolExecutor(max_workers=threads))
+
+
+def create_app(config=None):
+    '''Create the bundled ASGI application.'''
+    return to_asgi(create_wsgi_app(config))
+
+
+class BadRequest(Exception):
+    '''Represents a request that cannot be parsed.'''
+
+    def __init__(self, status, message):
+        super(BadRequest, self).__init__(message)
+        self.status = status
+
+
+# pylint: disable=too-many-instance-attributes
+class AsyncWorker(object):
+    '''An HTTP/1.1 server running an app on an event loop, on an inherited socket.
+
+    `app` is a WSGI app, called in a pool of `threads` threads. The server
+        stops after `max_requests` requests (if set). Keep-alive connections
+        are closed after `keepalive` idle seconds.
+    '''
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, app, listener, threads=8, max_requests=0, keepalive=5.0):
+        self.app = to_asgi(app, threads)
+        self.listener = listener
+        self.max_requests = max_requests
+        self.keepalive = keepalive
+        self.requests = 0
+        self.loop = None
+        self.stopping = False
+        self.stopped = None
+        self.connections = set()
+        self.idle = set()
+
+    def serve(self):
+        '''Handle connections until stopped, then finish the requests in progress.'''
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._serve())
+        finally:
+            self.app.executor.shutdown(wait=True)
+            self.loop.close()
+
+    def stop(self):
+        '''Stop accepting connections (from any thread, or a signal handler).'''
+        self.stopping = True
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._stop)
+
+    def _stop(self):
+        if self.stopped is not None:
+            self.stopped.set()
+
+    async def _serve(self):
+        self.stopped = asyncio.Event()
+        if self.stopping:
+            # stopped before the event loop was running
+            self.stopped.set()
+        server = await asyncio.start_server(
+            self._connected, sock=self.listener, limit=MAX_HEADER_SIZE)
+        await self.stopped.wait()
+        server.close()
+        await server.wait_closed()
+        for writer in list(self.idle):
+            writer.close()
+        if self.connections:
+            await asyncio.wait(list(self.connections))
+
+    def _connected(self, reader, writer):
+        task = self.loop.create_task(self._handle(reader, writer))
+        self.connections.add(task)
+        task.add_done_callback(self.connections.discard)
+
+    async def _handle(self, reader, writer):
+        try:
+            while not self.stopped.is_set():
+                self.idle.add(writer)
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keepalive)
+                except asyncio.LimitOverrunError:
+                    await _send_error(writer, 431, 'Request header fields too large')
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError,
+                        ConnectionError, OSError):
+                    break
+                finally:
+                    self.idle.discard(writer)
+                self.requests += 1
+                if self.max_requests and self.requests >= self.max_requests:
+                    self.stopped.set()
+                try:
+                    keep_alive = await self._handle_request(head, reader, writer)
+                except BadRequest as error:
+                    await _send_error(writer, error.status, str(error))
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _handle_request(self, head, reader, writer):
+        '''Handle a request, returning whether to keep the connection alive.'''
+        scope = _parse_head(head, writer)
+        headers = dict(scope['headers'])
+        if b'transfer-encoding' in headers:
+            raise BadRequest(411, 'Chunked request bodies are not supported')
+        try:
+            length = int(headers.get(b'content-length', b'0'))
+        except ValueError:
+            raise BadRequest(400, 'Invalid Content-Length')
+        body = await reader.readexactly(length) if length > 0 else b''
+        connection = headers.get(b'connection', b'').lower()
+        keep_alive = (connection != b'close') if scope['http_version'] == '1.1' \
+            else connection == b'keep-alive'
+        response = _Response(writer, scope, keep_alive and not self.stopped.is_set())
+        received = []
+
+        async def receive():
+            if received:
+                return {'type': 'http.disconnect'}
+            received.append(True)
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        try:
+            await self.app(scope, receive, response.send)
+        except Exception:  # pylint: disable=broad-except
+            _log('error', 'Error on request:\n%s', traceback.format_exc())
+            if response.status is None:
+                await _send_error(writer, 500, INTERNAL_ERROR.decode('latin-1'))
+            return False
+        _log('info', '%s - - [%s] "%s" %d -', scope['client'][0],
+             datetime.now().strftime('%d/%b/%Y %H:%M:%S'),
+             head.split(b'\r\n', 1)[0].decode('latin-1'), response.status or 0)
+        return response.keep_alive
+
+
+def _parse_head(head, writer):
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise BadRequest(400, 'Invalid request line')
+    if version not in ('HTTP/1.0', 'HTTP/1.1'):
+        raise BadRequest(505, 'HTTP version not supported')
+    path, _, query = target.partition('?')
+    headers = []
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers.append((name.strip().lower().encode('latin-1'),
+                            value.strip().encode('latin-1')))
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': version[5:],
+        'method': method,
+        'scheme': 'http',
+        'path': unquote(path),
+        'raw_path': path.encode('latin-1'),
+        'query_string': query.encode('latin-1'),
+        'root_path': '',
+        'headers': headers,
+        'client': writer.get_extra_info('peername')[:2],
+        'server': writer.get_extra_info('sockname')[:2]
+    }
+
+
+# pylint: disable=too-few-public-methods
+class _Response(object):
+    '''The response to a request, written as the app sends it.'''
+
+    def __init__(self, writer, scope, keep_alive):
+        self.writer = writer
+        self.http_version = scope['http_version']
+        self.head = scope['method'] == 'HEAD'
+        self.keep_alive = keep_alive
+        self.status = None
+        self.chunked = False
+
+    async def send(self, message):
+        '''Send an ASGI message.'''
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+            headers = [(name, value) for name, value in message.get('headers', [])
+                       if name != b'connection']
+            names = {name for name, _ in headers}
+            if b'content-length' not in names and not self.head:
+                if self.http_version == '1.1':
+                    self.chunked = True
+                    headers.append((b'transfer-encoding', b'chunked'))
+                else:
+                    self.keep_alive = False
+            headers.append((b'connection', b'keep-alive' if self.keep_alive else b'close'))
+            self.writer.write(b''.join(
+                [_status_line(self.status)] +
+                [b'%s: %s\r\n' % (name, value) for name, value in headers] +
+                [b'\r\n']
+            ))
+        elif message['type'] == 'http.response.body':
+            body = b'' if self.head else message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if self.chunked:
+                if body:
+                    self.writer.write(b'%x\r\n%s\r\n' % (len(body), body))
+                if not more_body:
+                    self.writer.write(b'0\r\n\r\n')
+            elif body:
+                self.writer.write(body)
+            await self.writer.drain()
+
+
+def _status_line(status):
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ''
+    return ('HTTP/1.1 %d %s\r\n' % (status, reason)).encode('latin-1')
+
+
+async def _send_error(writer, status, message):
+    body = message.encode('utf-8')
+    writer.write(_status_line(status) + (
+        'Content-Type: text/plain\r\nContent-Length: %d\r\nConnection: close\r\n\r\n' % len(body)
+    ).encode('latin-1') + body)
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
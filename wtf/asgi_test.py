@@ -0,0 +1,245 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import asyncio
+import json
+import socket
+import threading
+from http.client import HTTPConnection, IncompleteRead
+import pytest
+from mock import patch
+from wtf import asgi, server
+from wtf.api.app import create_app
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def call(app, scope, body=b''):
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    run(app(scope, receive, send))
+    return sent
+
+
+def scope(method, path, headers=None, query_string=b''):
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': headers or [],
+        'client': ('127.0.0.1', 1234),
+        'server': ('localhost', 5000)
+    }
+
+
+def test_to_environ():
+    environ = asgi.to_environ(scope('POST', '/café', [
+        (b'content-type', b'application/json'),
+        (b'content-length', b'2'),
+        (b'accept', b'text/plain'),
+        (b'accept', b'application/json')
+    ], b'a=1'), b'{}')
+    assert environ['REQUEST_METHOD'] == 'POST'
+    assert environ['PATH_INFO'] == '/café'.encode('utf-8').decode('latin-1')
+    assert environ['QUERY_STRING'] == 'a=1'
+    assert environ['CONTENT_TYPE'] == 'application/json'
+    assert environ['CONTENT_LENGTH'] == '2'
+    assert environ['HTTP_ACCEPT'] == 'text/plain,application/json'
+    assert environ['SERVER_PORT'] == '5000'
+    assert environ['wsgi.input'].read() == b'{}'
+
+
+@patch('wtf.core.accounts.REPO', {'by_id': {}, 'by_email': {}})
+def test_adapter():
+    app = asgi.to_asgi(create_app(prefix=''))
+    sent = call(app, scope('POST', '/accounts', [(b'content-type', b'application/json')]),
+                json.dumps({'email': 'foo@example.com', 'password': 'bar'}).encode('utf-8'))
+    assert sent[0]['type'] == 'http.response.start'
+    assert sent[0]['status'] == 201
+    assert (b'content-type', b'application/json') in sent[0]['headers']
+    assert json.loads(sent[1]['body'].decode('utf-8'))['account']['email'] == 'foo@example.com'
+    assert not sent[1].get('more_body')
+    sent = call(app, scope('GET', '/accounts/foo'))
+    assert sent[0]['status'] == 404
+    assert json.loads(sent[1]['body'].decode('utf-8')) == {'errors': ['Account not found']}
+
+
+def test_adapter_streaming():
+    def wsgi_app(_, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        yield b'foo'
+        yield b''
+        yield b'bar'
+    sent = call(asgi.to_asgi(wsgi_app), scope('GET', '/'))
+    assert [m.get('body') for m in sent[1:]] == [b'foo', b'bar', b'']
+    assert [m.get('more_body', False) for m in sent[1:]] == [True, True, False]
+
+
+def failing_app(environ, start_response):
+    if environ['PATH_INFO'] == '/stream':
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return (b'foo' if i == 0 else 1 / 0 for i in range(2))
+    raise ValueError('foo')
+
+
+def test_adapter_error():
+    with patch('wtf.asgi._log') as log:
+        sent = call(asgi.to_asgi(failing_app), scope('GET', '/'))
+    assert sent[0]['status'] == 500
+    assert sent[1]['body'] == asgi.INTERNAL_ERROR
+    assert 'ValueError: foo' in log.call_args[0][2]
+    with pytest.raises(ZeroDivisionError):
+        call(asgi.to_asgi(failing_app), scope('GET', '/stream'))
+
+
+def test_adapter_lifespan():
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    run(asgi.to_asgi(None)({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+
+@pytest.fixture
+def worker():
+    listener = server.create_listener('127.0.0.1', 0)
+    worker = asgi.AsyncWorker(create_app(prefix=''), listener, threads=2, keepalive=5)
+    thread = threading.Thread(target=worker.serve, daemon=True)
+    thread.start()
+    yield worker
+    worker.stop()
+    thread.join(10)
+    listener.close()
+    assert not thread.is_alive()
+
+
+def connect(worker):
+    return HTTPConnection('127.0.0.1', worker.listener.getsockname()[1], timeout=10)
+
+
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_worker(worker):
+    connection = connect(worker)
+    connection.request('GET', '/health')
+    response = connection.getresponse()
+    assert response.status == 200
+    assert response.read() == b'Healthy'
+    # the connection is kept alive
+    connection.request('POST', '/weapon-recipes', body=json.dumps({'name': 'Foo'}),
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    assert response.status == 400
+    assert b'Missing required field: description' in response.read()
+    connection.request('GET', '/export/weapon-recipes')
+    response = connection.getresponse()
+    assert response.getheader('Transfer-Encoding') == 'chunked'
+    assert response.read() == b''
+    connection.request('HEAD', '/health')
+    response = connection.getresponse()
+    assert response.status == 200
+    assert response.read() == b''
+    connection.request('GET', '/health', headers={'Connection': 'close'})
+    response = connection.getresponse()
+    assert response.getheader('Connection') == 'close'
+    assert response.read() == b'Healthy'
+    connection.close()
+    assert worker.requests == 5
+
+
+@pytest.mark.parametrize('request_bytes,status', [
+    (b'GARBAGE\r\n\r\n', 400),
+    (b'GET / HTTP/2.0\r\n\r\n', 505),
+    (b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n', 411),
+    (b'POST / HTTP/1.1\r\nContent-Length: foo\r\n\r\n', 400)
+])
+def test_worker_bad_request(worker, request_bytes, status):
+    client = socket.create_connection(('127.0.0.1', worker.listener.getsockname()[1]), 10)
+    try:
+        client.sendall(request_bytes)
+        assert client.recv(1024).startswith(b'HTTP/1.1 %d ' % status)
+    finally:
+        client.close()
+
+
+def test_worker_error():
+    listener = server.create_listener('127.0.0.1', 0)
+    worker = asgi.AsyncWorker(failing_app, listener, threads=2)
+    thread = threading.Thread(target=worker.serve, daemon=True)
+    thread.start()
+    try:
+        with patch('wtf.asgi._log') as log:
+            connection = connect(worker)
+            connection.request('GET', '/')
+            response = connection.getresponse()
+            assert response.status == 500
+            assert response.read() == asgi.INTERNAL_ERROR
+            # the response had started: the connection is closed
+            connection.request('GET', '/stream')
+            response = connection.getresponse()
+            assert response.status == 200
+            with pytest.raises(IncompleteRead):
+                response.read()
+            connection.close()
+        assert 'ZeroDivisionError' in log.call_args_list[-1][0][2]
+    finally:
+        worker.stop()
+        thread.join(10)
+        listener.close()
+
+
+def test_worker_stop(worker):
+    idle = connect(worker)
+    idle.request('GET', '/health')
+    idle.getresponse().read()
+    worker.stop()
+    # idle keep-alive connections are closed
+    assert idle.sock.recv(1) == b''
+    idle.close()
+
+
+def test_worker_max_requests():
+    listener = server.create_listener('127.0.0.1', 0)
+    worker = asgi.AsyncWorker(create_app(prefix=''), listener, threads=2, max_requests=2)
+    thread = threading.Thread(target=worker.serve, daemon=True)
+    thread.start()
+    try:
+        connection = connect(worker)
+        for _ in range(2):
+            connection.request('GET', '/health')
+            response = connection.getresponse()
+            assert response.read() == b'Healthy'
+        assert response.getheader('Connection') == 'close'
+        thread.join(10)
+        assert not thread.is_alive()
+    finally:
+        listener.close()
+
+
+def test_worker_stopped_before_serve():
+    listener = server.create_listener('127.0.0.1', 0)
+    try:
+        worker = asgi.AsyncWorker(create_app(prefix=''), listener)
+        worker.stop()
+        worker.serve()
+        assert worker.requests == 0
+    finally:
+        listener.close()
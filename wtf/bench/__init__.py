@@ -0,0 +1,7 @@
+'''
+wtf.bench
+
+War Torn Faith performance benchmarks. Run a benchmark with:
+
+    $ python -m wtf.bench <name>
+'''
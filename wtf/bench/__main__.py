@@ -0,0 +1,16 @@
+'''
+wtf.bench.__main__
+
+Runs a benchmark by name, i.e. `python -m wtf.bench compression`.
+'''
+import sys
+from importlib import import_module
+
+
+BENCHMARKS = ['boot', 'coalescing', 'codecs', 'compression', 'connections', 'core', 'export',
+              'load', 'loader', 'memory', 'metrics', 'rate_limiting', 'realms', 'responses',
+              'serve', 'server_timing', 'validation']
+
+if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+    sys.exit('usage: python -m wtf.bench {%s}' % ','.join(BENCHMARKS))
+print(import_module('wtf.bench.%s' % sys.argv[1]).main(sys.argv[2:]))
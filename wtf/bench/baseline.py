@@ -0,0 +1,51 @@
+'''
+wtf.bench.baseline
+
+Stores benchmark results as a baseline (a JSON file mapping each benchmark to
+    its seconds per call), and compares later results to it, so that
+    regressions can fail a build.
+'''
+import json
+
+
+def load(path):
+    '''Load baseline results from a file.'''
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['results']
+
+
+def save(path, results):
+    '''Save results as a baseline.'''
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'results': results}, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def compare(results, baseline, tolerance=0.25):
+    '''Compare results to a baseline, returning a row per benchmark.
+
+    A benchmark regressed if it is more than `tolerance` (a fraction, e.g. 0.25
+        for 25%) slower than its baseline. Benchmarks missing from the
+        baseline are new.
+    '''
+    rows = []
+    for name, seconds in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            change, status = None, 'new'
+        else:
+            change = (seconds - before) / before
+            status = 'regressed' if change > tolerance else 'ok'
+        rows.append({
+            'benchmark': name,
+            'us/call': seconds * 1e6,
+            'baseline us/call': None if before is None else before * 1e6,
+            'change %': None if change is None else change * 100,
+            'status': status
+        })
+    return rows
+
+
+def regressions(rows):
+    '''Get the names of the benchmarks that regressed (see compare()).'''
+    return [row['benchmark'] for row in rows if row['status'] == 'regressed']
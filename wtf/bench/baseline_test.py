@@ -0,0 +1,22 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from wtf.bench import baseline
+
+
+def test_save_load(tmpdir):
+    path = str(tmpdir.join('baseline.json'))
+    baseline.save(path, {'foo': 0.5, 'bar': 1e-6})
+    assert baseline.load(path) == {'foo': 0.5, 'bar': 1e-6}
+
+
+def test_compare():
+    rows = baseline.compare(
+        {'foo': 1.2e-6, 'bar': 1.3e-6, 'baz': 1e-6, 'quux': 2e-6},
+        {'foo': 1e-6, 'bar': 1e-6, 'baz': 2e-6},
+        tolerance=0.25
+    )
+    statuses = {row['benchmark']: row['status'] for row in rows}
+    assert statuses == {'foo': 'ok', 'bar': 'regressed', 'baz': 'ok', 'quux': 'new'}
+    [regressed] = [row for row in rows if row['benchmark'] == 'bar']
+    assert round(regressed['change %']) == 30
+    assert round(regressed['baseline us/call'], 6) == 1
+    assert baseline.regressions(rows) == ['bar']
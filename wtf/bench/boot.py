@@ -0,0 +1,62 @@
+'''
+wtf.bench.boot
+
+Measures how long it takes to boot the API with a large recipe catalog, loaded
+    from its JSON file (validating every recipe) or from a snapshot (see
+    wtf.core.catalog), in a new realm (see wtf.core.realms) each time:
+
+    $ python -m wtf.bench boot [--recipes 100000]
+'''
+import argparse
+import json
+import os
+import tempfile
+from time import monotonic
+from wtf.api.app import create_app
+from wtf.bench.compression import create_catalog
+from wtf.bench.util import format_table
+from wtf.core import catalog, realms, weapons
+
+
+COLUMNS = ['catalog', 'recipes', 'MB', 'boot ms', 'recipes/ms']
+
+
+def run(recipes=100000):
+    '''Benchmark booting the API with a catalog file and with its snapshot.'''
+    directory = tempfile.mkdtemp(prefix='wtf-boot-')
+    paths = {
+        'json': os.path.join(directory, 'catalog.json'),
+        'snapshot': os.path.join(directory, 'catalog.snapshot')
+    }
+    try:
+        with open(paths['json'], 'w') as file:
+            json.dump({'weapon-recipes': json.loads(create_catalog(recipes))['recipes']}, file)
+        rows = []
+        for name in ['json', 'snapshot']:
+            with realms.using(realms.Realm('bench')):
+                start = monotonic()
+                create_app(catalog=paths[name])
+                elapsed = monotonic() - start
+                if name == 'json':
+                    catalog.write_snapshot(paths['snapshot'])
+                rows.append({
+                    'catalog': name,
+                    'recipes': len(weapons.REPO_RECIPES['by_id']),
+                    'MB': os.path.getsize(paths[name]) / 1e6,
+                    'boot ms': elapsed * 1e3,
+                    'recipes/ms': recipes / (elapsed * 1e3)
+                })
+        return rows
+    finally:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(directory)
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench boot')
+    parser.add_argument('--recipes', type=int, default=100000)
+    args = parser.parse_args(argv)
+    return format_table(run(args.recipes), COLUMNS)
@@ -0,0 +1,9 @@
+# pylint: disable=missing-docstring,invalid-name
+from wtf.bench import boot
+
+
+def test_main():
+    report = boot.main(['--recipes', '10'])
+    lines = report.splitlines()
+    assert 'boot ms' in lines[0]
+    assert [line.split()[:2] for line in lines[2:]] == [['json', '10'], ['snapshot', '10']]
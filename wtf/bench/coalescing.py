@@ -0,0 +1,57 @@
+'''
+wtf.bench.coalescing
+
+Measures concurrent identical lookups (hundreds of GETs of the same character,
+    stored in SQLite) with and without coalescing (see wtf.api.coalescing):
+
+    $ python -m wtf.bench coalescing [--requests 500] [--threads 100] [--rounds 5]
+'''
+import argparse
+from wtf.api.app import create_app
+from wtf.bench.util import format_table, percentile, sqlite_storage
+from wtf.core import accounts, characters
+from wtf.testing import ConcurrentTestClient
+
+
+COLUMNS = ['coalescing', 'requests', 'coalesced', 'requests/s', 'p50 ms', 'p99 ms']
+
+
+def run(requests=500, threads=100, rounds=5):
+    '''Benchmark batches of identical GET requests with coalescing on and off.'''
+    with sqlite_storage('wtf-coalescing-'):
+        account = accounts.save(accounts.create(email='foo@example.com', password='foo'))
+        character = characters.save(characters.create(account=account['id'], name='Foo'))
+        paths = ['characters/%s' % character['id']] * requests
+        rows = []
+        for enabled in [False, True]:
+            client = ConcurrentTestClient(
+                create_app(prefix='', config={'WTF_COALESCING': enabled}), threads)
+            client.get_many(paths[:threads])  # warm up the app
+            latencies, coalesced, elapsed = [], 0, 0.0
+            for _ in range(rounds):
+                result = client.get_many(paths)
+                result.assert_status_codes({200: requests})
+                latencies.extend(result.latencies())
+                coalesced += sum(
+                    1 for response in result if response.response.headers.get('X-Coalesced'))
+                elapsed += result.elapsed
+            latencies.sort()
+            rows.append({
+                'coalescing': 'on' if enabled else 'off',
+                'requests': requests * rounds,
+                'coalesced': coalesced,
+                'requests/s': requests * rounds / elapsed,
+                'p50 ms': percentile(latencies, 0.5) * 1e3,
+                'p99 ms': percentile(latencies, 0.99) * 1e3
+            })
+        return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench coalescing')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args(argv)
+    return format_table(run(args.requests, args.threads, args.rounds), COLUMNS)
@@ -0,0 +1,13 @@
+# pylint: disable=missing-docstring,invalid-name
+from wtf.bench import coalescing
+from wtf.core import characters
+
+
+def test_main():
+    repo = characters.REPO
+    report = coalescing.main(['--requests', '20', '--threads', '10', '--rounds', '1'])
+    lines = report.splitlines()
+    assert 'coalesced' in lines[0]
+    assert [line.split()[:2] for line in lines[2:]] == [['off', '20'], ['on', '20']]
+    assert lines[2].split()[2] == '0'
+    assert characters.REPO is repo
@@ -0,0 +1,74 @@
+'''
+wtf.bench.codecs
+
+Measures encode and decode time and payload size of characters and transformed
+    weapons, singly and in lists of 100, for each supported codec:
+
+    $ python -m wtf.bench codecs
+'''
+import argparse
+import json
+from uuid import uuid4
+from wtf.api import packing, serialization
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table, measure
+from wtf.core import characters, weapons
+
+
+COLUMNS = ['payload', 'codec', 'bytes', 'encode us', 'decode us']
+
+
+def create_payloads():
+    '''Create the payloads to encode.'''
+    recipe = dict(weapons.create_recipe(**RECIPE), id=str(uuid4()))
+    character_list = [
+        characters.create(id=str(uuid4()), account=str(uuid4()), name='Player %d' % i)
+        for i in range(100)
+    ]
+    weapon_list = [
+        weapons.transform_with_recipe(
+            dict(weapons.create(recipe=recipe['id']), id=str(uuid4())), recipe)
+        for _ in range(100)
+    ]
+    return [
+        ('character', {'character': character_list[0]}),
+        ('weapon', {'weapon': weapon_list[0]}),
+        ('100 characters', {'characters': character_list}),
+        ('100 weapons', {'weapons': weapon_list})
+    ]
+
+
+def create_codecs():
+    '''Create (name, encode, decode) tuples for each available codec.'''
+    codecs = [('json', serialization.json_dumps, json.loads)]
+    if serialization.orjson is not None:
+        # pylint: disable=no-member
+        codecs.append(('orjson', serialization.orjson_dumps, serialization.orjson.loads))
+    codecs.append(('msgpack (in-tree)', packing.py_packb, packing.py_unpackb))
+    if packing.msgpack is not None:
+        codecs.append(('msgpack', packing.packb, packing.unpackb))
+    return codecs
+
+
+def run(min_time=0.2):
+    '''Benchmark each codec on each payload.'''
+    rows = []
+    for payload, obj in create_payloads():
+        for codec, encode, decode in create_codecs():
+            data = encode(obj)
+            rows.append({
+                'payload': payload,
+                'codec': codec,
+                'bytes': len(data),
+                'encode us': measure(lambda e=encode, o=obj: e(o), min_time=min_time) * 1e6,
+                'decode us': measure(lambda d=decode, b=data: d(b), min_time=min_time) * 1e6
+            })
+    return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench codecs')
+    parser.add_argument('--min-time', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    return format_table(run(args.min_time), COLUMNS)
@@ -0,0 +1,9 @@
+# pylint: disable=missing-docstring,invalid-name
+from wtf.bench import codecs
+
+
+def test_main():
+    report = codecs.main(['--min-time', '0.001'])
+    assert '100 weapons' in report
+    assert 'msgpack (in-tree)' in report
+    assert 'decode us' in report
@@ -0,0 +1,129 @@
+'''
+wtf.bench.compression
+
+Measures the CPU cost of response compression against the bandwidth it saves,
+    for each available encoding and a few compression levels:
+
+    $ python -m wtf.bench compression [--sizes 1,100,1000] [--levels 1,6,9]
+'''
+import argparse
+import json
+from random import Random
+from uuid import UUID
+from wtf import compression
+from wtf.bench.util import format_table, measure
+from wtf.core import weapons
+
+
+COLUMNS = [
+    'payload', 'encoding', 'level', 'bytes', 'compressed', 'ratio',
+    'us/op', 'MB/s', 'KB saved/CPU ms'
+]
+MIDDLEWARE_COLUMNS = ['payload', 'cached', 'us/request']
+
+
+def create_catalog(size, seed=0):
+    '''Create a JSON-encoded catalog of `size` weapon recipes.'''
+    rand = Random(seed)
+    recipes = []
+    for i in range(size):
+        center = rand.randint(20, 200)
+        recipe = weapons.create_recipe(
+            name='Weapon %d' % i,
+            description='A %s forged in the fires of war.' % rand.choice(
+                weapons.WEAPON_TYPES),
+            weight=dict(center=rand.randint(5, 30), radius=rand.randint(1, 4)),
+            type=rand.choice(weapons.WEAPON_TYPES),
+            handedness=rand.choice([1, 2]),
+            damage=dict(
+                min=dict(center=center, radius=rand.randint(1, 10)),
+                max=dict(center=center * 2, radius=rand.randint(1, 10))
+            )
+        )
+        recipe['id'] = str(UUID(int=rand.getrandbits(128)))
+        recipes.append(recipe)
+    return json.dumps({'recipes': recipes}).encode()
+
+
+def run(sizes=(1, 100, 1000), levels=(1, 6, 9), min_time=0.1):
+    '''Benchmark each encoder/level against catalogs of the provided sizes.'''
+    rows = []
+    for size in sizes:
+        data = create_catalog(size)
+        for level in levels:
+            for encoder in compression.available_encoders(level):
+                compressed = encoder.compress(data)
+                seconds = measure(
+                    lambda e=encoder, d=data: e.compress(d),
+                    min_time=min_time
+                )
+                saved = len(data) - len(compressed)
+                rows.append({
+                    'payload': 'catalog-%d' % size,
+                    'encoding': encoder.name,
+                    'level': level,
+                    'bytes': len(data),
+                    'compressed': len(compressed),
+                    'ratio': len(data) / len(compressed),
+                    'us/op': seconds * 1e6,
+                    'MB/s': len(data) / seconds / 1e6,
+                    'KB saved/CPU ms': saved / 1024.0 / (seconds * 1e3)
+                })
+    return rows
+
+
+def run_middleware(sizes=(1, 100, 1000), min_time=0.1):
+    '''Benchmark a full pass through CompressionMiddleware.
+
+    "cached" requests carry a strong ETag, so their compressed body is served
+        from the middleware's cache after the first request.
+    '''
+    rows = []
+    for size in sizes:
+        data = create_catalog(size)
+        for cached in [False, True]:
+            headers = [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(data)))
+            ]
+            if cached:
+                headers.append(('ETag', '"catalog-%d"' % size))
+            middleware = compression.CompressionMiddleware(
+                _create_wsgi_app(headers, data))
+            environ = {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': 'gzip'}
+            seconds = measure(
+                lambda m=middleware, e=environ: b''.join(m(dict(e), _start_response)),
+                min_time=min_time
+            )
+            rows.append({
+                'payload': 'catalog-%d' % size,
+                'cached': cached,
+                'us/request': seconds * 1e6
+            })
+    return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench compression')
+    parser.add_argument('--sizes', default='1,100,1000')
+    parser.add_argument('--levels', default='1,6,9')
+    parser.add_argument('--min-time', type=float, default=0.1)
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    levels = [int(level) for level in args.levels.split(',')]
+    return '%s\n\n%s' % (
+        format_table(run(sizes, levels, args.min_time), COLUMNS),
+        format_table(run_middleware(sizes, args.min_time), MIDDLEWARE_COLUMNS)
+    )
+
+
+def _create_wsgi_app(headers, data):
+    def app(_, start_response):
+        start_response('200 OK', list(headers))
+        return [data]
+    return app
+
+
+def _start_response(*_):
+    return None
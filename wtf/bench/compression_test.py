@@ -0,0 +1,16 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import json
+from wtf.bench import compression
+
+
+def test_create_catalog():
+    catalog = json.loads(compression.create_catalog(3).decode())
+    assert len(catalog['recipes']) == 3
+    assert compression.create_catalog(3) == compression.create_catalog(3)
+
+
+def test_main():
+    report = compression.main(['--sizes', '1,10', '--levels', '1', '--min-time', '0.001'])
+    assert 'catalog-10' in report
+    assert 'KB saved/CPU ms' in report
+    assert 'us/request' in report
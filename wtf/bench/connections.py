@@ -0,0 +1,114 @@
+'''
+wtf.bench.connections
+
+Measures how each worker class of the production server copes with many
+    concurrent, slow clients: clients connect at a steady rate over --ramp
+    seconds, and each sends the first half of a recipe GET, waits (as a slow
+    mobile client would), sends the rest and reads the response. A sync
+    worker ties up a thread per connection while it waits; an asyncio worker
+    (see wtf.asgi) only needs a thread once the request is complete:
+
+    $ python -m wtf.bench connections [--connections 1000 10000] [--delay 0.5]
+
+Requests that are not complete within --timeout seconds count as failed.
+'''
+import argparse
+import asyncio
+import os
+from time import monotonic
+from wtf.api import API_PREFIX
+from wtf.bench.serve import RECIPE_ID, start_server, stop_server, write_catalog
+from wtf.bench.util import format_table, percentile
+
+
+COLUMNS = [
+    'worker class', 'connections', 'completed', 'failed', 'seconds', 'requests/s',
+    'p50 ms', 'p99 ms'
+]
+
+
+async def request(port, delay):
+    '''Make a slow GET request, returning its latency in seconds.'''
+    start = monotonic()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        head = 'GET %s/weapon-recipes/%s HTTP/1.1\r\nHost: localhost\r\n' % (
+            API_PREFIX, RECIPE_ID)
+        writer.write(head.encode('latin-1'))
+        await writer.drain()
+        await asyncio.sleep(delay)
+        writer.write(b'Connection: close\r\n\r\n')
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    if not response.startswith(b'HTTP/1.1 200') and not response.startswith(b'HTTP/1.0 200'):
+        raise RuntimeError('Unexpected response: %r' % response[:100])
+    return monotonic() - start
+
+
+async def delayed_request(port, delay, timeout, start_after):
+    '''Make a slow GET request after `start_after` seconds.'''
+    await asyncio.sleep(start_after)
+    return await asyncio.wait_for(request(port, delay), timeout)
+
+
+async def load(port, connections, delay, timeout, ramp):
+    '''Make concurrent slow requests, returning the latencies of the completed ones.'''
+    tasks = [
+        asyncio.ensure_future(delayed_request(port, delay, timeout, i * ramp / connections))
+        for i in range(connections)
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return sorted(result for result in results if isinstance(result, float))
+
+
+# pylint: disable=too-many-arguments,too-many-locals
+def run(worker_classes=('sync', 'asyncio'), connections=(1000, 10000), delay=0.5,
+        timeout=30.0, threads=8, ramp=2.0):
+    '''Benchmark each worker class with each number of concurrent connections.'''
+    catalog = write_catalog()
+    try:
+        rows = []
+        for worker_class in worker_classes:
+            for count in connections:
+                process, port = start_server(
+                    catalog, 1, threads, '--worker-class', worker_class,
+                    '--keepalive', str(timeout))
+                loop = asyncio.new_event_loop()
+                try:
+                    start = monotonic()
+                    latencies = loop.run_until_complete(load(port, count, delay, timeout, ramp))
+                    elapsed = monotonic() - start
+                finally:
+                    loop.close()
+                    stop_server(process)
+                rows.append({
+                    'worker class': worker_class,
+                    'connections': count,
+                    'completed': len(latencies),
+                    'failed': count - len(latencies),
+                    'seconds': elapsed,
+                    'requests/s': len(latencies) / elapsed,
+                    'p50 ms': percentile(latencies, 0.5) * 1e3,
+                    'p99 ms': percentile(latencies, 0.99) * 1e3
+                })
+        return rows
+    finally:
+        os.remove(catalog)
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench connections')
+    parser.add_argument('--worker-class', nargs='+', default=['sync', 'asyncio'],
+                        choices=['sync', 'asyncio'])
+    parser.add_argument('--connections', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--delay', type=float, default=0.5)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ramp', type=float, default=2.0)
+    args = parser.parse_args(argv)
+    return format_table(run(
+        args.worker_class, args.connections, args.delay, args.timeout, args.threads, args.ramp
+    ), COLUMNS)
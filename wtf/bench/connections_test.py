@@ -0,0 +1,13 @@
+# pylint: disable=missing-docstring,invalid-name
+from wtf.bench import connections
+
+
+def test_main():
+    report = connections.main([
+        '--connections', '5', '--delay', '0.01', '--ramp', '0.01', '--timeout', '10'
+    ])
+    lines = report.splitlines()
+    assert 'p99 ms' in lines[0]
+    assert len(lines) == 4
+    assert lines[2].split()[:4] == ['sync', '5', '5', '0']
+    assert lines[3].split()[:4] == ['asyncio', '5', '5', '0']
@@ -0,0 +1,148 @@
+'''
+wtf.bench.core
+
+Measures the core hot paths (saving, finding, validating and transforming
+    entities, generating grades) and full requests through the API, with
+    repositories of several sizes. Results can be saved as a baseline, and
+    later runs compared to it: the benchmark fails if any path is more than
+    `--tolerance` slower than its baseline:
+
+    $ python -m wtf.bench core --baseline bench.json --save
+    $ python -m wtf.bench core --baseline bench.json [--tolerance 0.25]
+
+Each size is benchmarked in a new realm (see wtf.core.realms), whose
+    repositories are populated first. Saves remove the entities they save,
+    so that the repositories keep their size.
+'''
+import argparse
+import os
+import sys
+from itertools import count
+from wtf.api.app import create_app
+from wtf.bench import baseline
+from wtf.bench.export import ARMOR_RECIPE
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table, measure
+from wtf.core import accounts, armor, characters, equipment, realms, weapons
+from wtf.testing import create_test_client
+
+
+COLUMNS = ['benchmark', 'us/call']
+COMPARE_COLUMNS = ['benchmark', 'us/call', 'baseline us/call', 'change %', 'status']
+SIZES = [100, 10000]
+
+
+def populate(size):
+    '''Store `size` entities of each kind in the (empty) repositories of the current realm.'''
+    password = accounts.create(password='password')['password']
+    for i in range(size):
+        account = {'id': 'account-%d' % i, 'email': 'player%d@example.com' % i,
+                   'password': password}
+        accounts.REPO['by_id'][account['id']] = account
+        accounts.REPO['by_email'][account['email']] = account
+        character = characters.create(id='character-%d' % i, account=account['id'],
+                                      name='Player %d' % i)
+        characters.REPO['by_id'][character['id']] = character
+        characters.REPO['by_account'][account['id']] = [character]
+        recipe = dict(weapons.create_recipe(**RECIPE), id='weapon-recipe-%d' % i)
+        weapons.REPO_RECIPES['by_id'][recipe['id']] = recipe
+        weapon = dict(weapons.create(recipe=recipe['id'], grade=0.5), id='weapon-%d' % i)
+        weapons.REPO['by_id'][weapon['id']] = weapon
+        recipe = dict(armor.create_recipe(**ARMOR_RECIPE), id='armor-recipe-%d' % i)
+        armor.REPO_RECIPES['by_id'][recipe['id']] = recipe
+        item = dict(armor.create(recipe=recipe['id'], grade=0.5), id='armor-%d' % i)
+        armor.REPO['by_id'][item['id']] = item
+
+
+def benchmarks(size):
+    '''Get the benchmarks of a populated repository size, by name.'''
+    index = size // 2
+    ids = count()
+    password = accounts.REPO['by_id']['account-0']['password']
+    weapon = weapons.find_by_id('weapon-%d' % index)
+    weapon_recipe = weapons.find_recipe_by_id(weapon['recipe'])
+    item = armor.find_by_id('armor-%d' % index)
+    armor_recipe = armor.find_recipe_by_id(item['recipe'])
+    character = characters.find_by_id('character-%d' % index)
+
+    def save_account():
+        account = accounts.save({'email': 'bench%d@example.com' % next(ids),
+                                 'password': password})
+        del accounts.REPO['by_id'][account['id']]
+        del accounts.REPO['by_email'][account['email']]
+
+    def save_character():
+        saved = characters.save(characters.create(account='bench-%d' % next(ids), name='Foo'))
+        del characters.REPO['by_id'][saved['id']]
+        del characters.REPO['by_account'][saved['account']]
+
+    def save_weapon():
+        del weapons.REPO['by_id'][weapons.save(dict(weapon, id=None))['id']]
+
+    def save_armor():
+        del armor.REPO['by_id'][armor.save(dict(item, id=None))['id']]
+
+    client = create_test_client(create_app(prefix=''))
+    client.set_default_headers({'Content-Type': 'application/json'})
+    weapon_path = '/weapons/%s' % weapon['id']
+    return {
+        'accounts.save': save_account,
+        'accounts.find_by_email': lambda: accounts.find_by_email('player%d@example.com' % index),
+        'characters.save': save_character,
+        'characters.validate': lambda: characters.validate(dict(character, name='Foo')),
+        'equipment.generate_grade': equipment.generate_grade,
+        'weapons.save': save_weapon,
+        'weapons.validate_recipe': lambda: weapons.validate_recipe(weapon_recipe),
+        'weapons.transform': lambda: weapons.transform(weapon),
+        'armor.save': save_armor,
+        'armor.validate_recipe': lambda: armor.validate_recipe(armor_recipe),
+        'armor.transform': lambda: armor.transform(item),
+        'GET /weapons/<id>': lambda: client.get(weapon_path),
+        'POST /weapons': lambda: client.post('/weapons', body={'recipe': weapon['recipe']})
+    }
+
+
+def run(sizes=None, min_time=0.2):
+    '''Benchmark the core hot paths for each repository size.
+
+    Returns the seconds per call of each benchmark, by `<name>[<size>]`.
+    '''
+    results = {}
+    for size in sizes or SIZES:
+        with realms.using(realms.Realm('bench')):
+            populate(size)
+            for name, func in benchmarks(size).items():
+                results['%s[%d]' % (name, size)] = measure(func, min_time=min_time)
+    return results
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.
+
+    Exits with the report if a benchmark regressed from the baseline.
+    '''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench core')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--baseline', help='the baseline file to compare results to')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the baseline instead')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='the slowdown (e.g. 0.25 for 25%%) allowed before failing')
+    args = parser.parse_args(argv)
+    results = run(args.sizes, args.min_time)
+    if args.baseline and args.save:
+        baseline.save(args.baseline, results)
+    if not args.baseline or args.save or not os.path.exists(args.baseline):
+        return format_table(
+            [{'benchmark': name, 'us/call': seconds * 1e6}
+             for name, seconds in sorted(results.items())],
+            COLUMNS
+        )
+    rows = baseline.compare(results, baseline.load(args.baseline), args.tolerance)
+    report = format_table(rows, COMPARE_COLUMNS)
+    regressed = baseline.regressions(rows)
+    if regressed:
+        sys.exit('%s\n\nRegressed by more than %d%%: %s' % (
+            report, args.tolerance * 100, ', '.join(regressed)))
+    return report
@@ -0,0 +1,38 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import pytest
+from wtf.bench import baseline, core
+from wtf.core import accounts, characters, realms, weapons
+
+
+def test_run():
+    results = core.run(sizes=[1, 10], min_time=0.001)
+    assert 'accounts.save[1]' in results
+    assert 'POST /weapons[10]' in results
+    assert all(seconds > 0 for seconds in results.values())
+    assert 'account-0' not in accounts.REPO['by_id']
+
+
+def test_benchmarks_keep_size():
+    with realms.using(realms.Realm('bench')):
+        core.populate(10)
+        for name, func in core.benchmarks(10).items():
+            if not name.startswith('POST'):
+                func()
+        assert len(accounts.REPO['by_email']) == 10
+        assert len(characters.REPO['by_account']) == 10
+        assert len(weapons.REPO['by_id']) == 10
+
+
+def test_main_baseline(tmpdir):
+    path = str(tmpdir.join('baseline.json'))
+    args = ['--sizes', '1', '--min-time', '0.001', '--baseline', path]
+    assert 'benchmark' in core.main(args)
+    core.main(args + ['--save'])
+    results = baseline.load(path)
+    assert 'weapons.transform[1]' in results
+    baseline.save(path, {name: 1.0 for name in results})
+    assert 'ok' in core.main(args)
+    baseline.save(path, {name: 1e-12 for name in results})
+    with pytest.raises(SystemExit) as error:
+        core.main(args + ['--tolerance', '0.5'])
+    assert 'Regressed by more than 50%' in str(error.value)
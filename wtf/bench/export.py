@@ -0,0 +1,105 @@
+'''
+wtf.bench.export
+
+Measures export throughput (records/second) and peak memory for each kind of
+    record, by streaming `GET /export/<kind>` through the API. Peak memory is
+    measured in a second pass, since tracing allocations slows exports down.
+    The records are stored in a new realm (see wtf.core.realms):
+
+    $ python -m wtf.bench export [--records 100000]
+'''
+import argparse
+import tracemalloc
+from time import monotonic
+from wtf.api.app import create_app
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table
+from wtf.core import accounts, armor, characters, realms, weapons
+
+
+COLUMNS = ['kind', 'records', 'MB', 'seconds', 'records/s', 'peak KB']
+ARMOR_RECIPE = {
+    'name': 'Foo Helm',
+    'description': 'The mightiest helm in all the land.',
+    'weight': {'center': 4, 'radius': 1},
+    'location': 'head',
+    'defense': {
+        'min': {'center': 20, 'radius': 5},
+        'max': {'center': 40, 'radius': 5}
+    }
+}
+
+
+def populate(records):
+    '''Store `records` records of each kind in the (empty) repositories of the current realm.'''
+    weapon_recipe = weapons.create_recipe(**RECIPE)
+    weapon_recipe['id'] = 'weapon-recipe'
+    armor_recipe = armor.create_recipe(**ARMOR_RECIPE)
+    armor_recipe['id'] = 'armor-recipe'
+    password = accounts.create(password='password')['password']
+    for i in range(records):
+        account_id = 'account-%d' % i
+        accounts.REPO['by_id'][account_id] = {
+            'id': account_id,
+            'email': 'player%d@example.com' % i,
+            'password': password
+        }
+        character = characters.create(id='character-%d' % i, account=account_id,
+                                      name='Player %d' % i)
+        characters.REPO['by_id'][character['id']] = character
+        recipe = dict(weapon_recipe, id='weapon-recipe-%d' % i)
+        weapons.REPO_RECIPES['by_id'][recipe['id']] = recipe
+        weapon = dict(weapons.create(recipe=weapon_recipe['id'], grade=0.5),
+                      id='weapon-%d' % i)
+        weapons.REPO['by_id'][weapon['id']] = weapon
+        recipe = dict(armor_recipe, id='armor-recipe-%d' % i)
+        armor.REPO_RECIPES['by_id'][recipe['id']] = recipe
+        item = dict(armor.create(recipe=armor_recipe['id'], grade=0.5), id='armor-%d' % i)
+        armor.REPO['by_id'][item['id']] = item
+    weapons.REPO_RECIPES['by_id'][weapon_recipe['id']] = weapon_recipe
+    armor.REPO_RECIPES['by_id'][armor_recipe['id']] = armor_recipe
+
+
+def run(records=100000):
+    '''Benchmark an export of each kind.'''
+    with realms.using(realms.Realm('bench')):
+        populate(records)
+        client = create_app(prefix='').test_client()
+        rows = []
+        for kind in ['accounts', 'characters', 'weapon-recipes', 'weapons',
+                     'armor-recipes', 'armor']:
+            count, size, elapsed = _export(client, kind)
+            tracemalloc.start()
+            _export(client, kind)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rows.append({
+                'kind': kind,
+                'records': count,
+                'MB': size / 1e6,
+                'seconds': elapsed,
+                'records/s': count / elapsed,
+                'peak KB': peak / 1024.0
+            })
+        return rows
+
+
+def _export(client, kind):
+    start = monotonic()
+    response = client.get('/export/%s' % kind, buffered=False)
+    count = size = 0
+    try:
+        for chunk in response.response:
+            count += chunk.count(b'\n')
+            size += len(chunk)
+    finally:
+        response.close()
+    return count, size, monotonic() - start
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench export')
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args(argv)
+    return format_table(run(args.records), COLUMNS)
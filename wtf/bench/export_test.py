@@ -0,0 +1,23 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from wtf.bench import export
+from wtf.core import accounts
+
+
+def test_main():
+    report = export.main(['--records', '10'])
+    assert 'weapon-recipes' in report
+    assert 'records/s' in report
+    assert 'account-0' not in accounts.REPO['by_id']
+
+
+def test_run():
+    rows = export.run(records=3)
+    counts = {row['kind']: row['records'] for row in rows}
+    assert counts == {
+        'accounts': 3,
+        'characters': 3,
+        'weapon-recipes': 4,
+        'weapons': 3,
+        'armor-recipes': 4,
+        'armor': 3
+    }
@@ -0,0 +1,262 @@
+'''
+wtf.bench.load
+
+Load-tests the bundled app before a release: starts the production server on
+    localhost with a recipe catalog, and replays a mix of player actions from
+    --clients concurrent clients (threads, each with a keep-alive connection)
+    for --duration seconds, then reports the throughput, error rate and
+    latency percentiles of each route:
+
+    $ python -m wtf.bench load [--workers 2] [--clients 32] [--duration 30] \
+        [--mix signup=1 character=1 loot=3 read=15]
+
+The actions are:
+  * signup: create an account (POST /accounts)
+  * character: create a character for the client's account (POST /characters)
+  * loot: drop a weapon or a piece of armor from a catalog recipe (POST
+    /weapons, POST /armor)
+  * read: get a recipe, or one of the client's characters, weapons or armor
+
+Each client signs up first, so that it has an account to create characters
+    for. With --port, an already running server on localhost is load-tested
+    instead (it must have the benchmark's catalog loaded). With several
+    workers, the server stores its repositories in a temporary SQLite
+    database, so that every worker sees every client's entities.
+'''
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+from http.client import HTTPConnection, HTTPException
+from time import monotonic
+from wtf.api import API_PREFIX
+from wtf.bench.export import ARMOR_RECIPE
+from wtf.bench.responses import RECIPE
+from wtf.bench.serve import start_server, stop_server
+from wtf.bench.util import format_table, percentile
+
+
+COLUMNS = [
+    'route', 'requests', 'errors', 'error %', 'requests/s', 'p50 ms', 'p95 ms', 'p99 ms',
+    'p999 ms'
+]
+ACTIONS = ['signup', 'character', 'loot', 'read']
+MIX = {'signup': 1, 'character': 1, 'loot': 3, 'read': 15}
+WEAPON_RECIPE_ID = 'foo-sword'
+ARMOR_RECIPE_ID = 'foo-helm'
+TOTAL = 'total'
+
+
+class Client(object):
+    '''A simulated player: a connection, and the entities it created.'''
+
+    def __init__(self, port, mix, results, seed=None):
+        self.connection = HTTPConnection('127.0.0.1', port, timeout=30)
+        self.actions = sorted(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.results = results
+        self.random = random.Random(seed)
+        self.account = None
+        self.entities = []
+
+    def request(self, method, route, path, body=None):
+        '''Send a request, recording its latency, and return its body (or None).'''
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        start = monotonic()
+        try:
+            self.connection.request(
+                method, API_PREFIX + path,
+                body=None if body is None else json.dumps(body), headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            ok = response.status < 400
+        except (OSError, HTTPException):
+            self.connection.close()
+            data, ok = None, False
+        self.results.record(route, monotonic() - start, ok)
+        return json.loads(data.decode('utf-8')) if ok and data else None
+
+    def signup(self):
+        '''Create an account.'''
+        body = self.request('POST', 'POST /accounts', '/accounts', {
+            'email': 'player-%x@example.com' % self.random.getrandbits(64),
+            'password': 'password'
+        })
+        if body is not None:
+            self.account = body['account']['id']
+
+    def character(self):
+        '''Create a character for the client's account.'''
+        if self.account is None:
+            return self.signup()
+        body = self.request('POST', 'POST /characters', '/characters', {
+            'account': self.account,
+            'name': 'Player %x' % self.random.getrandbits(32)
+        })
+        if body is not None:
+            self.entities.append(('characters', body['character']['id']))
+        return None
+
+    def loot(self):
+        '''Drop a weapon or a piece of armor.'''
+        kind, key, recipe = self.random.choice([
+            ('weapons', 'weapon', WEAPON_RECIPE_ID),
+            ('armor', 'armor', ARMOR_RECIPE_ID)
+        ])
+        body = self.request('POST', 'POST /%s' % kind, '/%s' % kind, {'recipe': recipe})
+        if body is not None:
+            self.entities.append((kind, body[key]['id']))
+
+    def read(self):
+        '''Get a recipe, or one of the client's entities.'''
+        if not self.entities or self.random.random() < 0.2:
+            kind, entity_id = self.random.choice([
+                ('weapon-recipes', WEAPON_RECIPE_ID),
+                ('armor-recipes', ARMOR_RECIPE_ID)
+            ])
+        else:
+            kind, entity_id = self.random.choice(self.entities)
+        self.request('GET', 'GET /%s/<id>' % kind, '/%s/%s' % (kind, entity_id))
+
+    def run(self, deadline):
+        '''Replay random actions until the deadline.'''
+        self.signup()
+        while monotonic() < deadline:
+            action = self.random.choices(self.actions, self.weights)[0]
+            getattr(self, action)()
+        self.connection.close()
+
+
+class Results(object):
+    '''The latencies of successful requests and the errors, by route.'''
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+
+    def record(self, route, seconds, ok):
+        '''Record a request.'''
+        with self.lock:
+            self.latencies.setdefault(route, [])
+            self.errors.setdefault(route, 0)
+            if ok:
+                self.latencies[route].append(seconds)
+            else:
+                self.errors[route] += 1
+
+    def rows(self, elapsed):
+        '''Report the throughput, error rate and latency percentiles of each route.'''
+        routes = sorted(self.latencies)
+        self.latencies[TOTAL] = [s for route in routes for s in self.latencies[route]]
+        self.errors[TOTAL] = sum(self.errors[route] for route in routes)
+        rows = []
+        for route in routes + [TOTAL]:
+            latencies = sorted(self.latencies[route])
+            errors = self.errors[route]
+            requests = len(latencies) + errors
+            row = {
+                'route': route,
+                'requests': requests,
+                'errors': errors,
+                'error %': errors * 100.0 / requests if requests else 0.0,
+                'requests/s': requests / elapsed
+            }
+            for name, fraction in [('p50', 0.5), ('p95', 0.95), ('p99', 0.99),
+                                   ('p999', 0.999)]:
+                row['%s ms' % name] = percentile(latencies, fraction) * 1e3
+            rows.append(row)
+        return rows
+
+
+def write_catalog():
+    '''Write a catalog with the recipes that loot is dropped from to a temporary file.'''
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+        json.dump({
+            'weapon-recipes': [dict(RECIPE, id=WEAPON_RECIPE_ID)],
+            'armor-recipes': [dict(ARMOR_RECIPE, id=ARMOR_RECIPE_ID)]
+        }, file)
+    return file.name
+
+
+def load(port, clients=32, duration=30.0, mix=None, seed=None):
+    '''Load-test a server on localhost, returning a row per route.'''
+    results = Results()
+    rng = random.Random(seed)
+    deadline = monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=Client(port, mix or MIX, results, rng.getrandbits(64)).run,
+            args=(deadline,))
+        for _ in range(clients)
+    ]
+    start = monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results.rows(monotonic() - start)
+
+
+# pylint: disable=too-many-arguments
+def run(workers=2, clients=32, duration=30.0, mix=None, threads=8, seed=None):
+    '''Start a server and load-test it.'''
+    catalog = write_catalog()
+    directory = tempfile.mkdtemp(prefix='wtf-load-')
+    env = {'WTF_STORAGE': 'sqlite:///%s' % os.path.join(directory, 'wtf.db')} \
+        if workers > 1 else None
+    try:
+        process, port = start_server(catalog, workers, threads, env=env)
+        try:
+            return load(port, clients, duration, mix, seed)
+        finally:
+            stop_server(process)
+    finally:
+        os.remove(catalog)
+        shutil.rmtree(directory)
+
+
+def parse_mix(values):
+    '''Parse `action=weight` pairs into a mix (see MIX).
+
+    Actions that are not listed are not replayed.
+    '''
+    mix = {}
+    for value in values:
+        action, _, weight = value.partition('=')
+        if action not in ACTIONS:
+            raise argparse.ArgumentTypeError('Invalid action: %s' % action)
+        try:
+            mix[action] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError('Invalid weight: %s' % value)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError('Invalid mix: the weights add up to 0')
+    return mix
+
+
+def main(argv=None):
+    '''Run the load test and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench load')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--mix', nargs='+', metavar='ACTION=WEIGHT',
+                        help='the weight of each action (%s)' % ', '.join(ACTIONS))
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--port', type=int,
+                        help='load-test a server already running on this port of localhost')
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix) if args.mix else MIX
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+    if args.port:
+        rows = load(args.port, args.clients, args.duration, mix, args.seed)
+    else:
+        rows = run(args.workers, args.clients, args.duration, mix, args.threads, args.seed)
+    return format_table(rows, COLUMNS)
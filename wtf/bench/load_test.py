@@ -0,0 +1,38 @@
+# pylint: disable=missing-docstring,invalid-name
+import argparse
+import pytest
+from wtf.bench import load
+
+
+def test_main():
+    report = load.main(['--workers', '2', '--clients', '4', '--duration', '0.5', '--seed', '1'])
+    lines = report.splitlines()
+    assert 'p999 ms' in lines[0]
+    routes = {line.split()[0] + ' ' + line.split()[1] for line in lines[2:-1]}
+    assert {'POST /accounts', 'POST /characters', 'GET /weapons/<id>'} <= routes
+    total = lines[-1].split()
+    assert total[0] == 'total'
+    assert int(total[1]) > 4
+    assert int(total[2]) == 0
+
+
+def test_results():
+    results = load.Results()
+    for i in range(100):
+        results.record('GET /foo', i / 1000.0, True)
+    results.record('GET /foo', 1.0, False)
+    results.record('POST /bar', 0.5, True)
+    rows = {row['route']: row for row in results.rows(elapsed=2.0)}
+    assert rows['GET /foo']['requests'] == 101
+    assert rows['GET /foo']['errors'] == 1
+    assert rows['GET /foo']['p50 ms'] == 50
+    assert rows['GET /foo']['p99 ms'] == 99
+    assert rows['total']['requests'] == 102
+    assert rows['total']['requests/s'] == 51
+
+
+def test_parse_mix():
+    assert load.parse_mix(['read=2', 'loot=0.5']) == {'read': 2, 'loot': 0.5}
+    for values in [['foo=1'], ['read=foo'], ['read=0']]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            load.parse_mix(values)
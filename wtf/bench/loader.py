@@ -0,0 +1,82 @@
+'''
+wtf.bench.loader
+
+Measures the queries and latency of rendering a loadout (50 weapons stored in
+    SQLite, validated and transformed with their recipes) without and with a
+    request-scoped loader (see wtf.core.loader), and with the recipes loaded
+    in a single query:
+
+    $ python -m wtf.bench loader [--items 50] [--recipes 10]
+'''
+import argparse
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table, measure, sqlite_storage
+from wtf.core import loader, weapons
+
+
+COLUMNS = ['loadout', 'loader', 'items', 'queries', 'ms']
+
+
+def render(weapon_ids):
+    '''Render a loadout, looking up each weapon's recipe as needed.'''
+    items = [weapons.find_by_id(weapon_id) for weapon_id in weapon_ids]
+    for weapon in items:
+        weapons.validate(weapon)
+    return [weapons.transform(weapon) for weapon in items]
+
+
+def render_batched(weapon_ids):
+    '''Render a loadout, looking up the recipes at once.'''
+    items = [weapons.find_by_id(weapon_id) for weapon_id in weapon_ids]
+    transformed = weapons.transform_many(items)
+    for weapon in items:
+        weapons.validate(weapon)
+    return transformed
+
+
+def run(items=50, recipes=10, min_time=0.2):
+    '''Benchmark rendering a loadout.'''
+    with sqlite_storage('wtf-loader-'):
+        recipe_ids = [
+            weapons.save_recipe(weapons.create_recipe(**RECIPE))['id'] for _ in range(recipes)
+        ]
+        weapon_ids = [
+            weapons.save(weapons.create(recipe=recipe_ids[i % recipes]))['id']
+            for i in range(items)
+        ]
+        connection = weapons.REPO['by_id'].database.connection
+        rows = []
+        for name, func, scoped in [('one by one', render, False),
+                                   ('one by one', render, True),
+                                   ('batched', render_batched, True)]:
+
+            def request(func=func, scoped=scoped):
+                if scoped:
+                    loader.start()
+                try:
+                    return func(weapon_ids)
+                finally:
+                    if scoped:
+                        loader.stop()
+
+            queries = []
+            connection.set_trace_callback(queries.append)
+            request()
+            connection.set_trace_callback(None)
+            rows.append({
+                'loadout': name,
+                'loader': 'on' if scoped else 'off',
+                'items': items,
+                'queries': len(queries),
+                'ms': measure(request, min_time=min_time) * 1e3
+            })
+        return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench loader')
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--recipes', type=int, default=10)
+    args = parser.parse_args(argv)
+    return format_table(run(args.items, args.recipes), COLUMNS)
@@ -0,0 +1,16 @@
+# pylint: disable=missing-docstring,invalid-name
+from wtf.bench import loader
+from wtf.core import weapons
+
+
+def test_main():
+    repo = weapons.REPO
+    report = loader.main(['--items', '6', '--recipes', '2'])
+    lines = report.splitlines()
+    assert 'queries' in lines[0]
+    assert [line.strip().rsplit(None, 4)[:4] for line in lines[2:]] == [
+        ['one by one', 'off', '6', '18'],
+        ['one by one', 'on', '6', '8'],
+        ['batched', 'on', '6', '7']
+    ]
+    assert weapons.REPO is repo
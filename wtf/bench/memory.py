@@ -0,0 +1,53 @@
+'''
+wtf.bench.memory
+
+Measures the memory used by each repository, as bytes per entity, so that
+    memory regressions show up next to the other benchmarks. The sampled
+    estimate reported by `GET /admin/memory` (see wtf.memory) is compared to
+    an exact count, along with the time each takes:
+
+    $ python -m wtf.bench memory [--records 100000] [--sample 1000]
+'''
+import argparse
+from time import monotonic
+from wtf import memory
+from wtf.bench.export import populate
+from wtf.bench.util import format_table
+from wtf.core import realms
+
+
+COLUMNS = ['repository', 'entries', 'bytes/entry', 'MB', 'error %', 'estimate ms', 'exact ms']
+
+
+def run(records=100000, sample_size=memory.SAMPLE_SIZE):
+    '''Benchmark the memory use of each repository (of a new realm).'''
+    with realms.using(realms.Realm('bench')):
+        populate(records)
+        rows = []
+        for name, module, attribute in memory.REPOSITORIES:
+            mapping = getattr(module, attribute)[memory.PRIMARY_INDEX]
+            start = monotonic()
+            estimate = memory.estimate(mapping, sample_size)
+            estimate_elapsed = monotonic() - start
+            start = monotonic()
+            exact = memory.estimate(mapping, len(mapping))
+            exact_elapsed = monotonic() - start
+            rows.append({
+                'repository': name,
+                'entries': len(mapping),
+                'bytes/entry': estimate / max(1, len(mapping)),
+                'MB': estimate / 1e6,
+                'error %': (estimate - exact) * 100.0 / exact,
+                'estimate ms': estimate_elapsed * 1e3,
+                'exact ms': exact_elapsed * 1e3
+            })
+        return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench memory')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--sample', type=int, default=memory.SAMPLE_SIZE)
+    args = parser.parse_args(argv)
+    return format_table(run(args.records, args.sample), COLUMNS)
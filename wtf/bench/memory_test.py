@@ -0,0 +1,25 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from wtf.bench import memory
+from wtf.core import accounts
+
+
+def test_main():
+    report = memory.main(['--records', '10', '--sample', '5'])
+    assert 'weapon_recipes' in report
+    assert 'bytes/entry' in report
+    assert 'account-0' not in accounts.REPO['by_id']
+
+
+def test_run():
+    rows = memory.run(records=20, sample_size=100)
+    entries = {row['repository']: row['entries'] for row in rows}
+    assert entries == {
+        'accounts': 20,
+        'characters': 20,
+        'weapon_recipes': 21,
+        'weapons': 20,
+        'armor_recipes': 21,
+        'armor': 20
+    }
+    assert all(row['error %'] == 0 for row in rows)
+    assert all(row['bytes/entry'] > 0 for row in rows)
@@ -0,0 +1,60 @@
+'''
+wtf.bench.metrics
+
+Measures the overhead of request metrics: the cost of recording a request,
+    of GETs through the API with and without metrics, and of rendering
+    `GET /metrics` for every route:
+
+    $ python -m wtf.bench metrics
+'''
+import argparse
+from wtf.api import metrics
+from wtf.api.app import create_app
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table, measure
+from wtf.core import realms, weapons
+
+
+COLUMNS = ['operation', 'metrics', 'us/call']
+
+
+def run(min_time=0.2):
+    '''Benchmark request metrics.'''
+    recorder = metrics.Metrics()
+
+    def record():
+        recorder.start()
+        recorder.finish('get_weapon_by_id', 'GET', 200, 0.0012)
+        recorder.end()
+
+    rows = [{'operation': 'record a request', 'metrics': 'on',
+             'us/call': measure(record, min_time=min_time) * 1e6}]
+    with realms.using(realms.Realm('bench')):
+        recipe = weapons.save_recipe(weapons.create_recipe(**RECIPE))
+        weapon = weapons.save(weapons.create(recipe=recipe['id']))
+        for route, path in [('GET /health', '/health'),
+                            ('GET /weapons/<id>', '/weapons/%s' % weapon['id'])]:
+            for enabled in [False, True]:
+                client = create_app(prefix='', config={'WTF_METRICS': enabled}).test_client()
+                rows.append({
+                    'operation': route,
+                    'metrics': 'on' if enabled else 'off',
+                    'us/call': measure(lambda c=client, p=path: c.get(p), min_time=min_time) * 1e6
+                })
+        client = create_app(prefix='').test_client()
+        for path in ['/health', '/weapons/%s' % weapon['id'], '/weapons/foo', '/foo']:
+            client.get(path)
+        rows.append({
+            'operation': 'GET /metrics',
+            'metrics': 'on',
+            'us/call': measure(lambda: client.get('/metrics'), min_time=min_time) * 1e6
+        })
+        return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench metrics')
+    parser.add_argument('--min-time', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    return format_table(run(args.min_time), COLUMNS)
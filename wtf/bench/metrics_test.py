@@ -0,0 +1,8 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from wtf.bench import metrics
+
+
+def test_main():
+    report = metrics.main(['--min-time', '0.001'])
+    assert 'record a request' in report
+    assert 'GET /metrics' in report
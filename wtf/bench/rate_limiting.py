@@ -0,0 +1,82 @@
+'''
+wtf.bench.rate_limiting
+
+Measures the overhead of rate limits (see wtf.api.rate_limiting): taking a
+    token from the in-memory store with one client and with a million
+    distinct clients (and the memory their buckets take), from the shared
+    SQLite store, and GETs through the API with and without a rate limit:
+
+    $ python -m wtf.bench rate_limiting [--keys 1000000]
+'''
+import argparse
+import os
+import tempfile
+import tracemalloc
+from itertools import cycle
+from wtf.api import rate_limiting
+from wtf.api.app import create_app
+from wtf.bench.util import format_table, measure
+
+
+COLUMNS = ['operation', 'store', 'keys', 'us/call', 'MB']
+RATE, CAPACITY = 1e9, 1e9
+
+
+def run(keys=1000000, sqlite_keys=10000, min_time=0.2):
+    '''Benchmark rate limits.'''
+    rows = []
+    store = rate_limiting.MemoryStore()
+    rows.append({
+        'operation': 'take', 'store': 'memory', 'keys': 1,
+        'us/call': measure(lambda: store.take('ip:127.0.0.1', RATE, CAPACITY),
+                           min_time=min_time) * 1e6,
+        'MB': ''
+    })
+    names = ['ip:10.%d.%d.%d' % (i >> 16 & 255, i >> 8 & 255, i & 255) for i in range(keys)]
+    tracemalloc.start()
+    store = rate_limiting.MemoryStore(max_keys=keys)
+    for name in names:
+        store.take(name, RATE, CAPACITY)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    names = cycle(names)
+    rows.append({
+        'operation': 'take', 'store': 'memory', 'keys': keys,
+        'us/call': measure(lambda: store.take(next(names), RATE, CAPACITY),
+                           min_time=min_time) * 1e6,
+        'MB': size / 1e6
+    })
+    directory = tempfile.mkdtemp(prefix='wtf-rate-limiting-')
+    path = os.path.join(directory, 'wtf.db')
+    try:
+        store = rate_limiting.SQLiteStore(path)
+        names = cycle(['ip:10.0.%d.%d' % (i >> 8 & 255, i & 255) for i in range(sqlite_keys)])
+        rows.append({
+            'operation': 'take', 'store': 'sqlite', 'keys': sqlite_keys,
+            'us/call': measure(lambda: store.take(next(names), RATE, CAPACITY),
+                               min_time=min_time) * 1e6,
+            'MB': ''
+        })
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+    for limits in ['', 'get_health=%d/1' % CAPACITY]:
+        client = create_app(prefix='', config={'WTF_RATE_LIMITS': limits}).test_client()
+        rows.append({
+            'operation': 'GET /health',
+            'store': 'memory' if limits else 'off',
+            'keys': 1 if limits else '',
+            'us/call': measure(lambda c=client: c.get('/health'), min_time=min_time) * 1e6,
+            'MB': ''
+        })
+    return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench rate_limiting')
+    parser.add_argument('--keys', type=int, default=1000000)
+    parser.add_argument('--sqlite-keys', type=int, default=10000)
+    args = parser.parse_args(argv)
+    return format_table(run(args.keys, args.sqlite_keys), COLUMNS)
@@ -0,0 +1,11 @@
+# pylint: disable=missing-docstring,invalid-name
+from wtf.bench import rate_limiting
+
+
+def test_main():
+    report = rate_limiting.main(['--keys', '100', '--sqlite-keys', '10'])
+    lines = report.splitlines()
+    assert 'us/call' in lines[0]
+    assert [line.split()[:3] for line in lines[2:]] == [
+        ['take', 'memory', '1'], ['take', 'memory', '100'], ['take', 'sqlite', '10'],
+        ['GET', '/health', 'off'], ['GET', '/health', 'memory']]
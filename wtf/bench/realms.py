@@ -0,0 +1,90 @@
+'''
+wtf.bench.realms
+
+Measures the cost of serving many realms from one process (see
+    wtf.core.realms): the memory each empty realm takes, with and without the
+    recipes of a shared catalog, and the overhead of routing requests to
+    their realm by host and by path (see wtf.api.realms):
+
+    $ python -m wtf.bench realms [--realms 10000] [--recipes 1000]
+'''
+import argparse
+import tracemalloc
+from wtf.api.app import create_app
+from wtf.api.realms import RealmRouter
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table, measure
+from wtf.core import catalog, realms, weapons
+
+
+COLUMNS = ['operation', 'routing', 'realms', 'us/call', 'KB/realm']
+
+
+def realm_size(count, recipes=None):
+    '''Get the memory used by each of `count` new realms, storing shared recipes if given.'''
+    tracemalloc.start()
+    created = []
+    for i in range(count):
+        realm = realms.Realm('bench-%d' % i)
+        if recipes is not None:
+            with realms.using(realm):
+                catalog.store(recipes)
+        created.append(realm)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / count
+
+
+def run(count=10000, recipes=1000, min_time=0.2):
+    '''Benchmark realms.'''
+    rows = [{
+        'operation': 'create realm', 'routing': '', 'realms': count, 'us/call': '',
+        'KB/realm': realm_size(count) / 1e3
+    }]
+    recipe = weapons.create_recipe(**RECIPE)
+    shared = {
+        'weapon-recipes': {
+            'recipe-%d' % i: dict(recipe, id='recipe-%d' % i) for i in range(recipes)
+        },
+        'armor-recipes': {}
+    }
+    rows.append({
+        'operation': 'create realm + %d recipes' % recipes, 'routing': '',
+        'realms': max(1, count // 10), 'us/call': '',
+        'KB/realm': realm_size(max(1, count // 10), shared) / 1e3
+    })
+    served = [realms.Realm('bench-a'), realms.Realm('bench-b')]
+    for routing, environ in [('host', {'HTTP_HOST': 'bench-a.localhost', 'PATH_INFO': '/health'}),
+                             ('path', {'PATH_INFO': '/bench-a/health'})]:
+        router = RealmRouter(lambda environ, start_response: [b''], served, routing)
+        rows.append({
+            'operation': 'route request', 'routing': routing, 'realms': len(served),
+            'us/call': measure(lambda r=router, e=environ: list(r(dict(e), None)),
+                               min_time=min_time) * 1e6,
+            'KB/realm': ''
+        })
+    for routing, names, path, base_url in [
+            ('off', '', '/health', 'http://localhost/'),
+            ('host', 'bench-a,bench-b', '/health', 'http://bench-a.localhost/'),
+            ('path', 'bench-a,bench-b', '/bench-a/health', 'http://localhost/')]:
+        client = create_app(prefix='', config={
+            'WTF_REALMS': names,
+            'WTF_REALM_ROUTING': 'host' if routing == 'off' else routing
+        }).test_client()
+        assert client.get(path, base_url=base_url).status_code == 200
+        rows.append({
+            'operation': 'GET /health', 'routing': routing, 'realms': 2 if names else 1,
+            'us/call': measure(lambda c=client, p=path, b=base_url: c.get(p, base_url=b),
+                               min_time=min_time) * 1e6,
+            'KB/realm': ''
+        })
+    return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench realms')
+    parser.add_argument('--realms', type=int, default=10000)
+    parser.add_argument('--recipes', type=int, default=1000)
+    args = parser.parse_args(argv)
+    return format_table(run(args.realms, args.recipes), COLUMNS)
@@ -0,0 +1,13 @@
+# pylint: disable=missing-docstring,invalid-name
+import re
+from wtf.bench import realms
+
+
+def test_main():
+    report = realms.main(['--realms', '10', '--recipes', '10'])
+    lines = report.splitlines()
+    assert 'KB/realm' in lines[0]
+    assert [re.split(r'\s{2,}', line.strip())[:2] for line in lines[2:]] == [
+        ['create realm', '10'], ['create realm + 10 recipes', '1'],
+        ['route request', 'host'], ['route request', 'path'],
+        ['GET /health', 'off'], ['GET /health', 'host'], ['GET /health', 'path']]
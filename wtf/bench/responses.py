@@ -0,0 +1,96 @@
+'''
+wtf.bench.responses
+
+Measures requests/second for recipe and weapon GETs through the API, with and
+    without the pre-serialized response cache, for each JSON encoder:
+
+    $ python -m wtf.bench responses
+'''
+import argparse
+import flask
+from wtf.api import serialization
+from wtf.api.app import create_app
+from wtf.bench.util import format_table, measure
+from wtf.core import realms, weapons
+
+
+COLUMNS = ['route', 'encoder', 'cache', 'us/request', 'requests/s']
+RENDER_COLUMNS = ['renderer', 'encoder', 'us/response']
+RECIPE = {
+    'name': 'Foo Sword',
+    'description': 'The mightiest sword in all the land.',
+    'weight': {'center': 12, 'radius': 3},
+    'type': 'sword',
+    'handedness': 2,
+    'damage': {
+        'min': {'center': 50, 'radius': 10},
+        'max': {'center': 100, 'radius': 10}
+    }
+}
+
+
+def run(min_time=0.2):
+    '''Benchmark recipe and weapon GETs for each encoder, cached and not.'''
+    with realms.using(realms.Realm('bench')):
+        recipe = weapons.save_recipe(weapons.create_recipe(**RECIPE))
+        weapon = weapons.save(weapons.create(recipe=recipe['id']))
+        paths = {
+            'GET /weapon-recipes/<id>': '/weapon-recipes/%s' % recipe['id'],
+            'GET /weapons/<id>': '/weapons/%s' % weapon['id']
+        }
+        rows = []
+        for route, path in paths.items():
+            for encoder in sorted(serialization.JSON_ENCODERS):
+                for cache in [0, 10000]:
+                    client = create_app(prefix='', config={
+                        'WTF_JSON_ENCODER': encoder,
+                        'WTF_RESPONSE_CACHE_SIZE': cache
+                    }).test_client()
+                    seconds = measure(lambda c=client, p=path: c.get(p), min_time=min_time)
+                    rows.append({
+                        'route': route,
+                        'encoder': encoder,
+                        'cache': 'on' if cache else 'off',
+                        'us/request': seconds * 1e6,
+                        'requests/s': 1 / seconds
+                    })
+        return rows
+
+
+def run_render(min_time=0.2):
+    '''Benchmark just the creation of a weapon response.
+
+    This isolates the work that the response cache saves from the rest of the
+        request handling; flask.jsonify is how responses were created before.
+    '''
+    with realms.using(realms.Realm('bench')):
+        recipe = weapons.save_recipe(weapons.create_recipe(**RECIPE))
+        weapon = weapons.save(weapons.create(recipe=recipe['id']))
+        build = lambda: {'weapon': weapons.transform(weapon)}
+        renderers = [('flask.jsonify', 'json', lambda: flask.jsonify(build()))]
+        for encoder in sorted(serialization.JSON_ENCODERS):
+            renderers.append(('serialize', encoder, lambda: serialization.serialize(build())))
+            renderers.append(('cached_serialize', encoder, lambda: serialization.cached_serialize(
+                ('weapon', weapon['id']), (weapon, recipe), build)))
+        rows = []
+        for renderer, encoder, render in renderers:
+            app = create_app(prefix='', config={'WTF_JSON_ENCODER': encoder})
+            with app.test_request_context():
+                seconds = measure(render, min_time=min_time)
+            rows.append({
+                'renderer': renderer,
+                'encoder': encoder,
+                'us/response': seconds * 1e6
+            })
+        return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench responses')
+    parser.add_argument('--min-time', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    return '%s\n\n%s' % (
+        format_table(run(args.min_time), COLUMNS),
+        format_table(run_render(args.min_time), RENDER_COLUMNS)
+    )
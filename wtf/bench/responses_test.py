@@ -0,0 +1,9 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from wtf.bench import responses
+
+
+def test_main():
+    report = responses.main(['--min-time', '0.001'])
+    assert 'GET /weapon-recipes/<id>' in report
+    assert 'requests/s' in report
+    assert 'cached_serialize' in report
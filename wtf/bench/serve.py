@@ -0,0 +1,119 @@
+'''
+wtf.bench.serve
+
+Measures throughput (requests/second) of the production server for an
+    increasing number of worker processes, by running `python -m wtf serve`
+    with a recipe catalog and GETting a recipe from concurrent client
+    processes:
+
+    $ python -m wtf.bench serve [--workers 1 2 4] [--clients 8] [--duration 5]
+
+Throughput can only scale with the number of workers up to the number of CPUs,
+    which the clients share with the server.
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from http.client import HTTPConnection
+from multiprocessing import Pool
+from time import monotonic
+from wtf.api import API_PREFIX
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table
+
+
+COLUMNS = ['workers', 'clients', 'requests', 'requests/s', 'ms/request']
+RECIPE_ID = 'foo-sword'
+
+
+def start_server(catalog, workers, threads, *args, env=None):
+    '''Start a server on a free port, returning the process and the port.
+
+    Extra arguments are passed to `python -m wtf serve`, and extra environment
+        variables (`env`) to its process.
+    '''
+    env = dict(os.environ, WTF_CATALOG=catalog, **(env or {}))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'wtf', 'serve', '--port', '0', '--workers', str(workers),
+         '--threads', str(threads), '--graceful-timeout', '5'] + list(args),
+        env=env, stderr=subprocess.PIPE, universal_newlines=True)
+    for line in process.stderr:
+        if line.startswith('Serving on '):
+            # keep reading the request log, so that the workers don't block on it
+            process.log_reader = threading.Thread(target=process.stderr.read, daemon=True)
+            process.log_reader.start()
+            return process, int(line.split()[2].rpartition(':')[2])
+    process.wait()
+    raise RuntimeError('Unable to start server (exit code %s)' % process.returncode)
+
+
+def stop_server(process):
+    '''Stop a server gracefully.'''
+    process.terminate()
+    process.wait()
+    process.log_reader.join()
+    process.stderr.close()
+
+
+def load(port, duration):
+    '''GET the recipe repeatedly for `duration` seconds, returning the count.'''
+    path = '%s/weapon-recipes/%s' % (API_PREFIX, RECIPE_ID)
+    count = 0
+    deadline = monotonic() + duration
+    while monotonic() < deadline:
+        connection = HTTPConnection('127.0.0.1', port, timeout=30)
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        if response.status != 200:
+            raise RuntimeError('Unexpected status: %d' % response.status)
+        count += 1
+    return count
+
+
+def write_catalog():
+    '''Write a catalog with the benchmarked recipe to a temporary file.'''
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as file:
+        json.dump({'weapon-recipes': [dict(RECIPE, id=RECIPE_ID)]}, file)
+    return file.name
+
+
+def run(workers=(1, 2, 4), clients=8, duration=5.0, threads=8):
+    '''Benchmark the server with each number of workers.'''
+    catalog = write_catalog()
+    try:
+        rows = []
+        with Pool(clients) as pool:
+            for count in workers:
+                process, port = start_server(catalog, count, threads)
+                try:
+                    requests = sum(pool.starmap(load, [(port, duration)] * clients))
+                finally:
+                    stop_server(process)
+                rows.append({
+                    'workers': count,
+                    'clients': clients,
+                    'requests': requests,
+                    'requests/s': requests / duration,
+                    'ms/request': duration * clients * 1e3 / requests
+                })
+        return rows
+    finally:
+        os.remove(catalog)
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench serve')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args(argv)
+    return format_table(
+        run(args.workers, args.clients, args.duration, args.threads), COLUMNS)
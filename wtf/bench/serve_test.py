@@ -0,0 +1,8 @@
+# pylint: disable=missing-docstring,invalid-name
+from wtf.bench import serve
+
+
+def test_main():
+    report = serve.main(['--workers', '1', '2', '--clients', '2', '--duration', '0.2'])
+    assert 'requests/s' in report
+    assert len(report.splitlines()) == 4
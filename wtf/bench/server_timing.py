@@ -0,0 +1,64 @@
+'''
+wtf.bench.server_timing
+
+Measures the overhead of timing the stages of requests (see
+    wtf.api.server_timing): a weapon validation call, uninstrumented and
+    instrumented, and POST/GET weapon requests for each WTF_SERVER_TIMING
+    mode (`header` requests are made without the request header):
+
+    $ python -m wtf.bench server_timing
+'''
+import argparse
+from wtf.api.app import create_app
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table, measure
+from wtf.core import realms, timing, weapons
+
+
+COLUMNS = ['operation', 'timing', 'us/call']
+
+
+def run(min_time=0.2):
+    '''Benchmark Server-Timing.'''
+    with realms.using(realms.Realm('bench')):
+        recipe = weapons.save_recipe(weapons.create_recipe(**RECIPE))
+        weapon = weapons.save(weapons.create(recipe=recipe['id']))
+        rows = []
+        for mode in ['off', 'instrumented', 'timed']:
+            if mode != 'off':
+                timing.instrument()
+            if mode == 'timed':
+                timing.start()
+            try:
+                rows.append({
+                    'operation': 'weapons.validate()',
+                    'timing': mode,
+                    'us/call': measure(lambda: weapons.validate(weapon), min_time=min_time) * 1e6
+                })
+            finally:
+                timing.stop()
+                timing.uninstrument()
+        for mode in ['off', 'header', 'on']:
+            client = create_app(prefix='', config={'WTF_SERVER_TIMING': mode}).test_client()
+            try:
+                for operation, request in [
+                        ('POST /weapons', lambda c=client: c.post(
+                            '/weapons', json={'recipe': recipe['id']})),
+                        ('GET /weapons/<id>', lambda c=client: c.get(
+                            '/weapons/%s' % weapon['id']))]:
+                    rows.append({
+                        'operation': operation,
+                        'timing': mode,
+                        'us/call': measure(request, min_time=min_time) * 1e6
+                    })
+            finally:
+                timing.uninstrument()
+        return rows
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench server_timing')
+    parser.add_argument('--min-time', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    return format_table(run(args.min_time), COLUMNS)
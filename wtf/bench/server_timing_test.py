@@ -0,0 +1,10 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from wtf.bench import server_timing
+from wtf.core import timing
+
+
+def test_main():
+    report = server_timing.main(['--min-time', '0.001'])
+    assert 'weapons.validate()' in report
+    assert 'POST /weapons' in report
+    assert not timing.is_instrumented()
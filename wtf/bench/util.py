@@ -0,0 +1,80 @@
+'''
+wtf.bench.util
+
+Benchmark timing and reporting utilities.
+'''
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from timeit import default_timer
+from wtf import storage
+from wtf.core import realms
+
+
+def measure(func, repeat=3, min_time=0.1):
+    '''Measure the time it takes to call a function, in seconds per call.
+
+    The function is called in a loop until at least `min_time` seconds have
+        elapsed, and the best of `repeat` loops is returned.
+    '''
+    number = 1
+    while True:
+        elapsed = _loop(func, number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed * 10 > min_time else 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        best = min(best, _loop(func, number) / number)
+    return best
+
+
+@contextmanager
+def sqlite_storage(prefix='wtf-bench-'):
+    '''Store the default realm's repositories in a temporary SQLite database, within a `with` block.
+
+    The repositories are restored, and the database deleted, when the block exits.
+    '''
+    saved = dict(realms.DEFAULT.repositories)
+    directory = tempfile.mkdtemp(prefix=prefix)
+    try:
+        storage.init('sqlite:///%s' % os.path.join(directory, 'wtf.db'))
+        yield
+    finally:
+        realms.DEFAULT.repositories.update(saved)
+        shutil.rmtree(directory)
+
+
+def percentile(values, fraction):
+    '''Get a percentile (e.g. 0.99) of sorted values, or 0.0 if there are none.'''
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def format_table(rows, columns):
+    '''Format a list of dictionaries as a plain text table.'''
+    cells = [[_format_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [
+        max([len(column)] + [len(row[i]) for row in cells])
+        for i, column in enumerate(columns)
+    ]
+    lines = ['  '.join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines.append('  '.join('-' * w for w in widths))
+    for row in cells:
+        lines.append('  '.join(c.rjust(w) for c, w in zip(row, widths)))
+    return '\n'.join(lines)
+
+
+def _loop(func, number):
+    start = default_timer()
+    for _ in range(number):
+        func()
+    return default_timer() - start
+
+
+def _format_cell(value):
+    if isinstance(value, float):
+        return '%.2f' % value
+    return str(value)
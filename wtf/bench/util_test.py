@@ -0,0 +1,44 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import os
+from mock import Mock
+from wtf.bench import util
+from wtf.core import realms, weapons
+
+
+def test_measure():
+    func = Mock()
+    seconds = util.measure(func, repeat=2, min_time=0.001)
+    assert seconds > 0
+    assert func.call_count > 2
+
+
+def test_percentile():
+    values = list(range(100))
+    assert util.percentile(values, 0.5) == 50
+    assert util.percentile(values, 0.99) == 99
+    assert util.percentile(values, 0.999) == 99
+    assert util.percentile([], 0.5) == 0.0
+
+
+def test_format_table():
+    expected = '\n'.join([
+        'name  value',
+        '----  -----',
+        ' foo   1.50',
+        'quux     42',
+    ])
+    actual = util.format_table(
+        [{'name': 'foo', 'value': 1.5}, {'name': 'quux', 'value': 42}],
+        ['name', 'value']
+    )
+    assert expected == actual
+
+
+def test_sqlite_storage():
+    saved = dict(realms.DEFAULT.repositories)
+    with util.sqlite_storage():
+        by_id = weapons.REPO['by_id']
+        assert not isinstance(by_id, dict)
+        path = by_id.database.path
+    assert realms.DEFAULT.repositories == saved
+    assert not os.path.exists(path)
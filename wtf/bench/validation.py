@@ -0,0 +1,62 @@
+'''
+wtf.bench.validation
+
+Measures the cost of shaping and validating request bodies, for valid and
+    invalid (empty) weapon and armor recipes, and of a whole recipe POST:
+
+    $ python -m wtf.bench validation
+'''
+import argparse
+from wtf.api.app import create_app
+from wtf.bench.export import ARMOR_RECIPE
+from wtf.bench.responses import RECIPE
+from wtf.bench.util import format_table, measure
+from wtf.core import armor, realms, weapons
+from wtf.core.errors import ValidationError
+
+
+COLUMNS = ['operation', 'body', 'us/call']
+
+
+def run(min_time=0.2):
+    '''Benchmark recipe shaping and validation.'''
+    rows = []
+    for name, module, body in [('weapon recipe', weapons, RECIPE),
+                               ('armor recipe', armor, ARMOR_RECIPE)]:
+        recipe = dict(module.create_recipe(**body), id='recipe')
+        for operation, func in [
+                ('create_recipe', lambda m=module, b=body: m.create_recipe(**b)),
+                ('validate_recipe', lambda m=module, r=recipe: _validate(m, r)),
+                ('validate_recipe (empty)', lambda m=module: _validate(m, {}))]:
+            rows.append({
+                'operation': operation,
+                'body': name,
+                'us/call': measure(func, min_time=min_time) * 1e6
+            })
+    with realms.using(realms.Realm('bench')):
+        client = create_app(prefix='').test_client()
+        for body_name, body in [('weapon recipe', RECIPE), ('empty', {})]:
+            seconds = measure(
+                lambda b=body: client.post('/weapon-recipes', json=b), min_time=min_time)
+            weapons.REPO_RECIPES['by_id'].clear()
+            rows.append({
+                'operation': 'POST /weapon-recipes',
+                'body': body_name,
+                'us/call': seconds * 1e6
+            })
+    return rows
+
+
+def _validate(module, recipe):
+    try:
+        module.validate_recipe(recipe)
+    except ValidationError:
+        pass
+
+
+def main(argv=None):
+    '''Run the benchmark and return a report.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf.bench validation')
+    parser.add_argument('--min-time', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    return format_table(run(args.min_time), COLUMNS)
@@ -0,0 +1,8 @@
+# pylint: disable=missing-docstring,invalid-name
+from wtf.bench import validation
+
+
+def test_main():
+    report = validation.main(['--min-time', '0.001'])
+    assert 'validate_recipe (empty)' in report
+    assert 'POST /weapon-recipes' in report
@@ -0,0 +1,87 @@
+'''
+wtf.cache
+
+A small, thread-safe, bounded LRU (least recently used) cache.
+
+Every cache is tracked in CACHES (weakly), by name, so that its memory use can
+    be reported (see wtf.memory).
+'''
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from weakref import WeakSet
+
+
+CACHES = WeakSet()
+
+
+# pylint: disable=too-many-instance-attributes
+class LRUCache(object):
+    '''A thread-safe LRU cache bounded by entry count and (optionally) size.
+
+    Entries are evicted least-recently-used first once there are more than
+        `max_entries` of them, or once the sum of `sizeof(value)` exceeds
+        `max_size`. If `ttl` is set, entries older than `ttl` seconds are
+        treated as missing.
+    '''
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, max_entries=1024, max_size=None, sizeof=len, ttl=None, name='cache'):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.name = name
+        CACHES.add(self)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        '''Get a value from the cache.'''
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None:
+                if monotonic() - entry[2] > self.ttl:
+                    self._remove(key)
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        '''Add a value to the cache, evicting old entries as necessary.'''
+        size = self.sizeof(value) if self.max_size is not None else 0
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (value, size, monotonic())
+            self.size += size
+            while len(self.entries) > self.max_entries or (
+                    self.max_size is not None and self.size > self.max_size):
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key):
+        '''Remove a value from the cache, if present.'''
+        with self.lock:
+            self._remove(key)
+
+    def clear(self):
+        '''Remove every value from the cache.'''
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
@@ -0,0 +1,60 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from mock import patch
+from wtf.cache import LRUCache
+
+
+def test_get_set():
+    cache = LRUCache()
+    assert cache.get('foo') is None
+    assert cache.get('foo', 'default') == 'default'
+    cache.set('foo', 'bar')
+    assert cache.get('foo') == 'bar'
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_evict_max_entries():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_evict_max_size():
+    cache = LRUCache(max_size=10)
+    cache.set('a', b'12345')
+    cache.set('b', b'123456')
+    assert cache.get('a') is None
+    assert cache.get('b') == b'123456'
+    assert cache.size == 6
+    cache.set('c', b'12345678901')
+    assert cache.get('c') is None
+    assert cache.size == 6
+
+
+@patch('wtf.cache.monotonic')
+def test_ttl(mock_monotonic):
+    cache = LRUCache(ttl=10)
+    mock_monotonic.return_value = 100
+    cache.set('foo', 'bar')
+    mock_monotonic.return_value = 110
+    assert cache.get('foo') == 'bar'
+    mock_monotonic.return_value = 111
+    assert cache.get('foo') is None
+    assert not cache
+
+
+def test_delete_clear():
+    cache = LRUCache(max_size=100)
+    cache.set('a', b'1')
+    cache.set('b', b'2')
+    cache.delete('a')
+    cache.delete('missing')
+    assert cache.get('a') is None
+    cache.clear()
+    assert not cache
+    assert cache.size == 0
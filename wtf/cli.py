@@ -0,0 +1,259 @@
+'''
+wtf.cli
+
+The War Torn Faith command line interface, i.e. `python -m wtf <command>`.
+
+Commands:
+  * run: start the bundled app with the development server (this is the
+    default command)
+  * serve: start the bundled app with the production server (see wtf.server)
+  * export: download a full export of a running API as NDJSON
+  * memory: report the memory used by a running API's repositories and caches
+  * snapshot: convert a recipe catalog to a snapshot, which loads faster (see
+    wtf.core.catalog)
+
+With --profile-startup, the startup time of the bundled app is reported
+    instead (see wtf.startup).
+'''
+import argparse
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from functools import partial
+from time import monotonic
+from urllib.request import Request, urlopen
+from wtf import config as wtf_config, server, startup, storage
+from wtf.api import API_PREFIX, admin, metrics
+from wtf.api.export import KINDS
+from wtf.app import create_app
+from wtf.bench.util import format_table
+from wtf.core import catalog, equipment
+
+
+HOST = os.getenv('WTF_HOST')
+PORT = int(os.getenv('WTF_PORT')) if os.getenv('WTF_PORT') else None
+API_URL = 'http://%s:%d%s' % (HOST or 'localhost', PORT or 5000, API_PREFIX)
+
+
+def preload(config):
+    '''Set up storage.
+
+    The recipe catalog (if any) is loaded by the app factory, into every realm
+        that the app serves (see wtf.api.realms).
+    '''
+    storage.init(config['WTF_STORAGE'])
+
+
+def run(_):
+    '''Start the bundled app with the development server.'''
+    config = wtf_config.load()
+    preload(config)
+    create_app(catalog=config['WTF_CATALOG'] or None).run(host=HOST, port=PORT)
+
+
+def serve(args):
+    '''Start the bundled app with the production server.
+
+    The app is created, the catalog loaded and NumPy imported (unless grades
+        are sampled without it) before the workers are forked, so that the
+        workers don't each import it. The workers share their request metrics
+        through WTF_METRICS_DIR (a temporary directory by default).
+    '''
+    config = wtf_config.load()
+    preload(config)
+    equipment.set_sampler(config['WTF_GRADE_SAMPLER'])
+    if equipment.sampler() == 'numpy':
+        equipment.numpy()
+    worker_class = server.WorkerServer
+    if args.worker_class == 'asyncio':
+        from wtf import asgi
+        worker_class = partial(asgi.AsyncWorker, keepalive=args.keepalive)
+    metrics_dir = config['WTF_METRICS_DIR'] or tempfile.mkdtemp(prefix='wtf-metrics-')
+    metrics.clear_directory(metrics_dir)
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1 and config['WTF_IDEMPOTENCY_CACHE_SIZE'] and \
+            config['WTF_IDEMPOTENCY_STORAGE'] == 'memory':
+        print('Warning: each worker stores its own idempotent responses, so retries that reach '
+              'another worker are handled again (set WTF_IDEMPOTENCY_STORAGE to share them)',
+              file=sys.stderr)
+    server.serve(
+        create_app({'WTF_METRICS_DIR': metrics_dir}, catalog=config['WTF_CATALOG'] or None),
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        threads=args.threads,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout=args.graceful_timeout,
+        worker_class=worker_class
+    )
+
+
+def export(args):
+    '''Download an export from a running API.
+
+    With --resume, an existing output file is truncated to its last complete
+        line and the export continues from there.
+    '''
+    cursor = args.cursor
+    mode = 'wb'
+    if args.output and args.resume and os.path.exists(args.output):
+        cursor = truncate_to_last_line(args.output)
+        mode = 'ab'
+    url = '%s/export/%s?cursor=%d' % (args.url.rstrip('/'), args.kind, cursor)
+    count = 0
+    start = monotonic()
+    with urlopen(url) as response, open_output(args.output, mode) as output:
+        for line in response:
+            output.write(line)
+            count += 1
+    elapsed = monotonic() - start
+    print(
+        'Exported %d %s (cursor %d to %d) in %.2fs: %.0f records/s' % (
+            count, args.kind, cursor, cursor + count, elapsed,
+            count / elapsed if elapsed else 0
+        ),
+        file=sys.stderr
+    )
+
+
+def memory(args):
+    '''Report the memory used by a running API's repositories and caches.
+
+    The admin secret is read from WTF_ADMIN_SECRET. With several worker
+        processes, the report is that of the worker that handled the request.
+    '''
+    secret = wtf_config.load()['WTF_ADMIN_SECRET']
+    url = args.url.rstrip('/')
+    usage = _get_json('%s/admin/memory?sample=%d' % (url, args.sample), secret)
+    print('Process %(pid)d: %(rss)s MB resident (peak: %(max_rss)s MB)' % {
+        'pid': usage['process']['pid'],
+        'rss': _megabytes(usage['process']['rss_bytes']),
+        'max_rss': _megabytes(usage['process']['max_rss_bytes'])
+    })
+    for row in usage['repositories'] + usage['caches']:
+        row['MB'] = _megabytes(row['bytes'])
+    print(format_table(usage['repositories'], ['repository', 'index', 'entries', 'MB']))
+    print(format_table(
+        usage['caches'], ['cache', 'entries', 'max_entries', 'MB', 'hits', 'misses']))
+    if args.allocations is not None:
+        allocations = _get_json('%s/admin/memory/allocations?seconds=%s&limit=%d' % (
+            url, args.allocations, args.limit), secret)['allocations']
+        for row in allocations:
+            row['MB'] = _megabytes(row['bytes'])
+        print(format_table(allocations, ['site', 'MB', 'blocks']))
+
+
+def _get_json(url, secret):
+    with urlopen(Request(url, headers={admin.HEADER: secret})) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def _megabytes(size):
+    return None if size is None else round(size / 1048576, 2)
+
+
+def snapshot(args):
+    '''Validate a recipe catalog and write its recipes to a snapshot.'''
+    counts = catalog.load(args.catalog)
+    catalog.write_snapshot(args.output)
+    print('Wrote snapshot of %s to %s' % (
+        ', '.join('%d %s' % (count, kind) for kind, count in sorted(counts.items())),
+        args.output
+    ), file=sys.stderr)
+
+
+def truncate_to_last_line(path):
+    '''Truncate a file after its last newline and return its line count.'''
+    lines = 0
+    end = 0
+    offset = 0
+    with open(path, 'rb+') as file:
+        for chunk in iter(lambda: file.read(65536), b''):
+            lines += chunk.count(b'\n')
+            if b'\n' in chunk:
+                end = offset + chunk.rindex(b'\n') + 1
+            offset += len(chunk)
+        file.truncate(end)
+    return lines
+
+
+@contextmanager
+def open_output(path, mode):
+    '''Open an output file, or stdout if no path is provided.'''
+    if path is None:
+        yield sys.stdout.buffer
+    else:
+        with open(path, mode) as file:
+            yield file
+
+
+COMMANDS = {
+    'run': run, 'serve': serve, 'export': export, 'memory': memory, 'snapshot': snapshot
+}
+
+
+def main(argv=None):
+    '''Parse command line arguments and run the requested command.'''
+    parser = argparse.ArgumentParser(prog='python -m wtf')
+    parser.add_argument(
+        '--profile-startup', action='store_true',
+        help='report how long the bundled app takes to start, and its slowest imports')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('run', help='start the bundled app with the development server (default)')
+    config = wtf_config.load()
+    serve_parser = commands.add_parser(
+        'serve', help='start the bundled app with the production (preforking) server')
+    serve_parser.add_argument('--host', default=HOST or '127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5000 if PORT is None else PORT)
+    serve_parser.add_argument(
+        '--workers', '-w', type=int, default=config['WTF_WORKERS'],
+        help='worker processes (default: the number of CPUs)')
+    serve_parser.add_argument(
+        '--threads', '-t', type=int, default=config['WTF_THREADS'], help='threads per worker')
+    serve_parser.add_argument(
+        '--max-requests', type=int, default=config['WTF_MAX_REQUESTS'],
+        help='recycle workers after this many requests (default: never)')
+    serve_parser.add_argument(
+        '--max-requests-jitter', type=int, default=config['WTF_MAX_REQUESTS_JITTER'],
+        help='add a random number of requests, up to this many, to --max-requests')
+    serve_parser.add_argument(
+        '--graceful-timeout', type=float, default=config['WTF_GRACEFUL_TIMEOUT'],
+        help='seconds to wait for requests in progress when stopping workers')
+    serve_parser.add_argument(
+        '--worker-class', choices=['sync', 'asyncio'], default=config['WTF_WORKER_CLASS'],
+        help='sync: a thread per connection; asyncio: an event loop per worker, '
+             'with a thread per request in progress')
+    serve_parser.add_argument(
+        '--keepalive', type=float, default=config['WTF_KEEPALIVE'],
+        help='seconds to keep idle connections open (asyncio workers only)')
+    export_parser = commands.add_parser(
+        'export', help='download a full export of a running API as NDJSON')
+    export_parser.add_argument('kind', choices=sorted(KINDS))
+    export_parser.add_argument('--url', default=API_URL, help='the API URL')
+    export_parser.add_argument('--output', '-o', help='output file (default: stdout)')
+    export_parser.add_argument('--cursor', type=int, default=0, help='records to skip')
+    export_parser.add_argument(
+        '--resume', action='store_true',
+        help='resume an interrupted export into an existing output file')
+    memory_parser = commands.add_parser(
+        'memory', help="report the memory used by a running API's repositories and caches")
+    memory_parser.add_argument('--url', default=API_URL, help='the API URL')
+    memory_parser.add_argument(
+        '--sample', type=int, default=1000,
+        help='entries sampled per repository index and cache to estimate memory use')
+    memory_parser.add_argument(
+        '--allocations', type=float, metavar='SECONDS',
+        help='also trace allocations for this many seconds and report the top sites')
+    memory_parser.add_argument('--limit', type=int, default=10, help='allocation sites to report')
+    snapshot_parser = commands.add_parser(
+        'snapshot', help='convert a recipe catalog to a snapshot, which loads faster')
+    snapshot_parser.add_argument('catalog', help='the catalog (JSON) file')
+    snapshot_parser.add_argument('output', help='the snapshot file to write')
+    args = parser.parse_args(argv)
+    if args.profile_startup:
+        startup.main('wtf.app')
+        return
+    COMMANDS[args.command or 'run'](args)
@@ -0,0 +1,156 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import io
+import json
+from mock import patch, MagicMock
+from wtf import asgi, cli, server
+from wtf.bench.responses import RECIPE
+
+
+def mock_response(lines):
+    response = MagicMock()
+    response.__enter__.return_value = iter(lines)
+    return response
+
+
+def mock_json_response(value):
+    response = MagicMock()
+    response.__enter__.return_value.read.return_value = json.dumps(value).encode()
+    return response
+
+
+@patch('wtf.cli.create_app')
+def test_main_run(mock_create_app):
+    cli.main([])
+    mock_create_app.return_value.run.assert_called_with(host=cli.HOST, port=cli.PORT)
+    cli.main(['run'])
+    assert mock_create_app.return_value.run.call_count == 2
+
+
+@patch('wtf.cli.urlopen')
+def test_main_export(mock_urlopen, tmpdir):
+    output = str(tmpdir.join('accounts.ndjson'))
+    mock_urlopen.return_value = mock_response([b'{"id":"0"}\n', b'{"id":"1"}\n'])
+    cli.main(['export', 'accounts', '--url', 'http://foo/api/', '-o', output])
+    mock_urlopen.assert_called_with('http://foo/api/export/accounts?cursor=0')
+    with open(output, 'rb') as file:
+        assert file.read() == b'{"id":"0"}\n{"id":"1"}\n'
+
+
+@patch('wtf.cli.urlopen')
+def test_main_export_resume(mock_urlopen, tmpdir):
+    output = tmpdir.join('accounts.ndjson')
+    output.write_binary(b'{"id":"0"}\n{"id":"1"}\n{"id":')
+    mock_urlopen.return_value = mock_response([b'{"id":"2"}\n'])
+    cli.main(['export', 'accounts', '--url', 'http://foo/api', '-o', str(output), '--resume'])
+    mock_urlopen.assert_called_with('http://foo/api/export/accounts?cursor=2')
+    assert output.read_binary() == b'{"id":"0"}\n{"id":"1"}\n{"id":"2"}\n'
+
+
+@patch('wtf.cli.sys')
+@patch('wtf.cli.urlopen')
+def test_main_export_stdout(mock_urlopen, mock_sys):
+    mock_sys.stdout.buffer = io.BytesIO()
+    mock_urlopen.return_value = mock_response([b'{"id":"5"}\n'])
+    cli.main(['export', 'weapons', '--cursor', '5'])
+    mock_urlopen.assert_called_with('%s/export/weapons?cursor=5' % cli.API_URL)
+    assert mock_sys.stdout.buffer.getvalue() == b'{"id":"5"}\n'
+
+
+def test_truncate_to_last_line(tmpdir):
+    path = tmpdir.join('empty.ndjson')
+    path.write_binary(b'')
+    assert cli.truncate_to_last_line(str(path)) == 0
+    path.write_binary(b'partial')
+    assert cli.truncate_to_last_line(str(path)) == 0
+    assert path.read_binary() == b''
+
+
+@patch('wtf.cli.server.serve')
+@patch('wtf.cli.create_app')
+def test_main_serve(mock_create_app, mock_serve, tmpdir, capsys):
+    tmpdir.join('123.json').write('{}')
+    with patch.dict('os.environ', {'WTF_METRICS_DIR': str(tmpdir)}):
+        cli.main(['serve', '--port', '8000', '--workers', '3', '--max-requests', '100'])
+    mock_create_app.assert_called_with({'WTF_METRICS_DIR': str(tmpdir)}, catalog=None)
+    assert tmpdir.listdir() == []
+    mock_serve.assert_called_with(
+        mock_create_app.return_value, host='127.0.0.1', port=8000, workers=3, threads=8,
+        max_requests=100, max_requests_jitter=0, graceful_timeout=30.0,
+        worker_class=server.WorkerServer)
+    assert 'WTF_IDEMPOTENCY_STORAGE' in capsys.readouterr().err
+    with patch.dict('os.environ', {'WTF_METRICS_DIR': str(tmpdir),
+                                   'WTF_IDEMPOTENCY_STORAGE': 'sqlite:///wtf.db'}):
+        cli.main(['serve', '--workers', '3'])
+    assert capsys.readouterr().err == ''
+
+
+@patch('wtf.cli.storage.init')
+def test_preload(mock_init):
+    cli.preload({'WTF_STORAGE': 'memory', 'WTF_CATALOG': 'catalog.json'})
+    mock_init.assert_called_with('memory')
+
+
+@patch('wtf.cli.create_app')
+def test_main_run_catalog(mock_create_app):
+    with patch.dict('os.environ', {'WTF_CATALOG': 'catalog.json'}):
+        cli.main(['run'])
+    mock_create_app.assert_called_with(catalog='catalog.json')
+
+
+@patch('wtf.cli.server.serve')
+@patch('wtf.cli.create_app')
+@patch('wtf.cli.tempfile.mkdtemp')
+def test_main_serve_asyncio(mock_mkdtemp, mock_create_app, mock_serve, tmpdir):
+    mock_mkdtemp.return_value = str(tmpdir)
+    cli.main(['serve', '--worker-class', 'asyncio', '--keepalive', '60'])
+    mock_create_app.assert_called_with({'WTF_METRICS_DIR': str(tmpdir)}, catalog=None)
+    worker_class = mock_serve.call_args[1]['worker_class']
+    assert worker_class.func is asgi.AsyncWorker
+    assert worker_class.keywords == {'keepalive': 60.0}
+    assert mock_serve.call_args[0] == (mock_create_app.return_value,)
+
+
+@patch('wtf.cli.urlopen')
+def test_main_memory(mock_urlopen, capsys):
+    usage = {
+        'repositories': [{'repository': 'weapons', 'index': 'by_id', 'entries': 3,
+                          'bytes': 3145728}],
+        'caches': [{'cache': 'responses', 'entries': 1, 'max_entries': 10, 'bytes': 1024,
+                    'hits': 2, 'misses': 1}],
+        'process': {'pid': 123, 'rss_bytes': 10485760, 'max_rss_bytes': None}
+    }
+    allocations = {'allocations': [{'site': 'foo.py:1', 'bytes': 2097152, 'blocks': 4}]}
+    mock_urlopen.side_effect = [mock_json_response(usage), mock_json_response(allocations)]
+    with patch.dict('os.environ', {'WTF_ADMIN_SECRET': 'foo'}):
+        cli.main(['memory', '--url', 'http://foo/api', '--sample', '10', '--allocations', '5'])
+    requests = [call[0][0] for call in mock_urlopen.call_args_list]
+    assert [request.full_url for request in requests] == [
+        'http://foo/api/admin/memory?sample=10',
+        'http://foo/api/admin/memory/allocations?seconds=5.0&limit=10'
+    ]
+    assert requests[0].get_header('X-admin-secret') == 'foo'
+    output = capsys.readouterr().out
+    assert 'Process 123: 10.0 MB resident (peak: None MB)' in output
+    assert 'weapons' in output and '3.0' in output
+    assert 'foo.py:1' in output and '2.0' in output
+
+
+@patch('wtf.cli.startup.main')
+@patch('wtf.cli.create_app')
+def test_main_profile_startup(mock_create_app, mock_startup_main):
+    cli.main(['--profile-startup'])
+    mock_startup_main.assert_called_once_with('wtf.app')
+    assert not mock_create_app.called
+
+
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_main_snapshot(tmpdir, capsys):
+    from wtf.core import catalog, weapons
+    path = tmpdir.join('catalog.json')
+    path.write(json.dumps({'weapon-recipes': [dict(RECIPE, id='foo-sword')]}))
+    snapshot = str(tmpdir.join('catalog.snapshot'))
+    cli.main(['snapshot', str(path), snapshot])
+    assert 'Wrote snapshot of 0 armor-recipes, 1 weapon-recipes' in capsys.readouterr().err
+    weapons.REPO_RECIPES['by_id'].clear()
+    catalog.load(snapshot)
+    assert weapons.find_recipe_by_id('foo-sword')['name'] == 'Foo Sword'
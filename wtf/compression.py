@@ -0,0 +1,301 @@
+'''
+wtf.compression
+
+WSGI middleware that compresses responses according to the client's
+    Accept-Encoding header.
+
+gzip (from the standard library) is always available. Brotli (`br`) and
+    Zstandard (`zstd`) are offered as well when the optional `brotli` and
+    `zstandard` packages are installed.
+
+Small responses (below `min_size` bytes) are sent as-is, since compressing
+    them costs more CPU than it saves in bandwidth. Responses with a known
+    length of up to `stream_size` bytes are compressed in one shot; larger
+    responses, and responses of unknown length (i.e. streamed responses), are
+    compressed incrementally as they are sent.
+
+Compressed bodies of responses with a strong ETag (such as recipes) are kept
+    in a bounded cache, keyed by ETag and encoding, so that the same bytes are
+    never compressed twice.
+'''
+import re
+import zlib
+from wtf.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+COMPRESSIBLE_TYPES = [
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'application/xml',
+    'image/svg+xml'
+]
+ETAG_SUFFIX_PATTERN = re.compile(r'-(?:gzip|br|zstd)"')
+
+
+class GzipEncoder(object):
+    '''gzip encoding, implemented with zlib.'''
+
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        '''Compress data in one shot.'''
+        compressor = self.compressor()
+        return compressor.compress(data) + compressor.flush()
+
+    def compressor(self):
+        '''Create an incremental compressor.'''
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+
+class BrotliEncoder(object):
+    '''Brotli encoding, implemented with the optional `brotli` package.'''
+
+    name = 'br'
+
+    def __init__(self, level):
+        self.quality = min(level, 11)
+
+    def compress(self, data):
+        '''Compress data in one shot.'''
+        return brotli.compress(data, quality=self.quality)
+
+    def compressor(self):
+        '''Create an incremental compressor.'''
+        return BrotliCompressor(brotli.Compressor(quality=self.quality))
+
+
+class BrotliCompressor(object):
+    '''Adapts brotli.Compressor to the zlib compressor interface.'''
+
+    def __init__(self, compressor):
+        self.compressor = compressor
+
+    def compress(self, data):
+        '''Compress a chunk of data.'''
+        return self.compressor.process(data)
+
+    def flush(self):
+        '''Finish compressing and return any remaining data.'''
+        return self.compressor.finish()
+
+
+class ZstdEncoder(object):
+    '''Zstandard encoding, implemented with the optional `zstandard` package.'''
+
+    name = 'zstd'
+
+    def __init__(self, level):
+        self.compressor_factory = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data):
+        '''Compress data in one shot.'''
+        return self.compressor_factory.compress(data)
+
+    def compressor(self):
+        '''Create an incremental compressor.'''
+        return self.compressor_factory.compressobj()
+
+
+def available_encoders(level=6):
+    '''Get the available encoders, in order of preference.'''
+    encoders = []
+    if brotli is not None:
+        encoders.append(BrotliEncoder(level))
+    if zstandard is not None:
+        encoders.append(ZstdEncoder(level))
+    encoders.append(GzipEncoder(level))
+    return encoders
+
+
+def parse_accept_encoding(header):
+    '''Parse an Accept-Encoding header into a dictionary of quality values.'''
+    qualities = {}
+    for part in (header or '').split(','):
+        params = part.strip().split(';')
+        coding = params[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def negotiate(header, encoders):
+    '''Choose the best encoder for an Accept-Encoding header.
+
+    Returns None if the client doesn't accept any of the provided encoders.
+    '''
+    qualities = parse_accept_encoding(header)
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoder in encoders:
+        quality = qualities.get(encoder.name, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoder, quality
+    return best
+
+
+def is_compressible(content_type):
+    '''Check whether a content type is worth compressing.'''
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    return media_type.startswith('text/') or media_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware(object):
+    '''WSGI middleware that compresses responses.'''
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, app, min_size=512, level=6, stream_size=1048576,
+                 cache_size=16777216, encoders=None):
+        self.app = app
+        self.min_size = min_size
+        self.stream_size = stream_size
+        self.encoders = encoders or available_encoders(level)
+        self.cache = LRUCache(max_entries=4096, max_size=cache_size, name='compression')
+
+    def __call__(self, environ, start_response):
+        encoder = negotiate(environ.get('HTTP_ACCEPT_ENCODING'), self.encoders)
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            encoder = None
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if encoder is not None and if_none_match:
+            environ['HTTP_IF_NONE_MATCH'] = \
+                ETAG_SUFFIX_PATTERN.sub('"', if_none_match)
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            return captured.setdefault('writes', []).append
+
+        app_iter = self.app(environ, capture)
+        chunks = app_iter
+        if 'status' not in captured:
+            chunks = iter(app_iter)
+            chunks = _prepend(next(chunks, b''), chunks)
+        if captured.get('writes'):
+            chunks = _prepend(b''.join(captured['writes']), chunks)
+        status, headers = captured['status'], captured['headers']
+        plan = self.plan(encoder, status, headers)
+        if plan is None:
+            start_response(status, headers, captured['exc_info'])
+            if chunks is app_iter:
+                return app_iter
+            return _closing(chunks, app_iter)
+        headers = [
+            (key, value) for key, value in headers
+            if key.lower() not in ['content-length', 'etag']
+        ]
+        headers.append(('Content-Encoding', encoder.name))
+        etag = plan.get('etag')
+        if etag:
+            headers.append(('ETag', '%s-%s"' % (etag[:-1], encoder.name)))
+        if plan['mode'] == 'stream':
+            start_response(status, headers, captured['exc_info'])
+            return _compress_stream(encoder.compressor(), chunks, app_iter)
+        body = self.compress(encoder, etag, chunks, app_iter)
+        headers.append(('Content-Length', str(len(body))))
+        start_response(status, headers, captured['exc_info'])
+        return [body]
+
+    def plan(self, encoder, status, headers):
+        '''Decide how (and whether) to compress a response.
+
+        Returns None if the response should be sent uncompressed, otherwise a
+            dictionary with the compression `mode` ("buffer" or "stream") and
+            the response's strong `etag` (if any). Adds `Vary:
+            Accept-Encoding` to compressible responses.
+        '''
+        lookup = {key.lower(): value for key, value in headers}
+        if not is_compressible(lookup.get('content-type')):
+            return None
+        if 'accept-encoding' not in lookup.get('vary', '').lower():
+            headers.append(('Vary', 'Accept-Encoding'))
+        skip = (
+            encoder is None
+            or status[:3] in ['204', '206', '304']
+            or 'content-encoding' in lookup
+            or 'no-transform' in lookup.get('cache-control', '')
+        )
+        if skip:
+            return None
+        length = lookup.get('content-length')
+        if length is not None and int(length) < self.min_size:
+            return None
+        etag = lookup.get('etag')
+        if etag is not None and not etag.startswith('"'):
+            etag = None
+        mode = 'buffer'
+        if length is None or int(length) > self.stream_size:
+            mode = 'stream'
+        return {'mode': mode, 'etag': etag}
+
+    def compress(self, encoder, etag, chunks, app_iter):
+        '''Compress a buffered body, using the cache if it has an ETag.'''
+        key = (etag, encoder.name)
+        body = self.cache.get(key) if etag else None
+        if body is None:
+            data = b''.join(_closing(chunks, app_iter))
+            body = encoder.compress(data)
+            if etag:
+                self.cache.set(key, body)
+        elif hasattr(app_iter, 'close'):
+            app_iter.close()
+        return body
+
+
+def create_middleware(app, config):
+    '''Wrap a WSGI app in CompressionMiddleware, according to config.'''
+    if not config.get('WTF_COMPRESSION'):
+        return app
+    return CompressionMiddleware(
+        app,
+        min_size=config.get('WTF_COMPRESSION_MIN_SIZE'),
+        level=config.get('WTF_COMPRESSION_LEVEL'),
+        stream_size=config.get('WTF_COMPRESSION_STREAM_SIZE'),
+        cache_size=config.get('WTF_COMPRESSION_CACHE_SIZE')
+    )
+
+
+def _prepend(first, rest):
+    if first:
+        yield first
+    for chunk in rest:
+        yield chunk
+
+
+def _closing(chunks, app_iter):
+    try:
+        for chunk in chunks:
+            yield chunk
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def _compress_stream(compressor, chunks, app_iter):
+    for chunk in _closing(chunks, app_iter):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,240 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import gzip
+from mock import patch, MagicMock, Mock
+from wtf import compression
+
+
+DATA = b'{"recipes": [%s]}' % b','.join([b'{"name": "Foo Sword"}'] * 100)
+
+
+def create_app(headers=None, body=None, status='200 OK'):
+    app_iter = MagicMock()
+    app_iter.__iter__ = Mock(return_value=iter(body if body is not None else [DATA]))
+
+    def app(environ, start_response):
+        app.environ = environ
+        start_response(status, list(headers if headers is not None else [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(DATA)))
+        ]))
+        return app_iter
+    app.app_iter = app_iter
+    return app
+
+
+def call(middleware, **environ):
+    environ.setdefault('REQUEST_METHOD', 'GET')
+    start_response = Mock()
+    body = b''.join(middleware(environ, start_response))
+    status, headers = start_response.call_args[0][:2]
+    return status, dict(headers), body
+
+
+def test_parse_accept_encoding():
+    expected = {'gzip': 1.0, 'br': 0.5, 'zstd': 0.0, '*': 0.0}
+    actual = compression.parse_accept_encoding('gzip, br;q=0.5, zstd;q=x, , *;q=0')
+    assert expected == actual
+    assert compression.parse_accept_encoding(None) == {}
+
+
+def test_negotiate():
+    gzip_encoder = compression.GzipEncoder(6)
+    br_encoder = Mock()
+    br_encoder.name = 'br'
+    encoders = [br_encoder, gzip_encoder]
+    assert compression.negotiate('gzip, br', encoders) is br_encoder
+    assert compression.negotiate('gzip, br;q=0.5', encoders) is gzip_encoder
+    assert compression.negotiate('*', encoders) is br_encoder
+    assert compression.negotiate('identity', encoders) is None
+    assert compression.negotiate(None, encoders) is None
+
+
+def test_is_compressible():
+    assert compression.is_compressible('application/json')
+    assert compression.is_compressible('text/html; charset=utf-8')
+    assert not compression.is_compressible('image/png')
+    assert not compression.is_compressible(None)
+
+
+def test_gzip_encoder():
+    encoder = compression.GzipEncoder(6)
+    assert gzip.decompress(encoder.compress(DATA)) == DATA
+    compressor = encoder.compressor()
+    data = compressor.compress(DATA) + compressor.flush()
+    assert gzip.decompress(data) == DATA
+
+
+@patch('wtf.compression.brotli')
+def test_brotli_encoder(mock_brotli):
+    mock_brotli.compress.return_value = b'compressed'
+    mock_brotli.Compressor.return_value.process.return_value = b'chunk'
+    mock_brotli.Compressor.return_value.finish.return_value = b'end'
+    encoder = compression.BrotliEncoder(15)
+    assert encoder.compress(DATA) == b'compressed'
+    mock_brotli.compress.assert_called_with(DATA, quality=11)
+    compressor = encoder.compressor()
+    assert compressor.compress(DATA) + compressor.flush() == b'chunkend'
+
+
+@patch('wtf.compression.zstandard')
+def test_zstd_encoder(mock_zstandard):
+    factory = mock_zstandard.ZstdCompressor.return_value
+    factory.compress.return_value = b'compressed'
+    encoder = compression.ZstdEncoder(3)
+    assert encoder.compress(DATA) == b'compressed'
+    assert encoder.compressor() is factory.compressobj.return_value
+
+
+@patch('wtf.compression.zstandard')
+@patch('wtf.compression.brotli')
+def test_available_encoders(*_):
+    names = [encoder.name for encoder in compression.available_encoders()]
+    assert names == ['br', 'zstd', 'gzip']
+
+
+def test_available_encoders_stdlib_only():
+    with patch('wtf.compression.brotli', None), patch('wtf.compression.zstandard', None):
+        names = [encoder.name for encoder in compression.available_encoders()]
+    assert names == ['gzip']
+
+
+def test_middleware_compress():
+    app = create_app()
+    middleware = compression.CompressionMiddleware(app, encoders=[compression.GzipEncoder(6)])
+    status, headers, body = call(middleware, HTTP_ACCEPT_ENCODING='gzip')
+    assert status == '200 OK'
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert headers['Content-Length'] == str(len(body))
+    assert gzip.decompress(body) == DATA
+    assert app.app_iter.close.called
+
+
+def test_middleware_not_accepted():
+    app = create_app()
+    middleware = compression.CompressionMiddleware(app)
+    _, headers, body = call(middleware)
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert body == DATA
+
+
+def test_middleware_below_min_size():
+    middleware = compression.CompressionMiddleware(create_app(), min_size=len(DATA) + 1)
+    _, headers, body = call(middleware, HTTP_ACCEPT_ENCODING='gzip')
+    assert 'Content-Encoding' not in headers
+    assert body == DATA
+
+
+def test_middleware_not_compressible():
+    app = create_app(headers=[('Content-Type', 'image/png')])
+    middleware = compression.CompressionMiddleware(app)
+    _, headers, body = call(middleware, HTTP_ACCEPT_ENCODING='gzip')
+    assert headers == {'Content-Type': 'image/png'}
+    assert body == DATA
+
+
+def test_middleware_skipped():
+    cases = [
+        ({'REQUEST_METHOD': 'HEAD'}, [], '200 OK'),
+        ({}, [], '304 Not Modified'),
+        ({}, [('Content-Encoding', 'br')], '200 OK'),
+        ({}, [('Cache-Control', 'no-transform')], '200 OK'),
+    ]
+    for environ, extra_headers, status in cases:
+        headers = [('Content-Type', 'text/plain'), ('Vary', 'Accept-Encoding')]
+        app = create_app(headers=headers + extra_headers, status=status)
+        middleware = compression.CompressionMiddleware(app, min_size=0)
+        _, headers, body = call(middleware, HTTP_ACCEPT_ENCODING='gzip', **environ)
+        assert headers.get('Content-Encoding') in [None, 'br']
+        assert body == DATA
+
+
+def test_middleware_stream():
+    chunks = [DATA[:100], DATA[100:]]
+    app = create_app(headers=[('Content-Type', 'application/x-ndjson')], body=chunks)
+    middleware = compression.CompressionMiddleware(app)
+    _, headers, body = call(middleware, HTTP_ACCEPT_ENCODING='gzip')
+    assert headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in headers
+    assert gzip.decompress(body) == DATA
+    assert app.app_iter.close.called
+
+
+def test_middleware_stream_large():
+    middleware = compression.CompressionMiddleware(create_app(), stream_size=100)
+    _, headers, body = call(middleware, HTTP_ACCEPT_ENCODING='gzip')
+    assert 'Content-Length' not in headers
+    assert gzip.decompress(body) == DATA
+
+
+def test_middleware_cache():
+    headers = [
+        ('Content-Type', 'application/json'),
+        ('Content-Length', str(len(DATA))),
+        ('ETag', '"abc"')
+    ]
+    app = create_app(headers=headers)
+    middleware = compression.CompressionMiddleware(app)
+    middleware.cache.set(('"abc"', 'gzip'), b'cached')
+    _, response_headers, body = call(
+        middleware,
+        HTTP_ACCEPT_ENCODING='gzip',
+        HTTP_IF_NONE_MATCH='"abc-gzip", "def"'
+    )
+    assert body == b'cached'
+    assert response_headers['ETag'] == '"abc-gzip"'
+    assert app.environ['HTTP_IF_NONE_MATCH'] == '"abc", "def"'
+    assert not app.app_iter.__iter__.called
+    assert app.app_iter.close.called
+
+
+def test_middleware_cache_miss():
+    headers = [
+        ('Content-Type', 'application/json'),
+        ('Content-Length', str(len(DATA))),
+        ('ETag', '"abc"')
+    ]
+    middleware = compression.CompressionMiddleware(create_app(headers=headers))
+    _, _, body = call(middleware, HTTP_ACCEPT_ENCODING='gzip')
+    assert gzip.decompress(body) == DATA
+    assert middleware.cache.get(('"abc"', 'gzip')) == body
+
+
+def test_middleware_weak_etag_not_cached():
+    headers = [('Content-Type', 'application/json'), ('ETag', 'W/"abc"')]
+    middleware = compression.CompressionMiddleware(create_app(headers=headers))
+    _, response_headers, _ = call(middleware, HTTP_ACCEPT_ENCODING='gzip')
+    assert 'ETag' not in response_headers
+    assert not middleware.cache
+
+
+def test_middleware_write_and_lazy_start_response():
+    def app(_, start_response):
+        write = start_response('200 OK', [('Content-Type', 'text/plain')])
+        write(DATA[:10])
+        yield DATA[10:]
+
+    def lazy_app(environ, start_response):
+        return app(environ, start_response)
+
+    middleware = compression.CompressionMiddleware(lazy_app, min_size=0)
+    _, _, body = call(middleware, HTTP_ACCEPT_ENCODING='gzip')
+    assert gzip.decompress(body) == DATA
+    _, _, body = call(middleware)
+    assert body == DATA
+
+
+def test_create_middleware():
+    app = Mock()
+    assert compression.create_middleware(app, {'WTF_COMPRESSION': False}) is app
+    middleware = compression.create_middleware(app, {
+        'WTF_COMPRESSION': True,
+        'WTF_COMPRESSION_MIN_SIZE': 1,
+        'WTF_COMPRESSION_LEVEL': 1,
+        'WTF_COMPRESSION_STREAM_SIZE': 2,
+        'WTF_COMPRESSION_CACHE_SIZE': 3
+    })
+    assert isinstance(middleware, compression.CompressionMiddleware)
+    assert (middleware.min_size, middleware.stream_size) == (1, 2)
+    assert middleware.cache.max_size == 3
@@ -0,0 +1,87 @@
+'''
+wtf.config
+
+Application configuration. Every setting has a default value below and can be
+    overridden by an environment variable of the same name, or by passing an
+    explicit value to one of the app factories.
+'''
+import os
+
+
+DEFAULTS = {
+    'WTF_COMPRESSION': True,
+    'WTF_COMPRESSION_MIN_SIZE': 512,
+    'WTF_COMPRESSION_LEVEL': 6,
+    'WTF_COMPRESSION_STREAM_SIZE': 1048576,
+    'WTF_COMPRESSION_CACHE_SIZE': 16777216,
+    'WTF_JSON_ENCODER': 'auto',
+    'WTF_RESPONSE_CACHE_SIZE': 10000,
+    'WTF_IDEMPOTENCY_CACHE_SIZE': 10000,
+    'WTF_IDEMPOTENCY_TTL': 86400,
+    'WTF_IDEMPOTENCY_TIMEOUT': 30.0,
+    'WTF_IDEMPOTENCY_STORAGE': 'memory',
+    'WTF_COALESCING': True,
+    'WTF_COALESCING_TIMEOUT': 30.0,
+    'WTF_REQUEST_LOADER': True,
+    'WTF_ADMISSION_LIMIT': 0,
+    'WTF_ADMISSION_ROUTE_LIMITS': 'create_account=4,get_export=2',
+    'WTF_ADMISSION_QUEUE_SIZE': 16,
+    'WTF_ADMISSION_TIMEOUT': 1.0,
+    'WTF_ADMISSION_RETRY_AFTER': 1,
+    'WTF_ADMISSION_EXEMPT': 'get_health,get_metrics',
+    'WTF_RATE_LIMITS': '',
+    'WTF_RATE_LIMIT_STORAGE': 'memory',
+    'WTF_RATE_LIMIT_MAX_KEYS': 100000,
+    'WTF_STORAGE': 'memory',
+    'WTF_REALMS': '',
+    'WTF_REALM_ROUTING': 'host',
+    'WTF_CATALOG': '',
+    'WTF_CATALOG_WATCH_INTERVAL': 0.0,
+    'WTF_WORKERS': 0,
+    'WTF_THREADS': 8,
+    'WTF_MAX_REQUESTS': 0,
+    'WTF_MAX_REQUESTS_JITTER': 0,
+    'WTF_GRACEFUL_TIMEOUT': 30.0,
+    'WTF_WORKER_CLASS': 'sync',
+    'WTF_KEEPALIVE': 5.0,
+    'WTF_METRICS': True,
+    'WTF_METRICS_DIR': '',
+    'WTF_METRICS_FLUSH_INTERVAL': 1.0,
+    'WTF_SERVER_TIMING': 'off',
+    'WTF_ADMIN_SECRET': '',
+    'WTF_PROFILE_DIR': '',
+    'WTF_PROFILE_SAMPLE_RATE': 0,
+    'WTF_PROFILE_MAX_FILES': 1000,
+    'WTF_SLOW_REQUEST_THRESHOLD': 0.0,
+    'WTF_SLOW_REQUEST_LOG': '',
+    'WTF_SLOW_REQUEST_LOG_SIZE': 10485760,
+    'WTF_SLOW_REQUEST_LOG_BACKUPS': 5,
+    'WTF_GRADE_SAMPLER': 'auto'
+}
+
+TRUE_VALUES = ['1', 'true', 'yes', 'on']
+
+
+def parse(value, default):
+    '''Parse an environment variable value into the type of its default.'''
+    if isinstance(default, bool):
+        return value.strip().lower() in TRUE_VALUES
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    return value
+
+
+def load(overrides=None):
+    '''Load the configuration.
+
+    Values are taken from (in order of precedence) the provided overrides, the
+        environment and finally DEFAULTS.
+    '''
+    config = {}
+    for name, default in DEFAULTS.items():
+        value = os.getenv(name)
+        config[name] = default if value is None else parse(value, default)
+    config.update(overrides or {})
+    return config
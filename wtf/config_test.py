@@ -0,0 +1,18 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from mock import patch
+from wtf import config
+
+
+def test_parse():
+    assert config.parse('yes', False) is True
+    assert config.parse('0', True) is False
+    assert config.parse('42', 0) == 42
+    assert config.parse('0.5', 1.0) == 0.5
+    assert config.parse('foo', 'bar') == 'foo'
+
+
+@patch.dict('wtf.config.DEFAULTS', {'WTF_FOO': 1, 'WTF_BAR': 'bar'}, clear=True)
+@patch.dict('os.environ', {'WTF_FOO': '2'})
+def test_load():
+    assert config.load() == {'WTF_FOO': 2, 'WTF_BAR': 'bar'}
+    assert config.load({'WTF_BAR': 'baz'}) == {'WTF_FOO': 2, 'WTF_BAR': 'baz'}
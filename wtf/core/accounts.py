@@ -7,11 +7,17 @@ Accounts have the following properties:
   * password: the password used to authenticate as the account
 '''
 from uuid import uuid4
-from wtf.core import util
+from wtf.core import loader, realms, timing, util
 from wtf.core.errors import NotFoundError, ValidationError
+from wtf.core.schema import STRING, Field, Schema
 
 
-REPO = {'by_id': {}, 'by_email': {}}
+REPO = realms.repository('accounts')
+SCHEMA = Schema([
+    Field('id', kind=STRING, allow_empty=False),
+    Field('email', kind=STRING, allow_empty=False),
+    Field('password', kind=STRING, allow_empty=False)
+])
 
 
 def create(**kwargs):
@@ -24,53 +30,54 @@ def create(**kwargs):
     }
 
 
+@timing.stage('save')
 def save(account):
     '''Create/update an account.'''
     account = account.copy()
     if account.get('id') is None:
         account['id'] = str(uuid4())
     validate(account)
+    # claim the email address atomically, in case it was registered since validation
+    by_email = REPO.get('by_email')
+    if by_email.setdefault(account.get('email'), account).get('id') != account.get('id'):
+        raise ValidationError(errors=['Email address already registered'])
     REPO.get('by_id')[account.get('id')] = account
-    REPO.get('by_email')[account.get('email')] = account
+    by_email[account.get('email')] = account
+    loader.store('accounts', account.get('id'), account)
     return account
 
 
+@timing.stage('validate')
 def validate(account):
     '''Validate an account.
 
     Raises a ValidationError if the account is invalid.
     '''
-    account_id = account.get('id')
+    errors = SCHEMA.errors(account)
     email = account.get('email')
-    password = account.get('password')
-    errors = []
-    if not account_id:
-        errors.append('Missing required field: id')
-    if not email:
-        errors.append('Missing required field: email')
-    else:
+    if email and isinstance(email, str):
         try:
             find_by_email(email)
             errors.append('Email address already registered')
         except NotFoundError:
             pass
-    if not password:
-        errors.append('Missing required field: password')
     if errors:
         raise ValidationError(errors=errors)
 
 
+@timing.stage('find')
 def find_by_id(account_id):
     '''Find an account with the provided id.
 
     Raises a NotFoundError if the account could not be found.
     '''
-    account = REPO.get('by_id').get(account_id)
+    account = loader.load('accounts', REPO.get('by_id'), account_id)
     if account is None:
         raise NotFoundError('Account not found')
     return account
 
 
+@timing.stage('find')
 def find_by_email(email):
     '''Find an account with the provided email address.
 
@@ -93,6 +100,7 @@ def find_by_email_password(email, password):
     return account
 
 
+@timing.stage('transform')
 def transform(account):
     '''Transform an account.
 
@@ -102,3 +110,8 @@ def transform(account):
     account = account.copy()
     account.pop('password')
     return account
+
+
+def transform_many(accounts):
+    '''Transform many accounts (see transform()).'''
+    return [transform(account) for account in accounts]
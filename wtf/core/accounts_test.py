@@ -3,7 +3,7 @@
 # pylint: disable=redefined-outer-name
 import pytest
 from mock import patch
-from wtf.core import accounts
+from wtf.core import accounts, realms
 from wtf.core.errors import NotFoundError, ValidationError
 
 
@@ -21,7 +21,11 @@ TEST_DATA = {
 
 
 def setup_function():
-    accounts.REPO = {'by_id': {}, 'by_email': {}}
+    realms.activate(realms.Realm('test'))
+
+
+def teardown_function():
+    realms.activate(realms.DEFAULT)
 
 
 @patch('wtf.core.accounts.util.salt_and_hash')
@@ -72,6 +76,19 @@ def test_save_account_update(mock_validate):
     assert expected == accounts.REPO['by_email'][TEST_DATA['email']]
 
 
+@patch('wtf.core.accounts.validate')
+def test_save_account_email_taken(mock_validate):
+    # registered by another request after this one was validated
+    other = {'id': 'other', 'email': TEST_DATA['email']}
+    accounts.REPO['by_email'][TEST_DATA['email']] = other
+    mock_validate.return_value = None
+    with pytest.raises(ValidationError) as e:
+        accounts.save({'id': TEST_DATA['id'], 'email': TEST_DATA['email']})
+    assert e.value.errors == ['Email address already registered']
+    assert TEST_DATA['id'] not in accounts.REPO['by_id']
+    assert accounts.REPO['by_email'][TEST_DATA['email']] is other
+
+
 @patch('wtf.core.accounts.validate')
 def test_save_account_invalid(mock_validate):
     mock_validate.side_effect = ValidationError()
@@ -186,3 +203,12 @@ def test_transform_account():
     expected = {'foo': 'bar'}
     actual = accounts.transform({'foo': 'bar', 'password': 'foobar'})
     assert expected == actual
+
+
+def test_transform_many_accounts():
+    expected = [{'foo': 'bar'}, {'foo': 'baz'}]
+    actual = accounts.transform_many([
+        {'foo': 'bar', 'password': 'foobar'},
+        {'foo': 'baz', 'password': 'foobaz'}
+    ])
+    assert expected == actual
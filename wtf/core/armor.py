@@ -28,35 +28,23 @@ Armor have the following properties:
     > The higher this value, the "better" the armor
 '''
 from uuid import uuid4
-from wtf.core import equipment, util
+from wtf.core import equipment, loader, realms, timing, util
 from wtf.core.errors import NotFoundError, ValidationError
+from wtf.core.schema import STRING, Field, Schema
 
 
-REPO = {'by_id': {}}
-REPO_RECIPES = {'by_id': {}}
+REPO = realms.repository('armor')
+REPO_RECIPES = realms.repository('armor_recipes')
 ARMOR_LOCATIONS = ['head', 'chest', 'hands', 'legs', 'feet']
+RECIPE_SCHEMA = Schema(equipment.RECIPE_FIELDS + [
+    Field('location', choices=ARMOR_LOCATIONS, invalid='Invalid armor location')
+] + equipment.min_max_fields('defense'))
+SCHEMA = Schema(equipment.FIELDS + [Field('recipe', kind=STRING)])
 
 
 def create_recipe(**kwargs):
     '''Create an armor recipe.'''
-    recipe = equipment.create_recipe(**kwargs)
-    defense = kwargs.get('defense', {})
-    defense_min = defense.get('min', {})
-    defense_max = defense.get('max', {})
-    recipe.update({
-        'location': kwargs.get('location'),
-        'defense': {
-            'min': {
-                'center': defense_min.get('center', None),
-                'radius': defense_min.get('radius', None)
-            },
-            'max': {
-                'center': defense_max.get('center', None),
-                'radius': defense_max.get('radius', None)
-            }
-        }
-    })
-    return recipe
+    return RECIPE_SCHEMA.shape(kwargs)
 
 
 def create(**kwargs):
@@ -64,6 +52,7 @@ def create(**kwargs):
     return equipment.create(**kwargs)
 
 
+@timing.stage('save')
 def save_recipe(recipe):
     '''Create/update an armor recipe.
 
@@ -73,10 +62,13 @@ def save_recipe(recipe):
     if recipe.get('id') is None:
         recipe['id'] = str(uuid4())
     validate_recipe(recipe)
-    REPO_RECIPES['by_id'][recipe['id']] = recipe
+    with equipment.RECIPES_LOCK:
+        REPO_RECIPES['by_id'][recipe['id']] = recipe
+    loader.store('armor-recipes', recipe['id'], recipe)
     return recipe
 
 
+@timing.stage('save')
 def save(armor):
     '''Create/update an armor.
 
@@ -90,43 +82,24 @@ def save(armor):
     return armor
 
 
+@timing.stage('validate')
 def validate_recipe(recipe):
     '''Validate an armor recipe.
 
     Raises a ValidationError if the provided recipe is invalid.
     '''
-    errors = []
-    try:
-        equipment.validate_recipe(recipe)
-    except ValidationError as error:
-        errors += error.errors
-    location = recipe.get('location')
-    if location is None:
-        errors.append('Missing required field: location')
-    elif location not in ARMOR_LOCATIONS:
-        errors.append('Invalid armor location')
-    try:
-        equipment.validate_recipe_min_max_field(recipe, 'defense')
-    except ValidationError as error:
-        errors += error.errors
-    if errors:
-        raise ValidationError(errors=errors)
+    RECIPE_SCHEMA.validate(recipe)
 
 
+@timing.stage('validate')
 def validate(armor):
     '''Validate an armor.
 
     Raises a ValidationError if the provided armor is invalid.
     '''
-    errors = []
-    try:
-        equipment.validate(armor)
-    except ValidationError as error:
-        errors += error.errors
+    errors = SCHEMA.errors(armor)
     recipe = armor.get('recipe')
-    if recipe is None:
-        errors.append('Missing required field: recipe')
-    else:
+    if isinstance(recipe, str):
         try:
             find_recipe_by_id(recipe)
         except NotFoundError as error:
@@ -136,17 +109,19 @@ def validate(armor):
 
 
 # pylint: disable=duplicate-code
+@timing.stage('find')
 def find_recipe_by_id(recipe_id):
     '''Find an armor recipe with the provided id.
 
     Raises a NotFoundError if the recipe could not be found.
     '''
-    recipe = REPO_RECIPES['by_id'].get(recipe_id)
+    recipe = loader.load('armor-recipes', REPO_RECIPES['by_id'], recipe_id)
     if recipe is None:
         raise NotFoundError('Armor recipe not found')
     return recipe
 
 
+@timing.stage('find')
 def find_by_id(armor_id):
     '''Find an armor with the provided id.
 
@@ -169,7 +144,30 @@ def transform(armor):
       - defense.min: derived from recipe and grade, rounded to 2 decimal places
       - defense.max: derived from recipe and grade, rounded to 2 decimal places
     '''
-    recipe = find_recipe_by_id(armor.get('recipe'))
+    return transform_with_recipe(armor, find_recipe_by_id(armor.get('recipe')))
+
+
+def transform_many(items):
+    '''Transform many armor (see transform()).
+
+    The recipes are looked up at once (see wtf.core.loader).
+
+    Raises a NotFoundError if a recipe could not be found.
+    '''
+    recipes = loader.load_many(
+        'armor-recipes', REPO_RECIPES['by_id'], [armor.get('recipe') for armor in items])
+    transformed = []
+    for armor in items:
+        recipe = recipes[armor.get('recipe')]
+        if recipe is None:
+            raise NotFoundError('Armor recipe not found')
+        transformed.append(transform_with_recipe(armor, recipe))
+    return transformed
+
+
+@timing.stage('transform')
+def transform_with_recipe(armor, recipe):
+    '''Transform an armor's fields using an already retrieved recipe.'''
     grade = armor.get('grade')
     armor = equipment.transform(armor, recipe)
     defense = recipe.get('defense')
@@ -2,8 +2,8 @@
 # pylint: disable=invalid-name
 # pylint: disable=redefined-outer-name
 import pytest
-from mock import patch
-from wtf.core import armor
+from mock import Mock, patch
+from wtf.core import armor, realms
 from wtf.core.errors import NotFoundError, ValidationError
 
 
@@ -30,8 +30,11 @@ TEST_DATA = {
 
 
 def setup_function():
-    armor.REPO_RECIPES = {'by_id': {}}
-    armor.REPO = {'by_id': {}}
+    realms.activate(realms.Realm('test'))
+
+
+def teardown_function():
+    realms.activate(realms.DEFAULT)
 
 
 def test_create_armor_recipe():
@@ -390,3 +393,25 @@ def test_transform_weapon(mock_find_recipe_by_id, name, description):
         'other': 'fields'
     })
     assert expected == actual
+
+
+def test_transform_many_armor():
+    recipe = TEST_DATA.get('recipe')
+    by_id = Mock(get=Mock(return_value=recipe),
+                 get_many=Mock(return_value={recipe['id']: recipe}))
+    items = [
+        {'id': str(i), 'recipe': recipe['id'], 'grade': TEST_DATA['grade']}
+        for i in range(3)
+    ]
+    with patch('wtf.core.armor.REPO_RECIPES', {'by_id': by_id}):
+        expected = [armor.transform(item) for item in items]
+        actual = armor.transform_many(items)
+    assert expected == actual
+    by_id.get_many.assert_called_once_with([recipe['id']])
+
+
+@patch('wtf.core.armor.REPO_RECIPES', {'by_id': {}})
+def test_transform_many_armor_recipe_not_found():
+    with pytest.raises(NotFoundError) as e:
+        armor.transform_many([{'id': 'foo', 'recipe': 'bar', 'grade': TEST_DATA['grade']}])
+    assert str(e.value) == 'Armor recipe not found'
@@ -0,0 +1,156 @@
+'''
+wtf.core.catalog
+
+The recipe catalog: the weapon and armor recipes that the game is played with,
+    loaded from a JSON file (WTF_CATALOG) when the app starts:
+
+    {
+        "weapon-recipes": [{"id": "...", "name": "...", ...}, ...],
+        "armor-recipes": [{"id": "...", "name": "...", ...}, ...]
+    }
+
+Recipes should have fixed IDs, so that loading the catalog again (e.g. into
+    persistent storage) updates them instead of creating duplicates.
+
+A catalog can also be loaded from a snapshot: a binary file (pickled) with the
+    recipes of a catalog that was already loaded, and so validated, which
+    loads much faster than the JSON catalog. Snapshots are written with
+    `python -m wtf snapshot <catalog> <snapshot>`, and load() recognizes them
+    by their header. Only load snapshots that you wrote: unpickling can run
+    arbitrary code.
+
+The catalog can be reloaded while the app is serving requests (see reload()):
+    through the API (`POST /admin/catalog/reload`), or by watching the
+    catalog file for changes (see wtf.api.catalog_watcher).
+
+The recipes are stored in the repositories of the current realm (see
+    wtf.core.realms), which has its own catalog version. Realms that play
+    with the same catalog can share its recipes: read() it once, and store()
+    the recipes in each realm.
+'''
+import gc
+import json
+import pickle
+from uuid import uuid4
+from wtf.core import armor, equipment, realms, weapons
+
+
+KINDS = {
+    'weapon-recipes': weapons,
+    'armor-recipes': armor
+}
+SNAPSHOT_HEADER = b'WTF catalog snapshot 1\n'
+
+
+def read(path):
+    '''Read a catalog file or snapshot into recipes by kind and ID, without storing them.
+
+    Raises a ValidationError if a recipe of a catalog file is invalid.
+    '''
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data.startswith(SNAPSHOT_HEADER):
+        return read_snapshot(data)
+    catalog = json.loads(data.decode('utf-8'))
+    recipes = {}
+    for kind, module in KINDS.items():
+        recipes[kind] = {}
+        for recipe in catalog.get(kind, []):
+            recipe = dict(module.create_recipe(**recipe), id=recipe.get('id') or str(uuid4()))
+            module.validate_recipe(recipe)
+            recipes[kind][recipe['id']] = recipe
+    return recipes
+
+
+def read_snapshot(data):
+    '''Read the recipes of a snapshot by kind and ID.
+
+    The recipes were validated before the snapshot was written, so they are
+        not validated again. Garbage collection is paused while unpickling,
+        since it would otherwise run over and over as the recipes are created.
+    '''
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        snapshot = pickle.loads(memoryview(data)[len(SNAPSHOT_HEADER):])
+    finally:
+        if enabled:
+            gc.enable()
+    return {kind: snapshot.get(kind, {}) for kind in KINDS}
+
+
+def load(path):
+    '''Load a catalog file or snapshot, returning the number of recipes of each kind.
+
+    Raises a ValidationError if a recipe of a catalog file is invalid.
+    '''
+    return store(read(path))
+
+
+def store(recipes):
+    '''Store recipes by kind and ID (see read()), returning the number of each kind.'''
+    with equipment.RECIPES_LOCK:
+        for kind, module in KINDS.items():
+            module.REPO_RECIPES['by_id'].update(recipes[kind])
+    return {kind: len(recipes[kind]) for kind in KINDS}
+
+
+def reload(path, served=None):
+    '''Reload a catalog file or snapshot while the app is serving requests.
+
+    The catalog is reloaded in the current realm, or in each of the `served`
+        realms: it is read once, and the same recipes are added to each realm.
+
+    The new recipes are read and validated before any is stored. They are
+        then added to (or replace recipes with the same ID in) a copy of each
+        repository, which replaces the repository's index in a single
+        assignment: readers never lock, and see either the old or the new
+        recipes of a kind, never a mix of both. Recipes that are no longer in
+        the catalog are kept, since items may have been generated from them.
+        Repositories that are not stored in memory (see wtf.storage) are
+        updated in place. The catalog versions are incremented once every
+        repository is updated.
+
+    Returns the new catalog version (of the first realm) and the number of
+        recipes of each kind. Raises a ValidationError if a recipe is
+        invalid, leaving the repositories unchanged.
+    '''
+    recipes = read(path)
+    served = served or [realms.current()]
+    with equipment.RECIPES_LOCK:
+        swaps = []
+        for realm in served:
+            with realms.using(realm):
+                for kind, module in KINDS.items():
+                    by_id = module.REPO_RECIPES['by_id']
+                    if isinstance(by_id, dict):
+                        by_id = dict(by_id)
+                        by_id.update(recipes[kind])
+                        swaps.append((realm, module, by_id))
+                    else:
+                        by_id.update(recipes[kind])
+        for realm, module, by_id in swaps:
+            with realms.using(realm):
+                module.REPO_RECIPES['by_id'] = by_id
+        for realm in served:
+            realm.catalog_version += 1
+        return {
+            'version': served[0].catalog_version,
+            'recipes': {kind: len(recipes[kind]) for kind in KINDS}
+        }
+
+
+def version():
+    '''Get the catalog version of the current realm, which is incremented by every reload.'''
+    return realms.current().catalog_version
+
+
+def write_snapshot(path):
+    '''Write the recipes in the repositories to a snapshot file.'''
+    snapshot = {
+        kind: dict(module.REPO_RECIPES['by_id'].items())
+        for kind, module in KINDS.items()
+    }
+    with open(path, 'wb') as file:
+        file.write(SNAPSHOT_HEADER)
+        pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
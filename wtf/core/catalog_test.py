@@ -0,0 +1,128 @@
+# pylint: disable=missing-docstring,invalid-name
+import json
+import threading
+import pytest
+from mock import patch
+from wtf.core import catalog, equipment, weapons
+from wtf.core.errors import ValidationError
+
+
+RECIPE = {
+    'id': 'foo-sword',
+    'name': 'Foo Sword',
+    'description': 'The mightiest sword in all the land.',
+    'weight': {'center': 12, 'radius': 3},
+    'type': 'sword',
+    'damage': {
+        'min': {'center': 50, 'radius': 10},
+        'max': {'center': 100, 'radius': 10}
+    }
+}
+
+
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_load(tmpdir):
+    path = tmpdir.join('catalog.json')
+    path.write(json.dumps({'weapon-recipes': [RECIPE]}))
+    assert catalog.load(str(path)) == {'weapon-recipes': 1, 'armor-recipes': 0}
+    assert weapons.find_recipe_by_id('foo-sword')['handedness'] == 1
+    catalog.load(str(path))
+    assert len(weapons.REPO_RECIPES['by_id']) == 1
+
+
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_load_invalid(tmpdir):
+    path = tmpdir.join('catalog.json')
+    path.write(json.dumps({'weapon-recipes': [dict(RECIPE, type='spoon')]}))
+    with pytest.raises(ValidationError) as e:
+        catalog.load(str(path))
+    assert e.value.errors == ['Invalid weapon type']
+
+
+@patch('wtf.core.armor.REPO_RECIPES', {'by_id': {}})
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_snapshot(tmpdir):
+    path = tmpdir.join('catalog.json')
+    path.write(json.dumps({'weapon-recipes': [RECIPE]}))
+    catalog.load(str(path))
+    snapshot = str(tmpdir.join('catalog.snapshot'))
+    catalog.write_snapshot(snapshot)
+    expected = weapons.find_recipe_by_id('foo-sword')
+    weapons.REPO_RECIPES['by_id'].clear()
+    assert catalog.load(snapshot) == {'weapon-recipes': 1, 'armor-recipes': 0}
+    assert weapons.find_recipe_by_id('foo-sword') == expected
+
+
+def write_catalog(path, damage):
+    recipes = [dict(RECIPE, id='sword-%d' % i, damage={
+        'min': {'center': damage, 'radius': 1},
+        'max': {'center': damage * 2, 'radius': 1}
+    }) for i in range(100)]
+    path.write(json.dumps({'weapon-recipes': recipes}))
+
+
+@patch('wtf.core.armor.REPO_RECIPES', {'by_id': {}})
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {'custom': dict(RECIPE, id='custom')}})
+def test_reload(tmpdir):
+    path = tmpdir.join('catalog.json')
+    write_catalog(path, 10)
+    version = catalog.version()
+    by_id = weapons.REPO_RECIPES['by_id']
+    result = catalog.reload(str(path))
+    assert result == {'version': version + 1,
+                      'recipes': {'weapon-recipes': 100, 'armor-recipes': 0}}
+    assert catalog.version() == version + 1
+    # a new index replaced the old one, which is left untouched
+    assert weapons.REPO_RECIPES['by_id'] is not by_id
+    assert list(by_id) == ['custom']
+    assert len(weapons.REPO_RECIPES['by_id']) == 101
+    path.write(json.dumps({'weapon-recipes': [dict(RECIPE, id='sword-0', type='spoon')]}))
+    by_id = weapons.REPO_RECIPES['by_id']
+    with pytest.raises(ValidationError):
+        catalog.reload(str(path))
+    assert weapons.REPO_RECIPES['by_id'] is by_id
+    assert catalog.version() == version + 1
+
+
+@patch('wtf.core.armor.REPO_RECIPES', {'by_id': {}})
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_reload_while_reading(tmpdir):
+    '''Readers never wait for a reload, nor see a mix of two catalogs.'''
+    paths = [tmpdir.join('catalog-%d.json' % damage) for damage in [10, 20]]
+    for path, damage in zip(paths, [10, 20]):
+        write_catalog(path, damage)
+    catalog.load(str(paths[0]))
+    weapon = {'id': 'foo', 'recipe': 'sword-50', 'grade': 0.5}
+    stop = threading.Event()
+    errors = []
+    reads = []
+
+    def read():
+        count = 0
+        while not stop.is_set():
+            by_id = weapons.REPO_RECIPES['by_id']
+            centers = {recipe['damage']['min']['center'] for recipe in by_id.values()}
+            transformed = weapons.transform(weapon)
+            count += 1
+            if len(centers) != 1 or transformed['damage']['min'] not in (10, 20):
+                errors.append((centers, transformed))
+        reads.append(count)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i in range(20):
+            catalog.reload(str(paths[i % 2]))
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+    assert errors == []
+    assert all(count > 0 for count in reads)
+    # readers don't take the lock that reloads hold
+    reader = threading.Thread(target=lambda: reads.append(weapons.transform(weapon)))
+    with equipment.RECIPES_LOCK:
+        reader.start()
+        reader.join(5)
+        assert not reader.is_alive()
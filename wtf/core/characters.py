@@ -16,10 +16,17 @@ Characters have the following properties:
     * accuracy: increases normal and critical attack chance
 '''
 from uuid import uuid4
+from wtf.core import loader, realms, timing
 from wtf.core.errors import NotFoundError, ValidationError
+from wtf.core.schema import STRING, Field, Schema
 
 
-REPO = {'by_id': {}, 'by_account': {}}
+REPO = realms.repository('characters')
+SCHEMA = Schema([
+    Field('id', kind=STRING, allow_empty=False),
+    Field('account', kind=STRING, allow_empty=False),
+    Field('name', kind=STRING, allow_empty=False)
+])
 
 
 def create(**kwargs):
@@ -63,6 +70,7 @@ def allocate_ability_points(character, **kwargs):
     return character
 
 
+@timing.stage('save')
 def save(character):
     '''Create/update a character.
 
@@ -73,28 +81,27 @@ def save(character):
         character['id'] = str(uuid4())
     validate(character)
     REPO.get('by_id')[character.get('id')] = character
-    REPO.get('by_account') \
-        .setdefault(character.get('account'), []) \
-        .append(character)
+    by_account = REPO.get('by_account')
+    account = character.get('account')
+    if isinstance(by_account, dict):
+        by_account.setdefault(account, []).append(character)
+    else:
+        # e.g. SQLite (see wtf.storage), which appends in a transaction
+        by_account.append(account, character)
+    loader.store('characters', character.get('id'), character)
     return character
 
 
+@timing.stage('validate')
 def validate(character):
     '''Validate a character.
 
     Raises a ValidationError if the provided character is invalid.
     '''
-    character_id = character.get('id')
+    errors = SCHEMA.errors(character)
     account = character.get('account')
     name = character.get('name')
-    errors = []
-    if not character_id:
-        errors.append('Missing required field: id')
-    if not account:
-        errors.append('Missing required field: account')
-    if not name:
-        errors.append('Missing required field: name')
-    if account and name:
+    if account and name and isinstance(account, str) and isinstance(name, str):
         names = [c.get('name') for c in find_by_account(account)]
         if name in names:
             errors.append('Duplicate character name: %s' % name)
@@ -102,17 +109,19 @@ def validate(character):
         raise ValidationError(errors=errors)
 
 
+@timing.stage('find')
 def find_by_id(character_id):
     '''Find a character with the provided id.
 
     Raises a NotFoundError if the character could not be found.
     '''
-    character = REPO.get('by_id').get(character_id)
+    character = loader.load('characters', REPO.get('by_id'), character_id)
     if character is None:
         raise NotFoundError('Character not found')
     return character
 
 
+@timing.stage('find')
 def find_by_account(account):
     '''Find a characters owned by an account with the provided account ID.'''
     return REPO.get('by_account').get(account, [])
@@ -1,9 +1,10 @@
 # pylint: disable=missing-docstring
 # pylint: disable=invalid-name
 # pylint: disable=redefined-outer-name
+import threading
 import pytest
 from mock import patch
-from wtf.core import characters
+from wtf.core import characters, realms
 from wtf.core.errors import NotFoundError, ValidationError
 
 
@@ -22,7 +23,11 @@ TEST_DATA = {
 
 
 def setup_function():
-    characters.REPO = {'by_id': {}, 'by_account': {}}
+    realms.activate(realms.Realm('test'))
+
+
+def teardown_function():
+    realms.activate(realms.DEFAULT)
 
 
 def test_create_character():
@@ -142,6 +147,24 @@ def test_save_character_update(mock_validate):
     assert expected in characters.REPO['by_account'][TEST_DATA['account']]
 
 
+@patch('wtf.core.characters.validate')
+def test_save_character_concurrent(mock_validate):
+    mock_validate.return_value = None
+    realm = realms.current()
+
+    def save():
+        with realms.using(realm):
+            for _ in range(100):
+                characters.save({'account': TEST_DATA['account']})
+
+    threads = [threading.Thread(target=save) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(characters.REPO['by_account'][TEST_DATA['account']]) == 800
+
+
 @patch('wtf.core.characters.validate')
 def test_save_character_invalid(mock_validate):
     mock_validate.side_effect = ValidationError()
@@ -17,23 +17,50 @@ Equipment have the following properties:
   * description: (customizable) equipment description
   * grade: a value from 0.0 to 1.0 that measures the quality of the equipment
     > The higher this value, the "better" the equipment
+
+Grades are sampled with NumPy or, with WTF_GRADE_SAMPLER=python, with the
+    standard library's random module. NumPy is only imported when the first
+    grade is generated (or the generator is seeded), since importing it takes
+    a large share of the startup time.
+
+Each realm (see wtf.core.realms) generates grades with its own random number
+    generators: those of the default realm are `RANDOM` and NumPy's global
+    generator.
 '''
-import numpy as np
-from wtf.core import util
-from wtf.core.errors import ValidationError
+import threading
+from functools import lru_cache
+from importlib.util import find_spec
+from wtf.core import realms, timing, util
+from wtf.core.schema import NUMBER, STRING, Field, Rule, Schema
+
+
+RECIPE_FIELDS = [
+    Field('id', kind=STRING, generated=True),
+    Field('name', kind=STRING),
+    Field('description', kind=STRING),
+    Field('weight.center', kind=NUMBER),
+    Field('weight.radius', kind=NUMBER),
+    Rule(['weight.center', 'weight.radius'], lambda center, radius: center - radius >= 0,
+         'Weight must be >= 0')
+]
+FIELDS = [
+    Field('id', kind=STRING),
+    Field('grade', kind=NUMBER),
+    Rule(['grade'], lambda grade: 0 < grade < 1, 'Equipment grade must be >= 0.0 and <= 1.0')
+]
+RECIPE_SCHEMA = Schema(RECIPE_FIELDS)
+SCHEMA = Schema(FIELDS)
+SAMPLERS = ['auto', 'numpy', 'python']
+SAMPLER = {'name': 'auto'}
+RANDOM = realms.DEFAULT.random
+# serializes the writers of the recipe repositories, so that a catalog reload
+#   doesn't lose recipes saved while it runs (see wtf.core.catalog)
+RECIPES_LOCK = threading.Lock()
 
 
 def create_recipe(**kwargs):
     '''Create an equipment recipe.'''
-    weight = kwargs.get('weight', {})
-    return {
-        'name': kwargs.get('name'),
-        'description': kwargs.get('description'),
-        'weight': {
-            'center': weight.get('center', None),
-            'radius': weight.get('radius', None)
-        }
-    }
+    return RECIPE_SCHEMA.shape(kwargs)
 
 
 def create(**kwargs):
@@ -46,12 +73,67 @@ def create(**kwargs):
     }
 
 
+@timing.stage('generate_grade')
 def generate_grade(probabilities=None):
     '''Generate a random equipment grade.'''
     if probabilities is None:
         probabilities = grade_probabilities()
-    choices = np.arange(0.0, 1.0, 0.1) + np.random.uniform(0.0, 0.1)
-    return np.random.choice(choices, p=probabilities)
+    realm = realms.current()
+    if sampler() == 'python':
+        offset = realm.random.uniform(0.0, 0.1)
+        choices = [i / 10 + offset for i in range(10)]
+        return realm.random.choices(choices, weights=probabilities)[0]
+    np = numpy()
+    generator = numpy_random(realm)
+    choices = np.arange(0.0, 1.0, 0.1) + generator.uniform(0.0, 0.1)
+    return generator.choice(choices, p=probabilities)
+
+
+def set_sampler(name):
+    '''Set the grade sampler: "numpy", "python" or "auto" (NumPy if installed).
+
+    Raises a ValueError if the sampler is unknown.
+    '''
+    if name not in SAMPLERS:
+        raise ValueError('Invalid grade sampler: %s (expected one of: %s)' % (
+            name, ', '.join(SAMPLERS)))
+    SAMPLER['name'] = name
+
+
+def sampler():
+    '''Get the name of the grade sampler in use: "numpy" or "python".'''
+    name = SAMPLER['name']
+    if name == 'auto':
+        name = 'numpy' if find_spec('numpy') is not None else 'python'
+        SAMPLER['name'] = name
+    return name
+
+
+def numpy():
+    '''Import NumPy (on first use).'''
+    import numpy as np
+    return np
+
+
+def numpy_random(realm):
+    '''Get the NumPy random number generator of a realm (created on first use).'''
+    if realm is realms.DEFAULT:
+        return numpy().random
+    if realm.numpy_random is None:
+        realm.numpy_random = numpy().random.RandomState()
+    return realm.numpy_random
+
+
+def seed(value=None):
+    '''Seed the random number generators used to generate grades, in every realm.
+
+    Forked processes must reseed them, or they would all generate the same
+        grades as the process they were forked from.
+    '''
+    for realm in realms.realms():
+        realm.random.seed(value)
+        if sampler() == 'numpy':
+            numpy_random(realm).seed(value)
 
 
 def grade_probabilities():
@@ -61,30 +143,46 @@ def grade_probabilities():
     return [i / total for i in dist]
 
 
+def min_max_fields(field_name):
+    '''Get the schema of a field in an equipment recipe with a min/max value.'''
+    path = field_name + '.%s.%s'
+    return [
+        Field(path % ('min', 'center'), kind=NUMBER),
+        Field(path % ('min', 'radius'), kind=NUMBER),
+        Rule([path % ('min', 'center'), path % ('min', 'radius')],
+             lambda center, radius: center - radius > 0,
+             'Min %s must be > 0' % field_name),
+        Field(path % ('max', 'center'), kind=NUMBER),
+        Field(path % ('max', 'radius'), kind=NUMBER),
+        Rule([path % ('max', 'center'), path % ('max', 'radius')],
+             lambda center, radius: center - radius > 0,
+             'Max %s must be > 0' % field_name),
+        Rule([path % ('min', 'center'), path % ('min', 'radius'),
+              path % ('max', 'center'), path % ('max', 'radius')],
+             _min_lte_max,
+             'Min {0} must be <= max {0} for all values'.format(field_name))
+    ]
+
+
+def _min_lte_max(min_center, min_radius, max_center, max_radius):
+    return max_center >= min_center and util.interval_intersect(
+        {'center': min_center, 'radius': min_radius},
+        {'center': max_center, 'radius': max_radius}
+    ) is None
+
+
+@lru_cache(maxsize=None)
+def min_max_schema(field_name):
+    '''Get the compiled schema of a min/max field (see min_max_fields()).'''
+    return Schema(min_max_fields(field_name))
+
+
 def validate_recipe(recipe):
     '''Validate an equipment recipe.
 
     Raises a ValidationError if the provided recipe is invalid.
     '''
-    errors = []
-    if recipe.get('id') is None:
-        errors.append('Missing required field: id')
-    if recipe.get('name') is None:
-        errors.append('Missing required field: name')
-    if recipe.get('description') is None:
-        errors.append('Missing required field: description')
-    weight = recipe.get('weight', {})
-    weight_center = weight.get('center')
-    weight_radius = weight.get('radius')
-    if None in [weight_center, weight_radius]:
-        if weight_center is None:
-            errors.append('Missing required field: weight.center')
-        if weight_radius is None:
-            errors.append('Missing required field: weight.radius')
-    elif weight_center - weight_radius < 0:
-        errors.append('Weight must be >= 0')
-    if errors:
-        raise ValidationError(errors=errors)
+    RECIPE_SCHEMA.validate(recipe)
 
 
 def validate_recipe_min_max_field(recipe, field_name):
@@ -92,45 +190,7 @@ def validate_recipe_min_max_field(recipe, field_name):
 
     Raises a ValidationError if the field with the provided name is invalid.
     '''
-    errors = []
-    field = recipe.get(field_name, {})
-    field_min = field.get('min', {})
-    field_min_center = field_min.get('center')
-    field_min_radius = field_min.get('radius')
-    if None in [field_min_center, field_min_radius]:
-        if field_min_center is None:
-            errors.append('Missing required field: %s.min.center' % field_name)
-        if field_min_radius is None:
-            errors.append('Missing required field: %s.min.radius' % field_name)
-    elif field_min_center - field_min_radius <= 0:
-        errors.append('Min %s must be > 0' % field_name)
-    field_max = field.get('max', {})
-    field_max_center = field_max.get('center')
-    field_max_radius = field_max.get('radius')
-    if None in [field_max_center, field_max_radius]:
-        if field_max_center is None:
-            errors.append('Missing required field: %s.max.center' % field_name)
-        if field_max_radius is None:
-            errors.append('Missing required field: %s.max.radius' % field_name)
-    elif field_max_center - field_max_radius <= 0:
-        errors.append('Max %s must be > 0' % field_name)
-    min_lte_max = (
-        None not in [
-            field_min_center,
-            field_min_radius,
-            field_max_center,
-            field_max_radius
-        ]
-        and (
-            field_max_center < field_min_center
-            or util.interval_intersect(field_min, field_max) is not None
-        )
-    )
-    if min_lte_max:
-        error = 'Min {0} must be <= max {0} for all values'.format(field_name)
-        errors.append(error)
-    if errors:
-        raise ValidationError(errors=errors)
+    min_max_schema(field_name).validate(recipe)
 
 
 def validate(equipment):
@@ -138,16 +198,7 @@ def validate(equipment):
 
     Raises a ValidationError if the provided equipment is invalid.
     '''
-    errors = []
-    if equipment.get('id') is None:
-        errors.append('Missing required field: id')
-    grade = equipment.get('grade')
-    if grade is None:
-        errors.append('Missing required field: grade')
-    elif not 0 < grade < 1:
-        errors.append('Equipment grade must be >= 0.0 and <= 1.0')
-    if errors:
-        raise ValidationError(errors=errors)
+    SCHEMA.validate(equipment)
 
 
 def transform(equipment, recipe):
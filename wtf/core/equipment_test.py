@@ -107,7 +107,8 @@ def test_create_equipment_defaults(mock_generate_grade):
     pytest.param(0.042, TEST_DATA['grade_probabilities']['custom']),
     pytest.param(0.023, None)
 ])
-@patch('wtf.core.equipment.np.random')
+@patch.dict('wtf.core.equipment.SAMPLER', {'name': 'numpy'})
+@patch('numpy.random')
 def test_generate_equipment_grade(mock_np_random, random_value, probabilities):
     expected = TEST_DATA['grade']
     mock_np_random.uniform.return_value = random_value
@@ -121,6 +122,28 @@ def test_generate_equipment_grade(mock_np_random, random_value, probabilities):
     assert kwargs == {'p': probabilities or default_probabilities}
 
 
+@patch.dict('wtf.core.equipment.SAMPLER', {'name': 'python'})
+def test_generate_equipment_grade_python():
+    equipment.seed(42)
+    grades = [equipment.generate_grade() for _ in range(1000)]
+    assert all(isinstance(grade, float) and 0 <= grade < 1 for grade in grades)
+    assert sum(grade >= 0.1 for grade in grades) < 250
+    equipment.seed(42)
+    assert equipment.generate_grade([0, 0, 1] + [0] * 7) != grades[0]
+    equipment.seed(42)
+    assert equipment.generate_grade() == grades[0]
+
+
+@patch.dict('wtf.core.equipment.SAMPLER', {'name': 'auto'})
+def test_set_sampler():
+    with patch('wtf.core.equipment.find_spec', return_value=None):
+        assert equipment.sampler() == 'python'
+    equipment.set_sampler('numpy')
+    assert equipment.sampler() == 'numpy'
+    with pytest.raises(ValueError):
+        equipment.set_sampler('foo')
+
+
 def test_equipment_grade_probabilities_default():
     expected = TEST_DATA['grade_probabilities']['default']
     actual = equipment.grade_probabilities()
@@ -0,0 +1,101 @@
+'''
+wtf.core.loader
+
+Request-scoped memoization of lookups by ID (recipes, accounts, characters),
+    so that the lookups of a request (e.g. validating a weapon looks up its
+    recipe, and transforming it looks it up again) hit the repository once
+    per record.
+
+Between `start()` and `stop()`, the lookups made by the current thread through
+    `load()` are remembered in its Loader; outside of them `load()` is a plain
+    lookup. `load_many()` looks up many records at once, in a single query
+    for repositories that support it (see wtf.storage), e.g. to transform a
+    list of items with their recipes:
+
+    recipes = loader.load_many('weapon-recipes', REPO_RECIPES['by_id'], recipe_ids)
+
+Records saved during a request replace the ones it remembers (see `store()`).
+    A Loader is never shared between threads or requests, so it never serves
+    records older than the request.
+'''
+import threading
+
+
+class _Local(threading.local):  # pylint: disable=too-few-public-methods
+    loader = None
+
+
+_LOCAL = _Local()
+
+
+# pylint: disable=too-few-public-methods
+class Loader(object):
+    '''The records looked up during a request, by (kind, ID).
+
+    Missing records are remembered as None.
+    '''
+
+    __slots__ = ['records', 'lookups']
+
+    def __init__(self):
+        self.records = {}
+        self.lookups = 0
+
+
+def start():
+    '''Start remembering the lookups of the current thread.'''
+    loader = _LOCAL.loader = Loader()
+    return loader
+
+
+def stop():
+    '''Stop remembering the lookups of the current thread, returning the Loader.'''
+    loader, _LOCAL.loader = _LOCAL.loader, None
+    return loader
+
+
+def current():
+    '''Get the Loader of the current thread, if any.'''
+    return _LOCAL.loader
+
+
+def load(kind, repo, key):
+    '''Look up a record of a kind by its ID in a repository index (None if missing).'''
+    loader = _LOCAL.loader
+    if loader is None:
+        return repo.get(key)
+    try:
+        return loader.records[kind, key]
+    except KeyError:
+        pass
+    loader.lookups += 1
+    record = loader.records[kind, key] = repo.get(key)
+    return record
+
+
+def load_many(kind, repo, keys):
+    '''Look up records of a kind by their IDs, returning them by ID (None if missing).
+
+    The records that the current thread hasn't already looked up are looked
+        up at once, with the repository's `get_many()` if it has one.
+    '''
+    loader = _LOCAL.loader
+    records = loader.records if loader is not None else {}
+    missing = list({key for key in keys if (kind, key) not in records})
+    if missing:
+        get_many = getattr(repo, 'get_many', None)
+        found = get_many(missing) if get_many is not None else {
+            key: repo.get(key) for key in missing
+        }
+        if loader is not None:
+            loader.lookups += 1
+        for key in missing:
+            records[kind, key] = found.get(key)
+    return {key: records[kind, key] for key in keys}
+
+
+def store(kind, key, record):
+    '''Remember a record saved by the current thread, if it remembers its lookups.'''
+    loader = _LOCAL.loader
+    if loader is not None:
+        loader.records[kind, key] = record
@@ -0,0 +1,67 @@
+# pylint: disable=missing-docstring,invalid-name
+from mock import Mock
+from wtf.core import loader
+
+
+def repository(records):
+    return Mock(get=Mock(side_effect=records.get),
+                get_many=Mock(side_effect=lambda keys: {
+                    key: records[key] for key in keys if key in records}))
+
+
+def test_load_without_loader():
+    repo = repository({'foo': {'id': 'foo'}})
+    assert loader.current() is None
+    assert loader.load('things', repo, 'foo') == {'id': 'foo'}
+    assert loader.load('things', repo, 'foo') == {'id': 'foo'}
+    assert repo.get.call_count == 2
+
+
+def test_load():
+    repo = repository({'foo': {'id': 'foo'}})
+    started = loader.start()
+    try:
+        assert loader.current() is started
+        assert loader.load('things', repo, 'foo') is loader.load('things', repo, 'foo')
+        assert loader.load('things', repo, 'bar') is None
+        assert loader.load('things', repo, 'bar') is None
+        assert loader.load('others', repo, 'foo') == {'id': 'foo'}
+    finally:
+        assert loader.stop() is started
+    assert repo.get.call_count == 3
+    assert started.lookups == 3
+    assert loader.current() is None
+
+
+def test_load_many():
+    repo = repository({'foo': {'id': 'foo'}, 'bar': {'id': 'bar'}})
+    loader.start()
+    try:
+        loader.load('things', repo, 'foo')
+        assert loader.load_many('things', repo, ['foo', 'bar', 'baz', 'bar']) == {
+            'foo': {'id': 'foo'}, 'bar': {'id': 'bar'}, 'baz': None}
+        assert loader.load('things', repo, 'bar') == {'id': 'bar'}
+        assert loader.load_many('things', repo, ['bar']) == {'bar': {'id': 'bar'}}
+    finally:
+        used = loader.stop()
+    assert sorted(repo.get_many.call_args[0][0]) == ['bar', 'baz']
+    assert repo.get_many.call_count == 1
+    assert used.lookups == 2
+
+
+def test_load_many_without_get_many():
+    records = {'foo': {'id': 'foo'}}
+    assert loader.load_many('things', records, ['foo', 'bar']) == {
+        'foo': {'id': 'foo'}, 'bar': None}
+
+
+def test_store():
+    repo = repository({})
+    loader.store('things', 'foo', {'id': 'foo'})
+    loader.start()
+    try:
+        assert loader.load('things', repo, 'foo') is None
+        loader.store('things', 'foo', {'id': 'foo'})
+        assert loader.load('things', repo, 'foo') == {'id': 'foo'}
+    finally:
+        loader.stop()
@@ -0,0 +1,141 @@
+'''
+wtf.core.realms
+
+Realms: independent game worlds served by the same process. Each realm has
+    its own repositories (accounts, characters, recipes, items), random
+    number generator (to generate grades) and catalog version.
+
+The repositories of wtf.core (e.g. `weapons.REPO`) are those of the current
+    realm of the calling thread: the default realm, unless another one is in
+    use (see `using()`; the API selects a realm per request, see
+    wtf.api.realms):
+
+    with realms.using(realms.realm('foo')):
+        weapons.save(...)  # saved in realm foo
+
+Realm names are lowercase letters, digits and hyphens, starting with a letter
+    (so that they can be host names).
+'''
+import random
+import re
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+
+DEFAULT_NAME = 'default'
+NAME = re.compile(r'^[a-z][a-z0-9-]*$')
+# the indexes of each repository
+REPOSITORIES = {
+    'accounts': ['by_id', 'by_email'],
+    'characters': ['by_id', 'by_account'],
+    'weapon_recipes': ['by_id'],
+    'weapons': ['by_id'],
+    'armor_recipes': ['by_id'],
+    'armor': ['by_id']
+}
+
+
+# pylint: disable=too-few-public-methods
+class Realm(object):
+    '''A game world: its repositories (by name, then index), RNG and catalog version.
+
+    `numpy_random` is the realm's NumPy generator, created when first used
+        (see wtf.core.equipment).
+    '''
+
+    __slots__ = ['name', 'repositories', 'random', 'numpy_random', 'catalog_version']
+
+    def __init__(self, name):
+        self.name = name
+        self.repositories = {
+            repository: {index: {} for index in indexes}
+            for repository, indexes in REPOSITORIES.items()
+        }
+        self.random = random.Random()
+        self.numpy_random = None
+        self.catalog_version = 0
+
+
+class Repository(MutableMapping):
+    '''A repository (its indexes by name) of the current realm.'''
+
+    __slots__ = ['name']
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getitem__(self, key):
+        return _LOCAL.realm.repositories[self.name][key]
+
+    def get(self, key, default=None):
+        return _LOCAL.realm.repositories[self.name].get(key, default)
+
+    def __setitem__(self, key, mapping):
+        _LOCAL.realm.repositories[self.name][key] = mapping
+
+    def __delitem__(self, key):
+        del _LOCAL.realm.repositories[self.name][key]
+
+    def __iter__(self):
+        return iter(_LOCAL.realm.repositories[self.name])
+
+    def __len__(self):
+        return len(_LOCAL.realm.repositories[self.name])
+
+
+DEFAULT = Realm(DEFAULT_NAME)
+REALMS = {DEFAULT_NAME: DEFAULT}
+LOCK = threading.Lock()
+
+
+class _Local(threading.local):  # pylint: disable=too-few-public-methods
+    realm = DEFAULT
+
+
+_LOCAL = _Local()
+
+
+def realm(name):
+    '''Get a realm by name, creating it if needed.
+
+    Raises a ValueError if the name is invalid.
+    '''
+    existing = REALMS.get(name)
+    if existing is not None:
+        return existing
+    if not NAME.match(name):
+        raise ValueError('Invalid realm name: %s' % name)
+    with LOCK:
+        return REALMS.setdefault(name, Realm(name))
+
+
+def realms():
+    '''Get every realm.'''
+    return list(REALMS.values())
+
+
+def repository(name):
+    '''Get a repository of the current realm, e.g. to use as a module's REPO.'''
+    return Repository(name)
+
+
+def current():
+    '''Get the realm of the current thread.'''
+    return _LOCAL.realm
+
+
+def activate(new):
+    '''Make a realm that of the current thread, returning the previous one.'''
+    previous, _LOCAL.realm = _LOCAL.realm, new
+    return previous
+
+
+@contextmanager
+def using(new):
+    '''Use a realm in the current thread, within a `with` block.'''
+    previous = activate(new)
+    try:
+        yield new
+    finally:
+        activate(previous)
@@ -0,0 +1,87 @@
+# pylint: disable=missing-docstring,invalid-name
+import threading
+import pytest
+from mock import patch
+from wtf.core import accounts, catalog, equipment, realms, weapons
+from wtf.core.errors import NotFoundError
+
+
+def test_realm():
+    realm = realms.realm('core-test')
+    assert realm.name == 'core-test'
+    assert realms.realm('core-test') is realm
+    assert realm in realms.realms()
+    assert realms.realm('default') is realms.DEFAULT
+    for name in ['', 'Foo', '1foo', 'foo.bar', 'foo_bar']:
+        with pytest.raises(ValueError):
+            realms.realm(name)
+
+
+def test_using():
+    realm = realms.Realm('foo')
+    assert realms.current() is realms.DEFAULT
+    with realms.using(realm):
+        assert realms.current() is realm
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(realms.current()))
+        thread.start()
+        thread.join()
+        # other threads keep their own realm
+        assert seen == [realms.DEFAULT]
+    assert realms.current() is realms.DEFAULT
+
+
+def test_repositories_isolated():
+    eu, us = realms.Realm('eu'), realms.Realm('us')
+    with realms.using(eu):
+        account = accounts.save(accounts.create(email='foo@example.com', password='foo'))
+        assert accounts.find_by_id(account['id']) == account
+        assert list(accounts.REPO) == ['by_id', 'by_email']
+        assert len(accounts.REPO) == 2
+    with realms.using(us):
+        with pytest.raises(NotFoundError):
+            accounts.find_by_id(account['id'])
+    assert eu.repositories['accounts']['by_id'] == {account['id']: account}
+    assert us.repositories['accounts']['by_id'] == {}
+
+
+def test_repository_replaced():
+    realm = realms.Realm('foo')
+    by_id = {'foo': {'id': 'foo'}}
+    with realms.using(realm):
+        weapons.REPO['by_id'] = by_id
+        assert weapons.find_by_id('foo') == {'id': 'foo'}
+    assert realm.repositories['weapons']['by_id'] is by_id
+    assert realms.DEFAULT.repositories['weapons']['by_id'] is not by_id
+
+
+@patch.dict('wtf.core.equipment.SAMPLER', {'name': 'python'})
+def test_grades():
+    eu, us = realms.Realm('eu'), realms.Realm('us')
+    eu.random.seed(42)
+    us.random.seed(42)
+    with realms.using(eu):
+        grades = [equipment.generate_grade() for _ in range(10)]
+    with realms.using(us):
+        assert [equipment.generate_grade() for _ in range(10)] == grades
+
+
+def test_numpy_random():
+    realm = realms.Realm('foo')
+    assert equipment.numpy_random(realms.DEFAULT) is equipment.numpy().random
+    generator = equipment.numpy_random(realm)
+    assert equipment.numpy_random(realm) is generator
+    assert generator is not equipment.numpy().random
+
+
+@patch('wtf.core.armor.REPO_RECIPES', {'by_id': {}})
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_catalog_version(tmpdir):
+    path = tmpdir.join('catalog.json')
+    path.write('{}')
+    realm = realms.Realm('foo')
+    version = catalog.version()
+    with realms.using(realm):
+        assert catalog.reload(str(path))['version'] == 1
+        assert catalog.version() == 1
+    assert catalog.version() == version
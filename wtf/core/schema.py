@@ -0,0 +1,236 @@
+'''
+wtf.core.schema
+
+Declarative schemas of the game's entities.
+
+A schema is an ordered list of fields and rules:
+  * Field: a (possibly nested) value addressed by a dotted path, e.g.
+    `weight.center`, with its type and constraints
+  * Rule: a constraint on one or more fields, only checked when each of them
+    is present and valid
+
+Each schema is compiled once into two functions, generated as straight-line
+    Python code:
+  * errors(obj): the list of validation errors of an object, in schema order
+  * shape(obj): a new object with every (non-generated) field of the schema,
+    missing values replaced by their defaults, extra values dropped
+  * extract(obj): the same, without defaults, e.g. for request bodies, whose
+    missing values are reported by errors()
+
+    RECIPE_SCHEMA = Schema([
+        Field('name', kind=STRING),
+        Field('weight.center', kind=NUMBER),
+        Field('weight.radius', kind=NUMBER),
+        Rule(['weight.center', 'weight.radius'], lambda c, r: c - r >= 0,
+             'Weight must be >= 0')
+    ])
+    RECIPE_SCHEMA.validate(recipe)
+'''
+from numbers import Real
+from wtf.core.errors import ValidationError
+
+
+NUMBER = 'number'
+STRING = 'string'
+
+
+# pylint: disable=too-few-public-methods,too-many-arguments,too-many-instance-attributes
+class Field(object):
+    '''A field of a schema.
+
+    Missing (None) required fields are reported as missing; `allow_empty=False`
+        also reports empty values (e.g. '') as missing. `kind` is NUMBER,
+        STRING or None (any type) and `choices` restricts the field to a list
+        of values, with `invalid` as the error message.
+        Generated fields (e.g. IDs) are left out of shaped objects.
+    '''
+
+    def __init__(self, path, kind=None, required=True, allow_empty=True,
+                 choices=None, invalid=None, default=None, generated=False):
+        self.path = path
+        self.kind = kind
+        self.required = required
+        self.allow_empty = allow_empty
+        self.choices = tuple(choices) if choices is not None else None
+        self.invalid = invalid or 'Invalid field: %s' % path
+        self.default = default
+        self.generated = generated
+
+
+class Rule(object):
+    '''A constraint on the values of one or more fields of a schema.
+
+    `check` is called with the values of the fields at `paths` and returns
+        whether they are valid; if not, `message` is reported.
+    '''
+
+    def __init__(self, paths, check, message):
+        self.paths = list(paths)
+        self.check = check
+        self.message = message
+
+
+class Schema(object):
+    '''A compiled schema.'''
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.fields = [item for item in self.items if isinstance(item, Field)]
+        self.errors = _compile_errors(self.items)
+        self.shape = _compile_shape(self.fields)
+        self.extract = _compile_shape(self.fields, defaults=False)
+
+    def validate(self, obj):
+        '''Validate an object.
+
+        Raises a ValidationError if the object is invalid.
+        '''
+        errors = self.errors(obj)
+        if errors:
+            raise ValidationError(errors=errors)
+
+
+def is_number(value):
+    '''Check whether a value is a (non-boolean) real number.'''
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+class _Compiler(object):
+    '''Generates the source code of a function over `obj`.'''
+
+    def __init__(self, name):
+        self.name = name
+        self.lines = ['def %s(obj):' % name]
+        self.namespace = {'EMPTY': {}, 'is_number': is_number, 'NUMBER_TYPES': (int, float)}
+        self.variables = {'': 'obj'}
+
+    def emit(self, line, indent=1):
+        '''Add a line of code.'''
+        self.lines.append('    ' * indent + line)
+
+    def constant(self, value):
+        '''Add a value to the namespace of the function, returning its name.'''
+        name = 'c%d' % len(self.namespace)
+        self.namespace[name] = value
+        return name
+
+    def variable(self, path):
+        '''Get the name of the variable that holds the value at a path.'''
+        return self.variables.get(path)
+
+    def parent(self, path, on_invalid=None):
+        '''Get the name of the variable holding the object containing a path.
+
+        Objects are looked up once; missing and invalid (non-dict) objects are
+            replaced by an empty dict. `on_invalid` reports invalid objects.
+        '''
+        parent_path = path.rpartition('.')[0]
+        if parent_path in self.variables:
+            return self.variables[parent_path]
+        container = self.parent(parent_path, on_invalid)
+        name = 'o%d' % len(self.variables)
+        self.variables[parent_path] = name
+        self.emit('%s = %s.get(%r)' % (name, container, parent_path.rpartition('.')[2]))
+        self.emit('if %s.__class__ is not dict and not isinstance(%s, dict):' % (name, name))
+        if on_invalid is not None:
+            self.emit('if %s is not None:' % name, 2)
+            self.emit(on_invalid('Invalid field: %s must be an object' % parent_path), 3)
+        self.emit('%s = EMPTY' % name, 2)
+        return name
+
+    def load(self, path, on_invalid=None):
+        '''Load the value at a path into a new variable, returning its name.'''
+        container = self.parent(path, on_invalid)
+        name = 'v%d' % len(self.variables)
+        self.variables[path] = name
+        self.emit('%s = %s.get(%r)' % (name, container, path.rpartition('.')[2]))
+        return name
+
+    def build(self):
+        '''Compile the function.'''
+        namespace = dict(self.namespace)
+        exec('\n'.join(self.lines), namespace)  # pylint: disable=exec-used
+        return namespace[self.name]
+
+
+def _compile_errors(items):
+    compiler = _Compiler('errors')
+    compiler.emit('errors = []')
+    compiler.emit('append = errors.append')
+
+    def append(message):
+        return 'append(%r)' % message
+
+    for item in items:
+        if isinstance(item, Field):
+            _compile_field(compiler, item, append)
+        else:
+            _compile_rule(compiler, item, append)
+    compiler.emit('return errors')
+    return compiler.build()
+
+
+def _compile_field(compiler, field, append):
+    name = compiler.load(field.path, append)
+    missing = 'Missing required field: %s' % field.path if field.required else None
+    branches = [(('%s is None' if field.allow_empty else 'not %s') % name, missing)]
+    if field.kind == NUMBER:
+        branches.append((
+            '%s.__class__ not in NUMBER_TYPES and not is_number(%s)' % (name, name),
+            'Invalid field: %s must be a number' % field.path
+        ))
+    elif field.kind == STRING:
+        branches.append((
+            'not isinstance(%s, str)' % name,
+            'Invalid field: %s must be a string' % field.path
+        ))
+    if field.choices is not None:
+        branches.append(('%s not in %s' % (name, compiler.constant(field.choices)), field.invalid))
+    for i, (condition, message) in enumerate(branches):
+        compiler.emit('%s %s:' % ('elif' if i else 'if', condition))
+        if message:
+            compiler.emit(append(message), 2)
+        if i or not field.allow_empty:
+            compiler.emit('%s = None' % name, 2)
+        elif not message:
+            compiler.emit('pass', 2)
+
+
+def _compile_rule(compiler, rule, append):
+    names = []
+    for path in rule.paths:
+        if compiler.variable(path) is None:
+            raise ValueError('Rule refers to an undeclared field: %s' % path)
+        names.append(compiler.variable(path))
+    compiler.emit('if %s and not %s(%s):' % (
+        ' and '.join('%s is not None' % name for name in names),
+        compiler.constant(rule.check),
+        ', '.join(names)
+    ))
+    compiler.emit(append(rule.message), 2)
+
+
+def _compile_shape(fields, defaults=True):
+    compiler = _Compiler('shape' if defaults else 'extract')
+    tree = {}
+    for field in fields:
+        if field.generated:
+            continue
+        name = compiler.load(field.path)
+        if defaults and field.default is not None:
+            compiler.emit('if %s is None:' % name)
+            compiler.emit('%s = %s' % (name, compiler.constant(field.default)), 2)
+        node = tree
+        keys = field.path.split('.')
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = name
+    compiler.emit('return %s' % _render(tree))
+    return compiler.build()
+
+
+def _render(tree):
+    return '{%s}' % ', '.join(
+        '%r: %s' % (key, _render(value) if isinstance(value, dict) else value)
+        for key, value in tree.items()
+    )
@@ -0,0 +1,78 @@
+# pylint: disable=missing-docstring,invalid-name
+from collections import OrderedDict
+import numpy as np
+import pytest
+from wtf.core.errors import ValidationError
+from wtf.core.schema import NUMBER, STRING, Field, Rule, Schema
+
+
+SCHEMA = Schema([
+    Field('id', kind=STRING, generated=True),
+    Field('name', kind=STRING, allow_empty=False),
+    Field('size', choices=[1, 2], invalid='Size must be either 1 or 2', default=1),
+    Field('weight.center', kind=NUMBER),
+    Field('weight.radius', kind=NUMBER),
+    Rule(['weight.center', 'weight.radius'], lambda c, r: c - r >= 0, 'Weight must be >= 0'),
+    Field('notes', required=False)
+])
+
+
+def test_errors_valid():
+    for weight in [{'center': 2, 'radius': 1}, OrderedDict(center=2.5, radius=np.float64(1))]:
+        assert SCHEMA.errors({
+            'id': 'foo', 'name': 'Foo', 'size': 2, 'weight': weight
+        }) == []
+
+
+def test_errors_missing():
+    assert SCHEMA.errors({'name': ''}) == [
+        'Missing required field: id',
+        'Missing required field: name',
+        'Missing required field: size',
+        'Missing required field: weight.center',
+        'Missing required field: weight.radius'
+    ]
+
+
+def test_errors_invalid():
+    assert SCHEMA.errors({
+        'id': 42, 'name': 'Foo', 'size': 3, 'weight': {'center': True, 'radius': 1}
+    }) == [
+        'Invalid field: id must be a string',
+        'Size must be either 1 or 2',
+        'Invalid field: weight.center must be a number'
+    ]
+    assert 'Invalid field: weight must be an object' in SCHEMA.errors({'weight': [1]})
+
+
+def test_errors_rules():
+    obj = {'id': 'foo', 'name': 'Foo', 'size': 1, 'weight': {'center': 1, 'radius': 2}}
+    assert SCHEMA.errors(obj) == ['Weight must be >= 0']
+    obj['weight']['center'] = 'foo'
+    assert SCHEMA.errors(obj) == ['Invalid field: weight.center must be a number']
+
+
+def test_validate():
+    with pytest.raises(ValidationError) as e:
+        SCHEMA.validate({})
+    assert 'Missing required field: name' in e.value.errors
+
+
+def test_shape():
+    assert SCHEMA.shape({'id': 'foo', 'name': 'Foo', 'weight': None, 'extra': 42}) == {
+        'name': 'Foo',
+        'size': 1,
+        'weight': {'center': None, 'radius': None},
+        'notes': None
+    }
+    assert SCHEMA.shape({'weight': {'center': 2}})['weight'] == {'center': 2, 'radius': None}
+
+
+def test_extract():
+    assert SCHEMA.extract({'name': 'Foo', 'extra': 42}) == {
+        'name': 'Foo', 'size': None, 'weight': {'center': None, 'radius': None}, 'notes': None}
+
+
+def test_rule_undeclared_field():
+    with pytest.raises(ValueError):
+        Schema([Rule(['foo'], bool, 'Foo')])
@@ -0,0 +1,124 @@
+'''
+wtf.core.timing
+
+Per-request timing of the stages of handling a request (e.g. parsing,
+    validation, grade generation, saving), reported by the API in the
+    Server-Timing header (see wtf.api.server_timing).
+
+Stages are declared on module-level functions:
+
+    @timing.stage('validate')
+    def validate(weapon):
+        ...
+
+Declaring a stage costs nothing: the decorator only registers the function and
+    returns it unchanged. `instrument()` replaces each registered function in
+    its module with a wrapper that adds its duration to the Timer of the
+    current thread, if there is one (see `start()` and `stop()`);
+    `uninstrument()` puts the original functions back. Only calls made through
+    the module (e.g. `weapons.validate(...)`, or `validate(...)` from within
+    wtf.core.weapons) are timed.
+
+The duration of a stage includes that of the stages it calls (e.g. `save`
+    includes `validate`), and a stage called several times during a request
+    is reported once, with the sum of its durations.
+'''
+import sys
+import threading
+from functools import wraps
+from time import perf_counter
+
+
+STAGES = []
+
+
+class _Local(threading.local):  # pylint: disable=too-few-public-methods
+    timer = None
+
+
+_LOCAL = _Local()
+
+
+class Timer(object):
+    '''The durations of the stages of a request, in seconds.'''
+
+    __slots__ = ['stages', 'started']
+
+    def __init__(self):
+        self.stages = {}
+        self.started = perf_counter()
+
+    def add(self, name, seconds):
+        '''Add the duration of a stage.'''
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        '''Get the time elapsed since the timer started.'''
+        return perf_counter() - self.started
+
+
+def stage(name):
+    '''Declare a function as a stage, timed once instrumented.'''
+
+    def decorator(func):
+        STAGES.append((func.__module__, func.__name__, name, func))
+        return func
+
+    return decorator
+
+
+def _timed(name, func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        timer = _LOCAL.timer
+        if timer is None:
+            return func(*args, **kwargs)
+        started = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timer.add(name, perf_counter() - started)
+
+    wrapper.stage_function = func
+    return wrapper
+
+
+def instrument():
+    '''Time the stages (idempotent).'''
+    for module_name, func_name, name, func in STAGES:
+        module = sys.modules[module_name]
+        if getattr(module, func_name) is func:
+            setattr(module, func_name, _timed(name, func))
+
+
+def uninstrument():
+    '''Stop timing the stages.'''
+    for module_name, func_name, _, func in STAGES:
+        module = sys.modules[module_name]
+        if getattr(getattr(module, func_name), 'stage_function', None) is func:
+            setattr(module, func_name, func)
+
+
+def is_instrumented():
+    '''Check whether the stages are timed.'''
+    return any(
+        getattr(getattr(sys.modules[module_name], func_name), 'stage_function', None) is func
+        for module_name, func_name, _, func in STAGES
+    )
+
+
+def start():
+    '''Start timing the stages called by the current thread.'''
+    timer = _LOCAL.timer = Timer()
+    return timer
+
+
+def stop():
+    '''Stop timing the stages called by the current thread, returning the Timer.'''
+    timer, _LOCAL.timer = _LOCAL.timer, None
+    return timer
+
+
+def current():
+    '''Get the Timer of the current thread, if any.'''
+    return _LOCAL.timer
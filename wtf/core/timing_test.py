@@ -0,0 +1,55 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name,unused-argument
+import pytest
+from mock import patch
+from wtf.core import timing, weapons
+
+
+@pytest.fixture
+def instrumented():
+    timing.instrument()
+    yield
+    timing.uninstrument()
+    timing.stop()
+
+
+def test_stage_unchanged_until_instrumented():
+    assert not timing.is_instrumented()
+    assert ('wtf.core.weapons', 'validate', 'validate', weapons.validate) in timing.STAGES
+
+
+@patch('wtf.core.weapons.REPO', {'by_id': {}})
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {'foo': {'id': 'foo'}}})
+def test_instrument(instrumented):
+    assert timing.is_instrumented()
+    weapon = {'name': 'Foo', 'description': 'Bar', 'grade': 0.5, 'recipe': 'foo'}
+    weapons.save(weapon)
+    assert timing.current() is None
+    timer = timing.start()
+    assert timing.current() is timer
+    weapons.save(weapon)
+    weapons.find_recipe_by_id('foo')
+    assert timing.stop() is timer
+    assert timing.current() is None
+    assert list(timer.stages) == ['find', 'validate', 'save']
+    assert timer.stages['save'] >= timer.stages['validate'] >= 0
+    assert timer.elapsed() >= timer.stages['save']
+    timing.instrument()
+    timing.uninstrument()
+    assert not timing.is_instrumented()
+    assert weapons.save.__name__ == 'save'
+
+
+def test_errors_timed(instrumented):
+    timer = timing.start()
+    with pytest.raises(Exception):
+        weapons.find_by_id('foo')
+    assert 'find' in timer.stages
+
+
+def test_patched_stage_left_alone(instrumented):
+    timing.uninstrument()
+    with patch('wtf.core.weapons.validate') as mock_validate:
+        timing.instrument()
+        assert weapons.validate is mock_validate
+        timing.uninstrument()
+        assert weapons.validate is mock_validate
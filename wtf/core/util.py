@@ -5,8 +5,10 @@ Miscellaneous utilities.
 '''
 from hashlib import sha256
 from uuid import uuid4
+from wtf.core import timing
 
 
+@timing.stage('hash')
 def salt_and_hash(plaintext, salt=None):
     '''Salt and hash a plaintext value.'''
     if salt is None:
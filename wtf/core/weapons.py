@@ -29,36 +29,29 @@ Weapons have the following properties:
     > The higher this value, the "better" the weapon
 '''
 from uuid import uuid4
-from wtf.core import equipment, util
+from wtf.core import equipment, loader, realms, timing, util
 from wtf.core.errors import NotFoundError, ValidationError
+from wtf.core.schema import STRING, Field, Schema
 
 
-REPO_RECIPES = {'by_id': {}}
-REPO = {'by_id': {}}
+REPO_RECIPES = realms.repository('weapon_recipes')
+REPO = realms.repository('weapons')
 WEAPON_TYPES = ['sword', 'axe', 'mace', 'dagger', 'bow']
+RECIPE_SCHEMA = Schema(equipment.RECIPE_FIELDS + [
+    Field('type', choices=WEAPON_TYPES, invalid='Invalid weapon type'),
+    Field('handedness', choices=[1, 2], invalid='Handedness must be either 1 or 2', default=1)
+] + equipment.min_max_fields('damage'))
+SCHEMA = Schema(equipment.FIELDS + [Field('recipe', kind=STRING)])
 
 
 def create_recipe(**kwargs):
     '''Create a weapon recipe.'''
-    recipe = equipment.create_recipe(**kwargs)
-    damage = kwargs.get('damage', {})
-    damage_min = damage.get('min', {})
-    damage_max = damage.get('max', {})
-    recipe.update({
-        'type': kwargs.get('type'),
-        'handedness': kwargs.get('handedness', 1),
-        'damage': {
-            'min': {
-                'center': damage_min.get('center', None),
-                'radius': damage_min.get('radius', None)
-            },
-            'max': {
-                'center': damage_max.get('center', None),
-                'radius': damage_max.get('radius', None)
-            }
-        }
-    })
-    return recipe
+    return RECIPE_SCHEMA.shape(kwargs)
+
+
+def parse_recipe(body):
+    '''Create a weapon recipe from a request body, without defaults: missing fields stay missing.'''
+    return RECIPE_SCHEMA.extract(body)
 
 
 def create(**kwargs):
@@ -66,6 +59,7 @@ def create(**kwargs):
     return equipment.create(**kwargs)
 
 
+@timing.stage('save')
 def save_recipe(recipe):
     '''Create/update a weapon recipe.
 
@@ -75,10 +69,13 @@ def save_recipe(recipe):
     if recipe.get('id') is None:
         recipe['id'] = str(uuid4())
     validate_recipe(recipe)
-    REPO_RECIPES.get('by_id')[recipe.get('id')] = recipe
+    with equipment.RECIPES_LOCK:
+        REPO_RECIPES.get('by_id')[recipe.get('id')] = recipe
+    loader.store('weapon-recipes', recipe.get('id'), recipe)
     return recipe
 
 
+@timing.stage('save')
 def save(weapon):
     '''Create/update a weapon.
 
@@ -92,48 +89,24 @@ def save(weapon):
     return weapon
 
 
+@timing.stage('validate')
 def validate_recipe(recipe):
     '''Validate a weapon recipe.
 
     Raises a ValidationError if the provided recipe is invalid.
     '''
-    errors = []
-    try:
-        equipment.validate_recipe(recipe)
-    except ValidationError as error:
-        errors += error.errors
-    weapon_type = recipe.get('type')
-    if weapon_type is None:
-        errors.append('Missing required field: type')
-    elif weapon_type not in WEAPON_TYPES:
-        errors.append('Invalid weapon type')
-    handedness = recipe.get('handedness')
-    if handedness is None:
-        errors.append('Missing required field: handedness')
-    elif handedness not in [1, 2]:
-        errors.append('Handedness must be either 1 or 2')
-    try:
-        equipment.validate_recipe_min_max_field(recipe, 'damage')
-    except ValidationError as error:
-        errors += error.errors
-    if errors:
-        raise ValidationError(errors=errors)
+    RECIPE_SCHEMA.validate(recipe)
 
 
+@timing.stage('validate')
 def validate(weapon):
     '''Validate a weapon.
 
     Raises a ValidationError if the provided weapon is invalid.
     '''
-    errors = []
-    try:
-        equipment.validate(weapon)
-    except ValidationError as error:
-        errors += error.errors
+    errors = SCHEMA.errors(weapon)
     recipe = weapon.get('recipe')
-    if recipe is None:
-        errors.append('Missing required field: recipe')
-    else:
+    if isinstance(recipe, str):
         try:
             find_recipe_by_id(recipe)
         except NotFoundError as error:
@@ -142,17 +115,19 @@ def validate(weapon):
         raise ValidationError(errors=errors)
 
 
+@timing.stage('find')
 def find_recipe_by_id(recipe_id):
     '''Find a weapon recipe with the provided id.
 
     Raises a NotFoundError if the recipe could not be found.
     '''
-    recipe = REPO_RECIPES['by_id'].get(recipe_id)
+    recipe = loader.load('weapon-recipes', REPO_RECIPES['by_id'], recipe_id)
     if recipe is None:
         raise NotFoundError('Weapon recipe not found')
     return recipe
 
 
+@timing.stage('find')
 def find_by_id(weapon_id):
     '''Find a weapon with the provided id.
 
@@ -176,7 +151,30 @@ def transform(weapon):
       - damage.min: derived from recipe and grade, rounded to 2 decimal places
       - damage.max: derived from recipe and grade, rounded to 2 decimal places
     '''
-    recipe = find_recipe_by_id(weapon.get('recipe'))
+    return transform_with_recipe(weapon, find_recipe_by_id(weapon.get('recipe')))
+
+
+def transform_many(items):
+    '''Transform many weapons (see transform()).
+
+    The recipes are looked up at once (see wtf.core.loader).
+
+    Raises a NotFoundError if a recipe could not be found.
+    '''
+    recipes = loader.load_many(
+        'weapon-recipes', REPO_RECIPES['by_id'], [weapon.get('recipe') for weapon in items])
+    transformed = []
+    for weapon in items:
+        recipe = recipes[weapon.get('recipe')]
+        if recipe is None:
+            raise NotFoundError('Weapon recipe not found')
+        transformed.append(transform_with_recipe(weapon, recipe))
+    return transformed
+
+
+@timing.stage('transform')
+def transform_with_recipe(weapon, recipe):
+    '''Transform a weapon's fields using an already retrieved recipe.'''
     grade = weapon.get('grade')
     weapon = equipment.transform(weapon, recipe)
     damage = recipe.get('damage')
@@ -2,8 +2,8 @@
 # pylint: disable=invalid-name
 # pylint: disable=redefined-outer-name
 import pytest
-from mock import patch
-from wtf.core import weapons
+from mock import Mock, patch
+from wtf.core import weapons, realms
 from wtf.core.errors import NotFoundError, ValidationError
 
 
@@ -33,8 +33,11 @@ TEST_DATA = {
 
 
 def setup_function():
-    weapons.REPO_RECIPES = {'by_id': {}}
-    weapons.REPO = {'by_id': {}}
+    realms.activate(realms.Realm('test'))
+
+
+def teardown_function():
+    realms.activate(realms.DEFAULT)
 
 
 def test_create_weapon_recipe():
@@ -404,3 +407,25 @@ def test_transform_weapon(mock_find_recipe_by_id, name, description):
         'other': 'fields'
     })
     assert expected == actual
+
+
+def test_transform_many_weapons():
+    recipe = TEST_DATA.get('recipe')
+    by_id = Mock(get=Mock(return_value=recipe),
+                 get_many=Mock(return_value={recipe['id']: recipe}))
+    items = [
+        {'id': str(i), 'recipe': recipe['id'], 'grade': TEST_DATA['grade']}
+        for i in range(3)
+    ]
+    with patch('wtf.core.weapons.REPO_RECIPES', {'by_id': by_id}):
+        expected = [weapons.transform(item) for item in items]
+        actual = weapons.transform_many(items)
+    assert expected == actual
+    by_id.get_many.assert_called_once_with([recipe['id']])
+
+
+@patch('wtf.core.weapons.REPO_RECIPES', {'by_id': {}})
+def test_transform_many_weapons_recipe_not_found():
+    with pytest.raises(NotFoundError) as e:
+        weapons.transform_many([{'id': 'foo', 'recipe': 'bar', 'grade': TEST_DATA['grade']}])
+    assert str(e.value) == 'Weapon recipe not found'
@@ -0,0 +1,199 @@
+'''
+wtf.memory
+
+Memory accounting, e.g. to size containers: how many entries the repositories
+    (see wtf.core) and caches (see wtf.cache) hold, and how much memory they
+    use.
+
+Memory use is estimated by sampling, so that it stays cheap with millions of
+    entries: the deep size (the size of an entry and of every object it
+    references) of up to `sample_size` entries spread across a mapping,
+    scaled to the mapping's length, plus the size of the mapping itself.
+    Objects shared by the sampled entries (e.g. interned strings) are counted
+    once per sample, so estimates are slightly high.
+
+The values of a repository's secondary indexes (e.g. accounts by email) are
+    entities of its primary index (by id), so they are only counted in the
+    primary index. Repositories stored in SQLite (see wtf.storage) don't hold
+    their entities in memory: only their counts are reported (their decoded
+    values are cached, and reported with the other caches).
+
+`top_allocations()` reports the source lines that allocated the most memory
+    (still in use), using tracemalloc: either since tracing started (e.g. with
+    PYTHONTRACEMALLOC=1), or during a given number of seconds.
+'''
+import os
+import sys
+import threading
+import tracemalloc
+from itertools import islice
+from time import sleep
+from wtf.cache import CACHES
+from wtf.core import accounts, armor, characters, weapons
+
+
+# (name, module, attribute): repositories are looked up when reported, since
+#   they can be replaced (see wtf.storage)
+REPOSITORIES = [
+    ('accounts', accounts, 'REPO'),
+    ('characters', characters, 'REPO'),
+    ('weapon_recipes', weapons, 'REPO_RECIPES'),
+    ('weapons', weapons, 'REPO'),
+    ('armor_recipes', armor, 'REPO_RECIPES'),
+    ('armor', armor, 'REPO')
+]
+PRIMARY_INDEX = 'by_id'
+SAMPLE_SIZE = 1000
+TRACING_LOCK = threading.Lock()
+
+
+def deep_sizeof(obj, seen=None, exclude=None):
+    '''Add up the sizes of an object and of the objects it references.
+
+    Objects in `seen` (a set of ids, updated) or for which `exclude` returns
+        true are not counted.
+    '''
+    seen = set() if seen is None else seen
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or (exclude is not None and exclude(obj)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return size
+
+
+def sample(items, length, sample_size=SAMPLE_SIZE):
+    '''Pick up to `sample_size` items evenly spread across `length` items.'''
+    step = max(1, length // sample_size) if sample_size else length + 1
+    return list(islice(islice(items, 0, None, step), sample_size))
+
+
+def estimate(mapping, sample_size=SAMPLE_SIZE, exclude=None):
+    '''Estimate the deep size of a dict from a sample of its items.'''
+    length = len(mapping)
+    items = sample(iter(mapping.items()), length, sample_size)
+    if not items:
+        return sys.getsizeof(mapping)
+    seen = set()
+    sampled = sum(
+        deep_sizeof(key, seen, exclude) + deep_sizeof(value, seen, exclude)
+        for key, value in items
+    )
+    return sys.getsizeof(mapping) + int(sampled * length / len(items))
+
+
+def repository_usage(sample_size=SAMPLE_SIZE):
+    '''Count the entries of each repository index and estimate their memory use.
+
+    The repositories are those of the current realm (see wtf.core.realms).
+
+    The memory use of repositories that are not stored in memory is None.
+    '''
+    rows = []
+    for name, module, attribute in REPOSITORIES:
+        repository = getattr(module, attribute)
+        primary = repository.get(PRIMARY_INDEX)
+
+        def is_entity(obj, primary=primary):
+            return isinstance(obj, dict) and primary.get(obj.get('id')) is obj
+
+        for index, mapping in repository.items():
+            in_memory = isinstance(mapping, dict)
+            rows.append({
+                'repository': name,
+                'index': index,
+                'entries': len(mapping),
+                'bytes': estimate(
+                    mapping, sample_size,
+                    None if index == PRIMARY_INDEX or not isinstance(primary, dict)
+                    else is_entity
+                ) if in_memory else None
+            })
+    return rows
+
+
+def cache_usage(sample_size=SAMPLE_SIZE):
+    '''Count the entries of each cache and estimate their memory use.'''
+    rows = []
+    for cache in sorted(CACHES, key=lambda cache: cache.name):
+        with cache.lock:
+            length = len(cache.entries)
+            items = sample(iter(cache.entries.items()), length, sample_size)
+            size = sys.getsizeof(cache.entries)
+        seen = set()
+        sampled = sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in items)
+        rows.append({
+            'cache': cache.name,
+            'entries': length,
+            'max_entries': cache.max_entries,
+            'bytes': size + (int(sampled * length / len(items)) if items else 0),
+            'hits': cache.hits,
+            'misses': cache.misses
+        })
+    return rows
+
+
+def process_usage():
+    '''Get the resident memory of the process (current, if known, and peak).'''
+    rss = None
+    try:
+        with open('/proc/self/statm') as file:
+            rss = int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes, except on macOS
+        max_rss *= 1 if sys.platform == 'darwin' else 1024
+    except ImportError:
+        max_rss = None
+    return {'pid': os.getpid(), 'rss_bytes': rss, 'max_rss_bytes': max_rss}
+
+
+def usage(sample_size=SAMPLE_SIZE):
+    '''Report the memory use of the repositories, caches and process.'''
+    return {
+        'repositories': repository_usage(sample_size),
+        'caches': cache_usage(sample_size),
+        'process': process_usage()
+    }
+
+
+def top_allocations(seconds=0.0, limit=10):
+    '''Report the source lines that allocated the most memory still in use.
+
+    If tracemalloc isn't tracing already, allocations are traced for
+        `seconds` seconds. Returns None if another call is tracing.
+    '''
+    if not TRACING_LOCK.acquire(blocking=False):
+        return None
+    try:
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+        else:
+            tracemalloc.start()
+            try:
+                sleep(seconds)
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+    finally:
+        TRACING_LOCK.release()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return [
+        {
+            'site': '%s:%d' % (stat.traceback[0].filename, stat.traceback[0].lineno),
+            'bytes': stat.size,
+            'blocks': stat.count
+        }
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
@@ -0,0 +1,95 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import sys
+import tracemalloc
+from mock import patch
+from wtf import memory
+from wtf.api import admin
+from wtf.api.app import create_app
+from wtf.cache import LRUCache
+
+
+def test_deep_sizeof():
+    value = {'foo': ['bar', ('baz',)]}
+    size = sum(sys.getsizeof(obj) for obj in [value, 'foo', value['foo'], 'bar',
+                                               value['foo'][1], 'baz'])
+    assert memory.deep_sizeof(value) == size
+    assert memory.deep_sizeof([value, value]) == sys.getsizeof([value, value]) + size
+    assert memory.deep_sizeof(value, exclude=lambda obj: isinstance(obj, list)) == (
+        sys.getsizeof(value) + sys.getsizeof('foo'))
+
+
+def test_sample():
+    assert memory.sample(iter(range(10)), 10, 3) == [0, 3, 6]
+    assert memory.sample(iter(range(10)), 10, 20) == list(range(10))
+    assert memory.sample(iter(range(10)), 10, 0) == []
+
+
+def test_estimate():
+    mapping = {str(i): {'id': str(i), 'name': 'x' * (i % 7)} for i in range(10000)}
+    exact = memory.estimate(mapping, sample_size=len(mapping))
+    flat = [obj for item in mapping.items() for obj in item]
+    assert exact == sys.getsizeof(mapping) + memory.deep_sizeof(flat) - sys.getsizeof(flat)
+    assert abs(memory.estimate(mapping, sample_size=100) - exact) < exact * 0.05
+    assert memory.estimate({}) == sys.getsizeof({})
+
+
+@patch('wtf.core.accounts.REPO', {'by_id': {}, 'by_email': {}})
+def test_repository_usage():
+    from wtf.core import accounts
+    for i in range(100):
+        accounts.save(accounts.create(email='%d@foo.com' % i, password='bar'))
+    rows = {(row['repository'], row['index']): row for row in memory.repository_usage()}
+    by_id, by_email = rows['accounts', 'by_id'], rows['accounts', 'by_email']
+    assert by_id['entries'] == by_email['entries'] == 100
+    # accounts are only counted in their primary index
+    assert by_email['bytes'] < by_id['bytes'] / 3
+    assert rows['weapons', 'by_id']['entries'] == 0
+
+
+def test_cache_usage():
+    cache = LRUCache(max_entries=10, name='foo')
+    cache.set('bar', b'x' * 1000)
+    cache.get('bar')
+    [row] = [row for row in memory.cache_usage() if row['cache'] == 'foo']
+    assert row['entries'] == 1
+    assert row['max_entries'] == 10
+    assert row['bytes'] > 1000
+    assert row['hits'] == 1
+
+
+def test_top_allocations():
+    assert not tracemalloc.is_tracing()
+    allocations = memory.top_allocations(0.01, limit=3)
+    assert len(allocations) <= 3
+    assert not tracemalloc.is_tracing()
+    tracemalloc.start()
+    try:
+        line = sys._getframe().f_lineno + 1  # pylint: disable=protected-access
+        data = [bytearray(10000) for _ in range(10)]
+        allocations = memory.top_allocations(limit=1)
+        assert allocations[0]['site'] == '%s:%d' % (__file__, line)
+        assert allocations[0]['bytes'] >= 100000
+        del data
+        with memory.TRACING_LOCK:
+            assert memory.top_allocations() is None
+    finally:
+        tracemalloc.stop()
+
+
+def test_app():
+    client = create_app(prefix='', config={'WTF_ADMIN_SECRET': 'foo'}).test_client()
+    headers = {admin.HEADER: 'foo'}
+    assert client.get('/admin/memory').status_code == 403
+    usage = client.get('/admin/memory?sample=10', headers=headers).get_json()
+    assert {row['repository'] for row in usage['repositories']} == {
+        'accounts', 'characters', 'weapon_recipes', 'weapons', 'armor_recipes', 'armor'}
+    assert 'responses' in [row['cache'] for row in usage['caches']]
+    assert usage['process']['max_rss_bytes'] > 0
+    assert client.get('/admin/memory?sample=0', headers=headers).status_code == 400
+    response = client.get('/admin/memory/allocations?seconds=0&limit=2', headers=headers)
+    assert len(response.get_json()['allocations']) <= 2
+    assert client.get('/admin/memory/allocations?seconds=foo',
+                      headers=headers).status_code == 400
+    with memory.TRACING_LOCK:
+        assert client.get('/admin/memory/allocations?seconds=0',
+                          headers=headers).status_code == 409
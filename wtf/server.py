@@ -0,0 +1,274 @@
+'''
+wtf.server
+
+A preforking WSGI server for production use, i.e. `python -m wtf serve`.
+
+The master process binds the listening socket and creates the app (loading the
+    recipe catalog) before forking the workers, so that the workers share the
+    socket and, copy-on-write, the preloaded app and catalog. The preloaded
+    objects are frozen out of garbage collection, so that the workers' pages
+    stay shared. Each worker handles requests with a bounded pool of threads
+    and only accepts a new connection when one of its threads is free, so
+    that busy workers leave connections to idle ones.
+
+Workers are recycled gracefully: they stop accepting connections, finish the
+    requests in progress and exit, and the master forks replacements.
+    Recycling happens when:
+  * a worker has handled --max-requests requests (plus a random jitter of up
+    to --max-requests-jitter, so that workers don't all recycle at once)
+  * the master receives SIGHUP (every worker is replaced)
+
+SIGTERM or SIGINT stops the server gracefully: workers that are still busy
+    after --graceful-timeout seconds are killed.
+
+Workers are WorkerServer instances (--worker-class sync), or AsyncWorker
+    instances (--worker-class asyncio, see wtf.asgi) that hold many more
+    concurrent connections.
+
+Since each worker is a separate process, they only share the repositories when
+    a shared storage backend is used (see wtf.storage).
+'''
+import atexit
+import gc
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from werkzeug.serving import BaseWSGIServer
+from wtf.core import equipment
+
+
+WORKER_SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGHUP}
+
+class WorkerServer(BaseWSGIServer):
+    '''A WSGI server handling requests on an inherited socket with a pool of threads.
+
+    The server stops after `max_requests` requests (if set).
+    '''
+
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, app, listener, threads=8, max_requests=0):
+        host, port = listener.getsockname()[:2]
+        super(WorkerServer, self).__init__(host, port, app, fd=listener.fileno())
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+        self.slots = threading.BoundedSemaphore(threads)
+        self.max_requests = max_requests
+        self.requests = 0
+        self.stopping = False
+
+    def process_request(self, request, client_address):
+        '''Handle a connection in the thread pool.'''
+        self.pool.submit(self._process_request, request, client_address)
+        self.requests += 1
+        if self.max_requests and self.requests >= self.max_requests:
+            self.stop()
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # pylint: disable=broad-except
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def get_request(self):
+        '''Wait for a free thread, then accept a connection.
+
+        The listening socket is non-blocking and shared with the other
+            workers, which may accept the connection first.
+        '''
+        self.slots.acquire()
+        try:
+            connection, address = self.socket.accept()
+        except OSError:
+            self.slots.release()
+            raise
+        connection.setblocking(True)
+        return connection, address
+
+    def stop(self):
+        '''Stop accepting connections (from any thread, or a signal handler).'''
+        if not self.stopping:
+            self.stopping = True
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def serve(self):
+        '''Handle connections until stopped, then finish the requests in progress.'''
+        try:
+            self.serve_forever()
+        finally:
+            self.pool.shutdown(wait=True)
+
+
+# pylint: disable=too-many-instance-attributes,too-many-arguments,too-few-public-methods
+class Master(object):
+    '''The master process: forks, monitors and recycles workers.
+
+    `worker_class` is called with the app, listener, threads and max_requests
+        to create the server of a worker, which must have serve() and stop()
+        methods.
+    '''
+
+    def __init__(self, app, listener, workers=1, threads=8, max_requests=0,
+                 max_requests_jitter=0, graceful_timeout=30.0, worker_class=WorkerServer):
+        self.app = app
+        self.listener = listener
+        self.worker_count = workers
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.worker_class = worker_class
+        self.workers = {}
+        self.retiring = {}
+        self.signals = []
+        self.wakeup = None
+
+    def run(self):
+        '''Run until stopped by SIGTERM or SIGINT.'''
+        self.wakeup = os.pipe()
+        for fd in self.wakeup:
+            os.set_blocking(fd, False)
+        signal.set_wakeup_fd(self.wakeup[1])
+        for signum in [signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD]:
+            signal.signal(signum, self._on_signal)
+        try:
+            while True:
+                self._reap()
+                if signal.SIGTERM in self.signals or signal.SIGINT in self.signals:
+                    break
+                if signal.SIGHUP in self.signals:
+                    self.signals.remove(signal.SIGHUP)
+                    self._retire(list(self.workers))
+                while len(self.workers) < self.worker_count:
+                    self._spawn()
+                self._sleep(1.0)
+            self._stop()
+        finally:
+            signal.set_wakeup_fd(-1)
+            for fd in self.wakeup:
+                os.close(fd)
+
+    def _on_signal(self, signum, _):
+        if signum != signal.SIGCHLD:
+            self.signals.append(signum)
+
+    def _sleep(self, timeout):
+        try:
+            if select.select([self.wakeup[0]], [], [], timeout)[0]:
+                while os.read(self.wakeup[0], 1024):
+                    pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def _spawn(self):
+        max_requests = self.max_requests
+        if max_requests:
+            max_requests += random.randint(0, self.max_requests_jitter)
+        # signals are blocked until the worker has set up its own handlers, so
+        #   that it doesn't handle them as the master would
+        signal.pthread_sigmask(signal.SIG_BLOCK, WORKER_SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker(max_requests)
+            except BaseException:  # pylint: disable=broad-except
+                traceback.print_exc()
+                code = 1
+            finally:
+                # exit handlers (e.g. flushing metrics) run as on a normal exit
+                atexit._run_exitfuncs()  # pylint: disable=protected-access
+                os._exit(code)  # pylint: disable=protected-access
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, WORKER_SIGNALS)
+        self.workers[pid] = monotonic()
+        return pid
+
+    def _run_worker(self, max_requests):
+        signal.set_wakeup_fd(-1)
+        os.close(self.wakeup[0])
+        os.close(self.wakeup[1])
+        equipment.seed()
+        server = self.worker_class(self.app, self.listener, self.threads, max_requests)
+        for signum in [signal.SIGTERM, signal.SIGINT]:
+            signal.signal(signum, lambda *_: server.stop())
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, WORKER_SIGNALS)
+        server.serve()
+
+    def _retire(self, pids):
+        '''Gracefully stop workers; replacements are spawned right away.'''
+        for pid in pids:
+            self.retiring[pid] = self.workers.pop(pid)
+            _kill(pid, signal.SIGTERM)
+
+    def _reap(self):
+        while self.workers or self.retiring:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            self.workers.pop(pid, None)
+            self.retiring.pop(pid, None)
+
+    def _stop(self):
+        self._retire(list(self.workers))
+        deadline = monotonic() + self.graceful_timeout
+        while self.retiring and monotonic() < deadline:
+            self._sleep(0.1)
+            self._reap()
+        for pid in list(self.retiring):
+            _kill(pid, signal.SIGKILL)
+        while self.retiring:
+            self._reap()
+            self._sleep(0.1)
+
+
+def _kill(pid, signum):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def create_listener(host, port, backlog=2048):
+    '''Create a listening TCP socket.'''
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(backlog)
+    listener.setblocking(False)
+    listener.set_inheritable(True)
+    return listener
+
+
+def serve(app, host='127.0.0.1', port=5000, workers=1, **kwargs):
+    '''Serve an app with preforked workers until stopped.
+
+    Keyword arguments are passed to Master (threads, max_requests,
+        max_requests_jitter, graceful_timeout and worker_class).
+    '''
+    listener = create_listener(host, port)
+    if hasattr(gc, 'freeze'):
+        # keep the preloaded objects out of the workers' garbage collections,
+        #   which would otherwise write to (and so copy) every page they are on
+        gc.freeze()
+    print('Serving on http://%s:%d with %d worker(s)' % (
+        host, listener.getsockname()[1], workers), file=sys.stderr, flush=True)
+    try:
+        Master(app, listener, workers=workers, **kwargs).run()
+    finally:
+        listener.close()
@@ -0,0 +1,94 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import os
+import signal
+import subprocess
+import sys
+import threading
+from http.client import HTTPConnection
+from time import monotonic, sleep
+import pytest
+from wtf import server
+
+
+def app(_, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid()).encode('utf-8')]
+
+
+def get(port, path='/'):
+    connection = HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def listener():
+    listener = server.create_listener('127.0.0.1', 0)
+    yield listener
+    listener.close()
+
+
+def test_worker_server(listener):
+    port = listener.getsockname()[1]
+    worker = server.WorkerServer(app, listener, threads=2, max_requests=3)
+    thread = threading.Thread(target=worker.serve, daemon=True)
+    thread.start()
+    for _ in range(3):
+        assert get(port) == (200, str(os.getpid()))
+    thread.join(10)
+    assert not thread.is_alive()
+    assert worker.requests == 3
+
+
+def test_worker_server_stop(listener):
+    worker = server.WorkerServer(app, listener, threads=2)
+    thread = threading.Thread(target=worker.serve, daemon=True)
+    thread.start()
+    assert get(listener.getsockname()[1])[0] == 200
+    worker.stop()
+    worker.stop()
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+MASTER = '''
+import sys
+from wtf import server
+from wtf.server_test import app
+listener = server.create_listener('127.0.0.1', 0)
+print(listener.getsockname()[1], flush=True)
+server.Master(app, listener, workers=2, threads=2, max_requests=5,
+              graceful_timeout=5).run()
+'''
+
+
+def wait_for(condition, timeout=10):
+    deadline = monotonic() + timeout
+    while not condition():
+        if monotonic() > deadline:
+            raise AssertionError('Timed out')
+        sleep(0.05)
+
+
+def test_master():
+    process = subprocess.Popen([sys.executable, '-c', MASTER], stdout=subprocess.PIPE)
+    try:
+        port = int(process.stdout.readline())
+        pids = {get(port)[1] for _ in range(20)}
+        # workers are recycled after 5 requests
+        assert len(pids) >= 4
+        assert str(process.pid) not in pids
+        before = set()
+        wait_for(lambda: before.add(get(port)[1]) or len(before) == 2)
+        process.send_signal(signal.SIGHUP)
+        wait_for(lambda: get(port)[1] not in before)
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(10) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
@@ -0,0 +1,110 @@
+'''
+wtf.startup
+
+Startup-time profiling, with the --profile-startup flag of the entry points:
+
+    $ python -m wtf --profile-startup
+    $ python -m wtf.api --profile-startup
+
+A fresh interpreter imports the app with `-X importtime`, creates it, serves a
+    first request and generates a first equipment grade (which imports NumPy,
+    see wtf.core.equipment). The time each of these steps took, and the
+    imports that took the most time (cumulatively, i.e. including the modules
+    they imported), are reported.
+
+The profiled interpreter is a fresh one, so the modules that the entry point
+    already imported don't skew the profile.
+'''
+import json
+import subprocess
+import sys
+from wtf.bench.util import format_table
+
+
+# the app modules that can be profiled, with the path of their first request
+APPS = {
+    'wtf.app': '/api/health',
+    'wtf.api.app': '/api/health'
+}
+STAGES = ['import', 'create app', 'first request', 'first grade']
+PROBE = '''
+import json
+from time import perf_counter
+start = perf_counter()
+from %(module)s import create_app
+from wtf.core import equipment
+imported = perf_counter()
+client = create_app().test_client()
+created = perf_counter()
+status = client.get(%(path)r).status_code
+requested = perf_counter()
+equipment.generate_grade()
+graded = perf_counter()
+print(json.dumps({
+    'status': status,
+    'stages': [imported - start, created - imported, requested - created, graded - requested]
+}))
+'''
+
+
+def profile(module='wtf.app', limit=15):
+    '''Profile the startup of an app in a fresh interpreter.
+
+    Returns the duration of each stage (see STAGES) and the `limit` imports
+        that took the most time, in seconds.
+    '''
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         PROBE % {'module': module, 'path': APPS[module]}],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=False)
+    if process.returncode != 0:
+        raise RuntimeError('Unable to start %s:\n%s' % (module, process.stderr))
+    result = json.loads(process.stdout.splitlines()[-1])
+    imports = parse_importtime(process.stderr.splitlines())
+    return {
+        'stages': list(zip(STAGES, result['stages'])),
+        'imports': sorted(imports, key=lambda row: -row['cumulative'])[:limit]
+    }
+
+
+def parse_importtime(lines):
+    '''Parse the output of `-X importtime` into rows of seconds per module.
+
+    Each line is "import time: <self us> | <cumulative us> | <module>", with
+        the module indented by its import depth.
+    '''
+    rows = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except (IndexError, ValueError):
+            continue  # the header
+        rows.append({
+            'module': fields[2].strip(),
+            'self': own / 1e6,
+            'cumulative': cumulative / 1e6
+        })
+    return rows
+
+
+def report(result):
+    '''Format a startup profile (see profile()) as plain text.'''
+    stages = [{'stage': stage, 'ms': seconds * 1e3} for stage, seconds in result['stages']]
+    stages.append({'stage': 'total', 'ms': sum(row['ms'] for row in stages)})
+    imports = [
+        {'module': row['module'], 'self ms': row['self'] * 1e3,
+         'total ms': row['cumulative'] * 1e3}
+        for row in result['imports']
+    ]
+    return '%s\n\n%s' % (
+        format_table(stages, ['stage', 'ms']),
+        format_table(imports, ['module', 'self ms', 'total ms'])
+    )
+
+
+def main(module='wtf.app'):
+    '''Print the startup profile of an app to stderr.'''
+    print(report(profile(module)), file=sys.stderr)
@@ -0,0 +1,28 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+from wtf import startup
+
+
+IMPORTTIME = [
+    'import time: self [us] | cumulative | imported package',
+    'import time:       120 |        120 |   numpy.core',
+    'import time:      1500 |       1620 | numpy',
+    'Traceback: not an import line'
+]
+
+
+def test_parse_importtime():
+    assert startup.parse_importtime(IMPORTTIME) == [
+        {'module': 'numpy.core', 'self': 0.00012, 'cumulative': 0.00012},
+        {'module': 'numpy', 'self': 0.0015, 'cumulative': 0.00162}
+    ]
+
+
+def test_profile():
+    result = startup.profile('wtf.api.app', limit=5)
+    assert [stage for stage, _ in result['stages']] == startup.STAGES
+    assert all(seconds > 0 for _, seconds in result['stages'])
+    assert len(result['imports']) == 5
+    assert result['imports'][0]['module'] == 'wtf.api.app'
+    report = startup.report(result)
+    assert 'first request' in report
+    assert 'wtf.api.app' in report
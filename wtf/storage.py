@@ -0,0 +1,187 @@
+'''
+wtf.storage
+
+Repository storage backends, selected with WTF_STORAGE:
+  * memory (default): repositories are plain dicts in process memory
+  * sqlite:///<path>: repositories are tables in a SQLite database, so that
+    they can be shared by several processes (see wtf.server)
+
+    $ WTF_STORAGE=sqlite:////var/lib/wtf/wtf.db python -m wtf serve --workers 4
+
+A SQLite table behaves like the dict it replaces (keys in insertion order,
+    values are JSON documents). Decoded values are cached per process and
+    reused for as long as the stored document doesn't change, so unchanged
+    records keep their identity between reads (which the API's response cache
+    relies on).
+
+Each realm (see wtf.core.realms) has its own tables in the database: those of
+    the default realm are named after its repositories (e.g. `weapons`), and
+    those of other realms are prefixed with the realm's name (e.g.
+    `foo_weapons`, hyphens replaced with underscores).
+'''
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from wtf.cache import LRUCache
+from wtf.core import realms
+
+
+SQLITE_PREFIX = 'sqlite:///'
+TABLE_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+MAX_VARIABLES = 500  # per query, below SQLite's lowest limit (999)
+
+
+class SQLiteDatabase(object):
+    '''A SQLite database with one connection per thread and process.'''
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        '''Get the connection of the current thread.
+
+        Connections are not shared across fork(): a forked process opens its
+            own connections.
+        '''
+        local = self.local
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            local.connection, local.pid = connection, os.getpid()
+        return local.connection
+
+    def mapping(self, table, cache_size=10000):
+        '''Get a dict-like view of a table, creating it if necessary.'''
+        if not TABLE_NAME.match(table):
+            raise ValueError('Invalid table name: %s' % table)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, value TEXT NOT NULL)' % table)
+        return SQLiteMapping(self, table, cache_size)
+
+
+class SQLiteMapping(MutableMapping):
+    '''A dict-like SQLite table of JSON values.'''
+
+    def __init__(self, database, table, cache_size=10000):
+        self.database = database
+        self.table = table
+        self.decoded = LRUCache(max_entries=cache_size, name='sqlite:%s' % table)
+
+    def _query(self, sql, *args):
+        return self.database.connection.execute(sql % self.table, args)
+
+    def _decode(self, key, document):
+        cached = self.decoded.get(key)
+        if cached is not None and cached[0] == document:
+            return cached[1]
+        value = json.loads(document)
+        self.decoded.set(key, (document, value))
+        return value
+
+    def __getitem__(self, key):
+        row = self._query('SELECT value FROM %s WHERE key = ?', key).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self._decode(key, row[0])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def get_many(self, keys):
+        '''Get the values of many keys at once, by key (missing keys are left out).'''
+        keys = list(keys)
+        values = {}
+        for start in range(0, len(keys), MAX_VARIABLES):
+            batch = keys[start:start + MAX_VARIABLES]
+            sql = 'SELECT key, value FROM %%s WHERE key IN (%s)' % ', '.join('?' * len(batch))
+            for key, document in self._query(sql, *batch):
+                values[key] = self._decode(key, document)
+        return values
+
+    def __setitem__(self, key, value):
+        document = json.dumps(value, separators=(',', ':'))
+        self._query('INSERT OR IGNORE INTO %s (key, value) VALUES (?, ?)', key, document)
+        self._query('UPDATE %s SET value = ? WHERE key = ?', document, key)
+
+    def setdefault(self, key, default=None):
+        '''Get the value of a key, storing `default` first if the key is missing (atomically).'''
+        document = json.dumps(default, separators=(',', ':'))
+        if self._query('INSERT OR IGNORE INTO %s (key, value) VALUES (?, ?)',
+                       key, document).rowcount == 1:
+            return default
+        return self[key]
+
+    def append(self, key, value):
+        '''Append a value to the list stored at a key (created if missing).
+
+        The list is read and written in a single transaction, so that
+            concurrent appends (from any process) are not lost.
+        '''
+        connection = self.database.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._query('SELECT value FROM %s WHERE key = ?', key).fetchone()
+            values = json.loads(row[0]) if row is not None else []
+            values.append(value)
+            self[key] = values
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def __delitem__(self, key):
+        if self._query('DELETE FROM %s WHERE key = ?', key).rowcount == 0:
+            raise KeyError(key)
+        self.decoded.delete(key)
+
+    def __iter__(self):
+        return iter([row[0] for row in self._query('SELECT key FROM %s ORDER BY rowid')])
+
+    def __len__(self):
+        return self._query('SELECT COUNT(*) FROM %s').fetchone()[0]
+
+    def items(self):
+        return [
+            (key, self._decode(key, document))
+            for key, document in self._query('SELECT key, value FROM %s ORDER BY rowid')
+        ]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+
+def init(url, realm=None):
+    '''Set up the repositories of a realm (by default the current one) for a storage URL.
+
+    Raises a ValueError if the URL is not supported.
+    '''
+    if url == 'memory':
+        return
+    if not url.startswith(SQLITE_PREFIX):
+        raise ValueError('Unsupported storage: %s' % url)
+    realm = realm or realms.current()
+    prefix = '' if realm is realms.DEFAULT else realm.name.replace('-', '_') + '_'
+    database = SQLiteDatabase(url[len(SQLITE_PREFIX):])
+    repositories = realm.repositories
+    repositories['accounts'] = {
+        'by_id': database.mapping(prefix + 'accounts'),
+        'by_email': database.mapping(prefix + 'accounts_by_email')
+    }
+    repositories['characters'] = {
+        'by_id': database.mapping(prefix + 'characters'),
+        'by_account': database.mapping(prefix + 'characters_by_account')
+    }
+    repositories['weapon_recipes'] = {'by_id': database.mapping(prefix + 'weapon_recipes')}
+    repositories['weapons'] = {'by_id': database.mapping(prefix + 'weapons')}
+    repositories['armor_recipes'] = {'by_id': database.mapping(prefix + 'armor_recipes')}
+    repositories['armor'] = {'by_id': database.mapping(prefix + 'armor')}
@@ -0,0 +1,125 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import os
+import threading
+import pytest
+from mock import patch
+from wtf import storage
+from wtf.core import accounts, characters, realms, weapons
+from wtf.core.errors import NotFoundError
+
+
+@pytest.fixture
+def database(tmpdir):
+    return storage.SQLiteDatabase(str(tmpdir.join('wtf.db')))
+
+
+def test_mapping(database):
+    mapping = database.mapping('things')
+    assert len(mapping) == 0
+    mapping['b'] = {'id': 'b', 'grade': 0.5}
+    mapping['a'] = {'id': 'a', 'tags': ['foo']}
+    mapping['b'] = {'id': 'b', 'grade': 0.75}
+    assert len(mapping) == 2
+    assert list(mapping) == ['b', 'a']
+    assert mapping['b'] == {'id': 'b', 'grade': 0.75}
+    assert mapping.get('c') is None
+    assert mapping.values() == [{'id': 'b', 'grade': 0.75}, {'id': 'a', 'tags': ['foo']}]
+    del mapping['b']
+    assert 'b' not in mapping
+    with pytest.raises(KeyError):
+        del mapping['b']
+    with pytest.raises(KeyError):
+        mapping['b']  # pylint: disable=pointless-statement
+
+
+@patch('wtf.storage.MAX_VARIABLES', 2)
+def test_mapping_get_many(database):
+    mapping = database.mapping('things')
+    for key in 'abc':
+        mapping[key] = {'id': key}
+    assert mapping.get_many(['c', 'a', 'd', 'b']) == {
+        'a': {'id': 'a'}, 'b': {'id': 'b'}, 'c': {'id': 'c'}}
+    assert mapping.get_many(['a'])['a'] is mapping['a']
+    assert mapping.get_many([]) == {}
+
+
+def test_mapping_shared(database, tmpdir):
+    mapping = database.mapping('things')
+    other = storage.SQLiteDatabase(str(tmpdir.join('wtf.db'))).mapping('things')
+    mapping['a'] = {'id': 'a'}
+    assert other['a'] == {'id': 'a'}
+    value = other['a']
+    assert other['a'] is value
+    mapping['a'] = {'id': 'a', 'name': 'Foo'}
+    assert other['a'] == {'id': 'a', 'name': 'Foo'}
+
+
+def test_mapping_setdefault(database):
+    mapping = database.mapping('things')
+    assert mapping.setdefault('a', {'id': 'a'}) == {'id': 'a'}
+    assert mapping.setdefault('a', {'id': 'b'}) == {'id': 'a'}
+    assert mapping['a'] == {'id': 'a'}
+
+
+def test_mapping_append(database, tmpdir):
+    mapping = database.mapping('things')
+    other = storage.SQLiteDatabase(str(tmpdir.join('wtf.db'))).mapping('things')
+
+    def append(target, i):
+        for j in range(20):
+            target.append('a', {'id': '%d-%d' % (i, j)})
+
+    threads = [threading.Thread(target=append, args=(target, i))
+               for i, target in enumerate([mapping, other] * 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(mapping['a']) == 80
+    assert len({value['id'] for value in other['a']}) == 80
+
+
+def test_connection_per_process(database):
+    connection = database.connection
+    assert database.connection is connection
+    with patch('wtf.storage.os.getpid', return_value=os.getpid() + 1):
+        assert database.connection is not connection
+
+
+def test_invalid_table(database):
+    with pytest.raises(ValueError):
+        database.mapping('things; DROP TABLE things')
+
+
+def test_init(tmpdir):
+    saved = dict(realms.DEFAULT.repositories)
+    try:
+        storage.init('memory')
+        assert realms.DEFAULT.repositories == saved
+        storage.init('sqlite:///%s' % tmpdir.join('wtf.db'))
+        assert isinstance(weapons.REPO['by_id'], storage.SQLiteMapping)
+        account = accounts.save(accounts.create(email='foo@example.com', password='bar'))
+        assert accounts.find_by_email('foo@example.com') == account
+        characters.save(characters.create(account=account['id'], name='Foo'))
+        characters.save(characters.create(account=account['id'], name='Bar'))
+        assert [c['name'] for c in characters.find_by_account(account['id'])] == ['Foo', 'Bar']
+        with pytest.raises(ValueError):
+            storage.init('redis://localhost')
+    finally:
+        realms.DEFAULT.repositories.update(saved)
+
+
+def test_init_realm(tmpdir):
+    realm = realms.Realm('foo-2')
+    url = 'sqlite:///%s' % tmpdir.join('wtf.db')
+    storage.init(url, realm)
+    assert realm.repositories['weapons']['by_id'].table == 'foo_2_weapons'
+    with realms.using(realm):
+        account = accounts.save(accounts.create(email='foo@realm.example.com', password='bar'))
+    with pytest.raises(NotFoundError):
+        accounts.find_by_email('foo@realm.example.com')
+    # another process sees the realm's records
+    other = realms.Realm('foo-2')
+    storage.init(url, other)
+    with realms.using(other):
+        assert accounts.find_by_email('foo@realm.example.com') == account
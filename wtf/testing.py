@@ -2,8 +2,18 @@
 wtf.testing
 
 Application testing helpers.
+
+ConcurrentTestClient sends batches of requests to a Flask app from a pool of
+    threads (in-process, without sockets), to test how the app copes with
+    concurrent requests: lost updates, duplicates that should have been
+    rejected, throughput.
 '''
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from json import loads as json_loads, dumps as json_dumps
+from time import monotonic
+from wtf.api.packing import packb, unpackb
 
 
 def create_test_client(app):
@@ -17,12 +27,10 @@ def create_test_client(app):
 class TestClient(object):
     '''A convenience wrapper for Flask test clients'''
 
-    test_client = None
-    root_path = '/'
-    default_headers = {}
-
     def __init__(self, test_client):
         self.test_client = test_client
+        self.root_path = '/'
+        self.default_headers = {}
 
     def set_root_path(self, path):
         '''Set the root request path'''
@@ -37,7 +45,11 @@ class TestClient(object):
         path = '%s%s' % (self.root_path, path)
         headers = kwargs.get('headers', self.default_headers)
         body = kwargs.get('body')
-        data = json_dumps(body) if body is not None else None
+        data = None
+        if body is not None and headers.get('Content-Type') == 'application/msgpack':
+            data = packb(body)
+        elif body is not None:
+            data = json_dumps(body)
         response = self.test_client.post(
             path=path,
             headers=headers,
@@ -69,11 +81,148 @@ class AssertableResponse(object):
         message %= (expected, actual)
         assert expected == actual, message
 
+    @property
+    def status_code(self):
+        '''The response status code'''
+        return self.response.status_code
+
+    def body(self):
+        '''Get the response body, decoded if it is JSON or MessagePack'''
+        body = self.response.get_data()
+        if self.response.content_type == 'application/json':
+            return json_loads(body)
+        if self.response.content_type == 'application/msgpack':
+            return unpackb(body)
+        return body
+
     def assert_body(self, expected):
         '''Assert that the response body is as expected'''
-        actual = self.response.get_data()
-        if self.response.content_type == 'application/json':
-            actual = json_loads(actual)
+        actual = self.body()
         message = 'Expected response body to be %s, got %s'
         message %= (expected, actual)
         assert expected == actual, message
+
+
+class ConcurrentTestClient(object):
+    '''A test client that sends batches of requests to a Flask app concurrently
+
+    Each thread has its own Flask test client. The requests of a batch are
+        released together, so that the first `threads` of them overlap as
+        much as possible.
+    '''
+
+    def __init__(self, app, threads=8):
+        app.testing = True
+        self.app = app
+        self.threads = threads
+        self.root_path = '/'
+        self.default_headers = {}
+        self.local = threading.local()
+
+    def set_root_path(self, path):
+        '''Set the root request path'''
+        self.root_path = path
+
+    def set_default_headers(self, headers):
+        '''Set the default request headers'''
+        self.default_headers = headers
+
+    def client(self):
+        '''Get the calling thread's test client'''
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = TestClient(self.app.test_client())
+            self.local.client = client
+        return client
+
+    def batch(self, requests):
+        '''Send requests concurrently
+
+        Each request is a (method, path, kwargs) tuple, where method is 'get'
+            or 'post' and kwargs are passed to TestClient.get()/post().
+        '''
+        start_event = threading.Event()
+
+        def send(method, path, kwargs):
+            start_event.wait()
+            client = self.client()
+            client.set_root_path(self.root_path)
+            client.set_default_headers(self.default_headers)
+            start = monotonic()
+            response = getattr(client, method)(path, **kwargs)
+            return TimedResponse(response.response, monotonic() - start)
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            futures = [executor.submit(send, *request) for request in requests]
+            start = monotonic()
+            start_event.set()
+            responses = [future.result() for future in futures]
+        return BatchResult(responses, monotonic() - start)
+
+    def post_many(self, path, bodies, **kwargs):
+        '''POST each body to a path concurrently'''
+        return self.batch([('post', path, dict(kwargs, body=body)) for body in bodies])
+
+    def get_many(self, paths, **kwargs):
+        '''GET each path concurrently'''
+        return self.batch([('get', path, kwargs) for path in paths])
+
+
+class TimedResponse(AssertableResponse):
+    '''An assertable response, with the time it took in seconds'''
+
+    def __init__(self, response, seconds):
+        super(TimedResponse, self).__init__(response)
+        self.seconds = seconds
+
+
+class BatchResult(object):
+    '''The responses to a batch of concurrent requests, in request order'''
+
+    def __init__(self, responses, elapsed):
+        self.responses = responses
+        self.elapsed = elapsed
+
+    def __len__(self):
+        return len(self.responses)
+
+    def __iter__(self):
+        return iter(self.responses)
+
+    def status_codes(self):
+        '''Count the responses by status code'''
+        return Counter(response.status_code for response in self.responses)
+
+    def throughput(self):
+        '''Get the number of requests per second'''
+        return len(self.responses) / self.elapsed if self.elapsed else 0.0
+
+    def latencies(self):
+        '''Get the sorted durations of the requests, in seconds'''
+        return sorted(response.seconds for response in self.responses)
+
+    def assert_status_codes(self, expected):
+        '''Assert that the responses have the expected status code counts
+
+        For instance, {201: 1, 400: 9} when creating the same account 10 times
+            concurrently: exactly one must succeed.
+        '''
+        actual = dict(self.status_codes())
+        message = 'Expected response status codes to be %s, got %s'
+        message %= (expected, actual)
+        assert expected == actual, message
+
+    def assert_unique(self, key, status_code=None):
+        '''Assert that a value of the responses' bodies is unique
+
+        `key` gets the value from a response body, e.g. the ID of a created
+            entity. Only responses with `status_code` are checked, if given.
+        '''
+        values = Counter(
+            key(response.body()) for response in self.responses
+            if status_code is None or response.status_code == status_code
+        )
+        duplicates = sorted(str(value) for value, count in values.items() if count > 1)
+        message = 'Expected response values to be unique, got duplicates: %s'
+        message %= ', '.join(duplicates)
+        assert not duplicates, message
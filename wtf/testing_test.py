@@ -0,0 +1,62 @@
+# pylint: disable=missing-docstring,invalid-name,redefined-outer-name
+import pytest
+from mock import patch
+from wtf.api.app import create_app
+from wtf.testing import BatchResult, ConcurrentTestClient, create_test_client
+
+
+@pytest.fixture
+def concurrent_client():
+    client = ConcurrentTestClient(create_app(), threads=4)
+    client.set_root_path('/api')
+    client.set_default_headers({'Content-Type': 'application/json'})
+    return client
+
+
+def test_test_client_default_headers():
+    app = create_app()
+    client = create_test_client(app)
+    client.set_default_headers({'Content-Type': 'application/json'})
+    assert create_test_client(app).default_headers == {}
+
+
+@patch('wtf.core.accounts.REPO', {'by_id': {}, 'by_email': {}})
+def test_post_many(concurrent_client):
+    from wtf.core import accounts
+    bodies = [{'email': '%d@foo.com' % i, 'password': 'bar'} for i in range(20)]
+    result = concurrent_client.post_many('/accounts', bodies)
+    assert len(result) == 20
+    result.assert_status_codes({201: 20})
+    result.assert_unique(lambda body: body['account']['id'])
+    assert [response.body()['account']['email'] for response in result] == [
+        body['email'] for body in bodies]
+    # no lost updates
+    assert len(accounts.REPO['by_email']) == 20
+    assert result.throughput() > 0
+    assert len(result.latencies()) == 20
+
+
+@patch('wtf.core.accounts.REPO', {'by_id': {}, 'by_email': {}})
+def test_post_many_duplicates(concurrent_client):
+    from wtf.core import accounts
+    result = concurrent_client.post_many('/accounts', [{'email': 'foo@bar.com',
+                                                        'password': 'baz'}] * 10)
+    result.assert_status_codes({201: 1, 400: 9})
+    assert len(accounts.REPO['by_email']) == 1
+
+
+def test_get_many(concurrent_client):
+    result = concurrent_client.get_many(['/health'] * 8 + ['/foo'])
+    result.assert_status_codes({200: 8, 404: 1})
+    assert all(response.seconds >= 0 for response in result)
+    with pytest.raises(AssertionError):
+        result.assert_status_codes({200: 9})
+
+
+def test_batch_assert_unique(concurrent_client):
+    result = concurrent_client.batch([('get', '/health', {}), ('get', '/health', {})])
+    with pytest.raises(AssertionError) as error:
+        result.assert_unique(lambda body: body)
+    assert 'Healthy' in str(error.value)
+    result.assert_unique(lambda body: body, status_code=404)
+    assert BatchResult([], 0.0).throughput() == 0.0